@@ -0,0 +1,115 @@
+"""
+Benchmark grep_code: legacy line-by-line scan vs the grep engine fast paths.
+
+Builds a synthetic source tree (plus node_modules noise and binaries) in a
+temp dir, then times each query shape with both implementations.
+
+Usage:
+    python benchmarks/bench_grep.py [--files 2000] [--lines 200] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.grep_engine import grep  # noqa: E402
+
+
+def legacy_grep(roots: List[Path], pattern: str, limit: int) -> List[Dict[str, Any]]:
+    """The original cmd_grep_code loop (rglob + per-line str regex)"""
+    compiled = re.compile(pattern)
+    results = []
+    for root in roots:
+        for path in root.rglob("*"):
+            if not path.is_file():
+                continue
+            try:
+                with path.open('r', encoding='utf-8', errors='ignore') as f:
+                    for i, line in enumerate(f, start=1):
+                        if compiled.search(line):
+                            results.append({"path": str(path), "line": i, "preview": line.rstrip('\n')})
+                            if len(results) >= limit:
+                                return results
+            except Exception:
+                continue
+    return results
+
+
+def build_tree(root: Path, files: int, lines: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    words = [''.join(rng.choices(string.ascii_lowercase + '_', k=rng.randint(4, 12))) for _ in range(5000)]
+    for i in range(files):
+        d = root / "src" / f"pkg{i % 40}"
+        d.mkdir(parents=True, exist_ok=True)
+        body = []
+        for _ in range(lines):
+            body.append("    " + " = ".join(rng.sample(words, 2)) + f"({rng.choice(words)})")
+        (d / f"mod{i}.py").write_text("\n".join(body) + "\n")
+    # Noise the new engine should skip entirely
+    nm = root / "node_modules" / "dep"
+    nm.mkdir(parents=True)
+    for i in range(files // 4):
+        (nm / f"vendor{i}.js").write_text("\n".join(rng.sample(words, 50)) * 20)
+    for i in range(files // 20):
+        (root / "src" / f"blob{i}.bin").write_bytes(bytes(rng.randrange(256) for _ in range(65536)))
+    return words
+
+
+def timed(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        words = build_tree(root, args.files, args.lines)
+        rng = random.Random(11)
+        ident = rng.choice(words)
+        cases = [
+            ("literal", {"pattern": ident}, ident),
+            ("regex+required literal", {"pattern": rf"{ident}\(\w+\)"}, rf"{ident}\(\w+\)"),
+            ("regex (no literal)", {"pattern": r"^\s+[a-c]\w{10} ="}, r"^\s+[a-c]\w{10} ="),
+        ]
+        for k in (5, 200):
+            lits = rng.sample(words, k)
+            cases.append((f"{k} literals", {"patterns": lits}, "|".join(re.escape(w) for w in lits)))
+
+        rows = []
+        for name, kwargs, legacy_pattern in cases:
+            legacy_s = timed(lambda: legacy_grep([root], legacy_pattern, args.limit), args.repeat)
+            engine_s = timed(lambda: list(grep([root], limit=args.limit, **kwargs)), args.repeat)
+            rows.append({
+                "case": name,
+                "legacy_s": round(legacy_s, 4),
+                "engine_s": round(engine_s, 4),
+                "speedup": round(legacy_s / engine_s, 1) if engine_s else None,
+            })
+            print(f"{name:<26} legacy {legacy_s:8.3f}s   engine {engine_s:8.3f}s   "
+                  f"x{legacy_s / engine_s:.1f}", file=sys.stderr)
+
+        print(json.dumps({"files": args.files, "lines_per_file": args.lines, "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark the HNSW index: recall@k and latency against exact search.
+
+Builds one numpy-backend store with the flat index and one with the hnsw
+index over the same clustered unit vectors (closer to real embeddings than
+uniform noise), then for each efSearch value reports recall@k against the
+exact top-k and median query latency, next to the flat scan's latency.
+
+Usage:
+    python benchmarks/bench_hnsw.py [--size 20000] [--dim 256] [--m 16] [--ef-construction 200]
+                                    [--ef 16,32,64,128,256] [--k 10] [--queries 100]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_vectors import build_store  # noqa: E402
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", default="16,32,64,128,256", help="Comma-separated efSearch values")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.size + args.queries, args.dim, args.clusters)
+    vectors, queries = data[:args.size], data[args.size:]
+    with tempfile.TemporaryDirectory() as tmp:
+        flat = build_store(Path(tmp) / "flat.db", vectors, "numpy", index="flat")
+        start = time.perf_counter()
+        hnsw = build_store(Path(tmp) / "hnsw.db", vectors, "numpy", index="hnsw",
+                           hnsw_m=args.m, ef_construction=args.ef_construction)
+        build_s = time.perf_counter() - start
+
+        exact, flat_ms = [], []
+        for q in queries:
+            start = time.perf_counter()
+            exact.append({c.id for c, _ in flat.search(q.tolist(), limit=args.k)})
+            flat_ms.append((time.perf_counter() - start) * 1000)
+
+        rows = []
+        for ef in [int(e) for e in args.ef.split(",")]:
+            recalls, times = [], []
+            for q, truth in zip(queries, exact):
+                start = time.perf_counter()
+                found = {c.id for c, _ in hnsw.search(q.tolist(), limit=args.k, ef_search=ef)}
+                times.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(found & truth) / args.k)
+            rows.append({"ef_search": ef, f"recall@{args.k}": round(statistics.mean(recalls), 4),
+                         "median_ms": round(statistics.median(times), 3)})
+            print(f"ef={ef:<5} recall@{args.k} {rows[-1][f'recall@{args.k}']:.3f}   {rows[-1]['median_ms']:8.3f} ms",
+                  file=sys.stderr)
+        graph = hnsw.get_stats()["hnsw"]
+        flat.close()
+        hnsw.close()
+
+    print(json.dumps({
+        "size": args.size,
+        "dim": args.dim,
+        "k": args.k,
+        "hnsw": {"m": args.m, "ef_construction": args.ef_construction, "build_s": round(build_s, 2),
+                 "build_ms_per_row": round(build_s * 1000 / args.size, 3),
+                 "max_level": graph["max_level"], "links_mb": graph["links_mb"]},
+        "flat_median_ms": round(statistics.median(flat_ms), 3),
+        "ef_sweep": rows,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
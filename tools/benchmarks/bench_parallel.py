@@ -0,0 +1,100 @@
+"""
+Benchmark parallel_run: in-process execution against fork-per-command.
+
+Builds the startup benchmark's fixture tree, then runs the same spec of
+code-tools commands through run_parallel with --mode subprocess (one
+interpreter per command, the previous behaviour) and --mode auto
+(in-process threads, plus worker processes for CPU-bound commands), and
+reports median wall-clock and the speedup. Both modes must produce the
+same envelopes.
+
+Usage:
+    python benchmarks/bench_parallel.py [--commands 60] [--workers 4] [--repeat 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_startup import build_fixture  # noqa: E402
+from parallel_run import placement, run_parallel  # noqa: E402
+
+TEMPLATES: List[List[str]] = [
+    ["code-tools", "read_file", "--path", "src/app.py", "--start", "1", "--end", "20"],
+    ["code-tools", "grep_code", "--pattern", "def main", "--paths", "src"],
+    ["code-tools", "search_file", "--glob", "**/*.py"],
+    ["code-tools", "list_dir", "--path", "."],
+    ["code-tools", "slugify_feature", "--name", "User Authentication"],
+    ["code-tools", "search_memory", "--dir", "memory", "--query", "auth flow"],
+    ["code-tools", "query_tasks", "--tasks-dir", ".tasks"],
+]
+
+
+def _comparable(merged: Dict[str, Any]) -> List[Any]:
+    return [(r.get("ok"), r.get("data")) for _, r in sorted(merged["results"].items())]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--commands", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Subprocesses should find compiled bytecode, like an installed CLI
+    os.environ.pop("PYTHONDONTWRITEBYTECODE", None)
+    spec = [TEMPLATES[i % len(TEMPLATES)] for i in range(args.commands)]
+    cwd = os.getcwd()
+    timings: Dict[str, List[float]] = {"subprocess": [], "auto": []}
+    outputs: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            build_fixture(Path(tmp))
+            run_parallel(spec[:len(TEMPLATES)], workers=args.workers, mode="subprocess")  # warm-up
+            for _ in range(args.repeat):
+                for mode in timings:
+                    start = time.perf_counter()
+                    merged = run_parallel(spec, workers=args.workers, mode=mode)
+                    timings[mode].append((time.perf_counter() - start) * 1000)
+                    outputs[mode] = _comparable(merged)
+        finally:
+            os.chdir(cwd)
+
+    sub_ms, auto_ms = statistics.median(timings["subprocess"]), statistics.median(timings["auto"])
+    where = [placement(cmd) for cmd in spec]
+    report = {
+        "commands": len(spec),
+        "workers": merged["stats"]["workers"],
+        "in_threads": where.count("thread"),
+        "in_processes": where.count("process"),
+        "subprocess_ms": round(sub_ms, 1),
+        "in_process_ms": round(auto_ms, 1),
+        "speedup": round(sub_ms / auto_ms, 1),
+        "same_results": outputs["subprocess"] == outputs["auto"],
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['commands']} commands, {report['workers']} workers "
+              f"({report['in_threads']} in threads, {report['in_processes']} in worker processes), "
+              f"median of {args.repeat}")
+        print(f"fork per command: {report['subprocess_ms']:>9.1f} ms")
+        print(f"in-process:       {report['in_process_ms']:>9.1f} ms")
+        print(f"speedup:          {report['speedup']:>9.1f}x  (same results: {report['same_results']})")
+    if not report["same_results"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark quantized search: memory, disk and recall@k against exact search.
+
+Builds one numpy-backend store over clustered unit vectors, then switches it
+between codecs (none, int8 and pq at each --pq-m) without re-embedding. For
+each codec it reports the encode time, the size of the codes (what a search
+scans, so what must stay in memory for queries to be fast), the float32
+matrix still kept on disk for re-ranking, and for each --rerank factor the
+recall@k and median latency. The last line compares the embedding cache's
+packed float32 entries with the JSON text it used to store.
+
+Usage:
+    python benchmarks/bench_quantization.py [--size 100000] [--dim 1536] [--pq-m 96,192,384]
+                                            [--rerank 1,4,10,20] [--k 10] [--queries 50]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_hnsw import clustered_vectors  # noqa: E402
+from bench_vectors import build_store  # noqa: E402
+
+from code_tools.embeddings import pack_embedding  # noqa: E402
+from code_tools.vector_store import VectorStore  # noqa: E402
+
+
+def mb(path: Path) -> float:
+    return round((path.stat().st_size if path.exists() else 0) / 1024 / 1024, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--pq-m", default="96,192,384", help="Comma-separated pq subvector counts")
+    parser.add_argument("--rerank", default="1,4,10,20", help="Comma-separated shortlist factors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.size + args.queries, args.dim, args.clusters)
+    vectors, queries = data[:args.size], data[args.size:]
+    codecs = [("none", None), ("int8", None)] + [("pq", int(m)) for m in args.pq_m.split(",")]
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "codebase.db"
+        store = build_store(db_path, vectors, "numpy")
+        exact, exact_ms = [], []
+        for q in queries:
+            start = time.perf_counter()
+            exact.append({c.id for c, _ in store.search(q.tolist(), limit=args.k)})
+            exact_ms.append((time.perf_counter() - start) * 1000)
+        store.close()
+        vectors_mb = mb(db_path.with_suffix(".vectors"))
+
+        for codec, pq_m in codecs:
+            start = time.perf_counter()
+            store = VectorStore(db_path, quantization=codec, pq_m=pq_m)
+            stats = store.get_stats().get("quantization", {})
+            encode_s = time.perf_counter() - start
+            store.close()
+            row = {"codec": codec if pq_m is None else f"pq{pq_m}",
+                   "encode_s": round(encode_s, 2),
+                   "code_bytes": stats.get("code_bytes", args.dim * 4),
+                   "scanned_mb": stats.get("codes_mb", vectors_mb),
+                   "disk_mb": round(vectors_mb + stats.get("codes_mb", 0), 2),
+                   "rerank": []}
+            for factor in ([1] if codec == "none" else [int(r) for r in args.rerank.split(",")]):
+                store = VectorStore(db_path, rerank=factor)
+                recalls, times = [], []
+                for q, truth in zip(queries, exact):
+                    start = time.perf_counter()
+                    found = {c.id for c, _ in store.search(q.tolist(), limit=args.k)}
+                    times.append((time.perf_counter() - start) * 1000)
+                    recalls.append(len(found & truth) / args.k)
+                store.close()
+                row["rerank"].append({"factor": factor, f"recall@{args.k}": round(statistics.mean(recalls), 4),
+                                      "median_ms": round(statistics.median(times), 3)})
+                print(f"{row['codec']:<8} {row['code_bytes']:>6} B/vector  scan {row['scanned_mb']:>9} MB  "
+                      f"rerank {factor:<3} recall@{args.k} {row['rerank'][-1][f'recall@{args.k}']:.3f}  "
+                      f"{row['rerank'][-1]['median_ms']:8.3f} ms", file=sys.stderr)
+            rows.append(row)
+
+    sample = vectors[0].tolist()
+    print(json.dumps({
+        "size": args.size,
+        "dim": args.dim,
+        "k": args.k,
+        "vectors_mb": vectors_mb,
+        "exact_median_ms": round(statistics.median(exact_ms), 3),
+        "codecs": rows,
+        "embedding_cache_bytes": {"json": len(json.dumps(sample).encode()), "packed": len(pack_embedding(sample))},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark CLI cold start: wall-clock per subcommand and -X importtime.
+
+Runs each subcommand in a fresh interpreter against a small fixture tree,
+reports median wall-clock overhead over a bare `python -c pass`, the total
+import time and the heaviest imported modules, and compares both against
+the tracked budget in startup_budget.json. Bytecode writing is enabled for
+the child processes (one warm-up run populates __pycache__), so numbers
+match an installed CLI rather than a source-only checkout.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 15] [--only slugify_feature,grep_code] [--check] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+TOOLS_DIR = Path(__file__).resolve().parent.parent
+BUDGET_PATH = Path(__file__).resolve().parent / "startup_budget.json"
+
+# Representative, cheap invocations (run inside the fixture directory)
+COMMANDS: Dict[str, List[str]] = {
+    "help": ["--help"],
+    "slugify_feature": ["slugify_feature", "--name", "User Authentication"],
+    "list_dir": ["list_dir", "--path", "."],
+    "search_file": ["search_file", "--glob", "**/*.py"],
+    "grep_code": ["grep_code", "--pattern", "def main", "--paths", "src"],
+    "read_file": ["read_file", "--path", "src/app.py", "--start", "1", "--end", "5"],
+    "create_file": ["create_file", "--file", "out/new.txt", "--content", "x"],
+    "search_memory": ["search_memory", "--dir", "memory", "--query", "auth flow"],
+    "read_task_manifest": ["read_task_manifest", "--path", ".tasks/01-auth/manifest.json"],
+    "query_tasks": ["query_tasks", "--tasks-dir", ".tasks"],
+    "list_memory_artifacts": ["list_memory_artifacts", "--dir", "memory"],
+    "query_memory": ["query_memory", "--dir", "memory", "--query", "auth", "--mode", "direct"],
+    "batch": ["batch", "--commands", '[["slugify_feature", "--name", "x"]]'],
+}
+
+
+def build_fixture(root: Path) -> None:
+    (root / "src").mkdir()
+    (root / "src" / "app.py").write_text("".join(f"def main_{i}():\n    return {i}\n" for i in range(50)))
+    (root / "memory").mkdir()
+    (root / "memory" / "design.md").write_text("# Auth flow\n\nTokens are issued by the auth service.\n")
+    feature = root / ".tasks" / "01-auth"
+    feature.mkdir(parents=True)
+    (feature / "manifest.json").write_text(json.dumps({
+        "feature": "auth",
+        "tasks": [{"id": "T01", "title": "Login", "status": "NOT_STARTED", "dependencies": []}],
+    }))
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(TOOLS_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def wall_ms(cmd: List[str], cwd: Path, env: Dict[str, str], repeat: int) -> float:
+    """Median wall-clock of repeat runs, after one warm-up run"""
+    subprocess.run(cmd, cwd=cwd, env=env, capture_output=True)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, capture_output=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def import_profile(argv: List[str], cwd: Path, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """(total import ms, heaviest modules by self time, all imported module names) from -X importtime"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "code_tools", *argv],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    total_us = 0
+    selfs: List[Tuple[str, float]] = []
+    modules: List[str] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header line
+        name = fields[2].rstrip()
+        if not name.startswith("  "):
+            total_us += cumulative_us
+        modules.append(name.strip())
+        selfs.append((name.strip(), self_us / 1000))
+    heaviest = sorted(selfs, key=lambda item: -item[1])[:5]
+    return total_us / 1000, heaviest, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--only", default=None, help="Comma-separated subset of benchmarked commands")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any command is over budget")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_PATH.read_text())
+    names = args.only.split(",") if args.only else list(COMMANDS)
+    env = child_env()
+    results: List[Dict[str, Any]] = []
+    failures: List[str] = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_fixture(root)
+        baseline = wall_ms([sys.executable, "-c", "pass"], root, env, args.repeat)
+        for name in names:
+            argv = COMMANDS[name]
+            wall = wall_ms([sys.executable, "-m", "code_tools", *argv], root, env, args.repeat)
+            imports_ms, heaviest, modules = import_profile(argv, root, env)
+            limits = {**budget["default"], **budget["commands"].get(name, {})}
+            loaded = sorted(m for m in limits.get("forbidden_imports", []) if m in modules)
+            overhead = wall - baseline
+            over = overhead > limits["overhead_ms"]
+            if over or loaded:
+                failures.append(name)
+            results.append({
+                "command": name,
+                "wall_ms": round(wall, 1),
+                "overhead_ms": round(overhead, 1),
+                "budget_ms": limits["overhead_ms"],
+                "imports_ms": round(imports_ms, 1),
+                "heaviest": [[m, round(ms, 1)] for m, ms in heaviest],
+                "forbidden_loaded": loaded,
+                "ok": not (over or loaded),
+            })
+
+    if args.json:
+        print(json.dumps({"baseline_ms": round(baseline, 1), "results": results}, indent=2))
+    else:
+        print(f"baseline (python -c pass): {baseline:.1f} ms, median of {args.repeat}")
+        print(f"{'command':<24}{'wall':>8}{'overhead':>10}{'budget':>8}{'imports':>9}  heaviest self-time imports")
+        for r in results:
+            flag = "" if r["ok"] else "  OVER BUDGET" + (f" (loaded {', '.join(r['forbidden_loaded'])})"
+                                                         if r["forbidden_loaded"] else "")
+            heavy = ", ".join(f"{m} {ms:.1f}" for m, ms in r["heaviest"][:3])
+            print(f"{r['command']:<24}{r['wall_ms']:>8.1f}{r['overhead_ms']:>10.1f}{r['budget_ms']:>8}"
+                  f"{r['imports_ms']:>9.1f}  {heavy}{flag}")
+    if args.check and failures:
+        print(f"over budget: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
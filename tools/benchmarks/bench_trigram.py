@@ -0,0 +1,95 @@
+"""
+Benchmark the persistent trigram index: build, refresh and query latency.
+
+Builds the same synthetic tree as bench_grep.py, then times a full index
+build, a no-op refresh, a refresh after touching 1% of files, and
+grep_code queries with and without the index.
+
+Usage:
+    python benchmarks/bench_trigram.py [--files 20000] [--lines 200] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_grep import build_tree, timed  # noqa: E402
+from code_tools.grep_engine import grep  # noqa: E402
+from code_tools.trigram_index import TrigramIndex  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "repo"
+        root.mkdir()
+        words = build_tree(root, args.files, args.lines)
+        index = TrigramIndex(root, Path(tmp) / "memory")
+
+        start = time.perf_counter()
+        index.refresh()
+        build_s = time.perf_counter() - start
+        noop_s = timed(index.refresh, args.repeat)
+
+        rng = random.Random(3)
+        sources = sorted((root / "src").rglob("*.py"))
+        for path in rng.sample(sources, max(1, len(sources) // 100)):
+            path.write_text(path.read_text() + f"{rng.choice(words)}_edited = 1\n")
+        start = time.perf_counter()
+        changed = index.refresh()
+        incremental_s = time.perf_counter() - start
+
+        ident = rng.choice(words)
+        cases = [
+            ("literal", {"pattern": ident}),
+            ("regex+required literal", {"pattern": rf"{ident}\(\w+\)"}),
+            ("absent literal", {"pattern": "no_such_identifier_here"}),
+            ("5 literals", {"patterns": rng.sample(words, 5)}),
+            ("regex (no literal, fallback)", {"pattern": r"^\s+[a-c]\w{10} ="}),
+        ]
+        rows = []
+        for name, kwargs in cases:
+            scan_s = timed(lambda: list(grep([root], limit=args.limit, **kwargs)), args.repeat)
+            index_s = timed(lambda: list(grep([root], limit=args.limit, index=index, **kwargs)), args.repeat)
+            rows.append({
+                "case": name,
+                "scan_s": round(scan_s, 4),
+                "index_s": round(index_s, 4),
+                "speedup": round(scan_s / index_s, 1) if index_s else None,
+            })
+            print(f"{name:<30} scan {scan_s:8.3f}s   index {index_s:8.3f}s   x{scan_s / index_s:.1f}",
+                  file=sys.stderr)
+
+        stats = index.get_stats()
+        index.close()
+        print(json.dumps({
+            "files": args.files,
+            "lines_per_file": args.lines,
+            "index": {
+                "build_s": round(build_s, 3),
+                "noop_refresh_s": round(noop_s, 3),
+                "refresh_1pct_s": round(incremental_s, 3),
+                "refresh_1pct_indexed": changed["indexed"],
+                "trigrams": stats["trigrams"],
+                "db_size_mb": stats["db_size_mb"],
+            },
+            "queries": rows,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark VectorStore backends: build time and search latency, numpy against vss.
+
+For each size, fills a store with random unit vectors (in batches, as
+sync_memory_graph does) and times the build and single-query search with
+and without a file filter, plus the per-query cost of answering all the
+queries at once with search_many. vss is measured only where the extension loads;
+otherwise its column reports why it was skipped. The numpy results are
+checked against a brute-force top-k.
+
+Usage:
+    python benchmarks/bench_vectors.py [--sizes 10000,100000,1000000] [--dim 1536] [--queries 20] [--k 10]
+"""
+
+import argparse
+import json
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.vector_store import CodeChunk, VectorStore, _load_vss  # noqa: E402
+
+BATCH = 10000
+
+
+def random_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_chunks(vectors: np.ndarray, offset: int = 0) -> List[CodeChunk]:
+    return [
+        CodeChunk(id=f"{offset + i:016x}", file_path=f"src/pkg{(offset + i) % 100}/mod{(offset + i) % 7}.py",
+                  start_line=1, end_line=2, chunk_type="function", name=f"f{offset + i}",
+                  content="pass", language="python", embedding=vector.tolist())
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def build_store(db_path: Path, vectors: np.ndarray, backend: str, **options: Any) -> VectorStore:
+    store = VectorStore(db_path, backend=backend, **options)
+    for start in range(0, len(vectors), BATCH):
+        store.batch_upsert(make_chunks(vectors[start:start + BATCH], start))
+    return store
+
+
+def latency_ms(store: VectorStore, queries: np.ndarray, k: int, **filters: Any) -> float:
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        store.search(q.tolist(), limit=k, **filters)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def batch_ms_per_query(store: VectorStore, queries: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    store.search_many(queries.tolist(), limit=k)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def brute_force(vectors: np.ndarray, query: np.ndarray, k: int) -> List[int]:
+    dist = ((vectors - query) ** 2).sum(axis=1)
+    return [int(i) for i in np.argsort(dist, kind="stable")[:k]]
+
+
+def measure(backend: str, vectors: np.ndarray, queries: np.ndarray, k: int, tmp: Path) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        store = build_store(tmp / f"{backend}.db", vectors, backend)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    build_s = time.perf_counter() - start
+    result = {
+        "build_s": round(build_s, 2),
+        "search_ms": round(latency_ms(store, queries, k), 2),
+        "filtered_search_ms": round(latency_ms(store, queries, k, file_filter="pkg7/"), 2),
+        "batch_search_ms_per_query": round(batch_ms_per_query(store, queries, k), 2),
+    }
+    if backend == "numpy":
+        found = [int(chunk.id, 16) for chunk, _ in store.search(queries[0].tolist(), limit=k)]
+        result["exact"] = found == brute_force(vectors, queries[0], k)
+    store.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated chunk counts")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vss = _load_vss(sqlite3.connect(":memory:"))
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    rows = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        vectors = random_vectors(size, args.dim)
+        with tempfile.TemporaryDirectory() as tmp:
+            row = {"chunks": size, "numpy": measure("numpy", vectors, queries, args.k, Path(tmp))}
+            row["vss"] = measure("vss", vectors, queries, args.k, Path(tmp)) if vss else {"error": "sqlite-vss does not load"}
+        rows.append(row)
+        print(f"{size:>9} chunks  numpy {row['numpy'].get('search_ms', '-'):>8} ms"
+              f"   vss {row['vss'].get('search_ms', row['vss'].get('error')):>8}", file=sys.stderr)
+
+    print(json.dumps({"dim": args.dim, "k": args.k, "queries": args.queries, "sizes": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+In-process batch execution for `code-tools batch`.
+
+Architecture:
+- Input is a JSON array of argv vectors or NDJSON with one vector per
+  line; a leading "code-tools" token is accepted and dropped
+- Every command is parsed by one shared build_parser() and run in-process;
+  its envelope is captured through cli._output instead of stdout, and
+  usage errors / sys.exit from _err are turned into per-command results
+- One session (cli._session) per batch shares expensive resources
+  (graph store, vector store connection, embedding provider) between
+  commands; each resource is guarded by its own lock
+- Read-only commands run concurrently on a thread pool; any other command
+  is a barrier: it waits for everything before it, runs alone, and later
+  commands start after it finishes
+- Results are yielded in completion order and carry their input index
+"""
+
+import argparse
+import contextvars
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Iterator, Set
+
+from code_tools import cli
+
+
+READ_ONLY_COMMANDS = {
+    "list_dir", "search_file", "grep_code", "read_file", "fetch_content", "search_web",
+    "search_memory", "slugify_feature", "read_task_manifest", "find_next_task",
+    "validate_manifest", "query_tasks", "analyze_dependencies", "list_memory_artifacts",
+    "query_memory",
+}
+
+
+class UsageError(Exception):
+    """argparse rejected a command's arguments"""
+
+
+def parse_commands(text: str) -> List[List[str]]:
+    """Argv vectors from a JSON array or NDJSON; raises ValueError on bad input"""
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        parsed = json.loads(text)
+        commands = parsed if isinstance(parsed, list) and all(isinstance(c, list) for c in parsed) else None
+    except json.JSONDecodeError:
+        commands = None
+    if commands is None:
+        commands = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                commands.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {number}: {e}")
+    for number, argv in enumerate(commands):
+        if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+            raise ValueError(f"command {number}: expected a list of strings")
+    return [argv[1:] if argv and argv[0] == "code-tools" else argv for argv in commands]
+
+
+def _install_handlers(parser: argparse.ArgumentParser) -> None:
+    """Make the parser and its subparsers raise instead of exiting, and print help to the captured output"""
+    parsers = [parser]
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            parsers.extend(action.choices.values())
+    for p in parsers:
+        def error(message: str, p: argparse.ArgumentParser = p) -> None:
+            raise UsageError(f"{p.prog}: {message}")
+        print_help = p.print_help
+        p.error = error
+        p.print_help = lambda file=None, print_help=print_help: print_help(file or cli._output.get())
+
+
+def command_parser() -> argparse.ArgumentParser:
+    """build_parser() whose usage errors raise UsageError and whose help goes to the captured output"""
+    parser = cli.build_parser()
+    _install_handlers(parser)
+    return parser
+
+
+def session_context() -> contextvars.Context:
+    """Context with a fresh shared session and no stream state; run each task in a copy of it"""
+    base = contextvars.copy_context()
+    base.run(cli._session.set, {"objects": {}, "lock": threading.Lock()})
+    base.run(cli._stream.set, None)
+    return base
+
+
+def execute(parser: argparse.ArgumentParser, argv: List[str]) -> Dict[str, Any]:
+    """Run one command in this thread; returns exit_code, output (envelope or NDJSON records), error, elapsed_ms"""
+    buf = io.StringIO()
+    start = time.perf_counter()
+    error: Optional[str] = None
+    exit_code = 0
+    streaming = False
+    output_token = cli._output.set(buf)
+    try:
+        args = parser.parse_args(argv)
+        if args.cmd == "batch":
+            raise UsageError("batch commands cannot be nested")
+        cli._load_env(args)
+        streaming = args.stream
+        stream_token = cli._stream.set({"start": start} if streaming else None)
+        try:
+            cli.dispatch(args)
+        finally:
+            cli._stream.reset(stream_token)
+    except UsageError as e:
+        exit_code, error = 2, str(e)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        exit_code, error = 1, f"{type(e).__name__}: {e}"
+    finally:
+        cli._output.reset(output_token)
+
+    output: Any = None
+    lines = [line for line in buf.getvalue().splitlines() if line.strip()]
+    try:
+        records = [json.loads(line) for line in lines]
+        output = records if streaming else (records[-1] if records else None)
+    except json.JSONDecodeError:
+        output = buf.getvalue()  # e.g. --help text
+    result: Dict[str, Any] = {
+        "exit_code": exit_code,
+        "output": output,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+def run_batch(commands: List[List[str]], workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run commands with one shared session; yields {index, argv, ...execute()} in completion order"""
+    parser = command_parser()
+    # Tasks inherit a context holding the session and no stream state of the batch itself
+    base = session_context()
+
+    def run_one(index: int, argv: List[str]) -> Dict[str, Any]:
+        result = execute(parser, argv)
+        return {"index": index, "argv": argv, **result}
+
+    def drain(pending: Set[Future], block: bool) -> Iterator[Dict[str, Any]]:
+        while pending:
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            if not done:
+                return
+            for future in done:
+                pending.discard(future)
+                yield future.result()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: Set[Future] = set()
+        for index, argv in enumerate(commands):
+            exclusive = not argv or argv[0] not in READ_ONLY_COMMANDS
+            if exclusive:
+                yield from drain(pending, block=True)
+            pending.add(pool.submit(base.copy().run, run_one, index, argv))
+            yield from drain(pending, block=exclusive)
+        yield from drain(pending, block=True)
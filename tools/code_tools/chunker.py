@@ -12,6 +12,7 @@ from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
 
 from code_tools.vector_store import CodeChunk
+from code_tools.walker import DEFAULT_EXCLUDE_PATTERNS
 
 
 @dataclass
@@ -394,10 +395,7 @@ def chunk_directory(
         extensions = ['.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.go', '.rs']
 
     if exclude_patterns is None:
-        exclude_patterns = [
-            '__pycache__', 'node_modules', '.git', 'venv', 'env',
-            '.pytest_cache', 'dist', 'build', '.next', '.vscode'
-        ]
+        exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
 
     chunks = []
 
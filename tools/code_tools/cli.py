@@ -1,146 +1,408 @@
 import argparse
+import contextlib
+import contextvars
 import json
 import os
 import re
 import sys
-import glob as _glob
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable, Sequence
 
 
 VERSION = "1.0"
 
+# Set by main() for --stream: {"start": perf_counter at command start}
+_stream: "contextvars.ContextVar[Optional[Dict[str, float]]]" = contextvars.ContextVar("stream", default=None)
+# Where envelopes are printed (None: sys.stdout); code_tools.batch captures per command
+_output: "contextvars.ContextVar[Optional[Any]]" = contextvars.ContextVar("output", default=None)
+# Set by code_tools.batch: resources shared by every command of one batch
+_session: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("session", default=None)
+# Set by dispatch() for --memo: {"cached": bool}, plus the tool/data/items _ok was called with
+_memo: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("memo", default=None)
+
+# Set once .env has been loaded for a needs_env command
+_env_loaded = False
+
+# Read-only commands whose results can be memoised with --memo
+MEMO_COMMANDS = {"list_dir", "search_file", "grep_code", "read_file", "search_memory"}
+# Arguments that do not change a command's result
+_MEMO_IGNORED = {"func", "needs_env", "stream", "memo", "memo_dir", "memo_max_mb"}
+
+
+def _shared(kind: str, key: str, factory: Callable[[], Any]) -> Tuple[Any, Any]:
+    """
+    (resource, lock) for expensive objects such as stores and providers.
+
+    Outside a batch this is factory() and a no-op lock. Inside one the
+    resource is created once and shared; hold the lock while using it.
+    """
+    session = _session.get()
+    if session is None:
+        return factory(), contextlib.nullcontext()
+    import threading
+
+    with session["lock"]:
+        entry = session["objects"].get((kind, key))
+        if entry is None:
+            entry = (factory(), threading.RLock())
+            session["objects"][(kind, key)] = entry
+    return entry
+
+
+def _ok(tool: str, data: Any, items: Optional[str] = None) -> None:
+    """
+    Print the success envelope.
+
+    Under --stream, list data (or data[items] for dict results) is emitted
+    one record per element, and the rest of a dict goes to the trailer.
+    """
+    memo = _memo.get()
+    if memo is not None:
+        memo.update(tool=tool, data=data, items=items)
+    if _stream.get() is None:
+        envelope = {"ok": True, "tool": tool, "version": VERSION, "data": data}
+        if memo is not None:
+            envelope["cached"] = memo["cached"]
+        print(json.dumps(envelope, ensure_ascii=False), file=_output.get())
+    elif isinstance(data, list):
+        _emit_stream(tool, data)
+    elif items and isinstance(data, dict) and isinstance(data.get(items), list):
+        _emit_stream(tool, data[items], {k: v for k, v in data.items() if k != items})
+    else:
+        _emit_stream(tool, [data])
+
 
-def _ok(tool: str, data: Any) -> None:
-    print(json.dumps({"ok": True, "tool": tool, "version": VERSION, "data": data}, ensure_ascii=False))
+def _ok_iter(tool: str, results: Iterable[Any]) -> None:
+    """_ok for lazily produced results: streamed as produced under --stream"""
+    if _stream.get() is None:
+        _ok(tool, list(results))
+        return
+    memo = _memo.get()
+    if memo is None:
+        _emit_stream(tool, results)
+        return
+    produced: List[Any] = []
+
+    def keep() -> Iterable[Any]:
+        for item in results:
+            produced.append(item)
+            yield item
+
+    _emit_stream(tool, keep())
+    memo.update(tool=tool, data=produced, items=None)
+
+
+def _record(record: Dict[str, Any]) -> None:
+    print(json.dumps(record, ensure_ascii=False), file=_output.get(), flush=True)
+
+
+def _emit_stream(tool: str, results: Iterable[Any], meta: Optional[Dict[str, Any]] = None) -> None:
+    """NDJSON: header, one result record per item, trailer with count and timings"""
+    start = _stream.get()["start"]
+    _record({"type": "header", "ok": True, "tool": tool, "version": VERSION})
+    count = 0
+    first_ms = None
+    for item in results:
+        if first_ms is None:
+            first_ms = round((time.perf_counter() - start) * 1000, 2)
+        _record({"type": "result", "data": item})
+        count += 1
+    trailer = {
+        "type": "trailer",
+        "ok": True,
+        "tool": tool,
+        "count": count,
+        "first_result_ms": first_ms,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    if meta:
+        trailer["meta"] = meta
+    memo = _memo.get()
+    if memo is not None:
+        trailer["cached"] = memo["cached"]
+    _record(trailer)
 
 
 def _err(tool: str, msg: str) -> None:
-    print(json.dumps({"ok": False, "tool": tool, "version": VERSION, "error": msg}, ensure_ascii=False))
+    envelope = {"ok": False, "tool": tool, "version": VERSION, "error": msg}
+    if _stream.get() is not None:
+        envelope = {"type": "error", **envelope}
+    print(json.dumps(envelope, ensure_ascii=False), file=_output.get(), flush=True)
     sys.exit(1)
 
 
+def dispatch(args: argparse.Namespace) -> None:
+    """
+    Run the parsed command.
+
+    With --memo the result is looked up in the result cache first and
+    replayed (with "cached": true) if none of the files it depended on
+    changed; otherwise the command runs with its file accesses recorded and
+    a successful result is stored.
+    """
+    if not getattr(args, "memo", False):
+        args.func(args)
+        return
+    from code_tools.result_cache import ResultCache, command_key, recording
+
+    directory = Path(args.memo_dir)
+    cache, lock = _shared("memo", str(directory.resolve()),
+                          lambda: ResultCache(directory, int(args.memo_max_mb * 1024 * 1024)))
+    try:
+        key = command_key(args.cmd, {k: v for k, v in vars(args).items() if k not in _MEMO_IGNORED})
+        with lock:
+            hit = cache.get(key)
+        captured: Dict[str, Any] = {"cached": hit is not None}
+        token = _memo.set(captured)
+        try:
+            if hit is not None:
+                _ok(hit["tool"], hit["data"], hit["items"])
+                return
+            with recording() as touched:
+                args.func(args)
+        finally:
+            _memo.reset(token)
+        if "data" in captured:
+            with lock:
+                cache.put(key, {k: captured[k] for k in ("tool", "data", "items")}, touched)
+    finally:
+        if _session.get() is None:
+            cache.close()
+
+
+def _dir_cache(args: argparse.Namespace):
+    """Persistent directory listing cache when --cache is given"""
+    if not getattr(args, 'cache', False):
+        return None
+    from code_tools.walker import DirCache
+    return DirCache(Path(args.cache_dir) / "dircache.json")
+
+
+def _walk_excludes(args: argparse.Namespace) -> Sequence[str]:
+    """Directory names list_dir/search_file skip: the defaults, unless --no-ignore asks for everything"""
+    from code_tools.walker import DEFAULT_EXCLUDE_PATTERNS
+
+    return () if args.no_ignore else DEFAULT_EXCLUDE_PATTERNS
+
+
 def cmd_list_dir(args: argparse.Namespace) -> None:
+    from code_tools.walker import walk
+
     base = Path(args.path)
     if not base.exists():
         _err("list_dir", f"Path not found: {base}")
-    depth = args.depth
-    include_hidden = args.hidden
-    results = []
-    for root, dirs, files in os.walk(base):
-        rel_depth = Path(root).relative_to(base).parts
-        if len(rel_depth) > depth:
-            # prune deeper walks
-            dirs[:] = []
-            continue
-        for name in list(dirs) + list(files):
-            if not include_hidden and name.startswith('.'):
+    cache = _dir_cache(args)
+
+    def entries():
+        for entry, rel, _ in walk(base, exclude=_walk_excludes(args), use_gitignore=not args.no_ignore,
+                                  include_hidden=args.hidden, max_depth=args.depth, cache=cache):
+            try:
+                st = entry.stat()
+                is_dir = entry.is_dir()
+            except OSError:
                 continue
-            p = Path(root) / name
-            st = p.stat()
-            results.append({
-                "path": str(p),
-                "type": "dir" if p.is_dir() else "file",
+            yield {
+                "path": str(base / rel),
+                "type": "dir" if is_dir else "file",
                 "size": st.st_size,
                 "mtime": int(st.st_mtime),
-            })
-    _ok("list_dir", results)
+            }
+        if cache is not None:
+            cache.save()
+
+    _ok_iter("list_dir", entries())
 
 
 def cmd_search_file(args: argparse.Namespace) -> None:
+    from code_tools.walker import find
+
     base = Path(args.path)
-    glb = args.glob
-    limit = args.limit
-    matches: List[Dict[str, Any]] = []
-    for path in _glob.iglob(str(base / glb), recursive=True):
-        p = Path(path)
-        try:
-            st = p.stat()
-        except FileNotFoundError:
-            continue
-        matches.append({
-            "path": str(p),
-            "size": st.st_size,
-            "mtime": int(st.st_mtime),
-        })
-        if len(matches) >= limit:
-            break
-    _ok("search_file", matches)
+    globs = [g for arg in args.glob for g in arg.split(',') if g.strip()]
+    cache = _dir_cache(args)
+
+    def matches():
+        count = 0
+        if args.limit > 0:
+            for entry, rel in find(base, globs, exclude=_walk_excludes(args), use_gitignore=not args.no_ignore,
+                                   include_hidden=args.hidden, cache=cache):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield {
+                    "path": str(base / rel),
+                    "size": st.st_size,
+                    "mtime": int(st.st_mtime),
+                }
+                count += 1
+                if count >= args.limit:
+                    break
+        if cache is not None:
+            cache.save()
+
+    _ok_iter("search_file", matches())
 
 
 def cmd_grep_code(args: argparse.Namespace) -> None:
+    from code_tools.grep_engine import grep
+
+    roots = [Path(p) for p in (args.paths.split(',') if args.paths else ['.'])]
+    literals = args.patterns.split(',') if args.patterns else None
+    if not args.pattern and not literals:
+        _err("grep_code", "Provide --pattern or --patterns")
+    index = None
+    if args.index:
+        from code_tools.trigram_index import TrigramIndex
+        index = TrigramIndex(Path('.'), Path(args.index_dir), use_gitignore=not args.no_ignore)
+        index.refresh()
     try:
-        pattern = re.compile(args.pattern)
+        matches = grep(
+            roots,
+            args.pattern,
+            patterns=literals,
+            limit=args.limit,
+            context=args.context,
+            workers=args.workers,
+            use_gitignore=not args.no_ignore,
+            index=index
+        )
     except re.error as e:
         _err("grep_code", f"invalid regex: {e}")
-    limit = args.limit
-    roots = [Path(p) for p in (args.paths.split(',') if args.paths else ['.'])]
-    results = []
-    for root in roots:
-        for path in root.rglob("*"):
-            if not path.is_file():
-                continue
-            try:
-                with path.open('r', encoding='utf-8', errors='ignore') as f:
-                    for i, line in enumerate(f, start=1):
-                        if pattern.search(line):
-                            results.append({
-                                "path": str(path),
-                                "line": i,
-                                "preview": line.rstrip('\n'),
-                            })
-                            if len(results) >= limit:
-                                _ok("grep_code", results)
-                                return
-            except Exception:
-                continue
-    _ok("grep_code", results)
+    finally:
+        # Candidates are resolved inside grep(); the index is no longer needed
+        if index is not None:
+            index.close()
+    _ok_iter("grep_code", matches)
 
 
 def cmd_read_file(args: argparse.Namespace) -> None:
+    from code_tools.line_index import read_ranges
+    from code_tools.result_cache import note
+
+    index_dir = None if args.no_index_cache else Path(args.index_dir)
+    if args.ranges:
+        _read_file_ranges(args, index_dir)
+        return
+    if not args.path:
+        _err("read_file", "Provide --path or --ranges")
     p = Path(args.path)
+    note(p)
     if not p.exists():
         _err("read_file", f"Path not found: {p}")
     start = args.start
     end = args.end
     if start is not None and start < 1:
         _err("read_file", "start must be >= 1")
-    content_lines: List[str] = []
-    with p.open('r', encoding='utf-8', errors='ignore') as f:
-        for i, line in enumerate(f, start=1):
-            if start is not None and i < start:
-                continue
-            if end is not None and i > end:
-                break
-            content_lines.append(line)
-    data = {
-        "path": str(p),
-        "start": start,
-        "end": end,
-        "content": ''.join(content_lines),
-        "line_count": len(content_lines),
-    }
-    _ok("read_file", data)
+    try:
+        window = read_ranges(str(p), [(start, end)], index_dir)[0]
+    except OSError as e:
+        _err("read_file", f"Cannot read {p}: {e}")
+    _ok("read_file", window)
+
+
+def _read_file_ranges(args: argparse.Namespace, index_dir: Optional[Path]) -> None:
+    """Multi-range mode: several windows across several files, each file mapped once"""
+    from code_tools.line_index import read_ranges
+    from code_tools.result_cache import note
+
+    try:
+        if args.ranges.startswith('@'):
+            note(args.ranges[1:])
+            ranges = json.loads(Path(args.ranges[1:]).read_text(encoding='utf-8'))
+        else:
+            ranges = json.loads(args.ranges)
+    except (OSError, ValueError) as e:
+        _err("read_file", f"Cannot read --ranges: {e}")
+    if isinstance(ranges, dict):
+        ranges = ranges.get("ranges", [])
+    if not isinstance(ranges, list) or not all(
+        isinstance(r, dict) and r.get("path")
+        and all(isinstance(r.get(key), int) or r.get(key) is None for key in ("start", "end"))
+        for r in ranges
+    ):
+        _err("read_file", "ranges must be a list of {path, start?, end?}")
+    for r in ranges:
+        if r.get("start") is not None and r["start"] < 1:
+            _err("read_file", "start must be >= 1")
+
+    by_path: Dict[str, List[int]] = {}
+    for position, r in enumerate(ranges):
+        by_path.setdefault(r["path"], []).append(position)
+    windows: List[Optional[Dict[str, Any]]] = [None] * len(ranges)
+    for path, positions in by_path.items():
+        note(path)
+        if not Path(path).exists():
+            for position in positions:
+                windows[position] = {"path": path, "error": f"Path not found: {path}"}
+            continue
+        try:
+            results = read_ranges(path, [(ranges[i].get("start"), ranges[i].get("end")) for i in positions], index_dir)
+        except OSError as e:
+            results = [{"path": path, "error": f"Cannot read {path}: {e}"}] * len(positions)
+        for position, window in zip(positions, results):
+            windows[position] = window
+    _ok("read_file", {"ranges": windows, "count": len(windows)}, items="ranges")
 
 
 def cmd_fetch_content(args: argparse.Namespace) -> None:
+    from code_tools.web_fetch import Fetcher, HTTPCache, make_session, DEFAULT_WORKERS
+
+    urls: List[str] = list(args.url or [])
+    if args.urls:
+        try:
+            if args.urls.startswith('@'):
+                text = Path(args.urls[1:]).read_text(encoding='utf-8')
+            else:
+                text = args.urls
+            listed = json.loads(text) if text.lstrip().startswith('[') else text.split()
+        except (OSError, ValueError) as e:
+            _err("fetch_content", f"Invalid urls: {e}")
+        if not isinstance(listed, list) or not all(isinstance(u, str) for u in listed):
+            _err("fetch_content", "urls must be a list of strings")
+        urls.extend(listed)
+    if not urls:
+        _err("fetch_content", "Provide --url or --urls")
+    if args.workers < 1:
+        _err("fetch_content", "workers must be >= 1")
+
     try:
-        import requests  # type: ignore
-    except Exception:
+        # Sessions are safe for concurrent GETs, so a batch shares one without its lock
+        session, _ = _shared("http", "session", lambda: make_session(max(args.workers, DEFAULT_WORKERS)))
+    except ImportError:
         _err("fetch_content", "requests not installed. pip install requests")
-    url = args.url
-    try:
-        resp = requests.get(url, timeout=15)
-        text = resp.text
-        # very light extraction: strip scripts/styles
-        cleaned = re.sub(r"<script[\s\S]*?</script>", "", text, flags=re.I)
-        cleaned = re.sub(r"<style[\s\S]*?</style>", "", cleaned, flags=re.I)
-        # naive text fallback
-        only_text = re.sub(r"<[^>]+>", " ", cleaned)
-        only_text = re.sub(r"\s+", " ", only_text).strip()
-        _ok("fetch_content", {"status": resp.status_code, "content": only_text[:20000]})
-    except Exception as e:
-        _err("fetch_content", str(e))
+    cache = None if args.no_cache else HTTPCache(Path(args.cache_dir) / "http_cache")
+    fetcher = Fetcher(session, cache=cache, ttl=args.ttl, timeout=args.timeout, max_chars=args.max_chars)
+
+    if len(urls) == 1 and not args.urls:
+        try:
+            result = fetcher.fetch(urls[0])
+        except Exception as e:
+            _err("fetch_content", str(e))
+        _ok("fetch_content", result)
+        return
+
+    start = time.perf_counter()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+
+    def produce() -> Iterable[Dict[str, Any]]:
+        for i, result in fetcher.fetch_many(urls, workers=args.workers):
+            results[i] = result
+            yield {"index": i, **result}
+
+    if _stream.get() is not None:
+        # Completion order, as each URL finishes
+        _ok_iter("fetch_content", produce())
+        return
+    for _ in produce():
+        pass
+    _ok("fetch_content", {
+        "results": results,
+        "count": len(results),
+        "failed": sum(1 for r in results if "error" in r),
+        "cache_hits": sum(1 for r in results if r.get("cache") in ("hit", "revalidated")),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }, items="results")
 
 
 def cmd_search_web(args: argparse.Namespace) -> None:
@@ -148,40 +410,45 @@ def cmd_search_web(args: argparse.Namespace) -> None:
 
 
 def cmd_search_replace(args: argparse.Namespace) -> None:
-    file_path = Path(args.file)
-    if not file_path.exists():
-        _err("search_replace", f"File not found: {file_path}")
-    # replacements file or inline JSON
-    if args.replacements.startswith('@'):
-        rep_path = Path(args.replacements[1:])
-        reps = json.loads(rep_path.read_text(encoding='utf-8'))
-    else:
-        reps = json.loads(args.replacements)
-    if not isinstance(reps, list):
-        reps = reps.get("replacements", reps)
-    content = file_path.read_text(encoding='utf-8')
-    summary = []
-    for r in reps:
-        orig = r.get("original_text")
-        new = r.get("new_text")
-        replace_all = bool(r.get("replace_all", False))
-        if orig is None or new is None:
-            _err("search_replace", "replacement missing original_text/new_text")
-        if orig == new:
-            _err("search_replace", "original_text and new_text identical")
-        count = content.count(orig)
-        if count == 0:
-            _err("search_replace", f"original_text not found: {orig[:80]}")
-        if not replace_all and count != 1:
-            _err("search_replace", f"original_text not unique (count={count})")
-        if replace_all:
-            content = content.replace(orig, new)
-            summary.append({"original_text": orig[:80], "new_text": new[:80], "count": count})
+    from code_tools.replace_engine import FilePlan, ReplaceError, apply_plan, load_plan
+
+    def load(value: str) -> Any:
+        if value.startswith('@'):
+            return json.loads(Path(value[1:]).read_text(encoding='utf-8'))
+        return json.loads(value)
+
+    try:
+        if args.plan:
+            plans = load_plan(load(args.plan))
+        elif args.file and args.replacements:
+            # replacements file or inline JSON
+            reps = load(args.replacements)
+            if not isinstance(reps, list):
+                reps = reps.get("replacements", reps)
+            if not isinstance(reps, list):
+                _err("search_replace", "replacements must be a list")
+            plans = [FilePlan(Path(args.file), reps)]
         else:
-            content = content.replace(orig, new, 1)
-            summary.append({"original_text": orig[:80], "new_text": new[:80], "count": 1})
-    file_path.write_text(content, encoding='utf-8')
-    _ok("search_replace", {"file": str(file_path), "applied": summary})
+            _err("search_replace", "Provide --file and --replacements, or --plan")
+    except (OSError, ValueError) as e:
+        _err("search_replace", f"Invalid replacements: {e}")
+
+    try:
+        edits = apply_plan(plans, workers=args.workers, dry_run=args.dry_run)
+    except ReplaceError as e:
+        if not args.plan and len(e.errors) == 1:
+            _err("search_replace", e.errors[0][1])
+        _err("search_replace", f"No files changed: {e}")
+
+    if not args.plan:
+        _ok("search_replace", {"file": str(edits[0].path), "applied": edits[0].applied})
+        return
+    _ok("search_replace", {
+        "files": [{"file": str(e.path), "applied": e.applied} for e in edits],
+        "count": len(edits),
+        "replacements": sum(a["count"] for e in edits for a in e.applied),
+        "dry_run": args.dry_run,
+    }, items="files")
 
 
 def cmd_create_file(args: argparse.Namespace) -> None:
@@ -201,43 +468,74 @@ def cmd_create_file(args: argparse.Namespace) -> None:
 
 
 def cmd_edit_file(args: argparse.Namespace) -> None:
-    file_path = Path(args.file)
-    if not file_path.exists():
-        _err("edit_file", f"File not found: {file_path}")
-    patch: str
+    patch: bytes
     if args.patch.startswith('@'):
-        patch = Path(args.patch[1:]).read_text(encoding='utf-8')
+        try:
+            patch = Path(args.patch[1:]).read_bytes()
+        except OSError as e:
+            _err("edit_file", f"Cannot read patch: {e}")
     else:
-        patch = args.patch
-    # Minimal patch: keep only provided text as the new content between existing markers
-    # Here we interpret the patch as the new full content for simplicity
-    file_path.write_text(patch, encoding='utf-8')
-    _ok("edit_file", {"file": str(file_path), "bytes": len(patch.encode('utf-8'))})
+        patch = args.patch.encode('utf-8')
+
+    from code_tools.patch_engine import PatchError, apply_patches, is_unified_diff, parse_patch
+
+    if args.mode == "content" or (args.mode == "auto" and not is_unified_diff(patch)):
+        # Whole-file replacement (the original edit_file behaviour), written atomically
+        if not args.file:
+            _err("edit_file", "--file is required for content mode")
+        file_path = Path(args.file)
+        if not file_path.exists():
+            _err("edit_file", f"File not found: {file_path}")
+        mode = file_path.stat().st_mode & 0o7777
+        tmp = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(patch)
+            os.chmod(tmp, mode)
+            tmp.replace(file_path)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            _err("edit_file", f"Could not write {file_path}: {e}")
+        _ok("edit_file", {"file": str(file_path), "bytes": len(patch)})
+        return
+
+    try:
+        results = apply_patches(
+            parse_patch(patch),
+            root=Path(args.root),
+            target=Path(args.file) if args.file else None,
+            strip=args.strip,
+            fuzz=args.fuzz,
+            dry_run=args.dry_run,
+        )
+    except (PatchError, OSError) as e:
+        _err("edit_file", str(e))
+    _ok("edit_file", {
+        "files": results,
+        "count": len(results),
+        "hunks_applied": sum(len(r["hunks"]) for r in results),
+        "dry_run": args.dry_run,
+    }, items="files")
 
 
 def cmd_search_memory(args: argparse.Namespace) -> None:
+    import sqlite3
+    from code_tools.memory_index import MemoryIndex
+
     base = Path(args.dir or ".dimitri/memory")
     query = args.query.strip()
-    topk = args.topk
     if not base.exists():
         _err("search_memory", f"Memory dir not found: {base}")
-    tokens = set(re.findall(r"\w+", query.lower()))
-    scored: List[Dict[str, Any]] = []
-    for p in base.rglob("*"):
-        if not p.is_file() or p.suffix.lower() not in {".md", ".txt"}:
-            continue
-        try:
-            text = p.read_text(encoding='utf-8', errors='ignore')
-        except Exception:
-            continue
-        words = re.findall(r"\w+", text.lower())
-        score = sum(1 for w in words if w in tokens)
-        if score > 0:
-            # simple snippet
-            snippet = text[:500]
-            scored.append({"path": str(p), "score": score, "snippet": snippet})
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    _ok("search_memory", scored[:topk])
+    try:
+        index = MemoryIndex(base)
+    except sqlite3.OperationalError:
+        # Read-only memory dir: index in memory for this query only
+        index = MemoryIndex(base, db_path=Path(":memory:"))
+    try:
+        index.refresh()
+        results = index.search(query, args.topk)
+    finally:
+        index.close()
+    _ok("search_memory", results)
 
 
 def cmd_slugify_feature(args: argparse.Namespace) -> None:
@@ -276,11 +574,12 @@ def cmd_read_task_manifest(args: argparse.Namespace) -> None:
     if not manifest_path.exists():
         _err("read_task_manifest", f"Manifest not found: {manifest_path}")
 
+    from code_tools.task_events import load_manifest_view, TaskEventError
+
     try:
-        with manifest_path.open('r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        _err("read_task_manifest", f"Invalid JSON: {e}")
+        data = load_manifest_view(manifest_path)
+    except TaskEventError as e:
+        _err("read_task_manifest", str(e))
 
     # Validate required fields
     required = ["feature", "tasks"]
@@ -302,73 +601,48 @@ def cmd_read_task_manifest(args: argparse.Namespace) -> None:
 
 
 def cmd_update_task_status(args: argparse.Namespace) -> None:
-    """Update task status in manifest and XML"""
-    task_id = args.task_id
-    new_status = args.status
+    """Record task status transitions in the event log and sync manifests"""
+    from code_tools.task_events import record_status_updates, TaskEventError
+
     feature_dir = Path(args.feature_dir)
 
-    if new_status not in ["NOT_STARTED", "IN_PROGRESS", "COMPLETED", "BLOCKED"]:
-        _err("update_task_status", f"Invalid status: {new_status}")
+    if args.updates:
+        try:
+            if args.updates.startswith('@'):
+                updates = json.loads(Path(args.updates[1:]).read_text(encoding='utf-8'))
+            else:
+                updates = json.loads(args.updates)
+        except (OSError, ValueError) as e:
+            _err("update_task_status", f"Cannot read --updates: {e}")
+        if isinstance(updates, dict):
+            updates = updates.get("updates", [])
+        if not isinstance(updates, list) or not all(isinstance(u, dict) for u in updates):
+            _err("update_task_status", "updates must be a list of {task_id, status}")
+    elif args.task_id and args.status:
+        updates = [{"task_id": args.task_id, "status": args.status}]
+    else:
+        _err("update_task_status", "Provide --task-id and --status, or --updates")
+
+    try:
+        applied = record_status_updates(feature_dir, updates)
+    except TaskEventError as e:
+        _err("update_task_status", str(e))
+
+    if args.updates:
+        _ok("update_task_status", {"updates": applied, "count": len(applied)})
+    else:
+        _ok("update_task_status", applied[0])
 
-    # Read task manifest
-    task_manifest_path = feature_dir / "manifest.json"
-    if not task_manifest_path.exists():
-        _err("update_task_status", f"Task manifest not found: {task_manifest_path}")
-
-    with task_manifest_path.open('r', encoding='utf-8') as f:
-        task_manifest = json.load(f)
-
-    # Find and update task
-    task_found = False
-    for task in task_manifest.get("tasks", []):
-        if task.get("id") == task_id:
-            old_status = task.get("status")
-            task["status"] = new_status
-            if new_status == "IN_PROGRESS" and "started" not in task:
-                task["started"] = json.dumps(None)  # Placeholder for timestamp
-            if new_status == "COMPLETED" and "completed" not in task:
-                task["completed"] = json.dumps(None)  # Placeholder for timestamp
-            task_found = True
-            break
-
-    if not task_found:
-        _err("update_task_status", f"Task {task_id} not found in manifest")
-
-    # Write updated task manifest
-    with task_manifest_path.open('w', encoding='utf-8') as f:
-        json.dump(task_manifest, f, indent=2)
-
-    # Update root manifest if needed
-    root_manifest_path = Path(".tasks/manifest.json")
-    if root_manifest_path.exists():
-        with root_manifest_path.open('r', encoding='utf-8') as f:
-            root_manifest = json.load(f)
-
-        # Update completed count
-        feature_id = task_manifest.get("feature", {}).get("id")
-        for feature in root_manifest.get("features", []):
-            if feature.get("id") == feature_id:
-                completed_count = sum(1 for t in task_manifest.get("tasks", []) if t.get("status") == "COMPLETED")
-                feature["completedCount"] = completed_count
-                # Update feature status
-                total_tasks = len(task_manifest.get("tasks", []))
-                if completed_count == 0:
-                    feature["status"] = "NOT_STARTED"
-                elif completed_count == total_tasks:
-                    feature["status"] = "COMPLETED"
-                else:
-                    feature["status"] = "IN_PROGRESS"
-                break
-
-        with root_manifest_path.open('w', encoding='utf-8') as f:
-            json.dump(root_manifest, f, indent=2)
-
-    _ok("update_task_status", {
-        "task_id": task_id,
-        "old_status": old_status,
-        "new_status": new_status,
-        "updated": True
-    })
+
+def cmd_materialize_manifest(args: argparse.Namespace) -> None:
+    """Apply pending task events to manifest.json (or replay the full log)"""
+    from code_tools.task_events import materialize, TaskEventError
+
+    try:
+        result = materialize(Path(args.feature_dir), replay=args.replay)
+    except TaskEventError as e:
+        _err("materialize_manifest", str(e))
+    _ok("materialize_manifest", result)
 
 
 def cmd_find_next_task(args: argparse.Namespace) -> None:
@@ -377,8 +651,12 @@ def cmd_find_next_task(args: argparse.Namespace) -> None:
     if not manifest_path.exists():
         _err("find_next_task", f"Manifest not found: {manifest_path}")
 
-    with manifest_path.open('r', encoding='utf-8') as f:
-        data = json.load(f)
+    from code_tools.task_events import load_manifest_view, TaskEventError
+
+    try:
+        data = load_manifest_view(manifest_path)
+    except TaskEventError as e:
+        _err("find_next_task", str(e))
 
     tasks = data.get("tasks", [])
 
@@ -410,6 +688,14 @@ def cmd_find_next_task(args: argparse.Namespace) -> None:
 
 def cmd_validate_manifest(args: argparse.Namespace) -> None:
     """Validate manifest consistency"""
+    from code_tools.task_index import validate_feature
+
+    if args.all:
+        _validate_all_manifests(Path(args.tasks_dir))
+        return
+    if not args.feature_dir:
+        _err("validate_manifest", "Provide --feature-dir or --all")
+
     feature_dir = Path(args.feature_dir)
     task_manifest_path = feature_dir / "manifest.json"
     root_manifest_path = Path(".tasks/manifest.json")
@@ -417,69 +703,169 @@ def cmd_validate_manifest(args: argparse.Namespace) -> None:
     if not task_manifest_path.exists():
         _err("validate_manifest", f"Task manifest not found: {task_manifest_path}")
 
-    with task_manifest_path.open('r', encoding='utf-8') as f:
-        task_manifest = json.load(f)
-
-    issues = []
-
-    # Check task count
-    actual_task_count = len(task_manifest.get("tasks", []))
-
-    # Check completed count
-    actual_completed = sum(1 for t in task_manifest.get("tasks", []) if t.get("status") == "COMPLETED")
-
-    # Check feature status accuracy
-    in_progress = sum(1 for t in task_manifest.get("tasks", []) if t.get("status") == "IN_PROGRESS")
-    blocked = sum(1 for t in task_manifest.get("tasks", []) if t.get("status") == "BLOCKED")
+    from code_tools.task_events import load_manifest_view, load_root_manifest_view, TaskEventError
 
-    expected_status = "NOT_STARTED"
-    if actual_completed == actual_task_count and actual_task_count > 0:
-        expected_status = "COMPLETED"
-    elif actual_completed > 0 or in_progress > 0:
-        expected_status = "IN_PROGRESS"
-    if blocked > 0:
-        expected_status = "BLOCKED"
+    try:
+        task_manifest = load_manifest_view(task_manifest_path)
+    except TaskEventError as e:
+        _err("validate_manifest", str(e))
+
+    tasks = task_manifest.get("tasks", [])
+    stats = {
+        "feature_id": task_manifest.get("feature", {}).get("id"),
+        "total_tasks": len(tasks),
+        "completed": sum(1 for t in tasks if t.get("status") == "COMPLETED"),
+        "in_progress": sum(1 for t in tasks if t.get("status") == "IN_PROGRESS"),
+        "blocked": sum(1 for t in tasks if t.get("status") == "BLOCKED"),
+    }
 
     # Compare with root manifest if exists
+    issues = []
     if root_manifest_path.exists():
-        with root_manifest_path.open('r', encoding='utf-8') as f:
-            root_manifest = json.load(f)
-
-        feature_id = task_manifest.get("feature", {}).get("id")
-        for feature in root_manifest.get("features", []):
-            if feature.get("id") == feature_id:
-                if feature.get("taskCount") != actual_task_count:
-                    issues.append({
-                        "type": "task_count_mismatch",
-                        "expected": actual_task_count,
-                        "found": feature.get("taskCount")
-                    })
-                if feature.get("completedCount") != actual_completed:
-                    issues.append({
-                        "type": "completed_count_mismatch",
-                        "expected": actual_completed,
-                        "found": feature.get("completedCount")
-                    })
-                if feature.get("status") != expected_status:
-                    issues.append({
-                        "type": "status_mismatch",
-                        "expected": expected_status,
-                        "found": feature.get("status")
-                    })
-                break
+        try:
+            root_manifest = load_root_manifest_view(root_manifest_path)
+        except TaskEventError as e:
+            _err("validate_manifest", str(e))
+        issues = validate_feature(stats, root_manifest.get("features", []))
 
     _ok("validate_manifest", {
         "valid": len(issues) == 0,
         "issues": issues,
         "stats": {
-            "total_tasks": actual_task_count,
-            "completed": actual_completed,
-            "in_progress": in_progress,
-            "blocked": blocked
+            "total_tasks": stats["total_tasks"],
+            "completed": stats["completed"],
+            "in_progress": stats["in_progress"],
+            "blocked": stats["blocked"]
         }
     })
 
 
+def _validate_all_manifests(tasks_dir: Path) -> None:
+    """Validate every feature manifest against the root manifest in one pass"""
+    from code_tools.task_events import load_root_manifest_view, TaskEventError
+    from code_tools.task_index import TaskIndex, validate_feature
+
+    if not tasks_dir.exists():
+        _err("validate_manifest", f"Tasks dir not found: {tasks_dir}")
+
+    root_features: List[Dict[str, Any]] = []
+    root_manifest_path = tasks_dir / "manifest.json"
+    if root_manifest_path.exists():
+        try:
+            root_features = load_root_manifest_view(root_manifest_path).get("features", [])
+        except TaskEventError as e:
+            _err("validate_manifest", str(e))
+
+    index = TaskIndex(tasks_dir)
+    try:
+        refresh = index.refresh()
+        features = []
+        for stats in index.feature_stats():
+            if stats["error"]:
+                issues = [{"type": "unreadable_manifest", "error": stats["error"]}]
+            else:
+                issues = validate_feature(stats, root_features)
+            features.append({
+                "manifest": stats["manifest"],
+                "feature_id": stats["feature_id"],
+                "valid": len(issues) == 0,
+                "issues": issues,
+                "stats": {
+                    "total_tasks": stats["total_tasks"],
+                    "completed": stats["completed"],
+                    "in_progress": stats["in_progress"],
+                    "blocked": stats["blocked"]
+                }
+            })
+    finally:
+        index.close()
+
+    _ok("validate_manifest", {
+        "valid": all(f["valid"] for f in features),
+        "feature_count": len(features),
+        "invalid_count": sum(1 for f in features if not f["valid"]),
+        "features": features,
+        "index": refresh
+    })
+
+
+def cmd_query_tasks(args: argparse.Namespace) -> None:
+    """Query tasks across all feature manifests via the task index"""
+    from code_tools.task_index import TaskIndex, STATUSES
+
+    tasks_dir = Path(args.tasks_dir)
+    if not tasks_dir.exists():
+        _err("query_tasks", f"Tasks dir not found: {tasks_dir}")
+    if args.status and args.status not in STATUSES:
+        _err("query_tasks", f"Invalid status: {args.status}")
+
+    index = TaskIndex(tasks_dir)
+    try:
+        refresh = index.refresh()
+        tasks = index.query_tasks(
+            status=args.status,
+            feature_id=args.feature,
+            task_id=args.task_id,
+            limit=args.limit
+        )
+        summary = index.summary()
+    finally:
+        index.close()
+
+    _ok("query_tasks", {
+        "tasks": tasks,
+        "count": len(tasks),
+        "summary": summary,
+        "index": refresh
+    })
+
+
+def cmd_analyze_dependencies(args: argparse.Namespace) -> None:
+    """Detect dependency cycles and compute critical path, slack and makespan"""
+    from code_tools.task_analysis import analyze_manifest, find_feature_manifests
+
+    if args.all:
+        tasks_dir = Path(args.tasks_dir)
+        if not tasks_dir.exists():
+            _err("analyze_dependencies", f"Tasks dir not found: {tasks_dir}")
+        manifests = find_feature_manifests(tasks_dir)
+    elif args.manifest:
+        manifests = [Path(args.manifest)]
+    elif args.feature_dir:
+        manifests = [Path(args.feature_dir) / "manifest.json"]
+    else:
+        _err("analyze_dependencies", "Provide --manifest, --feature-dir or --all")
+
+    if args.agents < 1:
+        _err("analyze_dependencies", "agents must be >= 1")
+
+    features = []
+    for manifest_path in manifests:
+        if not manifest_path.exists():
+            _err("analyze_dependencies", f"Manifest not found: {manifest_path}")
+        try:
+            features.append(analyze_manifest(
+                manifest_path,
+                agents=args.agents,
+                remaining_only=args.remaining,
+                use_cache=not args.no_cache
+            ))
+        except ValueError as e:
+            _err("analyze_dependencies", str(e))
+
+    if not args.all:
+        _ok("analyze_dependencies", features[0])
+        return
+
+    _ok("analyze_dependencies", {
+        "features": features,
+        "feature_count": len(features),
+        "features_with_cycles": [f["manifest"] for f in features if f["has_cycles"]],
+        "total_tasks": sum(f["task_count"] for f in features),
+        "total_makespan": sum(f["simulation"]["makespan"] for f in features if f["simulation"]),
+    })
+
+
 def cmd_list_memory_artifacts(args: argparse.Namespace) -> None:
     """List memory artifacts for feature or all"""
     memory_dir = Path(args.dir or ".claude/memory")
@@ -537,43 +923,50 @@ def cmd_query_memory(args: argparse.Namespace) -> None:
     from code_tools.builders.feature_graph_builder import FeatureGraphBuilder
 
     memory_dir = Path(args.dir or ".claude/memory")
-    query = args.query.strip()
+    queries = [q.strip() for q in args.query]
+    query = queries[0]
     feature = args.feature
     mode = args.mode or "auto"
 
     if not memory_dir.exists():
         _err("query_memory", f"Memory dir not found: {memory_dir}")
 
+    # Several --query values: one batched semantic search, results grouped by query
+    if len(queries) > 1:
+        if mode in ("direct", "nlp"):
+            _err("query_memory", f"Multiple --query values need --mode semantic or auto, not {mode}")
+        _ok("query_memory", _query_semantic_many(memory_dir, queries, args), items="groups")
+        return
+
     # Check if semantic mode is requested
     if mode == "semantic":
         # Semantic code search
         results = _query_semantic(memory_dir, query, args)
-        _ok("query_memory", results)
+        _ok("query_memory", results, items="results")
         return
 
+    # Try semantic first (auto mode) if codebase.db exists
+    if mode not in ("direct", "nlp") and (memory_dir / "codebase.db").exists():
+        semantic_results = _query_semantic(memory_dir, query, args)
+        if semantic_results.get('results'):
+            _ok("query_memory", semantic_results, items="results")
+            return
+
     # Original graph query modes
-    store = GraphStore(memory_dir)
+    store, store_lock = _shared("graph", str(memory_dir.resolve()), lambda: GraphStore(memory_dir))
 
     # Mode: direct (graph query) or nlp (LLM-powered)
-    if mode == "direct":
-        # Direct graph query (simple keyword matching for now)
-        results = _query_direct(store, feature, query, args)
-    elif mode == "nlp":
-        # LLM-powered query translation (placeholder)
-        results = _query_nlp(store, feature, query, args)
-    else:  # auto
-        # Try semantic first if codebase.db exists
-        codebase_db = memory_dir / "codebase.db"
-        if codebase_db.exists():
-            semantic_results = _query_semantic(memory_dir, query, args)
-            if semantic_results.get('results'):
-                _ok("query_memory", semantic_results)
-                return
-
-        # Fall back to direct graph query
-        results = _query_direct(store, feature, query, args)
-        if not results.get('entities') and not results.get('relationships'):
+    with store_lock:
+        if mode == "direct":
+            # Direct graph query (simple keyword matching for now)
+            results = _query_direct(store, feature, query, args)
+        elif mode == "nlp":
+            # LLM-powered query translation (placeholder)
             results = _query_nlp(store, feature, query, args)
+        else:  # auto: fall back to direct graph query
+            results = _query_direct(store, feature, query, args)
+            if not results.get('entities') and not results.get('relationships'):
+                results = _query_nlp(store, feature, query, args)
 
     _ok("query_memory", results)
 
@@ -653,86 +1046,174 @@ def _query_nlp(store: Any, feature: Optional[str], query: str, args: argparse.Na
     }
 
 
-def _query_semantic(memory_dir: Path, query: str, args: argparse.Namespace) -> Dict[str, Any]:
-    """Semantic code search using vector similarity"""
-    from code_tools.vector_store import VectorStore
+def _embedding_provider(memory_dir: Path, dimensions: Optional[int]):
+    """Cached OpenAI provider producing dimensions-sized embeddings (shared across a batch)"""
     from code_tools.embeddings import create_embedding_provider
 
+    return _shared("embedding_provider", f"{memory_dir.resolve()}:{dimensions}", lambda: create_embedding_provider(
+        provider_type='openai',
+        cache_dir=memory_dir,
+        cache_enabled=True,
+        dimensions=dimensions
+    ))
+
+
+def _semantic_search(memory_dir: Path, queries: List[str], args: argparse.Namespace,
+                     limit: int) -> Tuple[List[List[Tuple[Any, float]]], Dict[str, Any]]:
+    """
+    (chunk, similarity) lists for each query, and the search plan.
+
+    Several queries are embedded in one provider batch and searched together
+    (VectorStore.search_many). Failures raise RuntimeError with the message
+    to report.
+    """
+    from code_tools.vector_store import VectorStore
+
     db_path = memory_dir / "codebase.db"
 
     if not db_path.exists():
-        return {
-            'mode': 'semantic',
-            'query': query,
-            'error': 'Code index not found. Run: code-tools sync_memory_graph --mode code',
-            'results': []
-        }
+        raise RuntimeError('Code index not found. Run: code-tools sync_memory_graph --mode code')
 
-    # Initialize components
-    store = VectorStore(db_path)
+    # Initialize components (shared across a batch)
+    try:
+        store, store_lock = _shared("vector_store", str(db_path.resolve()), lambda: VectorStore(db_path))
+    except (RuntimeError, ValueError) as e:
+        raise RuntimeError(f'Failed to open code index: {e}') from e
 
     try:
-        provider = create_embedding_provider(
-            provider_type='openai',
-            cache_dir=memory_dir,
-            cache_enabled=True
-        )
+        # Queries must be embedded like the indexed chunks were
+        with store_lock:
+            dimensions = store.input_dimension
+        provider, provider_lock = _embedding_provider(memory_dir, dimensions)
     except Exception as e:
-        return {
-            'mode': 'semantic',
-            'query': query,
-            'error': f'Failed to initialize embedding provider: {e}',
-            'results': []
-        }
+        raise RuntimeError(f'Failed to initialize embedding provider: {e}') from e
 
-    # Generate query embedding
+    # Generate query embeddings
     try:
-        query_embedding = provider.embed(query)
+        with provider_lock:
+            if len(queries) == 1:
+                embeddings = [provider.embed(queries[0])]
+            else:
+                embeddings = provider.embed_batch(queries)
     except Exception as e:
-        return {
-            'mode': 'semantic',
-            'query': query,
-            'error': f'Failed to generate query embedding: {e}',
-            'results': []
-        }
+        raise RuntimeError(f'Failed to generate query embedding: {e}') from e
 
     # Search
-    limit = getattr(args, 'limit', 10)
-    file_filter = getattr(args, 'file_filter', None)
-    chunk_type = getattr(args, 'chunk_type', None)
+    options = {
+        'limit': limit,
+        'file_filter': getattr(args, 'file_filter', None),
+        'chunk_type_filter': getattr(args, 'chunk_type', None),
+        'path_prefix': getattr(args, 'path_prefix', None),
+        'language_filter': getattr(args, 'language', None),
+        'ef_search': getattr(args, 'ef_search', None)
+    }
 
     try:
-        search_results = store.search(
-            query_embedding,
-            limit=limit,
-            file_filter=file_filter,
-            chunk_type_filter=chunk_type
-        )
+        with store_lock:
+            if len(queries) == 1:
+                hits = [store.search(embeddings[0], **options)]
+            else:
+                hits = store.search_many(embeddings, **options)
+            plan = dict(store.last_plan)
     except Exception as e:
-        return {
-            'mode': 'semantic',
-            'query': query,
-            'error': f'Search failed: {e}',
-            'results': []
-        }
+        raise RuntimeError(f'Search failed: {e}') from e
+
+    return hits, plan
 
-    # Format results
-    results = []
-    for chunk, similarity in search_results:
-        results.append({
+
+def _format_semantic(hits: List[Tuple[Any, float]]) -> List[Dict[str, Any]]:
+    """Result records for (chunk, similarity) pairs"""
+    return [
+        {
             'file': chunk.file_path,
             'lines': f"{chunk.start_line}-{chunk.end_line}",
             'type': chunk.chunk_type,
             'name': chunk.name,
             'similarity': round(similarity, 4),
             'preview': chunk.content[:200] + ('...' if len(chunk.content) > 200 else '')
-        })
+        }
+        for chunk, similarity in hits
+    ]
+
+
+def _query_semantic(memory_dir: Path, query: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Semantic code search using vector similarity"""
+    try:
+        hits, plan = _semantic_search(memory_dir, [query], args, getattr(args, 'limit', 10))
+    except RuntimeError as e:
+        return {
+            'mode': 'semantic',
+            'query': query,
+            'error': str(e),
+            'results': []
+        }
 
+    results = _format_semantic(hits[0])
     return {
         'mode': 'semantic',
         'query': query,
         'results': results,
-        'count': len(results)
+        'count': len(results),
+        'plan': plan
+    }
+
+
+def _dedupe_groups(hits: List[List[Tuple[Any, float]]], limit: int) -> List[List[Tuple[Any, float]]]:
+    """
+    Each chunk only under the query it is most similar to, up to limit per query.
+
+    Pairs are assigned best first, so a query that loses a chunk to another
+    fills its place from its own next results.
+    """
+    ranked = sorted(
+        ((similarity, group, position, chunk) for group, found in enumerate(hits)
+         for position, (chunk, similarity) in enumerate(found)),
+        key=lambda item: (-item[0], item[1], item[2])
+    )
+    seen = set()
+    kept: List[List[Tuple[int, Any, float]]] = [[] for _ in hits]
+    for similarity, group, position, chunk in ranked:
+        if chunk.id in seen or len(kept[group]) >= limit:
+            continue
+        seen.add(chunk.id)
+        kept[group].append((position, chunk, similarity))
+    return [[(chunk, similarity) for _, chunk, similarity in sorted(found, key=lambda item: item[0])]
+            for found in kept]
+
+
+def _query_semantic_many(memory_dir: Path, queries: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Semantic code search for several queries, grouped by query.
+
+    With --dedupe every query fetches limit * len(queries) results, so that
+    after each chunk is kept only under its best query, every query can
+    still show limit distinct ones.
+    """
+    limit = getattr(args, 'limit', 10)
+    dedupe = bool(getattr(args, 'dedupe', False))
+    try:
+        hits, plan = _semantic_search(memory_dir, queries, args, limit * len(queries) if dedupe else limit)
+    except RuntimeError as e:
+        return {
+            'mode': 'semantic',
+            'queries': queries,
+            'error': str(e),
+            'groups': []
+        }
+
+    if dedupe:
+        hits = _dedupe_groups(hits, limit)
+    groups = []
+    for query, found in zip(queries, hits):
+        results = _format_semantic(found)
+        groups.append({'query': query, 'results': results, 'count': len(results)})
+    return {
+        'mode': 'semantic',
+        'queries': queries,
+        'groups': groups,
+        'count': sum(group['count'] for group in groups),
+        'deduplicated': dedupe,
+        'plan': plan
     }
 
 
@@ -769,8 +1250,9 @@ def cmd_sync_memory_graph(args: argparse.Namespace) -> None:
 
 def _sync_code_index(memory_dir: Path, args: argparse.Namespace) -> None:
     """Index codebase for semantic search"""
+    import hashlib
+
     from code_tools.vector_store import VectorStore
-    from code_tools.embeddings import create_embedding_provider
     from code_tools.chunker import chunk_directory
 
     # Pre-flight check: Validate API key before expensive operations
@@ -787,16 +1269,21 @@ def _sync_code_index(memory_dir: Path, args: argparse.Namespace) -> None:
     if extensions:
         extensions = extensions.split(',')
 
-    # Initialize components
+    # Initialize components (shared across a batch, where writes run alone)
     db_path = memory_dir / "codebase.db"
-    store = VectorStore(db_path)
+    try:
+        store, _ = _shared("vector_store", str(db_path.resolve()),
+                           lambda: VectorStore(db_path, backend=args.backend, index=args.index, hnsw_m=args.hnsw_m,
+                                               ef_construction=args.ef_construction, ef_search=args.ef_search,
+                                               quantization=args.quantization, pq_m=args.pq_m, rerank=args.rerank,
+                                               dimension=args.dimensions))
+    except (RuntimeError, ValueError) as e:
+        _err("sync_memory_graph", f"Failed to open code index: {e}")
+        return
 
     try:
-        provider = create_embedding_provider(
-            provider_type='openai',
-            cache_dir=memory_dir,
-            cache_enabled=True
-        )
+        # An existing index fixes the dimension; a re-projected one takes its input dimension
+        provider, _ = _embedding_provider(memory_dir, args.dimensions or store.input_dimension)
     except Exception as e:
         _err("sync_memory_graph", f"Failed to initialize embedding provider: {e}")
         return
@@ -926,6 +1413,62 @@ def _sync_code_index(memory_dir: Path, args: argparse.Namespace) -> None:
     })
 
 
+def cmd_reproject_code_index(args: argparse.Namespace) -> None:
+    """Reduce the code index's embedding dimension in place, without re-embedding"""
+    from code_tools.vector_store import VectorStore
+
+    db_path = Path(args.dir) / "codebase.db"
+    if not db_path.exists():
+        _err("reproject_code_index", "Code index not found. Run: code-tools sync_memory_graph --mode code")
+    try:
+        store, lock = _shared("vector_store", str(db_path.resolve()), lambda: VectorStore(db_path))
+        with lock:
+            result = store.reproject(args.dimensions, method=args.method)
+            result['db_stats'] = store.get_stats()
+    except (RuntimeError, ValueError) as e:
+        _err("reproject_code_index", str(e))
+    _ok("reproject_code_index", result)
+
+
+def cmd_batch(args: argparse.Namespace) -> None:
+    from code_tools.batch import parse_commands, run_batch
+
+    try:
+        if args.commands == '-':
+            text = sys.stdin.read()
+        elif args.commands.startswith('@'):
+            text = Path(args.commands[1:]).read_text(encoding='utf-8')
+        else:
+            text = args.commands
+        commands = parse_commands(text)
+    except (OSError, ValueError) as e:
+        _err("batch", f"Invalid commands: {e}")
+    if args.workers is not None and args.workers < 1:
+        _err("batch", "workers must be >= 1")
+
+    start = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+
+    def produce() -> Iterable[Dict[str, Any]]:
+        for result in run_batch(commands, workers=args.workers):
+            results.append(result)
+            yield result
+
+    if _stream.get() is not None:
+        # Completion order, as each command finishes
+        _ok_iter("batch", produce())
+        return
+    for _ in produce():
+        pass
+    results.sort(key=lambda r: r["index"])
+    _ok("batch", {
+        "results": results,
+        "count": len(results),
+        "failed": sum(1 for r in results if r["exit_code"] != 0),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }, items="results")
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="code-tools", description="Portable code tools CLI")
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -934,38 +1477,70 @@ def build_parser() -> argparse.ArgumentParser:
     sp.add_argument("--path", default=".")
     sp.add_argument("--depth", type=int, default=1)
     sp.add_argument("--hidden", action="store_true")
+    sp.add_argument("--no-ignore", action="store_true",
+                    help="Do not honour .gitignore files or skip node_modules, build, dist, venv and the like")
+    sp.add_argument("--cache", action="store_true", help="Reuse directory listings while their mtime is unchanged")
+    sp.add_argument("--cache-dir", default=".claude/memory", help="Where the listing cache is stored")
     sp.set_defaults(func=cmd_list_dir)
 
     sp = sub.add_parser("search_file", help="Glob search files")
     sp.add_argument("--path", default=".")
-    sp.add_argument("--glob", required=True)
+    sp.add_argument("--glob", required=True, action="append",
+                    help="Glob relative to --path; repeat or comma-separate for several")
     sp.add_argument("--limit", type=int, default=25)
+    sp.add_argument("--hidden", action="store_true", help="Include dotfiles and dot-directories")
+    sp.add_argument("--no-ignore", action="store_true",
+                    help="Do not honour .gitignore files or skip node_modules, build, dist, venv and the like")
+    sp.add_argument("--cache", action="store_true", help="Reuse directory listings while their mtime is unchanged")
+    sp.add_argument("--cache-dir", default=".claude/memory", help="Where the listing cache is stored")
     sp.set_defaults(func=cmd_search_file)
 
     sp = sub.add_parser("grep_code", help="Regex search in files")
-    sp.add_argument("--pattern", required=True)
+    sp.add_argument("--pattern", default=None, help="Regex (plain literals take a fast path)")
+    sp.add_argument("--patterns", default=None, help="Comma-separated literals; a line matches if it contains any")
     sp.add_argument("--paths", default=".")
     sp.add_argument("--limit", type=int, default=25)
+    sp.add_argument("--context", type=int, default=0, help="Lines of context before/after each match")
+    sp.add_argument("--workers", type=int, default=None, help="Search threads (default: cores + 4, max 32)")
+    sp.add_argument("--no-ignore", action="store_true", help="Do not honour .gitignore files")
+    sp.add_argument("--index", action="store_true",
+                    help="Use a persistent trigram index of the working directory (refreshed incrementally)")
+    sp.add_argument("--index-dir", default=".claude/memory", help="Where the trigram index is stored")
     sp.set_defaults(func=cmd_grep_code)
 
     sp = sub.add_parser("read_file", help="Read file content or range")
-    sp.add_argument("--path", required=True)
+    sp.add_argument("--path", default=None)
     sp.add_argument("--start", type=int)
     sp.add_argument("--end", type=int)
+    sp.add_argument("--ranges", default=None,
+                    help='JSON list (or @file) of {"path", "start", "end"} windows to read in one call')
+    sp.add_argument("--index-dir", default=".claude/memory", help="Where line-offset indexes of large files are kept")
+    sp.add_argument("--no-index-cache", action="store_true", help="Do not persist line-offset indexes")
     sp.set_defaults(func=cmd_read_file)
 
     sp = sub.add_parser("fetch_content", help="Fetch URL content")
-    sp.add_argument("--url", required=True)
+    sp.add_argument("--url", action="append", help="URL to fetch (repeatable)")
+    sp.add_argument("--urls", default=None, help="JSON list or whitespace-separated URLs, or @file")
+    sp.add_argument("--workers", type=int, default=8, help="Concurrent fetches")
+    sp.add_argument("--timeout", type=float, default=15.0, help="Connect/read timeout in seconds")
+    sp.add_argument("--max-chars", type=int, default=20000, help="Truncate extracted text per URL")
+    sp.add_argument("--ttl", type=float, default=3600, help="Serve cached pages younger than this without revalidating")
+    sp.add_argument("--no-cache", action="store_true", help="Do not read or write the HTTP cache")
+    sp.add_argument("--cache-dir", default=".claude/memory", help="Where the HTTP cache is stored")
     sp.set_defaults(func=cmd_fetch_content)
 
     sp = sub.add_parser("search_web", help="Web search (placeholder)")
     sp.add_argument("--query", required=True)
     sp.add_argument("--limit", type=int, default=5)
-    sp.set_defaults(func=cmd_search_web)
+    sp.set_defaults(func=cmd_search_web, needs_env=True)
 
     sp = sub.add_parser("search_replace", help="Apply validated replacements")
-    sp.add_argument("--file", required=True)
-    sp.add_argument("--replacements", required=True, help="JSON or @file.json")
+    sp.add_argument("--file", default=None, help="File for --replacements")
+    sp.add_argument("--replacements", default=None, help="JSON or @file.json")
+    sp.add_argument("--plan", default=None,
+                    help='Multi-file plan: JSON or @file.json list of {"file", "replacements"}; all files change or none')
+    sp.add_argument("--workers", type=int, default=None, help="Threads for matching files (default: auto)")
+    sp.add_argument("--dry-run", action="store_true", help="Validate and report without writing")
     sp.set_defaults(func=cmd_search_replace)
 
     sp = sub.add_parser("create_file", help="Create a new file atomically")
@@ -974,9 +1549,16 @@ def build_parser() -> argparse.ArgumentParser:
     sp.add_argument("--add-last-line-newline", action="store_true")
     sp.set_defaults(func=cmd_create_file)
 
-    sp = sub.add_parser("edit_file", help="Replace file content with provided patch text")
-    sp.add_argument("--file", required=True)
-    sp.add_argument("--patch", required=True, help="Text or @file")
+    sp = sub.add_parser("edit_file", help="Apply a unified diff (or replace file content)")
+    sp.add_argument("--file", default=None, help="Target file (single-file patch or content mode)")
+    sp.add_argument("--patch", required=True, help="Unified diff or new content: text or @file")
+    sp.add_argument("--mode", choices=["auto", "diff", "content"], default="auto",
+                    help="auto: apply as a diff if the patch has @@ hunks, else replace the content")
+    sp.add_argument("--root", default=".", help="Directory that diff paths are relative to")
+    sp.add_argument("--strip", type=int, default=None,
+                    help="Leading path components to strip from diff paths (default: 1 for a/ b/ paths)")
+    sp.add_argument("--fuzz", type=int, default=2, help="Context lines that may be ignored at each hunk end")
+    sp.add_argument("--dry-run", action="store_true", help="Report where hunks apply without writing")
     sp.set_defaults(func=cmd_edit_file)
 
     sp = sub.add_parser("search_memory", help="Search .dimitri/memory for query")
@@ -995,19 +1577,46 @@ def build_parser() -> argparse.ArgumentParser:
     sp.set_defaults(func=cmd_read_task_manifest)
 
     sp = sub.add_parser("update_task_status", help="Update task status in manifests")
-    sp.add_argument("--task-id", required=True, help="Task ID (e.g., 'T01')")
-    sp.add_argument("--status", required=True, help="New status")
+    sp.add_argument("--task-id", default=None, help="Task ID (e.g., 'T01')")
+    sp.add_argument("--status", default=None, help="New status")
+    sp.add_argument("--updates", default=None,
+                    help="Batch updates: JSON or @file.json list of {task_id, status}")
     sp.add_argument("--feature-dir", required=True, help="Feature directory path")
     sp.set_defaults(func=cmd_update_task_status)
 
+    sp = sub.add_parser("materialize_manifest", help="Apply task event log to manifest.json")
+    sp.add_argument("--feature-dir", required=True, help="Feature directory path")
+    sp.add_argument("--replay", action="store_true", help="Replay the full event log from the start")
+    sp.set_defaults(func=cmd_materialize_manifest)
+
     sp = sub.add_parser("find_next_task", help="Find next available task")
     sp.add_argument("--manifest", required=True, help="Path to task manifest.json")
     sp.set_defaults(func=cmd_find_next_task)
 
     sp = sub.add_parser("validate_manifest", help="Validate manifest consistency")
-    sp.add_argument("--feature-dir", required=True, help="Feature directory path")
+    sp.add_argument("--feature-dir", default=None, help="Feature directory path")
+    sp.add_argument("--all", action="store_true", help="Validate every feature manifest under --tasks-dir")
+    sp.add_argument("--tasks-dir", default=".tasks", help="Tasks directory (with --all)")
     sp.set_defaults(func=cmd_validate_manifest)
 
+    sp = sub.add_parser("query_tasks", help="Query tasks across all feature manifests")
+    sp.add_argument("--tasks-dir", default=".tasks", help="Tasks directory")
+    sp.add_argument("--status", default=None, help="Filter by status (e.g., BLOCKED)")
+    sp.add_argument("--feature", default=None, help="Filter by feature id")
+    sp.add_argument("--task-id", default=None, help="Filter by task id")
+    sp.add_argument("--limit", type=int, default=None, help="Max tasks to return")
+    sp.set_defaults(func=cmd_query_tasks)
+
+    sp = sub.add_parser("analyze_dependencies", help="Analyze task dependency graph (cycles, critical path, makespan)")
+    sp.add_argument("--manifest", default=None, help="Path to task manifest.json")
+    sp.add_argument("--feature-dir", default=None, help="Feature directory path")
+    sp.add_argument("--all", action="store_true", help="Analyze every feature manifest under --tasks-dir")
+    sp.add_argument("--tasks-dir", default=".tasks", help="Tasks directory (with --all)")
+    sp.add_argument("--agents", type=int, default=1, help="Parallel agents for makespan simulation")
+    sp.add_argument("--remaining", action="store_true", help="Treat COMPLETED tasks as zero remaining work")
+    sp.add_argument("--no-cache", action="store_true", help="Ignore and do not write the analysis cache")
+    sp.set_defaults(func=cmd_analyze_dependencies)
+
     sp = sub.add_parser("list_memory_artifacts", help="List memory artifacts for feature")
     sp.add_argument("--dir", default=".claude/memory", help="Memory directory")
     sp.add_argument("--feature", default=None, help="Optional feature filter")
@@ -1015,14 +1624,21 @@ def build_parser() -> argparse.ArgumentParser:
 
     sp = sub.add_parser("query_memory", help="Query knowledge graph OR semantic code search")
     sp.add_argument("--dir", default=".claude/memory", help="Memory directory")
-    sp.add_argument("--query", required=True, help="Natural language query")
+    sp.add_argument("--query", required=True, action="append",
+                    help="Natural language query; repeat for a batched semantic search grouped by query")
     sp.add_argument("--feature", default=None, help="Feature slug to query")
     sp.add_argument("--mode", choices=["auto", "direct", "nlp", "semantic"], default="auto",
                     help="Query mode: 'auto', 'direct', 'nlp', or 'semantic' for code search")
     sp.add_argument("--limit", type=int, default=10, help="Max results to return")
     sp.add_argument("--file-filter", default=None, help="Filter results by file path (semantic mode)")
     sp.add_argument("--chunk-type", default=None, help="Filter by chunk type (semantic mode)")
-    sp.set_defaults(func=cmd_query_memory)
+    sp.add_argument("--path-prefix", default=None, help="Only files under this directory (semantic mode)")
+    sp.add_argument("--language", default=None, help="Filter by language, e.g. python (semantic mode)")
+    sp.add_argument("--ef-search", type=int, default=None,
+                    help="HNSW beam width for this query: higher is more accurate and slower (semantic mode)")
+    sp.add_argument("--dedupe", action="store_true",
+                    help="With several --query values, list each chunk only under the query it matches best")
+    sp.set_defaults(func=cmd_query_memory, needs_env=True)
 
     sp = sub.add_parser("sync_memory_graph", help="Sync markdown files to JSONL knowledge graph OR index code")
     sp.add_argument("--dir", default=".claude/memory", help="Memory directory")
@@ -1034,20 +1650,82 @@ def build_parser() -> argparse.ArgumentParser:
                     help="Comma-separated extensions for code indexing (e.g., '.py,.js,.ts')")
     sp.add_argument("--rebuild", action="store_true",
                     help="Force full rebuild, ignore file hashes (code mode only)")
-    sp.set_defaults(func=cmd_sync_memory_graph)
+    sp.add_argument("--backend", choices=["auto", "vss", "numpy"], default="auto",
+                    help="Vector backend for a new code index (auto: vss if it loads, else numpy)")
+    sp.add_argument("--index", choices=["flat", "hnsw"], default=None,
+                    help="numpy backend: exact 'flat' scan or approximate 'hnsw' graph (default: as recorded, else flat)")
+    sp.add_argument("--hnsw-m", type=int, default=None, help="HNSW links per node (default 16; changing it rebuilds the graph)")
+    sp.add_argument("--ef-construction", type=int, default=None,
+                    help="HNSW build beam width (default 200; changing it rebuilds the graph)")
+    sp.add_argument("--ef-search", type=int, default=None, help="Default HNSW search beam width to record (default 64)")
+    sp.add_argument("--quantization", choices=["none", "int8", "pq"], default=None,
+                    help="numpy backend: also keep int8 or product-quantised codes and search over them "
+                         "(default: as recorded, else none)")
+    sp.add_argument("--pq-m", type=int, default=None,
+                    help="Product quantisation subvectors, must divide the dimension (default: dimension / 8)")
+    sp.add_argument("--rerank", type=int, default=None,
+                    help="Quantized search re-ranks rerank * limit candidates with full-precision vectors (default 10)")
+    sp.add_argument("--dimensions", type=int, default=None,
+                    help="Ask the provider for shortened embeddings (text-embedding-3 models) for a new code index; "
+                         "an existing index must match (see reproject_code_index); "
+                         "one reduced by PCA is synced at its original size")
+    sp.set_defaults(func=cmd_sync_memory_graph, needs_env=True)
+
+    sp = sub.add_parser("reproject_code_index",
+                        help="Reduce the code index's embedding dimension without re-embedding (numpy backend)")
+    sp.add_argument("--dir", default=".claude/memory", help="Memory directory")
+    sp.add_argument("--dimensions", type=int, required=True, help="Target embedding dimension")
+    sp.add_argument("--method", choices=["pca", "truncate"], default="pca",
+                    help="'pca' fits principal components to the stored vectors; 'truncate' keeps the leading "
+                         "dimensions and re-normalises (Matryoshka, as the provider's dimensions option does)")
+    sp.set_defaults(func=cmd_reproject_code_index)
+
+    sp = sub.add_parser("batch", help="Run many commands in one process with shared caches")
+    sp.add_argument("--commands", default="-",
+                    help="JSON array or NDJSON of argv lists: inline, @file, or - for stdin (default)")
+    sp.add_argument("--workers", type=int, default=None,
+                    help="Threads for read-only commands (default: ThreadPoolExecutor default)")
+    sp.set_defaults(func=cmd_batch, needs_env=True)
+
+    for sp in sub.choices.values():
+        sp.add_argument("--stream", action="store_true",
+                        help="NDJSON output: header, one record per result as produced, trailer with count/timings")
+    for name in MEMO_COMMANDS:
+        sp = sub.choices[name]
+        sp.add_argument("--memo", action="store_true",
+                        help="Reuse the stored result while the files it read are unchanged")
+        sp.add_argument("--memo-dir", default=".claude/memory/memo", help="Where memoised results are stored")
+        sp.add_argument("--memo-max-mb", type=float, default=64, help="Evict least recently used results beyond this")
 
     return p
 
 
-def main(argv: List[str] | None = None) -> None:
-    # Load .env file if present (fallback to system env vars)
+def _load_env(args: argparse.Namespace) -> None:
+    """
+    Load .env if present (fallback to system env vars), once per process and
+    only for commands registered with needs_env: dotenv costs more than most
+    commands. Called by main and by in-process runners (batch, parallel_run).
+    """
+    global _env_loaded
+    if _env_loaded or not getattr(args, "needs_env", False):
+        return
     try:
         from dotenv import load_dotenv
         load_dotenv()
     except ImportError:
         # python-dotenv not installed, continue with system env vars only
         pass
+    _env_loaded = True
+
 
+def main(argv: List[str] | None = None) -> None:
     parser = build_parser()
     args = parser.parse_args(argv)
-    args.func(args)
+    _load_env(args)
+
+    token = _stream.set({"start": time.perf_counter()}) if args.stream else None
+    try:
+        dispatch(args)
+    finally:
+        if token is not None:
+            _stream.reset(token)
@@ -3,15 +3,49 @@ Embedding provider abstraction with caching.
 
 Supports multiple embedding providers with local caching to minimize API costs.
 Cache is stored in SQLite for portability with .claude/ folder.
+Cached embeddings are packed float32 (4 bytes per dimension); entries written
+as JSON by earlier versions are still read.
 """
 
 import json
 import sqlite3
 import hashlib
+import sys
+from array import array
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 from abc import ABC, abstractmethod
 
+# Marks a packed float32 cache entry (JSON entries start with "[")
+F32_PREFIX = b"f32:"
+
+# Native output size per OpenAI model, and whether it accepts a `dimensions` request
+OPENAI_MODELS = {
+    "text-embedding-3-small": (1536, True),
+    "text-embedding-3-large": (3072, True),
+    "text-embedding-ada-002": (1536, False),
+}
+
+
+def pack_embedding(embedding: List[float]) -> bytes:
+    """Cache blob for an embedding: F32_PREFIX + little-endian float32 values"""
+    values = array("f", embedding)
+    # Little-endian on disk so the cache stays portable with the .claude/ folder
+    if sys.byteorder != "little":
+        values.byteswap()
+    return F32_PREFIX + values.tobytes()
+
+
+def unpack_embedding(blob: bytes) -> List[float]:
+    """Embedding from a cache blob, packed or JSON"""
+    if not blob.startswith(F32_PREFIX):
+        return json.loads(blob.decode('utf-8'))
+    values = array("f")
+    values.frombytes(blob[len(F32_PREFIX):])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
 
 class EmbeddingProvider(ABC):
     """Abstract base for embedding providers"""
@@ -32,6 +66,11 @@ class EmbeddingProvider(ABC):
         """Embedding dimension"""
         pass
 
+    @property
+    def cache_namespace(self) -> str:
+        """Distinguishes cached embeddings of differently configured providers ("" for the default)"""
+        return ""
+
 
 class AnthropicEmbeddingProvider(EmbeddingProvider):
     """Anthropic Claude embedding provider"""
@@ -77,7 +116,24 @@ class AnthropicEmbeddingProvider(EmbeddingProvider):
 class OpenAIEmbeddingProvider(EmbeddingProvider):
     """OpenAI embedding provider using text-embedding-3-small"""
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "text-embedding-3-small"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None
+    ):
+        """dimensions asks a text-embedding-3 model for shortened embeddings"""
+        native, shortens = OPENAI_MODELS.get(model, (None, True))
+        if dimensions == native:
+            dimensions = None
+        if dimensions is not None:
+            if not shortens:
+                raise ValueError(f"{model} does not support a dimensions request")
+            if dimensions < 1 or (native is not None and dimensions > native):
+                raise ValueError(f"dimensions must be between 1 and {native} for {model}")
+        self.native_dimension = native
+        self.dimensions = dimensions
+
         try:
             import openai
         except ImportError:
@@ -101,10 +157,14 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         """Generate embedding using OpenAI"""
         response = self.client.embeddings.create(
             model=self.model,
-            input=text
+            input=text,
+            **self._options()
         )
         return response.data[0].embedding
 
+    def _options(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions} if self.dimensions else {}
+
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for batch (more efficient)"""
         if not texts:
@@ -112,13 +172,21 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
 
         response = self.client.embeddings.create(
             model=self.model,
-            input=texts
+            input=texts,
+            **self._options()
         )
         return [item.embedding for item in response.data]
 
     @property
     def dimension(self) -> int:
-        return 1536  # text-embedding-3-small dimension
+        return self.dimensions or self.native_dimension or 1536
+
+    @property
+    def cache_namespace(self) -> str:
+        # Empty for the original configuration so existing cache entries stay valid
+        if self.model == "text-embedding-3-small" and self.dimensions is None:
+            return ""
+        return f"{self.model}:{self.dimension}"
 
 
 class CachedEmbeddingProvider:
@@ -164,9 +232,16 @@ class CachedEmbeddingProvider:
         conn.close()
 
     def _hash_text(self, text: str) -> str:
-        """Generate cache key from text"""
+        """Generate cache key from text (and the provider's configuration, if not the default)"""
+        namespace = self.provider.cache_namespace
+        if namespace:
+            text = f"{namespace}\0{text}"
         return hashlib.sha256(text.encode()).hexdigest()
 
+    @property
+    def dimension(self) -> int:
+        return self.provider.dimension
+
     def _get_cached(self, text_hash: str) -> Optional[List[float]]:
         """Retrieve embedding from cache"""
         if not self.cache_enabled:
@@ -181,8 +256,7 @@ class CachedEmbeddingProvider:
         conn.close()
 
         if row:
-            # Deserialize from JSON stored as BLOB
-            return json.loads(row[0].decode('utf-8'))
+            return unpack_embedding(row[0])
         return None
 
     def _cache_embedding(
@@ -199,8 +273,7 @@ class CachedEmbeddingProvider:
 
         conn = sqlite3.connect(str(self.cache_db))
 
-        # Store as JSON for portability
-        embedding_blob = json.dumps(embedding).encode('utf-8')
+        embedding_blob = pack_embedding(embedding)
         preview = text[:200]  # Store preview for debugging
 
         conn.execute("""
@@ -321,7 +394,7 @@ def create_embedding_provider(
         provider_type: 'openai' or 'anthropic'
         cache_dir: Directory for cache database
         cache_enabled: Whether to enable caching
-        **kwargs: Additional arguments for provider (e.g., api_key, model)
+        **kwargs: Additional arguments for provider (e.g., api_key, model, dimensions)
 
     Returns:
         CachedEmbeddingProvider instance
@@ -0,0 +1,277 @@
+"""
+Parallel grep engine for grep_code.
+
+Architecture:
+- Files come from walker.iter_files (os.scandir, .gitignore and exclude
+  patterns honoured, deterministic order)
+- Binary files are skipped by sniffing the first block for NUL bytes
+- Each file is searched on a thread pool over a memory-mapped buffer
+- Pattern analysis picks the matcher: pure literals use bytes.find,
+  literal sets use alternation or Aho–Corasick (literal_search), regexes
+  with a required literal are prefiltered by bytes.find and confirmed
+  per line; remaining regexes run as bytes on pure-ASCII LF files and as
+  decoded text otherwise (keeps str-regex semantics for \\w, case
+  folding and universal newlines)
+- Results are consumed in submission order, so output is deterministic,
+  and the walk stops as soon as the limit is reached
+- With a trigram index (trigram_index), only candidate files are
+  searched; patterns without a usable literal fall back to the walk
+"""
+
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Sequence, Deque, Callable
+
+from code_tools.literal_search import analyze_pattern, PatternInfo, MultiLiteral
+from code_tools.walker import iter_files, DEFAULT_EXCLUDE_PATTERNS, BINARY_SNIFF_BYTES
+
+
+# Bytes that rule out the raw fast path: non-ASCII text or CR line endings
+_NEEDS_DECODE = re.compile(rb'[\x80-\xff\r]')
+
+
+def default_workers() -> int:
+    """Worker count for I/O-bound file scanning"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode('utf-8', errors='ignore')
+
+
+def _identity(text: str) -> str:
+    return text
+
+
+def _regex_finder(regex: re.Pattern, buf: Any) -> Callable[[int], int]:
+    def find(pos: int) -> int:
+        m = regex.search(buf, pos)
+        return m.start() if m else -1
+    return find
+
+
+def _context_lines(buf: Any, start: int, end: int, size: int, count: int, nl: Any, decode: Any):
+    """Up to `count` lines before [start, end) and `count` lines after it"""
+    pre: List[str] = []
+    pos = start
+    while len(pre) < count and pos > 0:
+        prev_start = buf.rfind(nl, 0, pos - 1) + 1
+        pre.append(decode(buf[prev_start:pos - 1]).rstrip('\r'))
+        pos = prev_start
+    pre.reverse()
+    post: List[str] = []
+    pos = end
+    while len(post) < count and pos + 1 < size:
+        nxt = buf.find(nl, pos + 1)
+        if nxt == -1:
+            nxt = size
+        post.append(decode(buf[pos + 1:nxt]).rstrip('\r'))
+        pos = nxt
+    return pre, post
+
+
+def _scan(path: str, buf: Any, size: int, find: Callable[[int], int],
+          confirm: Optional[Callable[[str], Any]], annotate: Optional[Callable[[Any], Dict[str, Any]]],
+          nl: Any, decode: Any, limit: int, context: int) -> List[Dict[str, Any]]:
+    """
+    Collect matching lines from a whole-file buffer (bytes map or decoded text).
+
+    find(pos) locates the next candidate; its line is then checked with
+    confirm (when given) so regex matches never span lines.
+    """
+    results: List[Dict[str, Any]] = []
+    line_no = 1
+    counted_to = 0
+    pos = 0
+    while pos <= size and len(results) < limit:
+        hit = find(pos)
+        if hit < 0:
+            break
+        start = buf.rfind(nl, 0, hit) + 1
+        end = buf.find(nl, hit)
+        if end == -1:
+            end = size
+        raw_line = buf[start:end]
+        line_text = decode(raw_line).rstrip('\r')
+        if confirm is None or confirm(line_text):
+            line_no += buf[counted_to:start].count(nl)
+            counted_to = start
+            result = {"path": path, "line": line_no, "preview": line_text}
+            if annotate is not None:
+                result.update(annotate(raw_line))
+            if context:
+                result["before"], result["after"] = _context_lines(
+                    buf, start, end, size, context, nl, decode
+                )
+            results.append(result)
+        pos = end + 1
+    return results
+
+
+class RegexMatcher:
+    """
+    General regex search.
+
+    With a required literal, candidate lines are located by bytes.find on
+    the raw map and confirmed with the regex; otherwise pure-ASCII LF files
+    are matched with a bytes regex and the rest as decoded text.
+    """
+
+    kind = "regex"
+
+    def __init__(self, pattern: str, info: Optional[PatternInfo] = None):
+        self.text = re.compile(pattern, re.MULTILINE)
+        self.line = re.compile(pattern)
+        info = info or analyze_pattern(pattern)
+        self.required = info.required.encode('utf-8') if info.required else None
+        try:
+            self.raw: Optional[re.Pattern] = re.compile(pattern.encode('ascii'), re.MULTILINE) \
+                if pattern.isascii() else None
+        except re.error:
+            self.raw = None
+
+    def search(self, path: str, buf: Any, size: int, limit: int, context: int) -> List[Dict[str, Any]]:
+        if self.required is not None:
+            required = self.required
+            return _scan(path, buf, size, lambda pos: buf.find(required, pos), self.line.search, None,
+                         b"\n", _decode, limit, context)
+        if self.raw is not None and not _NEEDS_DECODE.search(buf):
+            return _scan(path, buf, size, _regex_finder(self.raw, buf), self.line.search, None,
+                         b"\n", _decode, limit, context)
+        # Universal newlines, as text-mode reading would give
+        text = _decode(buf[:]).replace('\r\n', '\n').replace('\r', '\n')
+        return _scan(path, text, len(text), _regex_finder(self.text, text), self.line.search, None,
+                     "\n", _identity, limit, context)
+
+
+class LiteralMatcher:
+    """Pure literal: bytes.find over the whole mapped file, no regex at all"""
+
+    kind = "literal"
+
+    def __init__(self, literal: str):
+        self.literal = literal.encode('utf-8')
+
+    def search(self, path: str, buf: Any, size: int, limit: int, context: int) -> List[Dict[str, Any]]:
+        literal = self.literal
+        return _scan(path, buf, size, lambda pos: buf.find(literal, pos), None, None,
+                     b"\n", _decode, limit, context)
+
+
+class MultiLiteralMatcher:
+    """Any of several literals (alternation or Aho–Corasick, by set size)"""
+
+    kind = "multi_literal"
+
+    def __init__(self, literals: Sequence[str]):
+        self.multi = MultiLiteral(literals)
+
+    def search(self, path: str, buf: Any, size: int, limit: int, context: int) -> List[Dict[str, Any]]:
+        if self.multi.automaton is not None:
+            buf = buf[:]  # the automaton indexes bytes directly
+        return _scan(path, buf, size, self.multi.finder(buf), None,
+                     lambda raw: {"matches": self.multi.matched_in(raw)},
+                     b"\n", _decode, limit, context)
+
+
+def compile_matcher(pattern: Optional[str] = None, patterns: Optional[Sequence[str]] = None) -> Any:
+    """
+    Pick the fastest matcher for the request.
+
+    patterns are literals; pattern is a regex (raises re.error if invalid).
+    """
+    literals = [p for p in (patterns or []) if p]
+    if literals:
+        if "\n" in "".join(literals) or "\r" in "".join(literals):
+            raise re.error("literal patterns cannot contain line breaks")
+        if len(set(literals)) == 1:
+            return LiteralMatcher(literals[0])
+        return MultiLiteralMatcher(literals)
+    if pattern is None:
+        raise re.error("no pattern given")
+    re.compile(pattern)
+    info = analyze_pattern(pattern)
+    if info.literal is not None:
+        return LiteralMatcher(info.literal)
+    return RegexMatcher(pattern, info)
+
+
+def search_file(path: str, matcher: Any, limit: int, context: int = 0) -> List[Dict[str, Any]]:
+    """Search one file; returns at most `limit` line matches (binary files yield none)"""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            if b"\0" in f.read(BINARY_SNIFF_BYTES):
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return matcher.search(path, buf, size, limit, context)
+    except (OSError, ValueError):
+        return []
+
+
+def grep(
+    roots: Sequence[Path],
+    pattern: Optional[str] = None,
+    limit: int = 25,
+    context: int = 0,
+    workers: Optional[int] = None,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS,
+    use_gitignore: bool = True,
+    patterns: Optional[Sequence[str]] = None,
+    index: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream line matches across roots in deterministic walk order.
+
+    The matcher is compiled eagerly, so re.error is raised by this call
+    rather than on first iteration. index is an up-to-date TrigramIndex
+    built with the same ignore settings.
+    """
+    matcher = compile_matcher(pattern, patterns)
+    files: Optional[Iterator[str]] = None
+    if index is not None:
+        from code_tools.trigram_index import trigram_query
+        groups = trigram_query(pattern, patterns)
+        candidates = index.candidate_files(roots, groups) if groups else None
+        if candidates is not None:
+            files = iter(candidates)
+    if files is None:
+        files = iter_files(roots, exclude=exclude, use_gitignore=use_gitignore)
+    return _stream_matches(files, matcher, limit, context, workers or default_workers())
+
+
+def _stream_matches(files: Iterator[str], matcher: Any, limit: int,
+                    context: int, workers: int) -> Iterator[Dict[str, Any]]:
+    if limit <= 0:
+        return
+    window = workers * 4
+    emitted = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Future] = deque()
+
+        def fill() -> None:
+            while len(pending) < window:
+                path = next(files, None)
+                if path is None:
+                    return
+                pending.append(pool.submit(search_file, path, matcher, limit, context))
+
+        fill()
+        try:
+            while pending:
+                for result in pending.popleft().result():
+                    yield result
+                    emitted += 1
+                    if emitted >= limit:
+                        return
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
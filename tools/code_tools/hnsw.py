@@ -0,0 +1,563 @@
+"""
+HNSW approximate nearest-neighbour graph over the numpy backend's vector matrix.
+
+Architecture:
+- Nodes are the rows of FlatIndex's memory-mapped matrix; the graph stores
+  only links, never vectors, and reads vectors through the matrix passed in
+- Layer 0 links are a memory-mapped int32 array (<db>.hnsw.links, one row
+  of 2*M slots per node, -1 for empty) grown by doubling like the matrix;
+  upper layers hold few nodes (a 1/M fraction per layer) and are kept as
+  {row: int32[M]} per layer, saved with the node levels, entry point and
+  parameters to <db>.hnsw.npz (written to a temporary file, then renamed)
+- Insertion follows Malkov & Yashunin: a random level drawn with
+  mL = 1/ln(M), greedy descent to that level, then a beam search of width
+  ef_construction per layer and the neighbour-selection heuristic (keep a
+  candidate only if it is closer to the new node than to any kept one,
+  then fill up with the nearest pruned ones)
+- Distances are squared L2. The beam search expands its ef // EXPAND_DIVISOR
+  closest candidates per step, so each step is one gather and one
+  distance expression over all their neighbours
+- The heuristic runs on whole candidate pools as array operations: the new
+  node's candidates, and in one call every neighbour whose link row is full
+  (its links plus the new node)
+- add() inserts layer-0-only rows (all but ~1/M) in batches of ADD_BATCH:
+  one lockstep beam search for the batch (a bitmask per row marks which
+  queries visited it), batch members offered to each other as candidates,
+  then back-links grouped per target node. Rows with upper-layer levels are
+  inserted one at a time. Build time at M=16, ef_construction=200 over
+  64-dim vectors: ~2 ms per row at 5k rows, 3.5 ms per row (58 min) at 1M
+  rows, where ef_search=64 reaches recall@10 0.925 in 1.4 ms against 61 ms
+  for the exact scan (benchmarks/bench_hnsw.py --size 1000000 --dim 64)
+- Deleted rows stay in the graph for navigation; search skips them (and
+  rows outside a filter) when collecting results via the accept callback
+- A row whose vector is overwritten is relinked: its outgoing links are
+  rebuilt from a fresh search, links into it from other nodes are kept
+- The graph records how many matrix rows it covers, so rows appended
+  without a graph update (a crash between the two) are inserted on open
+"""
+
+import io
+import math
+import os
+import random
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
+
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 200
+DEFAULT_EF_SEARCH = 64
+MIN_CAPACITY = 1024
+# A beam search of width ef expands its ef // EXPAND_DIVISOR closest candidates per step
+EXPAND_DIVISOR = 4
+# Layer-0 nodes inserted together (at most 64: one visited bit each) and the
+# gathered-vector budget per step of their lockstep search
+ADD_BATCH = 64
+BATCH_BYTES = 64 * 1024 * 1024
+
+Candidates = List[Tuple[float, int]]
+
+
+def graph_files(path: Path) -> List[Path]:
+    """The files an HNSWGraph at path keeps"""
+    return [Path(f"{path}.links"), Path(f"{path}.npz")]
+
+
+class HNSWGraph:
+    """Hierarchical navigable small world graph over matrix rows"""
+
+    def __init__(self, path: Path, m: int = DEFAULT_M, ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+                 seed: int = 0):
+        import numpy as np
+
+        self.links_path, self.meta_path = graph_files(path)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.seed = seed
+        self.count = 0
+        self.entry = -1
+        self.max_level = -1
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.upper: List[Dict[int, Any]] = []
+        self._mmap = None
+        self._links0 = None  # Plain ndarray view of _mmap: indexing a memmap costs more than the lookup
+        if self.meta_path.exists():
+            self._load()
+
+    @property
+    def m0(self) -> int:
+        return 2 * self.m
+
+    def _load(self) -> None:
+        import numpy as np
+
+        with np.load(self.meta_path) as saved:
+            self.m = int(saved["m"])
+            self.ef_construction = int(saved["ef_construction"])
+            self.count = int(saved["count"])
+            self.entry = int(saved["entry"])
+            self.max_level = int(saved["max_level"])
+            self.levels = saved["levels"].copy()
+            self.upper = [
+                dict(zip(saved[f"rows{level}"].tolist(), saved[f"links{level}"]))
+                for level in range(1, self.max_level + 1)
+            ]
+        self._open(self.count)
+
+    def _open(self, rows: int):
+        """Map layer 0 links with room for at least rows nodes"""
+        import numpy as np
+
+        itemsize = self.m0 * 4
+        size = self.links_path.stat().st_size if self.links_path.exists() else 0
+        capacity = size // itemsize
+        if capacity < rows:
+            new_capacity = max(MIN_CAPACITY, capacity * 2, rows)
+            self._mmap = self._links0 = None
+            with open(self.links_path, "ab") as f:
+                f.truncate(new_capacity * itemsize)
+            # Fresh slots must read as empty (-1), not as links to row 0
+            grown = np.memmap(self.links_path, dtype=np.int32, mode="r+", shape=(new_capacity, self.m0))
+            grown[capacity:] = -1
+            grown.flush()
+            capacity = new_capacity
+        if self._mmap is None and capacity:
+            self._mmap = np.memmap(self.links_path, dtype=np.int32, mode="r+", shape=(capacity, self.m0))
+            self._links0 = np.asarray(self._mmap)
+        if len(self.levels) < capacity:
+            self.levels = np.concatenate([self.levels, np.zeros(capacity - len(self.levels), dtype=np.int8)])
+        return self._links0
+
+    def save(self) -> None:
+        """Flush layer 0 and atomically rewrite the rest of the graph"""
+        import numpy as np
+
+        if self._mmap is not None:
+            self._mmap.flush()
+        arrays: Dict[str, Any] = {
+            "m": self.m, "ef_construction": self.ef_construction, "count": self.count,
+            "entry": self.entry, "max_level": self.max_level, "levels": self.levels[:self.count],
+        }
+        for level, layer in enumerate(self.upper, start=1):
+            rows = sorted(layer)
+            arrays[f"rows{level}"] = np.asarray(rows, dtype=np.int32)
+            arrays[f"links{level}"] = (np.stack([layer[r] for r in rows]) if rows
+                                       else np.zeros((0, self.m), dtype=np.int32))
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        tmp = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        tmp.write_bytes(buf.getvalue())
+        os.replace(tmp, self.meta_path)
+
+    def reset(self, m: Optional[int] = None, ef_construction: Optional[int] = None) -> None:
+        """Drop every node (before a rebuild), optionally with new parameters"""
+        import numpy as np
+
+        self.close()
+        self.links_path.unlink(missing_ok=True)
+        self.m = m or self.m
+        self.ef_construction = ef_construction or self.ef_construction
+        self.count, self.entry, self.max_level = 0, -1, -1
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.upper = []
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap = self._links0 = None
+
+    # Graph primitives
+
+    def _links(self, rows, level: int):
+        """Link rows (-1 padded) of several nodes on one layer, one row per node"""
+        import numpy as np
+
+        if level == 0:
+            return self._links0[rows]
+        layer = self.upper[level - 1]
+        return np.stack([layer[r] for r in rows.tolist()])
+
+    def _set_links(self, row: int, level: int, rows: List[int]) -> None:
+        import numpy as np
+
+        width = self.m0 if level == 0 else self.m
+        links = np.full(width, -1, dtype=np.int32)
+        links[:len(rows)] = rows
+        if level == 0:
+            self._links0[row] = links
+        else:
+            self.upper[level - 1][row] = links
+
+    @staticmethod
+    def _distances(vectors, query, rows):
+        import numpy as np
+
+        diff = vectors[rows] - query
+        return np.einsum("...d,...d->...", diff, diff)
+
+    def _search_layer(self, vectors, query, entry: Candidates, ef: int, level: int,
+                      accept: Optional[Callable[[int], bool]] = None) -> Candidates:
+        """Beam search of width ef on one layer; (distance, row) of the ef nearest accepted rows"""
+        import numpy as np
+
+        visited = np.zeros(len(self._links0), dtype=bool)
+        cand_r = np.array([r for _, r in entry], dtype=np.int64)
+        cand_d = np.array([d for d, _ in entry], dtype=np.float32)
+        visited[cand_r] = True
+        if accept is None:
+            res_r, res_d = cand_r, cand_d
+        else:
+            keep = self._accepted(cand_r, accept)
+            res_r, res_d = cand_r[keep], cand_d[keep]
+        # Expanding several of the closest candidates per step keeps the loop short
+        step = max(1, ef // EXPAND_DIVISOR)
+        bound = math.inf
+        while cand_r.size:
+            if res_r.size >= ef:
+                bound = res_d.max()
+                close = cand_d <= bound
+                cand_r, cand_d = cand_r[close], cand_d[close]
+                if not cand_r.size:
+                    break
+            if cand_r.size > step:
+                order = np.argpartition(cand_d, step - 1)
+                expand = cand_r[order[:step]]
+                cand_r, cand_d = cand_r[order[step:]], cand_d[order[step:]]
+            else:
+                expand, cand_r, cand_d = cand_r, cand_r[:0], cand_d[:0]
+            fresh = self._links(expand, level).ravel()
+            fresh = fresh[fresh >= 0]
+            fresh = fresh[~visited[fresh]]
+            if not fresh.size:
+                continue
+            if len(expand) > 1:
+                fresh = np.unique(fresh)
+            visited[fresh] = True
+            dist = self._distances(vectors, query, fresh)
+            if bound < math.inf:
+                close = dist < bound
+                fresh, dist = fresh[close], dist[close]
+            cand_r, cand_d = np.concatenate([cand_r, fresh]), np.concatenate([cand_d, dist])
+            if accept is not None:
+                keep = self._accepted(fresh, accept)
+                fresh, dist = fresh[keep], dist[keep]
+            res_r, res_d = np.concatenate([res_r, fresh]), np.concatenate([res_d, dist])
+            if res_r.size > ef:
+                nearest = np.argpartition(res_d, ef - 1)[:ef]
+                res_r, res_d = res_r[nearest], res_d[nearest]
+        order = np.lexsort((res_r, res_d))
+        return list(zip(res_d[order].tolist(), res_r[order].tolist()))
+
+    @staticmethod
+    def _accepted(rows, accept: Callable[[int], bool]):
+        import numpy as np
+
+        return np.fromiter((accept(r) for r in rows.tolist()), dtype=bool, count=len(rows))
+
+    @staticmethod
+    def _heuristic(vectors, pools, dist, width: int):
+        """
+        Neighbour-selection heuristic for several candidate pools at once.
+
+        pools: (n, p) rows sorted nearest first by dist. A candidate is kept if
+        it is closer to the pool's node than to every kept one, then the
+        nearest pruned ones fill up to width. Returns (n, width) rows.
+        """
+        import numpy as np
+
+        n, p = pools.shape
+        points = vectors[pools]
+        norms = (points * points).sum(axis=2)
+        nearest_selected = np.full((n, p), np.inf, dtype=points.dtype)
+        selected = np.zeros((n, p), dtype=bool)
+        everyone = np.arange(n)
+        for _ in range(width):
+            # Each pool's first candidate that no selected one is closer to: positions before it are
+            # pruned, and nearest_selected only shrinks, so they stay pruned
+            open_ = nearest_selected > dist
+            first = open_.argmax(axis=1)
+            active = open_[everyone, first]
+            if not active.any():
+                break
+            selected[everyone, first] |= active
+            chosen = points[everyone, first]
+            to_chosen = norms - 2 * np.einsum("npd,nd->np", points, chosen) + norms[everyone, first][:, None]
+            to_chosen[~active] = np.inf
+            to_chosen[everyone[active], first[active]] = -np.inf
+            np.minimum(nearest_selected, to_chosen, out=nearest_selected)
+        # Selected in pool order (the first width of them), then the pruned ones in pool order
+        positions = np.arange(p)
+        order = np.argsort(np.where(selected, positions, positions + p), axis=1, kind="stable")[:, :width]
+        return np.take_along_axis(pools, order, axis=1)
+
+    def _select(self, vectors, candidates: Candidates, width: int) -> List[int]:
+        """Neighbour-selection heuristic: diverse neighbours first, then the nearest of the rest"""
+        import numpy as np
+
+        if len(candidates) <= width:
+            return [r for _, r in candidates]
+        pools = np.array([[r for _, r in candidates]], dtype=np.int64)
+        dist = np.array([[d for d, _ in candidates]])
+        return self._heuristic(vectors, pools, dist, width)[0].tolist()
+
+    def _link_back(self, vectors, rows: List[int], target: int, level: int) -> None:
+        """Add target to the links of rows, pruning full ones with the heuristic"""
+        import numpy as np
+
+        rows = np.asarray(rows, dtype=np.int64)
+        if not rows.size:
+            return
+        links = self._links(rows, level)
+        fresh = ~(links == target).any(axis=1)
+        rows, links = rows[fresh], links[fresh]
+        width = links.shape[1]
+        used = (links >= 0).sum(axis=1)
+        room = used < width
+        # Links are packed, so a node with room takes target in its first empty slot
+        links[room, used[room]] = target
+        full = ~room
+        if full.any():
+            pools = np.concatenate([links[full], np.full((int(full.sum()), 1), target, dtype=links.dtype)], axis=1)
+            dist = self._distances(vectors, vectors[rows[full]][:, None, :], pools)
+            order = np.argsort(dist, axis=1, kind="stable")
+            pools = np.take_along_axis(pools, order, axis=1)
+            dist = np.take_along_axis(dist, order, axis=1)
+            links[full] = self._heuristic(vectors, pools, dist, width)
+        if level == 0:
+            self._links0[rows] = links
+        else:
+            layer = self.upper[level - 1]
+            for row, row_links in zip(rows.tolist(), links):
+                layer[row] = row_links
+
+    def _greedy(self, vectors, query, top: int, bottom: int) -> Candidates:
+        """Entry point for layer bottom: greedy descent from the top layer"""
+        row = self.entry
+        best = float(self._distances(vectors, query, [row])[0])
+        for level in range(top, bottom, -1):
+            # Move to the nearest neighbour while that gets closer (a beam search with ef=1)
+            while True:
+                links = self._links0[row] if level == 0 else self.upper[level - 1][row]
+                links = links[links >= 0]
+                if not links.size:
+                    break
+                dist = self._distances(vectors, query, links)
+                nearest = int(dist.argmin())
+                if dist[nearest] >= best:
+                    break
+                row, best = int(links[nearest]), float(dist[nearest])
+        return [(best, row)]
+
+    def _connect(self, vectors, row: int, entry: Candidates, top: int) -> None:
+        """Link row on layers top..0 to its selected neighbours and them back to it"""
+        query = vectors[row]
+        for layer in range(top, -1, -1):
+            found = [c for c in self._search_layer(vectors, query, entry, self.ef_construction, layer) if c[1] != row]
+            neighbours = self._select(vectors, found, self.m)
+            self._set_links(row, layer, neighbours)
+            self._link_back(vectors, neighbours, row, layer)
+            entry = found or entry
+
+    def _insert(self, vectors, row: int, level: int) -> None:
+        if self.entry < 0:
+            self.entry, self.max_level = row, level
+            while len(self.upper) < level:
+                self.upper.append({})
+            for layer in range(1, level + 1):
+                self._set_links(row, layer, [])
+            return
+        while len(self.upper) < level:
+            self.upper.append({})
+        entry = self._greedy(vectors, vectors[row], self.max_level, level)
+        self._connect(vectors, row, entry, min(level, self.max_level))
+        for layer in range(self.max_level + 1, level + 1):
+            self._set_links(row, layer, [])
+        if level > self.max_level:
+            self.entry, self.max_level = row, level
+
+    def _descend(self, vectors, queries):
+        """Layer-0 entry points for several queries: greedy descent, all queries in step"""
+        import numpy as np
+
+        count = len(queries)
+        entry = np.full(count, self.entry, dtype=np.int64)
+        best = self._distances(vectors, queries, entry)
+        everyone = np.arange(count)
+        for level in range(self.max_level, 0, -1):
+            while True:
+                links = self._links(entry, level)
+                dist = self._distances(vectors, queries[:, None, :], links)
+                dist[links < 0] = np.inf
+                nearest = dist.argmin(axis=1)
+                closer = dist[everyone, nearest] < best
+                if not closer.any():
+                    break
+                entry[closer] = links[everyone, nearest][closer]
+                best[closer] = dist[everyone, nearest][closer]
+        return entry, best
+
+    def _search_batch(self, vectors, queries, visited):
+        """
+        Layer-0 beam search of width ef_construction for up to 64 queries in lockstep.
+
+        Each query's beam is a row of a (queries, ef) array; every step expands
+        the closest unexpanded entries of every beam with one gather. visited
+        holds one bit per query and is cleared again before returning.
+        Returns (distances, rows) sorted nearest first, padded with inf/-1.
+        """
+        import numpy as np
+
+        count, ef, dim = len(queries), self.ef_construction, queries.shape[1]
+        entry, best = self._descend(vectors, queries)
+        res_r = np.full((count, ef), -1, dtype=np.int64)
+        res_d = np.full((count, ef), np.inf, dtype=np.float32)
+        expanded = np.ones((count, ef), dtype=bool)
+        res_r[:, 0], res_d[:, 0], expanded[:, 0] = entry, best, False
+        bits = np.left_shift(np.uint64(1), np.arange(count, dtype=np.uint64))
+        np.bitwise_or.at(visited, entry, bits)
+        touched = [entry]
+        # Expand as many per beam as fit the gather budget, at most ef // EXPAND_DIVISOR
+        step = max(1, min(ef // EXPAND_DIVISOR, BATCH_BYTES // (count * self.m0 * dim * 4)))
+        while True:
+            open_d = np.where(expanded, np.inf, res_d)
+            pick = np.argpartition(open_d, step - 1, axis=1)[:, :step] if step < ef else np.argsort(open_d, axis=1)
+            live = np.take_along_axis(open_d, pick, axis=1) < np.inf
+            if not live.any():
+                break
+            np.put_along_axis(expanded, pick, True, axis=1)
+            links = self._links0[np.where(live, np.take_along_axis(res_r, pick, axis=1), 0)]
+            links[~live] = -1
+            found = links >= 0
+            query = np.broadcast_to(np.arange(count)[:, None, None], links.shape)[found]
+            fresh = links[found]
+            unseen = (visited[fresh] & bits[query]) == 0
+            if not unseen.any():
+                continue
+            # One (query, row) pair per neighbour reached from several expanded nodes
+            key = np.unique(query[unseen] * len(visited) + fresh[unseen])
+            query, fresh = key // len(visited), key % len(visited)
+            np.bitwise_or.at(visited, fresh, bits[query])
+            touched.append(fresh)
+            dist = self._distances(vectors, queries[query], fresh)
+            # Lay the new candidates out one row per query, then keep each beam's ef nearest
+            per_query = np.bincount(query, minlength=count)
+            column = np.arange(len(query)) - (np.cumsum(per_query) - per_query)[query]
+            new_r = np.full((count, int(per_query.max())), -1, dtype=np.int64)
+            new_d = np.full(new_r.shape, np.inf, dtype=np.float32)
+            new_r[query, column], new_d[query, column] = fresh, dist
+            all_d = np.concatenate([res_d, new_d], axis=1)
+            keep = np.argpartition(all_d, ef - 1, axis=1)[:, :ef]
+            res_d = np.take_along_axis(all_d, keep, axis=1)
+            res_r = np.take_along_axis(np.concatenate([res_r, new_r], axis=1), keep, axis=1)
+            expanded = np.take_along_axis(np.concatenate([expanded, new_r < 0], axis=1), keep, axis=1)
+        visited[np.concatenate(touched)] = 0
+        order = np.argsort(res_d, axis=1, kind="stable")
+        return np.take_along_axis(res_d, order, axis=1), np.take_along_axis(res_r, order, axis=1)
+
+    def _add_batch(self, vectors, rows, visited) -> None:
+        """Insert level-0 rows together: one lockstep search, then links in and out in bulk"""
+        import numpy as np
+
+        queries = vectors[rows]
+        res_d, res_r = self._search_batch(vectors, queries, visited)
+        # The batch's rows are not in the graph yet, so each is also a candidate for the others
+        norms = (queries * queries).sum(axis=1)
+        between = np.maximum(norms[:, None] + norms[None, :] - 2 * (queries @ queries.T), 0)
+        np.fill_diagonal(between, np.inf)
+        all_d = np.concatenate([res_d, between], axis=1)
+        all_r = np.concatenate([res_r, np.broadcast_to(rows, between.shape)], axis=1)
+        order = np.argsort(all_d, axis=1, kind="stable")[:, :self.ef_construction]
+        pools, dist = np.take_along_axis(all_r, order, axis=1), np.take_along_axis(all_d, order, axis=1)
+        links = np.full((len(rows), self.m0), -1, dtype=np.int32)
+        links[:, :self.m] = self._heuristic_blocks(vectors, pools, dist, self.m)
+        self._links0[rows] = links
+
+        # Links back: group the new rows by the node they link to, and add them all at once
+        nodes, new = links[:, :self.m].ravel(), np.repeat(rows, self.m)
+        linked = nodes >= 0
+        nodes, new = nodes[linked], new[linked]
+        order = np.argsort(nodes, kind="stable")
+        nodes, new = nodes[order], new[order]
+        targets, first, incoming = np.unique(nodes, return_index=True, return_counts=True)
+        column = np.arange(len(nodes)) - np.repeat(first, incoming)
+        arrivals = np.full((len(targets), int(incoming.max())), -1, dtype=np.int64)
+        arrivals[np.repeat(np.arange(len(targets)), incoming), column] = new
+        current = self._links0[targets].astype(np.int64)
+        # Two new rows that chose each other already hold the link
+        arrivals[(arrivals[:, :, None] == current[:, None, :]).any(axis=2)] = -1
+        pools = np.concatenate([current, arrivals], axis=1)
+        used = (pools >= 0).sum(axis=1)
+        result = np.empty((len(targets), self.m0), dtype=np.int64)
+        fits = used <= self.m0
+        # Pack the links that fit: existing ones first, then the arrivals
+        packed = np.argsort(pools[fits] < 0, axis=1, kind="stable")[:, :self.m0]
+        result[fits] = np.take_along_axis(pools[fits], packed, axis=1)
+        if not fits.all():
+            over = pools[~fits]
+            dist = self._distances(vectors, vectors[targets[~fits]][:, None, :], over)
+            dist[over < 0] = np.inf
+            order = np.argsort(dist, axis=1, kind="stable")
+            result[~fits] = self._heuristic_blocks(vectors, np.take_along_axis(over, order, axis=1),
+                                                   np.take_along_axis(dist, order, axis=1), self.m0)
+        self._links0[targets] = result
+
+    def _heuristic_blocks(self, vectors, pools, dist, width: int):
+        """_heuristic over pools in blocks of about BATCH_BYTES of gathered vectors"""
+        import numpy as np
+
+        block = max(1, BATCH_BYTES // (pools.shape[1] * vectors.shape[1] * 4))
+        return np.concatenate([self._heuristic(vectors, pools[i:i + block], dist[i:i + block], width)
+                               for i in range(0, len(pools), block)])
+
+    def add(self, vectors, rows: Iterable[int]) -> None:
+        """Insert new rows (count, count + 1, ...) with random levels"""
+        import numpy as np
+
+        rows = list(rows)
+        if not rows:
+            return
+        self._open(rows[-1] + 1)
+        rng = random.Random(self.seed * 1_000_003 + self.count)
+        ml = 1 / math.log(self.m)
+        levels = [int(-math.log(1.0 - rng.random()) * ml) for _ in rows]
+        self.levels[rows] = levels
+        self._links0[rows] = -1
+        visited = np.zeros(len(self._links0), dtype=np.uint64)
+        for start in range(0, len(rows), ADD_BATCH):
+            # Nodes on upper layers (about 1 in M) go in one at a time, the rest together
+            batch = []
+            for row, level in zip(rows[start:start + ADD_BATCH], levels[start:start + ADD_BATCH]):
+                if level or self.entry < 0:
+                    self._insert(vectors, row, level)
+                else:
+                    batch.append(row)
+            if batch:
+                self._add_batch(vectors, np.asarray(batch, dtype=np.int64), visited)
+            self.count = max(self.count, rows[min(start + ADD_BATCH, len(rows)) - 1] + 1)
+
+    def relink(self, vectors, rows: Iterable[int]) -> None:
+        """Rebuild the outgoing links of rows whose vectors were overwritten"""
+        for row in rows:
+            if row >= self.count:
+                continue
+            level = int(self.levels[row])
+            # The stale links are still valid edges, so the search can use them before they are replaced
+            entry = self._greedy(vectors, vectors[row], self.max_level, level)
+            self._connect(vectors, row, entry, level)
+
+    def search(self, vectors, query, k: int, ef: int = DEFAULT_EF_SEARCH,
+               accept: Optional[Callable[[int], bool]] = None) -> Candidates:
+        """(squared L2 distance, row) of about the k nearest accepted rows, nearest first"""
+        if self.entry < 0 or k <= 0:
+            return []
+        entry = self._greedy(vectors, query, self.max_level, 0)
+        return self._search_layer(vectors, query, entry, max(ef, k), 0, accept)[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.count,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "max_level": self.max_level,
+            "links_mb": round((self.links_path.stat().st_size if self.links_path.exists() else 0) / 1024 / 1024, 2),
+        }
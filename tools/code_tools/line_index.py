@@ -0,0 +1,220 @@
+"""
+Line-offset index and memory-mapped ranged reads for read_file.
+
+Architecture:
+- A LineIndex stores the byte offset of every CHECKPOINT_EVERY-th line
+  start (a sparse index: 8 bytes per 1024 lines), built in one NumPy pass
+  over fixed-size blocks of the mapped file
+- Line breaks follow text-mode universal newlines (\\n, \\r\\n and lone \\r);
+  files without lone \\r use bytes.find to step between lines
+- A ranged read jumps to the nearest checkpoint and steps at most
+  CHECKPOINT_EVERY - 1 lines, so it costs O(range) once the index exists
+- Indexes are cached in-process (under a lock, since batch reads on
+  threads) and, for files of PERSIST_MIN_BYTES or
+  more, on disk under {index_dir}/line-index; both are validated by file
+  size and mtime
+- numpy is imported only when an index is built or loaded, so reads near
+  the top of a file start as fast as a plain open()
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+CHECKPOINT_EVERY = 1024
+PERSIST_MIN_BYTES = 4 * 1024 * 1024
+BLOCK_BYTES = 64 * 1024 * 1024
+MAX_CACHED_INDEXES = 64
+
+_BREAK_RE = re.compile(rb'\r\n?|\n')
+
+_cache: "OrderedDict[str, LineIndex]" = OrderedDict()
+# batch runs read-only commands on threads; guards every _cache access
+_cache_lock = threading.Lock()
+
+
+def _next_line_start(buf: Any, pos: int, size: int, lone_cr: bool) -> int:
+    """Offset just past the line break at or after pos (size if none)"""
+    if not lone_cr:
+        i = buf.find(b"\n", pos)
+        return size if i < 0 else i + 1
+    m = _BREAK_RE.search(buf, pos)
+    return m.end() if m else size
+
+
+def _decode_lines(raw: bytes) -> str:
+    """Decode like open(..., 'r', errors='ignore') would (universal newlines)"""
+    text = raw.decode('utf-8', errors='ignore')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+class LineIndex:
+    """Sparse line-start offsets for one version (size, mtime) of a file"""
+
+    def __init__(self, size: int, mtime_ns: int, lines: int, lone_cr: bool, checkpoints: "np.ndarray"):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.lines = lines
+        self.lone_cr = lone_cr
+        self.checkpoints = checkpoints
+
+    @classmethod
+    def build(cls, buf: Any, size: int, mtime_ns: int) -> "LineIndex":
+        """Scan the buffer block by block, keeping every CHECKPOINT_EVERY-th line start"""
+        import numpy as np
+
+        checkpoints = [np.zeros(1, dtype=np.uint64)]
+        lone_cr = buf.find(b"\r") >= 0 and re.search(rb'\r(?!\n)', buf) is not None
+        breaks_seen = 0
+        last_break = -1
+        for block_start in range(0, size, BLOCK_BYTES):
+            block_end = min(size, block_start + BLOCK_BYTES)
+            arr = np.frombuffer(buf[block_start:block_end], dtype=np.uint8)
+            is_break = arr == 10
+            if lone_cr:
+                following = np.empty_like(arr)
+                following[:-1] = arr[1:]
+                following[-1] = buf[block_end] if block_end < size else 0
+                is_break |= (arr == 13) & (following != 10)
+            breaks = np.flatnonzero(is_break)
+            if not len(breaks):
+                continue
+            ordinals = breaks_seen + np.arange(1, len(breaks) + 1)
+            selected = breaks[ordinals % CHECKPOINT_EVERY == 0]
+            checkpoints.append((selected + block_start + 1).astype(np.uint64))
+            breaks_seen += len(breaks)
+            last_break = block_start + int(breaks[-1])
+        lines = breaks_seen + (1 if last_break + 1 < size else 0)
+        return cls(size, mtime_ns, lines, lone_cr, np.concatenate(checkpoints))
+
+    def offset_of(self, buf: Any, line: int) -> int:
+        """Byte offset where 1-based line starts (size if past the end)"""
+        if line > self.lines:
+            return self.size
+        k = (line - 1) // CHECKPOINT_EVERY
+        pos = int(self.checkpoints[k])
+        for _ in range(line - 1 - k * CHECKPOINT_EVERY):
+            pos = _next_line_start(buf, pos, self.size, self.lone_cr)
+        return pos
+
+    def save(self, path: Path) -> None:
+        import numpy as np
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = np.array([self.size, self.mtime_ns, self.lines, int(self.lone_cr), CHECKPOINT_EVERY], dtype=np.int64)
+        tmp = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, 'wb') as f:
+            np.save(f, meta)
+            np.save(f, self.checkpoints)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LineIndex"]:
+        import numpy as np
+
+        try:
+            with open(path, 'rb') as f:
+                meta = np.load(f)
+                checkpoints = np.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        if len(meta) != 5 or int(meta[4]) != CHECKPOINT_EVERY:
+            return None
+        return cls(int(meta[0]), int(meta[1]), int(meta[2]), bool(meta[3]), checkpoints)
+
+
+def get_index(path: str, buf: Any, st: os.stat_result, index_dir: Optional[Path] = None) -> LineIndex:
+    """Cached index for this version of path, building (and persisting) it if needed"""
+    key = os.path.abspath(path)
+    fingerprint = (st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None and (index.size, index.mtime_ns) == fingerprint:
+            _cache.move_to_end(key)
+            return index
+
+    disk_path = None
+    if index_dir is not None and st.st_size >= PERSIST_MIN_BYTES:
+        disk_path = index_dir / "line-index" / (hashlib.sha256(key.encode()).hexdigest()[:24] + ".npy")
+        index = LineIndex.load(disk_path)
+        if index is not None and (index.size, index.mtime_ns) != fingerprint:
+            index = None
+    if index is None:
+        index = LineIndex.build(buf, st.st_size, st.st_mtime_ns)
+        if disk_path is not None:
+            try:
+                index.save(disk_path)
+            except OSError:
+                pass
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+    return index
+
+
+def _count_lines(text: str) -> int:
+    return text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+
+
+def read_ranges(
+    path: str,
+    ranges: List[Tuple[Optional[int], Optional[int]]],
+    index_dir: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read several 1-based inclusive (start, end) windows of one file.
+
+    Windows ending within the first checkpoint are read by stepping from
+    the top of the file; any other window builds or reuses the line index
+    and slices the map between two indexed offsets. Raises OSError for
+    unreadable files.
+    """
+    results = []
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        if size == 0:
+            return [{"path": path, "start": s, "end": e, "content": "", "line_count": 0} for s, e in ranges]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            index: Optional[LineIndex] = None
+            for start, end in ranges:
+                first = start or 1
+                if end is not None and end < first:
+                    content = ""
+                elif first == 1 and end is None:
+                    content = _decode_lines(buf[:])
+                elif end is not None and end <= CHECKPOINT_EVERY and index is None:
+                    # Near the top: step lines directly (regex stepping handles every newline style)
+                    offset = 0
+                    for _ in range(first - 1):
+                        offset = _next_line_start(buf, offset, size, True)
+                    stop = offset
+                    for _ in range(end - first + 1):
+                        stop = _next_line_start(buf, stop, size, True)
+                    content = _decode_lines(buf[offset:stop])
+                else:
+                    if index is None:
+                        index = get_index(path, buf, st, index_dir)
+                    offset = index.offset_of(buf, first)
+                    stop = size if end is None else index.offset_of(buf, end + 1)
+                    content = _decode_lines(buf[offset:stop])
+                results.append({
+                    "path": path,
+                    "start": start,
+                    "end": end,
+                    "content": content,
+                    "line_count": _count_lines(content),
+                })
+    return results
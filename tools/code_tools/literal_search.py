@@ -0,0 +1,184 @@
+"""
+Literal fast paths for grep: pattern analysis and multi-literal matching.
+
+- analyze_pattern: classifies a regex as a pure literal, or extracts the
+  longest literal every match must contain (used as a bytes.find prefilter)
+- AhoCorasick: byte-level automaton for large literal sets, one pass over
+  the buffer regardless of how many literals are searched
+- Small literal sets use a C-level alternation regex instead, which beats
+  a Python-driven automaton until the set grows past AHO_CORASICK_MIN_PATTERNS
+  (see benchmarks/bench_grep.py)
+- MultiLiteral.occurrences reports every occurrence of every literal in
+  one scan (used by search_replace to validate overlaps)
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Sequence, Set, Tuple, Iterator
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse  # type: ignore
+
+
+AHO_CORASICK_MIN_PATTERNS = 48
+MIN_PREFILTER_LENGTH = 3
+
+
+@dataclass
+class PatternInfo:
+    """Result of analysing a regex for literal fast paths"""
+    literal: Optional[str] = None  # whole pattern is this literal
+    required: Optional[str] = None  # every match contains this literal
+    runs: Tuple[str, ...] = ()  # all top-level literal runs (each must occur)
+
+
+def analyze_pattern(pattern: str) -> PatternInfo:
+    """
+    Classify a (valid) regex.
+
+    Only top-level literal runs are considered, and nothing is extracted
+    for case-insensitive patterns or literals containing line breaks, so
+    the result is always safe to use as a necessary condition.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return PatternInfo()
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return PatternInfo()
+
+    runs: List[str] = []
+    current: List[str] = []
+    all_literal = True
+    for op, av in parsed:
+        if str(op) == 'LITERAL' and chr(av) not in '\r\n':
+            current.append(chr(av))
+            continue
+        all_literal = False
+        if current:
+            runs.append(''.join(current))
+            current = []
+    if current:
+        runs.append(''.join(current))
+
+    if all_literal and runs:
+        return PatternInfo(literal=runs[0], required=runs[0], runs=(runs[0],))
+    best = max(runs, key=len, default='')
+    if len(best) >= MIN_PREFILTER_LENGTH:
+        return PatternInfo(required=best, runs=tuple(runs))
+    return PatternInfo(runs=tuple(runs))
+
+
+class AhoCorasick:
+    """Aho–Corasick automaton over bytes, compiled to a full transition table"""
+
+    def __init__(self, patterns: Sequence[bytes]):
+        self.patterns = list(patterns)
+        goto: List[Dict[int, int]] = [{}]
+        out: List[Tuple[int, ...]] = [()]
+        for idx, pat in enumerate(self.patterns):
+            state = 0
+            for byte in pat:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][byte] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (idx,)
+
+        # BFS: failure links, then complete each state's transitions with
+        # its failure state's so scanning is one dict lookup per byte
+        fail = [0] * len(goto)
+        delta: List[Dict[int, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = deque(goto[0].values())
+        while queue:
+            r = queue.popleft()
+            out[r] = out[r] + out[fail[r]]
+            row = dict(delta[fail[r]]) if r else {}
+            row.update(goto[r])
+            delta[r] = row
+            for byte, s in goto[r].items():
+                fail[s] = delta[fail[r]].get(byte, 0) if r else 0
+                queue.append(s)
+        self._delta = delta
+        self._out = out
+
+    def iter_matches(self, buf: bytes, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """Yield (match_start, pattern_index) in order of match end"""
+        delta = self._delta
+        out = self._out
+        patterns = self.patterns
+        state = 0
+        for i in range(start, len(buf)):
+            state = delta[state].get(buf[i], 0)
+            if out[state]:
+                for idx in out[state]:
+                    yield i + 1 - len(patterns[idx]), idx
+
+    def matched_in(self, buf: bytes) -> Set[int]:
+        """Indexes of all patterns occurring in buf"""
+        return {idx for _, idx in self.iter_matches(buf)}
+
+
+class MultiLiteral:
+    """Search for any of several literals, choosing the faster engine by set size"""
+
+    def __init__(self, literals: Sequence[str]):
+        self.literals = list(dict.fromkeys(literals))
+        self.encoded = [lit.encode('utf-8') for lit in self.literals]
+        if len(self.encoded) >= AHO_CORASICK_MIN_PATTERNS:
+            self.automaton: Optional[AhoCorasick] = AhoCorasick(self.encoded)
+            self.regex = None
+        else:
+            self.automaton = None
+            alternatives = sorted(self.encoded, key=len, reverse=True)
+            self.regex = re.compile(b'|'.join(re.escape(a) for a in alternatives))
+
+    def finder(self, buf: bytes):
+        """Return find(pos) -> start of the next match at or after pos, or -1"""
+        if self.regex is not None:
+            regex = self.regex
+
+            def find(pos: int) -> int:
+                m = regex.search(buf, pos)
+                return m.start() if m else -1
+            return find
+
+        hits = self.automaton.iter_matches(buf)
+
+        def find_ac(pos: int) -> int:
+            for start, _ in hits:
+                if start >= pos:
+                    return start
+            return -1
+        return find_ac
+
+    def occurrences(self, buf: bytes) -> Iterator[Tuple[int, int]]:
+        """Yield (start, literal index) for every occurrence, overlapping ones included"""
+        if self.automaton is not None:
+            yield from self.automaton.iter_matches(buf)
+            return
+        # Zero-width lookahead stops at every position where some literal
+        # starts; the literals sharing that first byte are then checked there
+        by_first: Dict[bytes, List[int]] = {}
+        for idx, enc in enumerate(self.encoded):
+            by_first.setdefault(enc[:1], []).append(idx)
+        encoded = self.encoded
+        starts = re.compile(b'(?=' + b'|'.join(re.escape(e) for e in encoded) + b')')
+        for m in starts.finditer(buf):
+            pos = m.start()
+            for idx in by_first[buf[pos:pos + 1]]:
+                if buf.startswith(encoded[idx], pos):
+                    yield pos, idx
+
+    def matched_in(self, line: bytes) -> List[str]:
+        """Literals present in a matched line"""
+        if self.automaton is not None:
+            found = self.automaton.matched_in(line)
+            return [self.literals[i] for i in sorted(found)]
+        return [lit for lit, enc in zip(self.literals, self.encoded) if enc in line]
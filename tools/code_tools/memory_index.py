@@ -0,0 +1,292 @@
+"""
+BM25 index over memory artifacts (.md/.txt) for search_memory.
+
+Architecture:
+- Files are split into sections at Markdown headings (fenced code is never
+  split); long sections and heading-less text are split further at
+  paragraph boundaries, so every hit points at a small block of text
+- SQLite in {memory_dir}/.search-index.db: files (fingerprint), sections
+  (heading, line span, text, token count) and postings (term, section, tf)
+- Refresh is incremental: (mtime, size) unchanged -> skipped, otherwise the
+  file is re-split only if its content hash changed
+- Queries score sections with Okapi BM25 straight from the postings; each
+  file is represented by its best section
+"""
+
+import hashlib
+import math
+import re
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+from code_tools.result_cache import note
+
+
+INDEX_FILENAME = ".search-index.db"
+MEMORY_SUFFIXES = {".md", ".txt"}
+MAX_SECTION_CHARS = 2000
+SNIPPET_CHARS = 500
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (same tokenisation as the original scorer)"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class Section:
+    """A contiguous block of a memory file"""
+    heading: str
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    text: str
+
+
+def _split_long(heading: str, start: int, lines: List[str]) -> Iterator[Section]:
+    """Split an oversized block at blank lines into ~MAX_SECTION_CHARS pieces"""
+    chunk: List[str] = []
+    chunk_start = start
+    size = 0
+    for offset, line in enumerate(lines):
+        if size + len(line) > MAX_SECTION_CHARS and chunk and not line.strip():
+            yield Section(heading, chunk_start, start + offset - 1, "\n".join(chunk))
+            chunk, chunk_start, size = [], start + offset + 1, 0
+            continue
+        if not chunk and not line.strip():
+            chunk_start = start + offset + 1
+            continue
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield Section(heading, chunk_start, start + len(lines) - 1, "\n".join(chunk))
+
+
+def split_sections(text: str) -> List[Section]:
+    """Split text into heading-delimited sections (headings inside code fences ignored)"""
+    lines = text.splitlines()
+    blocks: List[tuple] = []  # (heading, start_line, lines)
+    heading, start, current = "", 1, []
+    fence: Optional[str] = None
+    for number, line in enumerate(lines, start=1):
+        fence_match = _FENCE_RE.match(line)
+        if fence_match:
+            marker = fence_match.group(1)
+            fence = None if fence == marker else (fence or marker)
+        elif fence is None:
+            heading_match = _HEADING_RE.match(line)
+            if heading_match:
+                if any(part.strip() for part in current):
+                    blocks.append((heading, start, current))
+                heading, start, current = heading_match.group(2), number, [line]
+                continue
+        current.append(line)
+    if any(part.strip() for part in current):
+        blocks.append((heading, start, current))
+
+    sections: List[Section] = []
+    for heading, start, block in blocks:
+        if sum(len(line) + 1 for line in block) <= MAX_SECTION_CHARS:
+            sections.append(Section(heading, start, start + len(block) - 1, "\n".join(block).strip("\n")))
+        else:
+            sections.extend(_split_long(heading, start, block))
+    return sections
+
+
+def snippet(text: str, terms: set, max_chars: int = SNIPPET_CHARS) -> str:
+    """Section text, or a window starting at the line of the first query term hit"""
+    if len(text) <= max_chars:
+        return text
+    lowered = text.lower()
+    first = min((m.start() for m in _TOKEN_RE.finditer(lowered) if m.group() in terms), default=0)
+    start = lowered.rfind("\n", 0, first) + 1
+    if len(text) - start < max_chars:
+        # Near the end: show more context before, starting on a line boundary
+        earliest = len(text) - max_chars
+        start = min(start, text.find("\n", earliest) + 1 or start)
+    return text[start:start + max_chars]
+
+
+class MemoryIndex:
+    """Incremental section-level BM25 index over one memory directory"""
+
+    def __init__(self, memory_dir: Path, db_path: Optional[Path] = None):
+        self.memory_dir = memory_dir
+        self.db_path = db_path or memory_dir / INDEX_FILENAME
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize database schema"""
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                text TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                section_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, section_id)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sections_path ON sections(path)")
+        self._conn.commit()
+
+    def _files(self) -> Iterator[Path]:
+        note(self.memory_dir)
+        for path in sorted(self.memory_dir.rglob("*")):
+            if path.is_dir():
+                note(path)
+            elif path.suffix.lower() in MEMORY_SUFFIXES and path.is_file():
+                note(path)
+                yield path
+
+    def _remove(self, rel: str) -> None:
+        # Re-tokenise the stored text to find the postings keys; cheaper
+        # than maintaining a second index on section_id
+        keys = [
+            (term, section_id)
+            for section_id, text in self._conn.execute("SELECT id, text FROM sections WHERE path = ?", (rel,))
+            for term in set(tokenize(text))
+        ]
+        self._conn.executemany("DELETE FROM postings WHERE term = ? AND section_id = ?", keys)
+        self._conn.execute("DELETE FROM sections WHERE path = ?", (rel,))
+
+    def _add(self, rel: str, text: str, postings: List[tuple]) -> None:
+        """Insert rel's sections; their postings are appended for a later bulk insert"""
+        for section in split_sections(text):
+            counts = Counter(tokenize(section.text))
+            cursor = self._conn.execute("""
+                INSERT INTO sections (path, heading, start_line, end_line, length, text)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (rel, section.heading, section.start_line, section.end_line,
+                  sum(counts.values()), section.text))
+            section_id = cursor.lastrowid
+            postings.extend((term, section_id, tf) for term, tf in counts.items())
+
+    def refresh(self) -> Dict[str, int]:
+        """Sync the index with files on disk; returns change counts"""
+        # Take the write lock before reading state so concurrent refreshes serialise
+        self._conn.execute("BEGIN IMMEDIATE")
+        known = {
+            row[0]: row[1:]
+            for row in self._conn.execute("SELECT path, mtime_ns, size, content_hash FROM files")
+        }
+        stats = {"scanned": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        postings: List[tuple] = []
+
+        for path in self._files():
+            rel = path.relative_to(self.memory_dir).as_posix()
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen.add(rel)
+            stats["scanned"] += 1
+            previous = known.get(rel)
+            if previous and previous[:2] == (st.st_mtime_ns, st.st_size):
+                stats["unchanged"] += 1
+                continue
+            try:
+                raw = path.read_bytes()
+            except OSError:
+                continue
+            content_hash = hashlib.sha256(raw).hexdigest()
+            if not previous or previous[2] != content_hash:
+                if previous:
+                    self._remove(rel)
+                self._add(rel, raw.decode('utf-8', errors='ignore'), postings)
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, content_hash, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                (rel, content_hash, st.st_mtime_ns, st.st_size)
+            )
+
+        for rel in set(known) - seen:
+            self._remove(rel)
+            self._conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+            stats["removed"] += 1
+
+        # Key order makes the primary-key B-tree inserts sequential
+        postings.sort()
+        self._conn.executemany("INSERT INTO postings (term, section_id, tf) VALUES (?, ?, ?)", postings)
+        self._conn.commit()
+        return stats
+
+    def search(self, query: str, topk: int = 10) -> List[Dict[str, Any]]:
+        """Top files by their best section's BM25 score"""
+        terms = set(tokenize(query))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM sections").fetchone()
+        if not terms or not count or topk <= 0:
+            return []
+        avg_length = total / count or 1.0
+
+        scores: Dict[int, float] = {}
+        paths: Dict[int, str] = {}
+        for term in terms:
+            rows = self._conn.execute("""
+                SELECT p.section_id, p.tf, s.length, s.path
+                FROM postings p JOIN sections s ON s.id = p.section_id
+                WHERE p.term = ?
+            """, (term,)).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            for section_id, tf, length, rel in rows:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[section_id] = scores.get(section_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+                paths[section_id] = rel
+
+        best: Dict[str, tuple] = {}
+        for section_id, score in scores.items():
+            rel = paths[section_id]
+            if rel not in best or score > best[rel][0]:
+                best[rel] = (score, section_id)
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))[:topk]
+        results = []
+        for rel, (score, section_id) in ranked:
+            heading, start_line, end_line, text = self._conn.execute(
+                "SELECT heading, start_line, end_line, text FROM sections WHERE id = ?", (section_id,)
+            ).fetchone()
+            results.append({
+                "path": str(self.memory_dir / rel),
+                "score": round(score, 4),
+                "heading": heading,
+                "lines": [start_line, end_line],
+                "snippet": snippet(text, terms),
+            })
+        return results
+
+    def close(self):
+        """Close the database connection"""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,514 @@
+"""
+Unified-diff application for edit_file.
+
+Architecture:
+- parse_patch splits a (possibly multi-file) unified diff into FilePatches
+  and Hunks; git-style a/ b/ prefixes are stripped, /dev/null marks file
+  creation or deletion, and hunk bodies are read tolerantly (a wrong
+  count in the @@ header ends the hunk at the next non-body line)
+- Target files are memory-mapped; the expected position of a hunk comes
+  from a sparse line index (line_index.LineIndex), shifted by the offset
+  at which the previous hunk applied
+- Locating a hunk tries, in order: the expected position, then every
+  occurrence of its most selective line (one regex scan of the map,
+  closest candidate wins), then the same with up to `fuzz` context lines
+  dropped from each end, then all of it again ignoring whitespace
+- The result is streamed to a temp file from slices of the map and the
+  hunks, so the file is never held twice in memory; context lines keep
+  the file's own text and line endings, added lines use the file's EOL
+- Every file is staged before any is touched; originals are kept as hard
+  links until all swaps succeed and restored if one fails
+"""
+
+import mmap
+import os
+import re
+import shutil
+import stat
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from code_tools.line_index import LineIndex
+
+
+DEFAULT_FUZZ = 2
+DEV_NULL = "/dev/null"
+
+_HUNK_RE = re.compile(rb'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class PatchError(Exception):
+    """Malformed patch, or hunks that could not be applied (nothing was written)"""
+
+    def __init__(self, message: str, results: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.results = results or []
+
+
+@dataclass
+class Hunk:
+    """One @@ block: (tag, text) lines with tag in ' ', '-', '+'; text has no EOL"""
+    old_start: int
+    old_len: int
+    new_start: int
+    new_len: int
+    header: str
+    lines: List[Tuple[str, bytes]] = field(default_factory=list)
+    old_no_eol: bool = False  # "\ No newline at end of file" after the last old line
+    new_no_eol: bool = False
+
+
+@dataclass
+class FilePatch:
+    """Hunks for one file; a path of None means /dev/null (or no header at all)"""
+    old_path: Optional[str]
+    new_path: Optional[str]
+    hunks: List[Hunk] = field(default_factory=list)
+
+
+def is_unified_diff(data: bytes) -> bool:
+    """True if data contains at least one hunk header"""
+    return any(_HUNK_RE.match(line) for line in data.splitlines())
+
+
+def _header_path(line: bytes) -> Optional[str]:
+    path = line[4:].split(b"\t")[0].rstrip(b"\r").decode('utf-8', errors='surrogateescape').strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    return None if path == DEV_NULL else path
+
+
+def parse_patch(data: bytes) -> List[FilePatch]:
+    """Parse unified diff text; raises PatchError if there are no hunks"""
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    patches: List[FilePatch] = []
+    current: Optional[FilePatch] = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith(b"--- ") and i + 1 < len(lines) and lines[i + 1].startswith(b"+++ "):
+            current = FilePatch(_header_path(line), _header_path(lines[i + 1]))
+            patches.append(current)
+            i += 2
+            continue
+        m = _HUNK_RE.match(line)
+        if not m:
+            i += 1  # diff --git, index, mode lines, commentary
+            continue
+        if current is None:
+            current = FilePatch(None, None)
+            patches.append(current)
+        old_len = int(m.group(2)) if m.group(2) is not None else 1
+        new_len = int(m.group(4)) if m.group(4) is not None else 1
+        hunk = Hunk(int(m.group(1)), old_len, int(m.group(3)), new_len,
+                    line.rstrip(b"\r").decode('utf-8', errors='replace'))
+        old_left, new_left = old_len, new_len
+        i += 1
+        while i < len(lines):
+            body = lines[i].rstrip(b"\r")
+            if body.startswith(b"\\"):
+                tag = hunk.lines[-1][0] if hunk.lines else ' '
+                if tag in ' -':
+                    hunk.old_no_eol = True
+                if tag in ' +':
+                    hunk.new_no_eol = True
+                i += 1
+                continue
+            if old_left <= 0 and new_left <= 0:
+                break
+            tag = body[:1].decode() if body else ' '
+            if tag not in ' -+' or _HUNK_RE.match(body) or (
+                    body.startswith(b"--- ") and i + 1 < len(lines) and lines[i + 1].startswith(b"+++ ")):
+                break
+            hunk.lines.append((tag, body[1:]))
+            if tag in ' -':
+                old_left -= 1
+            if tag in ' +':
+                new_left -= 1
+            i += 1
+        current.hunks.append(hunk)
+    patches = [p for p in patches if p.hunks]
+    if not patches:
+        raise PatchError("No hunks found in patch")
+    return patches
+
+
+def _strip_prefix(path: Optional[str], strip: int) -> Optional[str]:
+    if path is None or strip <= 0:
+        return path
+    parts = path.split("/")
+    return "/".join(parts[strip:]) if len(parts) > strip else parts[-1]
+
+
+def _under_root(root: Path, relative: str) -> Path:
+    """root / relative, refusing header paths that would land outside root"""
+    parts = relative.replace("\\", "/").split("/")
+    if Path(relative).is_absolute() or relative.startswith("/") or ".." in parts:
+        raise PatchError(f"Refusing to patch {relative}: paths must be relative and stay under the root")
+    path = root / relative
+    base = root.resolve()
+    resolved = path.resolve()
+    if resolved != base and base not in resolved.parents:
+        raise PatchError(f"Refusing to patch {relative}: it resolves outside {root}")
+    return path
+
+
+def _auto_strip(patches: List[FilePatch]) -> int:
+    """1 for git-style a/ and b/ prefixes, else 0"""
+    paths = [(p.old_path, p.new_path) for p in patches]
+    git_style = all(
+        (old is None or old.startswith("a/")) and (new is None or new.startswith("b/")) and (old or new)
+        for old, new in paths
+    )
+    return 1 if git_style else 0
+
+
+def _line_end(buf: Any, pos: int, size: int) -> Tuple[int, int]:
+    """(end of text without EOL, start of next line) for the line at pos"""
+    nl = buf.find(b"\n", pos)
+    if nl < 0:
+        end = size
+        nxt = size
+    else:
+        end = nl
+        nxt = nl + 1
+    if end > pos and buf[end - 1:end] == b"\r":
+        end -= 1
+    return end, nxt
+
+
+def _same(line: bytes, text: bytes, loose: bool) -> bool:
+    return line.split() == text.split() if loose else line == text
+
+
+def _match_at(buf: Any, pos: int, size: int, block: List[bytes], loose: bool) -> int:
+    """End offset if block's lines appear starting at pos, else -1"""
+    for text in block:
+        if pos >= size:
+            return -1
+        end, nxt = _line_end(buf, pos, size)
+        if not _same(buf[pos:end], text, loose):
+            return -1
+        pos = nxt
+    return pos
+
+
+def _anchor_regex(text: bytes, loose: bool) -> "re.Pattern[bytes]":
+    if loose:
+        body = rb'[ \t]*' + rb'[ \t]+'.join(re.escape(t) for t in text.split()) + rb'[ \t]*'
+    else:
+        body = re.escape(text)
+    return re.compile(rb'^' + body + rb'\r?$', re.M)
+
+
+def _locate(buf: Any, size: int, block: List[bytes], expected: int, min_pos: int, loose: bool) -> Optional[Tuple[int, int]]:
+    """(start, end) of block at or after min_pos, preferring the position closest to expected"""
+    if expected >= min_pos:
+        end = _match_at(buf, expected, size, block, loose)
+        if end >= 0:
+            return expected, end
+    anchor = max(range(len(block)), key=lambda k: len(block[k].strip()))
+    if not block[anchor].strip():
+        return None
+    best: Optional[Tuple[int, int]] = None
+    for m in _anchor_regex(block[anchor], loose).finditer(buf, min_pos):
+        start = m.start()
+        for _ in range(anchor):
+            if start == 0:
+                start = -1
+                break
+            start = buf.rfind(b"\n", 0, start - 1) + 1
+        if start < min_pos:
+            continue
+        end = _match_at(buf, start, size, block, loose)
+        if end >= 0 and (best is None or abs(start - expected) < abs(best[0] - expected)):
+            best = (start, end)
+            if start >= expected:
+                break  # later candidates are only further away
+    return best
+
+
+class _FileState:
+    """A target file opened for patching"""
+
+    def __init__(self, path: Path, creating: bool):
+        self.path = path
+        self.exists = path.exists()
+        self.mode = 0o644
+        self.fingerprint: Optional[Tuple[int, int]] = None
+        self._file = None
+        self.buf: Any = b""
+        self.size = 0
+        self._index = None
+        self._last = (0, 1)
+        if self.exists:
+            if creating and path.stat().st_size:
+                raise PatchError(f"{path}: patch creates the file but it already exists")
+            self._file = open(path, 'rb')
+            st = os.fstat(self._file.fileno())
+            self.st = st
+            self.mode = stat.S_IMODE(st.st_mode)
+            self.fingerprint = (st.st_mtime_ns, st.st_size)
+            self.size = st.st_size
+            if self.size:
+                self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        elif not creating:
+            raise PatchError(f"File not found: {path}")
+        nl = self.buf.find(b"\n")
+        self.eol = b"\r\n" if nl > 0 and self.buf[nl - 1:nl] == b"\r" else b"\n"
+
+    def offset_of(self, line: int) -> int:
+        """Byte offset where 1-based line starts (size if past the end)"""
+        if line <= 1 or not self.size:
+            return 0
+        if self._index is None:
+            # Built fresh: a cached index is keyed by (size, mtime), which an
+            # edit within one timestamp tick can leave unchanged
+            self._index = LineIndex.build(self.buf, self.size, self.st.st_mtime_ns)
+        return self._index.offset_of(self.buf, line)
+
+    def line_of(self, pos: int) -> int:
+        """1-based line at byte offset pos; counts forward from the previous call"""
+        last_pos, last_line = self._last
+        if pos < last_pos:
+            last_pos, last_line = 0, 1
+        line = last_line + self.buf[last_pos:pos].count(b"\n")
+        self._last = (pos, line)
+        return line
+
+    def close(self) -> None:
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _trimmed(hunk: Hunk, fuzz: int) -> Tuple[int, int]:
+    """Context lines (leading, trailing) to drop at this fuzz level"""
+    lead = 0
+    while lead < len(hunk.lines) and hunk.lines[lead][0] == ' ':
+        lead += 1
+    trail = 0
+    while trail < len(hunk.lines) - lead and hunk.lines[-1 - trail][0] == ' ':
+        trail += 1
+    return min(fuzz, lead), min(fuzz, trail)
+
+
+def _place_hunks(state: _FileState, hunks: List[Hunk], max_fuzz: int) -> List[Dict[str, Any]]:
+    """Find where each hunk applies; results carry start/end/lines for applied hunks"""
+    results = []
+    cursor = 0
+    line_shift = 0
+    for number, hunk in enumerate(hunks, start=1):
+        result: Dict[str, Any] = {"hunk": number, "header": hunk.header}
+        placed = None
+        for loose in (False, True):
+            tried = set()
+            for fuzz in range(max_fuzz + 1):
+                lead, trail = _trimmed(hunk, fuzz)
+                if (lead, trail) in tried:
+                    continue
+                tried.add((lead, trail))
+                lines = hunk.lines[lead:len(hunk.lines) - trail]
+                block = [text for tag, text in lines if tag in ' -']
+                if not block and fuzz:
+                    break  # never fuzz a hunk down to an anchorless insertion
+                # old_start names the line the hunk starts on, or the line it inserts after
+                first_line = (hunk.old_start if hunk.old_len else hunk.old_start + 1) + line_shift + lead
+                expected = state.offset_of(first_line)
+                if not block:
+                    if expected >= cursor:
+                        placed = (expected, expected, lines, fuzz, loose)
+                    break
+                found = _locate(state.buf, state.size, block, expected, cursor, loose)
+                if found:
+                    placed = (found[0], found[1], lines, fuzz, loose)
+                    break
+            if placed:
+                break
+        if placed is None:
+            result.update({"status": "failed", "reason": "context not found"})
+            results.append(result)
+            continue
+        start, end, lines, fuzz, loose = placed
+        line = state.line_of(start)
+        lead = _trimmed(hunk, fuzz)[0]
+        expected_line = (hunk.old_start if hunk.old_len else hunk.old_start + 1) + lead
+        line_shift = line - expected_line
+        cursor = end
+        result.update({"status": "applied", "line": line, "offset": line_shift, "fuzz": fuzz,
+                       "whitespace": loose, "_start": start, "_end": end, "_lines": lines,
+                       "_new_no_eol": hunk.new_no_eol})
+        results.append(result)
+    return results
+
+
+def _stream_result(state: _FileState, placed: List[Dict[str, Any]], out) -> None:
+    """Write the patched file: unchanged slices of the map, hunks rebuilt in between"""
+    buf, size, eol = state.buf, state.size, state.eol
+    cursor = 0
+    missing_eol = False
+    for r in placed:
+        if r["_start"] > cursor:
+            out.write(buf[cursor:r["_start"]])
+            missing_eol = False
+        pos = r["_start"]
+        lines = r["_lines"]
+        last_new = max((k for k, (tag, _) in enumerate(lines) if tag in ' +'), default=-1)
+        for k, (tag, text) in enumerate(lines):
+            if tag == '-':
+                pos = _line_end(buf, pos, size)[1]
+                continue
+            if missing_eol:
+                out.write(eol)
+            if tag == ' ':
+                nxt = _line_end(buf, pos, size)[1]
+                out.write(buf[pos:nxt])
+                missing_eol = not buf[pos:nxt].endswith(b"\n")
+                pos = nxt
+            else:
+                out.write(text)
+                no_eol = k == last_new and r["_new_no_eol"] and r["_end"] >= size
+                missing_eol = no_eol
+                if not no_eol:
+                    out.write(eol)
+        cursor = r["_end"]
+    if cursor < size:
+        if missing_eol:
+            out.write(eol)
+        out.write(buf[cursor:])
+
+
+def _backup_path(path: Path, suffix: str) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.{suffix}")
+
+
+def apply_patches(
+    patches: List[FilePatch],
+    root: Path = Path("."),
+    target: Optional[Path] = None,
+    strip: Optional[int] = None,
+    fuzz: int = DEFAULT_FUZZ,
+    dry_run: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Apply every FilePatch, all or nothing. Returns per-file results
+    ({file, action, hunks: [...]}); raises PatchError if any hunk fails.
+    target overrides the path of a single-file patch.
+    """
+    if target is not None and len(patches) > 1:
+        raise PatchError("--file given but the patch touches several files")
+    strip = _auto_strip(patches) if strip is None else strip
+
+    staged: List[Tuple[Path, Optional[Path], str, Optional[Tuple[int, int]]]] = []  # (path, tmp, action, fingerprint)
+    results: List[Dict[str, Any]] = []
+    failed: List[str] = []
+    made_dirs: List[Path] = []  # created for new files; removed again on failure
+    try:
+        for patch in patches:
+            old = _strip_prefix(patch.old_path, strip)
+            new = _strip_prefix(patch.new_path, strip)
+            if target is not None:
+                path = target
+            elif new or old:
+                path = _under_root(root, new or old)
+            else:
+                raise PatchError("Patch has no file headers; pass --file")
+            creating = patch.old_path is None and patch.new_path is not None
+            deleting = patch.new_path is None and patch.old_path is not None
+            action = "created" if creating else "deleted" if deleting else "modified"
+
+            state = _FileState(path, creating)
+            try:
+                hunks = _place_hunks(state, patch.hunks, fuzz)
+                bad = [h for h in hunks if h["status"] != "applied"]
+                failed.extend(f"{path} hunk {h['hunk']} ({h['header']}): {h['reason']}" for h in bad)
+                tmp = None
+                if not bad and not dry_run:
+                    tmp = _backup_path(path, "tmp")
+                    missing = [d for d in [path.parent, *path.parent.parents] if not d.exists()]
+                    for directory in reversed(missing):
+                        directory.mkdir()
+                        made_dirs.append(directory)
+                    try:
+                        with open(tmp, 'wb') as out:
+                            _stream_result(state, hunks, out)
+                        os.chmod(tmp, state.mode)
+                    except BaseException:
+                        tmp.unlink(missing_ok=True)
+                        raise
+                    if deleting and tmp.stat().st_size:
+                        tmp.unlink()
+                        failed.append(f"{path}: patch deletes the file but content would remain")
+                        tmp = None
+                staged.append((path, tmp, action, state.fingerprint))
+            finally:
+                state.close()
+            results.append({
+                "file": str(path),
+                "action": action,
+                "hunks": [{k: v for k, v in h.items() if not k.startswith("_")} for h in hunks],
+            })
+
+        if failed:
+            total = sum(len(r["hunks"]) for r in results)
+            raise PatchError(f"{len(failed)} of {total} hunks failed, nothing written: " + "; ".join(failed), results)
+        if not dry_run:
+            _commit(staged)
+    except BaseException:
+        for _, tmp, _, _ in staged:
+            if tmp is not None and tmp.exists():
+                tmp.unlink()
+        for directory in reversed(made_dirs):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+        raise
+    return results
+
+
+def _commit(staged: List[Tuple[Path, Optional[Path], str, Optional[Tuple[int, int]]]]) -> None:
+    """Swap staged files in; on failure put every original back"""
+    for path, _, _, fingerprint in staged:
+        try:
+            st = path.stat()
+            current = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            current = None
+        if current != fingerprint:
+            raise PatchError(f"{path}: modified while the patch was being applied")
+
+    done: List[Tuple[Path, Optional[Path]]] = []  # (path, backup or None if newly created)
+    try:
+        for path, tmp, action, fingerprint in staged:
+            backup = None
+            if fingerprint is not None:
+                backup = _backup_path(path, "orig")
+                try:
+                    os.link(path, backup)
+                except OSError:
+                    shutil.copy2(path, backup)
+            done.append((path, backup))
+            if action == "deleted":
+                os.unlink(path)
+                os.unlink(tmp)
+            else:
+                os.replace(tmp, path)
+    except OSError as e:
+        for path, backup in reversed(done):
+            try:
+                if backup is not None:
+                    os.replace(backup, path)
+                elif path.exists():
+                    path.unlink()
+            except OSError:
+                pass
+        raise PatchError(f"Could not write {getattr(e, 'filename', None) or 'patch'}: {e}; originals restored")
+    for _, backup in done:
+        if backup is not None:
+            backup.unlink()
@@ -0,0 +1,143 @@
+"""
+Dimension reduction for stored embeddings: PCA and Matryoshka truncation.
+
+Architecture:
+- A projection is a list of stages applied in order; each stage maps
+  source-dimension vectors to target-dimension ones as x @ components -
+  offset, optionally followed by L2 normalisation:
+  - truncate: keep the first target dimensions and re-normalise, which is
+    what text-embedding-3's `dimensions` parameter does server-side
+    (Matryoshka representation learning front-loads the information)
+  - pca: centre on the sample mean and keep the top principal components,
+    which preserves distances as well as a linear map of that size can
+- Stages live in the store's SQLite database (store_projection), so they
+  commit in the same transaction as the re-projected rows; re-projecting an
+  already reduced index appends a stage rather than refitting, since the
+  original vectors are gone
+- Queries and new chunks embedded at the input dimension go through every
+  stage; vectors already at the index dimension (a provider asked for it
+  directly) are stored as they are only while every stage is a truncation,
+  since PCA output lives in a space no provider produces
+"""
+
+import sqlite3
+from dataclasses import dataclass
+from typing import List, Dict, Any, Sequence
+
+METHODS = ("pca", "truncate")
+# Vectors sampled to fit PCA (20000 x 1536 float32 is 120 MB)
+PCA_SAMPLE = 20000
+
+
+@dataclass
+class ProjectionStage:
+    """One linear reduction step: x @ components - offset, then optionally normalised"""
+    method: str
+    components: Any  # float32 (source, target)
+    offset: Any  # float32 (target,)
+    normalise: bool
+    retained: float = 1.0  # Fraction of the sample's variance (pca) or norm (truncate) kept
+
+    @property
+    def source(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def target(self) -> int:
+        return self.components.shape[1]
+
+    def apply(self, vectors):
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "truncate":
+            reduced = vectors[:, :self.target].copy()
+        else:
+            reduced = vectors @ self.components - self.offset
+        if self.normalise:
+            norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+            reduced /= np.where(norms > 0, norms, 1)
+        return reduced
+
+
+def truncation(sample, dimension: int) -> ProjectionStage:
+    """Keep the first dimension coordinates and re-normalise"""
+    import numpy as np
+
+    source = sample.shape[1]
+    components = np.eye(source, dimension, dtype=np.float32)
+    kept = (sample[:, :dimension] ** 2).sum() / max(float((sample ** 2).sum()), 1e-12)
+    return ProjectionStage("truncate", components, np.zeros(dimension, dtype=np.float32), True, float(kept))
+
+
+def fit_pca(sample, dimension: int) -> ProjectionStage:
+    """Project onto the top dimension principal components of sample"""
+    import numpy as np
+
+    sample = np.asarray(sample, dtype=np.float32)
+    mean = sample.mean(axis=0, dtype=np.float64)
+    centred = sample - mean.astype(np.float32)
+    covariance = (centred.T @ centred).astype(np.float64) / max(len(sample) - 1, 1)
+    values, vectors = np.linalg.eigh(covariance)
+    top = np.argsort(values)[::-1][:dimension]
+    components = vectors[:, top].astype(np.float32)
+    retained = float(values[top].sum() / max(values.sum(), 1e-12))
+    return ProjectionStage("pca", components, (mean @ vectors[:, top]).astype(np.float32), False, retained)
+
+
+def fit(method: str, sample, dimension: int) -> ProjectionStage:
+    if method not in METHODS:
+        raise ValueError(f"Unknown reduction: {method} (expected one of {', '.join(METHODS)})")
+    if not 0 < dimension < sample.shape[1]:
+        raise ValueError(f"target dimension must be between 1 and {sample.shape[1] - 1}, got {dimension}")
+    if method == "pca" and len(sample) < 2:
+        raise ValueError("pca needs at least two stored vectors")
+    return fit_pca(sample, dimension) if method == "pca" else truncation(sample, dimension)
+
+
+def init_db(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS store_projection (
+            stage INTEGER PRIMARY KEY,
+            method TEXT NOT NULL,
+            source INTEGER NOT NULL,
+            target INTEGER NOT NULL,
+            components BLOB NOT NULL,
+            bias BLOB NOT NULL,
+            normalise INTEGER NOT NULL,
+            retained REAL NOT NULL
+        )
+    """)
+
+
+def load_stages(conn: sqlite3.Connection) -> List[ProjectionStage]:
+    import numpy as np
+
+    return [
+        ProjectionStage(method, np.frombuffer(components, dtype="<f4").reshape(source, target),
+                        np.frombuffer(bias, dtype="<f4"), bool(normalise), retained)
+        for method, source, target, components, bias, normalise, retained in conn.execute("""
+            SELECT method, source, target, components, bias, normalise, retained
+            FROM store_projection ORDER BY stage
+        """)
+    ]
+
+
+def add_stage(conn: sqlite3.Connection, stage: ProjectionStage) -> None:
+    """Record stage after the existing ones; the caller commits"""
+    conn.execute("""
+        INSERT INTO store_projection (stage, method, source, target, components, bias, normalise, retained)
+        VALUES ((SELECT COALESCE(MAX(stage) + 1, 0) FROM store_projection), ?, ?, ?, ?, ?, ?, ?)
+    """, (stage.method, stage.source, stage.target, stage.components.astype("<f4").tobytes(),
+          stage.offset.astype("<f4").tobytes(), int(stage.normalise), stage.retained))
+
+
+def project(stages: Sequence[ProjectionStage], vectors):
+    """vectors through every stage"""
+    for stage in stages:
+        vectors = stage.apply(vectors)
+    return vectors
+
+
+def describe(stages: Sequence[ProjectionStage]) -> List[Dict[str, Any]]:
+    return [{"method": s.method, "from": s.source, "to": s.target, "retained": round(s.retained, 4)} for s in stages]
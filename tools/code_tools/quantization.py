@@ -0,0 +1,328 @@
+"""
+Compressed codes for the numpy backend's vectors: 8-bit scalar and product quantisation.
+
+Architecture:
+- A codec turns each float32 row of FlatIndex's matrix into a short uint8 code:
+  - int8: one byte per dimension, linear between the per-dimension minimum
+    and maximum of the training sample (about 4x smaller than float32), plus
+    the decoded vector's squared norm as 4 more bytes so that a distance
+    is one matrix-vector product
+  - pq: the vector is cut into M subvectors and each is replaced by the
+    number of its nearest of 256 centroids, learned by k-means per subspace
+    (M bytes per vector, 4 * dimension / M times smaller)
+- Codes live in a memory-mapped uint8 array (<db>.codes.u8), one row per
+  matrix row, grown by doubling; the codebook, its parameters, the number of
+  rows covered and the training size are saved to <db>.codes.npz (written to
+  a temporary file, then renamed)
+- Search scans the codes in blocks with asymmetric distances: the query stays
+  float32, int8 blocks are decoded on the fly and pq distances are sums from
+  a per-query M x 256 table. It returns a shortlist that the store re-ranks
+  exactly from the float32 matrix, so of the full-precision vectors only the
+  shortlisted rows are read
+- The codebook is trained on the vectors present when codes are first built
+  (a sample of at most TRAIN_SAMPLE) and retrained, re-encoding every row,
+  whenever the index has grown RETRAIN_GROWTH-fold past its training size
+  while that is still below TRAIN_SAMPLE; the store re-encodes overwritten
+  rows and rebuilds the codes after a compaction, as it does for the graph
+"""
+
+import io
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+from code_tools.vector_index import BLOCK_BYTES, MIN_CAPACITY, _blocks, _top_k
+
+
+CODECS = ("none", "int8", "pq")
+# Shortlist size as a multiple of the limit, re-ranked with full-precision vectors
+DEFAULT_RERANK = 10
+TRAIN_SAMPLE = 256 * 40
+RETRAIN_GROWTH = 4
+PQ_CENTROIDS = 256
+PQ_ITERATIONS = 12
+# Dimensions per pq subvector unless pq_m is given
+PQ_SUBVECTOR = 8
+# Rows encoded at a time (bounds the rows x centroids score matrix)
+ENCODE_ROWS = 4096
+
+
+def code_files(path: Path) -> List[Path]:
+    """The files a CodeIndex at path keeps"""
+    return [Path(f"{path}.u8"), Path(f"{path}.npz")]
+
+
+def default_pq_m(dimension: int) -> int:
+    """Most subvectors that divide dimension evenly with at least PQ_SUBVECTOR dimensions each"""
+    for m in range(max(1, dimension // PQ_SUBVECTOR), 1, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def check_pq_m(dimension: int, m: int) -> None:
+    """Raise unless m subvectors split dimension evenly"""
+    if m < 1 or dimension % m:
+        raise ValueError(f"pq_m ({m}) must divide the embedding dimension ({dimension})")
+
+
+def _nearest(points, centroids):
+    """Index of the nearest centroid for each point"""
+    scores = points @ centroids.T
+    scores *= -2
+    scores += (centroids * centroids).sum(axis=1)
+    return scores.argmin(axis=1)
+
+
+def _kmeans(points, k: int, rng):
+    """Lloyd's k-means from k sampled points; an emptied cluster is reseeded with a random point"""
+    import numpy as np
+
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(PQ_ITERATIONS):
+        assign = _nearest(points, centroids)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        for d in range(points.shape[1]):
+            sums = np.bincount(assign, weights=points[:, d], minlength=k)
+            centroids[filled, d] = sums[filled] / counts[filled]
+        if not filled.all():
+            centroids[~filled] = points[rng.choice(len(points), int((~filled).sum()))]
+    return centroids
+
+
+class ScalarCodec:
+    """8-bit scalar quantisation: one byte per dimension between the trained minimum and maximum"""
+
+    kind = "int8"
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        # The bytes of each dimension, then the decoded squared norm as float32
+        self.code_size = dimension + 4
+        self.low = None
+        self.step = None
+
+    def train(self, sample, rng) -> None:
+        import numpy as np
+
+        self.low = sample.min(axis=0).astype(np.float32)
+        self.step = ((sample.max(axis=0) - self.low) / 255).astype(np.float32)
+        # A constant dimension encodes as 0 and decodes to its value
+        self.step[self.step == 0] = 1.0
+
+    def encode(self, vectors):
+        import numpy as np
+
+        codes = np.empty((len(vectors), self.code_size), dtype=np.uint8)
+        codes[:, :self.dimension] = np.clip(np.rint((vectors - self.low) / self.step), 0, 255)
+        decoded = self.decode(codes)
+        codes[:, self.dimension:] = np.einsum("ij,ij->i", decoded, decoded).astype("<f4")[:, None].view(np.uint8)
+        return codes
+
+    def decode(self, codes):
+        return codes[:, :self.dimension] * self.step + self.low
+
+    def distance(self, query):
+        """Approximate squared L2 distance from query to each row of a block of codes"""
+        import numpy as np
+
+        # |c * step + low - q|^2 = |decoded|^2 - 2 (c . (step * q) + low . q) + |q|^2
+        scaled = self.step * query
+        offset = float(query @ query) - 2 * float(self.low @ query)
+
+        def distances(codes):
+            norms = np.ascontiguousarray(codes[:, self.dimension:]).view("<f4")[:, 0]
+            return norms - 2 * (codes[:, :self.dimension].astype(np.float32) @ scaled) + offset
+        return distances
+
+    def state(self) -> Dict[str, Any]:
+        return {"low": self.low, "step": self.step}
+
+    def load(self, saved: Any) -> None:
+        self.low = saved["low"].copy()
+        self.step = saved["step"].copy()
+
+
+class ProductCodec:
+    """Product quantisation: M subvectors, each coded as its nearest of up to 256 centroids"""
+
+    kind = "pq"
+
+    def __init__(self, dimension: int, m: int):
+        check_pq_m(dimension, m)
+        self.dimension = dimension
+        self.m = m
+        self.sub = dimension // m
+        self.code_size = m
+        self.centroids = None  # (m, k, sub)
+
+    def train(self, sample, rng) -> None:
+        import numpy as np
+
+        k = min(PQ_CENTROIDS, len(sample))
+        parts = sample.reshape(len(sample), self.m, self.sub)
+        self.centroids = np.stack([_kmeans(np.ascontiguousarray(parts[:, j]), k, rng) for j in range(self.m)])
+
+    def encode(self, vectors):
+        import numpy as np
+
+        parts = vectors.reshape(len(vectors), self.m, self.sub)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(parts[:, j], self.centroids[j])
+        return codes
+
+    def decode(self, codes):
+        import numpy as np
+
+        return self.centroids[np.arange(self.m), codes].reshape(len(codes), self.dimension)
+
+    def distance(self, query):
+        """Approximate squared L2 distance from query to each row of a block of codes"""
+        import numpy as np
+
+        diff = self.centroids - query.reshape(self.m, 1, self.sub)
+        table = (diff * diff).sum(axis=2)
+        flat = table.ravel()
+        offsets = np.arange(self.m) * table.shape[1]
+
+        def distances(codes):
+            return flat[codes + offsets].sum(axis=1)
+        return distances
+
+    def state(self) -> Dict[str, Any]:
+        return {"centroids": self.centroids}
+
+    def load(self, saved: Any) -> None:
+        self.centroids = saved["centroids"].copy()
+
+
+class CodeIndex:
+    """Quantised codes for the rows of the numpy backend's matrix"""
+
+    def __init__(self, path: Path, kind: str, dimension: int, pq_m: Optional[int] = None, seed: int = 0):
+        if kind not in CODECS[1:]:
+            raise ValueError(f"Unknown quantization: {kind} (expected one of {', '.join(CODECS)})")
+        self.codes_path, self.meta_path = code_files(path)
+        self.seed = seed
+        self._mmap = None
+        self._configure(kind, dimension, pq_m)
+        # Codes saved with other parameters are rebuilt, not reused
+        if self.meta_path.exists() and not self._load():
+            self.reset()
+
+    def _configure(self, kind: str, dimension: int, pq_m: Optional[int]) -> None:
+        self.kind = kind
+        self.dimension = dimension
+        self.pq_m = (pq_m or default_pq_m(dimension)) if kind == "pq" else None
+        self.codec = ProductCodec(dimension, self.pq_m) if kind == "pq" else ScalarCodec(dimension)
+        self.count = 0
+        self.trained_on = 0
+
+    def _load(self) -> bool:
+        import numpy as np
+
+        with np.load(self.meta_path) as saved:
+            if (str(saved["kind"]), int(saved["dimension"]), int(saved["pq_m"]) or None) != (
+                    self.kind, self.dimension, self.pq_m):
+                return False
+            self.count = int(saved["count"])
+            self.trained_on = int(saved["trained_on"])
+            if self.trained_on:
+                self.codec.load(saved)
+        return True
+
+    def _open(self, rows: int):
+        """Map the codes with room for at least rows vectors"""
+        import numpy as np
+
+        itemsize = self.codec.code_size
+        size = self.codes_path.stat().st_size if self.codes_path.exists() else 0
+        capacity = size // itemsize
+        if capacity < rows:
+            capacity = max(MIN_CAPACITY, capacity * 2, rows)
+            with open(self.codes_path, "ab") as f:
+                f.truncate(capacity * itemsize)
+            self._mmap = None
+        if self._mmap is None and capacity:
+            self._mmap = np.memmap(self.codes_path, dtype=np.uint8, mode="r+", shape=(capacity, itemsize))
+        return self._mmap
+
+    def needs_training(self, count: int) -> bool:
+        """Whether the codebook should be (re)trained for an index of count rows"""
+        return count > 0 and self.trained_on * RETRAIN_GROWTH <= min(count, TRAIN_SAMPLE)
+
+    def add(self, matrix, rows: Iterable[int]) -> None:
+        """Encode matrix rows (new or overwritten), training the codebook first if it has none"""
+        import numpy as np
+
+        rows = np.fromiter(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        if not self.trained_on:
+            rng = np.random.default_rng(self.seed)
+            sample = np.sort(rng.choice(len(matrix), min(len(matrix), TRAIN_SAMPLE), replace=False))
+            self.codec.train(np.asarray(matrix[sample], dtype=np.float32), rng)
+            self.trained_on = len(sample)
+        codes = self._open(int(rows.max()) + 1)
+        for start in range(0, len(rows), ENCODE_ROWS):
+            part = rows[start:start + ENCODE_ROWS]
+            codes[part] = self.codec.encode(np.asarray(matrix[part], dtype=np.float32))
+        self.count = max(self.count, int(rows.max()) + 1)
+
+    def search(self, query, k: int, mask) -> List[Any]:
+        """(row, approximate squared L2 distance) of the k nearest rows mask selects, nearest first"""
+        import numpy as np
+
+        q = np.asarray(query, dtype=np.float32)
+        if q.shape != (self.dimension,):
+            raise ValueError(f"query dimension {q.size} does not match the index ({self.dimension})")
+        if k <= 0 or not self.count or not mask[:self.count].any():
+            return []
+        # Decoded blocks are rows x code_size float32 (pq: int64 table offsets)
+        block = max(1, BLOCK_BYTES // (self.codec.code_size * 8))
+        codes = np.asarray(self._open(self.count))
+        return _top_k(q, k, _blocks(codes, mask[:self.count], block), self.codec.distance(q))
+
+    def save(self) -> None:
+        """Flush the codes and atomically rewrite the codebook"""
+        import numpy as np
+
+        if self._mmap is not None:
+            self._mmap.flush()
+        arrays: Dict[str, Any] = {
+            "kind": self.kind, "dimension": self.dimension, "pq_m": self.pq_m or 0,
+            "count": self.count, "trained_on": self.trained_on,
+        }
+        if self.trained_on:
+            arrays.update(self.codec.state())
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        tmp = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        tmp.write_bytes(buf.getvalue())
+        os.replace(tmp, self.meta_path)
+
+    def reset(self) -> None:
+        """Drop the codes and the codebook (before retraining and re-encoding)"""
+        self.close()
+        self.codes_path.unlink(missing_ok=True)
+        self._configure(self.kind, self.dimension, self.pq_m)
+
+    def stats(self) -> Dict[str, Any]:
+        size = self.codes_path.stat().st_size if self.codes_path.exists() else 0
+        stats = {
+            "codec": self.kind,
+            "code_bytes": self.codec.code_size,
+            "compression": round(self.dimension * 4 / self.codec.code_size, 1),
+            "trained_on": self.trained_on,
+            "codes_mb": round(size / 1024 / 1024, 2),
+        }
+        if self.kind == "pq":
+            stats["pq_m"] = self.pq_m
+        return stats
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap = None
@@ -0,0 +1,236 @@
+"""
+Multi-file, single-pass search/replace engine for search_replace.
+
+Architecture:
+- A plan lists files and their replacements ({original_text, new_text,
+  replace_all}); entries naming the same file are merged
+- Each file is read once as bytes (line endings and encoding untouched)
+  and every original is located in one scan with
+  literal_search.MultiLiteral, overlapping occurrences included
+- Everything is validated before anything is written: each original must
+  be found, be unique unless replace_all, and no two selected matches may
+  overlap. Originals are matched against the file as read, so one
+  replacement never sees another's output
+- Each file is rebuilt once by joining slices of the original with the
+  new texts
+- Files are matched and rebuilt on a thread pool; new contents are then
+  all staged as temp files before any is swapped in with os.replace. If a file changed
+  since it was read, or any write fails, files already swapped are
+  restored from their original bytes
+"""
+
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from code_tools.literal_search import MultiLiteral
+
+
+SUMMARY_CHARS = 80
+
+
+class ReplaceError(Exception):
+    """One or more files failed; errors are (file, message) pairs"""
+
+    def __init__(self, errors: List[Tuple[str, str]]):
+        self.errors = errors
+        super().__init__("; ".join(f"{path}: {msg}" for path, msg in errors))
+
+
+@dataclass
+class FilePlan:
+    """Replacements requested for one file"""
+    path: Path
+    replacements: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class FileEdit:
+    """A validated, rebuilt file waiting to be committed"""
+    path: Path
+    original: bytes
+    content: bytes
+    mtime_ns: int
+    size: int
+    mode: int
+    applied: List[Dict[str, Any]]
+
+
+def check_replacement(r: Any) -> Optional[str]:
+    """Error message for a malformed replacement, else None"""
+    if not isinstance(r, dict):
+        return "replacement must be an object"
+    orig = r.get("original_text")
+    new = r.get("new_text")
+    if orig is None or new is None:
+        return "replacement missing original_text/new_text"
+    if not isinstance(orig, str) or not isinstance(new, str):
+        return "original_text/new_text must be strings"
+    if orig == new:
+        return "original_text and new_text identical"
+    if not orig:
+        return "original_text must not be empty"
+    return None
+
+
+def load_plan(data: Any) -> List[FilePlan]:
+    """
+    Parse [{"file", "replacements"}, ...] (or {"files": [...]}) into
+    FilePlans, merging repeated files. Raises ValueError.
+    """
+    if isinstance(data, dict):
+        data = data.get("files")
+    if not isinstance(data, list):
+        raise ValueError("plan must be a list of {file, replacements}")
+    plans: Dict[str, FilePlan] = {}
+    for entry in data:
+        if not isinstance(entry, dict) or not isinstance(entry.get("file"), str):
+            raise ValueError("plan entry missing file")
+        reps = entry.get("replacements")
+        if not isinstance(reps, list):
+            raise ValueError(f"{entry['file']}: replacements must be a list")
+        key = os.path.abspath(entry["file"])
+        plans.setdefault(key, FilePlan(Path(entry["file"]))).replacements.extend(reps)
+    return list(plans.values())
+
+
+def _line_of(buf: bytes, pos: int) -> int:
+    return buf.count(b"\n", 0, pos) + 1
+
+
+def plan_file(plan: FilePlan) -> FileEdit:
+    """Read, match and rebuild one file; raises ValueError with the first problem found"""
+    reps = plan.replacements
+    for r in reps:
+        problem = check_replacement(r)
+        if problem:
+            raise ValueError(problem)
+    if not reps:
+        raise ValueError("no replacements")
+    try:
+        with open(plan.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            buf = f.read()
+    except FileNotFoundError:
+        raise ValueError(f"File not found: {plan.path}")
+    except OSError as e:
+        raise ValueError(f"Cannot read {plan.path}: {e}")
+
+    matcher = MultiLiteral([r["original_text"] for r in reps])
+    starts: Dict[int, List[int]] = {}
+    for start, idx in matcher.occurrences(buf):
+        starts.setdefault(idx, []).append(start)
+
+    spans: List[Tuple[int, int, int]] = []  # (start, end, replacement index)
+    applied = []
+    for i, r in enumerate(reps):
+        orig = r["original_text"]
+        idx = matcher.literals.index(orig)
+        encoded = matcher.encoded[idx]
+        # Non-overlapping occurrences, left to right (what str.count counts)
+        selected = []
+        last_end = 0
+        for start in sorted(starts.get(idx, [])):
+            if start >= last_end:
+                selected.append(start)
+                last_end = start + len(encoded)
+        if not selected:
+            raise ValueError(f"original_text not found: {orig[:SUMMARY_CHARS]}")
+        if not r.get("replace_all", False) and len(selected) != 1:
+            raise ValueError(f"original_text not unique (count={len(selected)})")
+        spans.extend((start, start + len(encoded), i) for start in selected)
+        applied.append({
+            "original_text": orig[:SUMMARY_CHARS],
+            "new_text": r["new_text"][:SUMMARY_CHARS],
+            "count": len(selected),
+        })
+
+    spans.sort()
+    for (a_start, a_end, a), (b_start, _, b) in zip(spans, spans[1:]):
+        if b_start < a_end:
+            raise ValueError(
+                f"replacements overlap at line {_line_of(buf, b_start)}: "
+                f"{reps[a]['original_text'][:SUMMARY_CHARS]!r} and {reps[b]['original_text'][:SUMMARY_CHARS]!r}"
+            )
+
+    parts = []
+    pos = 0
+    for start, end, i in spans:
+        parts.append(buf[pos:start])
+        parts.append(reps[i]["new_text"].encode('utf-8'))
+        pos = end
+    parts.append(buf[pos:])
+    return FileEdit(plan.path, buf, b"".join(parts), st.st_mtime_ns, st.st_size,
+                    stat.S_IMODE(st.st_mode), applied)
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _write_tmp(path: Path, content: bytes, mode: int) -> Path:
+    tmp = _tmp_path(path)
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.chmod(tmp, mode)
+    return tmp
+
+
+def commit(edits: List[FileEdit]) -> None:
+    """Swap all rebuilt files in, or restore every file already swapped and raise ReplaceError"""
+    changed = []
+    for e in edits:
+        try:
+            st = os.stat(e.path)
+        except OSError:
+            st = None
+        if st is None or (st.st_mtime_ns, st.st_size) != (e.mtime_ns, e.size):
+            changed.append((str(e.path), "modified while search_replace was running"))
+    if changed:
+        raise ReplaceError(changed)
+
+    staged: List[Path] = []
+    swapped = 0
+    try:
+        for e in edits:
+            staged.append(_write_tmp(e.path, e.content, e.mode))
+        for e, tmp in zip(edits, staged):
+            os.replace(tmp, e.path)
+            swapped += 1
+    except OSError as error:
+        for tmp in staged[swapped:]:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+        failed = [(getattr(error, "filename", None) or "commit", str(error))]
+        for e in edits[:swapped]:
+            try:
+                os.replace(_write_tmp(e.path, e.original, e.mode), e.path)
+            except OSError as restore_error:
+                failed.append((str(e.path), f"could not restore original: {restore_error}"))
+        raise ReplaceError(failed)
+
+
+def apply_plan(plans: List[FilePlan], workers: Optional[int] = None, dry_run: bool = False) -> List[FileEdit]:
+    """Validate and rebuild every file in parallel, then commit them all (unless dry_run)"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(_try_plan_file, plans))
+        errors = [(str(plan.path), outcome) for plan, outcome in zip(plans, outcomes) if isinstance(outcome, str)]
+        if errors:
+            raise ReplaceError(errors)
+        edits: List[FileEdit] = outcomes  # type: ignore[assignment]
+        if not dry_run:
+            commit([e for e in edits if e.content != e.original])
+    return edits
+
+
+def _try_plan_file(plan: FilePlan) -> Any:
+    try:
+        return plan_file(plan)
+    except ValueError as e:
+        return str(e)
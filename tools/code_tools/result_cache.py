@@ -0,0 +1,156 @@
+"""
+Opt-in memoisation of read-only command results (--memo).
+
+Architecture:
+- While a memoisable command runs, the code that reads the filesystem
+  (walker, grep_engine, read_file, memory_index) calls note(path) for
+  every directory it lists and file it reads or reports; outside a
+  recording, note() is a context-variable lookup
+- A result is stored under a hash of the command's normalised arguments
+  and working directory, with the (mtime_ns, size) fingerprint of each
+  noted path (None for paths that did not exist)
+- Lookup re-stats the noted paths: any difference drops the entry. Results
+  touching a path modified within RACY_NS are not stored, since a change
+  in the same mtime tick would go unnoticed
+- Paths inside the cache's own directory are never fingerprinted, so
+  writing the cache does not invalidate it
+- Entries live in SQLite; hits refresh last_used, and the least recently
+  used entries are evicted once the stored results exceed max_bytes
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
+
+
+DB_FILENAME = "results.db"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+RACY_NS = 1_000_000_000
+
+_touched: "contextvars.ContextVar[Optional[Set[str]]]" = contextvars.ContextVar("touched", default=None)
+
+
+def note(path: Any) -> None:
+    """Record that the running command's result depends on path's state"""
+    touched = _touched.get()
+    if touched is not None:
+        touched.add(os.fspath(path))
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[Set[str]]:
+    """Collect the paths noted by the code run inside the block"""
+    touched: Set[str] = set()
+    token = _touched.set(touched)
+    try:
+        yield touched
+    finally:
+        _touched.reset(token)
+
+
+def fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def command_key(command: str, arguments: Dict[str, Any]) -> str:
+    """Stable key for a command invocation from the current directory"""
+    import hashlib
+
+    payload = json.dumps([command, os.getcwd(), arguments], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU, size-bounded store of command results validated by file fingerprints"""
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        import sqlite3
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+        self._own = os.path.abspath(directory)
+        self._conn = sqlite3.connect(str(directory / DB_FILENAME), timeout=30, check_same_thread=False)
+        # A cache: losing the last writes on power failure is harmless, an fsync per hit is not
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize database schema"""
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                deps TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Stored result if every dependency is unchanged, else None (and the entry is dropped)"""
+        row = self._conn.execute("SELECT result, deps FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        for path, mtime_ns, size in json.loads(row[1]):
+            current = fingerprint(path)
+            if (current is None and mtime_ns is not None) or (current is not None and list(current) != [mtime_ns, size]):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Any, touched: Set[str]) -> bool:
+        """Store result with the current fingerprints of touched; False if a path is too fresh to trust"""
+        now_ns = time.time_ns()
+        deps: List[List[Any]] = []
+        for path in sorted(touched):
+            absolute = os.path.abspath(path)
+            if absolute == self._own or absolute.startswith(self._own + os.sep):
+                continue
+            current = fingerprint(path)
+            if current is not None and now_ns - current[0] < RACY_NS:
+                return False
+            deps.append([path, *(current or (None, None))])
+        encoded = json.dumps(result, ensure_ascii=False)
+        size = len(encoded) + sum(len(d[0]) for d in deps)
+        if size > self.max_bytes:
+            return False
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, result, deps, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, encoded, json.dumps(deps), size, time.time())
+        )
+        self._evict()
+        self._conn.commit()
+        return True
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        self._conn.close()
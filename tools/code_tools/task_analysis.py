@@ -0,0 +1,426 @@
+"""
+Dependency analytics for task manifests.
+
+Builds the task dependency graph of a feature manifest and derives:
+- Cycles (Tarjan SCC, linear time)
+- Transitive reduction (redundant dependency edges)
+- Critical path with earliest/latest start and slack per task
+- Makespan simulation for k parallel agents (list scheduling)
+
+Results are cached next to the manifest, keyed by manifest content hash,
+so repeated planning calls on an unchanged manifest are instant.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+
+CACHE_FILENAME = ".analysis-cache.json"
+CACHE_MAX_ENTRIES = 16
+CACHE_VERSION = 1
+
+# Manifest fields consulted (in order) for a task's duration
+DURATION_FIELDS = ("duration", "estimate_hours", "estimatedHours", "estimate", "effort")
+
+
+def task_duration(task: Dict[str, Any], default: float = 1.0) -> float:
+    """Duration of a task from the first numeric estimate field, else default"""
+    for field_name in DURATION_FIELDS:
+        value = task.get(field_name)
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)) and value >= 0:
+            return float(value)
+        if isinstance(value, str):
+            try:
+                parsed = float(value)
+            except ValueError:
+                continue
+            if parsed >= 0:
+                return parsed
+    return default
+
+
+def build_graph(tasks: List[Dict[str, Any]]) -> Tuple[List[str], List[List[int]], List[Dict[str, str]]]:
+    """
+    Build an index-based dependency graph.
+
+    Returns (ids, deps, missing) where deps[i] lists indexes of the tasks
+    task i depends on, and missing lists references to unknown task ids.
+    """
+    ids = [str(t.get("id")) for t in tasks]
+    index = {tid: i for i, tid in enumerate(ids)}
+    deps: List[List[int]] = []
+    missing: List[Dict[str, str]] = []
+    for tid, task in zip(ids, tasks):
+        seen = set()
+        row = []
+        for dep in task.get("dependencies", []) or []:
+            dep = str(dep)
+            j = index.get(dep)
+            if j is None:
+                missing.append({"task": tid, "dependency": dep})
+                continue
+            if j not in seen:
+                seen.add(j)
+                row.append(j)
+        deps.append(row)
+    return ids, deps, missing
+
+
+def strongly_connected_components(deps: List[List[int]]) -> List[List[int]]:
+    """Tarjan's SCC algorithm (iterative, O(V + E))"""
+    n = len(deps)
+    index_of = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in range(n):
+        if index_of[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, pos = work.pop()
+            if pos == 0:
+                index_of[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            recurse = False
+            edges = deps[v]
+            while pos < len(edges):
+                w = edges[pos]
+                pos += 1
+                if index_of[w] == -1:
+                    work.append((v, pos))
+                    work.append((w, 0))
+                    recurse = True
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index_of[w])
+            if recurse:
+                continue
+            if low[v] == index_of[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+    return components
+
+
+def find_cycles(deps: List[List[int]]) -> List[List[int]]:
+    """Return SCCs that form cycles (size > 1, or a self-dependency)"""
+    cycles = []
+    for component in strongly_connected_components(deps):
+        if len(component) > 1 or component[0] in deps[component[0]]:
+            cycles.append(sorted(component))
+    return cycles
+
+
+def topological_order(deps: List[List[int]]) -> List[int]:
+    """Kahn's algorithm; dependencies come before dependents (graph must be acyclic)"""
+    n = len(deps)
+    dependents: List[List[int]] = [[] for _ in range(n)]
+    indegree = [0] * n
+    for v, row in enumerate(deps):
+        indegree[v] = len(row)
+        for u in row:
+            dependents[u].append(v)
+    ready = [v for v in range(n) if indegree[v] == 0]
+    order = []
+    while ready:
+        u = ready.pop()
+        order.append(u)
+        for v in dependents[u]:
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                ready.append(v)
+    return order
+
+
+def transitive_reduction(deps: List[List[int]], order: List[int]) -> List[Tuple[int, int]]:
+    """
+    Find redundant edges of a DAG.
+
+    Ancestor sets are kept as integer bitsets, so the pass is O(V * E / wordsize).
+    Returns (task, dependency) pairs implied by another dependency path.
+    """
+    ancestors = [0] * len(deps)
+    redundant = []
+    for v in order:
+        # Ancestors reachable through each direct dependency
+        via: Dict[int, int] = {u: ancestors[u] for u in deps[v]}
+        union = 0
+        for bits in via.values():
+            union |= bits
+        for u in deps[v]:
+            if union >> u & 1:
+                redundant.append((v, u))
+        acc = union
+        for u in deps[v]:
+            acc |= 1 << u
+        ancestors[v] = acc
+    return redundant
+
+
+def critical_path(
+    deps: List[List[int]],
+    order: List[int],
+    durations: List[float]
+) -> Dict[str, Any]:
+    """Forward/backward pass: earliest/latest start, slack and one critical path"""
+    n = len(deps)
+    dependents: List[List[int]] = [[] for _ in range(n)]
+    for v, row in enumerate(deps):
+        for u in row:
+            dependents[u].append(v)
+
+    earliest_start = [0.0] * n
+    for v in order:
+        earliest_start[v] = max((earliest_start[u] + durations[u] for u in deps[v]), default=0.0)
+    finish = [earliest_start[v] + durations[v] for v in range(n)]
+    length = max(finish, default=0.0)
+
+    latest_finish = [length] * n
+    for u in reversed(order):
+        if dependents[u]:
+            latest_finish[u] = min(latest_finish[v] - durations[v] for v in dependents[u])
+    latest_start = [latest_finish[v] - durations[v] for v in range(n)]
+    slack = [round(latest_start[v] - earliest_start[v], 9) for v in range(n)]
+
+    # Walk back from the last-finishing task along zero-slack dependencies
+    path: List[int] = []
+    if n:
+        v = max(range(n), key=lambda i: (finish[i], -i))
+        while True:
+            path.append(v)
+            preds = [u for u in deps[v] if abs(finish[u] - earliest_start[v]) < 1e-9]
+            if not preds:
+                break
+            v = min(preds)
+        path.reverse()
+
+    return {
+        "length": length,
+        "path": path,
+        "earliest_start": earliest_start,
+        "latest_start": latest_start,
+        "slack": slack,
+    }
+
+
+def simulate_makespan(
+    deps: List[List[int]],
+    order: List[int],
+    durations: List[float],
+    agents: int
+) -> Dict[str, Any]:
+    """
+    Event-driven list scheduling on k agents.
+
+    Ready tasks are prioritised by bottom level (longest remaining path),
+    the classic critical-path heuristic. Returns makespan and per-task slots.
+    """
+    n = len(deps)
+    agents = max(1, agents)
+    dependents: List[List[int]] = [[] for _ in range(n)]
+    remaining = [len(row) for row in deps]
+    for v, row in enumerate(deps):
+        for u in row:
+            dependents[u].append(v)
+
+    bottom = [0.0] * n
+    for u in reversed(order):
+        bottom[u] = durations[u] + max((bottom[v] for v in dependents[u]), default=0.0)
+
+    ready = [(-bottom[v], v) for v in range(n) if remaining[v] == 0]
+    heapq.heapify(ready)
+    free_agents = list(range(agents))
+    heapq.heapify(free_agents)
+    running: List[Tuple[float, int, int]] = []  # (finish_time, task, agent)
+    schedule: List[Optional[Dict[str, Any]]] = [None] * n
+    now = 0.0
+    busy_time = 0.0
+
+    while ready or running:
+        while ready and free_agents:
+            _, v = heapq.heappop(ready)
+            agent = heapq.heappop(free_agents)
+            end = now + durations[v]
+            schedule[v] = {"start": now, "end": end, "agent": agent}
+            busy_time += durations[v]
+            heapq.heappush(running, (end, v, agent))
+        if not running:
+            break
+        now = running[0][0]
+        while running and running[0][0] <= now:
+            _, u, agent = heapq.heappop(running)
+            heapq.heappush(free_agents, agent)
+            for v in dependents[u]:
+                remaining[v] -= 1
+                if remaining[v] == 0:
+                    heapq.heappush(ready, (-bottom[v], v))
+
+    makespan = now
+    return {
+        "agents": agents,
+        "makespan": makespan,
+        "utilization": round(busy_time / (makespan * agents), 4) if makespan > 0 else 0.0,
+        "schedule": schedule,
+    }
+
+
+def analyze_tasks(
+    tasks: List[Dict[str, Any]],
+    agents: int = 1,
+    remaining_only: bool = False
+) -> Dict[str, Any]:
+    """Run the full dependency analysis over a manifest's task list"""
+    ids, deps, missing = build_graph(tasks)
+    cycles = find_cycles(deps)
+
+    result: Dict[str, Any] = {
+        "task_count": len(ids),
+        "edge_count": sum(len(row) for row in deps),
+        "missing_dependencies": missing,
+        "cycles": [[ids[v] for v in cycle] for cycle in cycles],
+        "has_cycles": bool(cycles),
+        "redundant_dependencies": [],
+        "critical_path": None,
+        "tasks": {},
+        "simulation": None,
+    }
+    if cycles:
+        # Scheduling properties are undefined on a cyclic graph
+        return result
+
+    durations = []
+    for task in tasks:
+        if remaining_only and task.get("status") == "COMPLETED":
+            durations.append(0.0)
+        else:
+            durations.append(task_duration(task))
+
+    order = topological_order(deps)
+    result["redundant_dependencies"] = [
+        {"task": ids[v], "dependency": ids[u]}
+        for v, u in transitive_reduction(deps, order)
+    ]
+
+    cp = critical_path(deps, order, durations)
+    result["critical_path"] = {
+        "length": cp["length"],
+        "tasks": [ids[v] for v in cp["path"]],
+    }
+    result["tasks"] = {
+        ids[v]: {
+            "duration": durations[v],
+            "earliest_start": cp["earliest_start"][v],
+            "latest_start": cp["latest_start"][v],
+            "slack": cp["slack"][v],
+            "critical": cp["slack"][v] == 0,
+        }
+        for v in range(len(ids))
+    }
+
+    sim = simulate_makespan(deps, order, durations, agents)
+    result["simulation"] = {
+        "agents": sim["agents"],
+        "makespan": sim["makespan"],
+        "utilization": sim["utilization"],
+        "lower_bound": max(cp["length"], sum(durations) / sim["agents"]),
+        "schedule": {
+            ids[v]: slot for v, slot in enumerate(sim["schedule"]) if slot is not None
+        },
+    }
+    return result
+
+
+def _load_cache(cache_path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def _save_cache(cache_path: Path, entries: Dict[str, Any]) -> None:
+    # Keep the newest entries only (dicts preserve insertion order)
+    if len(entries) > CACHE_MAX_ENTRIES:
+        entries = dict(list(entries.items())[-CACHE_MAX_ENTRIES:])
+    tmp = cache_path.with_suffix(cache_path.suffix + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(json.dumps({"version": CACHE_VERSION, "entries": entries}), encoding='utf-8')
+        tmp.replace(cache_path)
+    except OSError:
+        # Cache is an optimisation; read-only trees still get results
+        pass
+
+
+def analyze_manifest(
+    manifest_path: Path,
+    agents: int = 1,
+    remaining_only: bool = False,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Analyze a manifest file, reusing a cached result when its content is unchanged.
+
+    Raises ValueError on unreadable or invalid manifests.
+    """
+    try:
+        raw = manifest_path.read_bytes()
+    except OSError as e:
+        raise ValueError(f"Cannot read manifest {manifest_path}: {e}")
+    digest = hashlib.sha256(raw).hexdigest()
+    key = f"{digest}:{agents}:{int(remaining_only)}"
+
+    cache_path = manifest_path.parent / CACHE_FILENAME
+    entries = _load_cache(cache_path) if use_cache else {}
+    if key in entries:
+        result = dict(entries[key])
+        result["cached"] = True
+        return result
+
+    try:
+        data = json.loads(raw.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid JSON in {manifest_path}: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("tasks"), list):
+        raise ValueError(f"Manifest has no task list: {manifest_path}")
+
+    result = analyze_tasks(data["tasks"], agents=agents, remaining_only=remaining_only)
+    result["manifest"] = str(manifest_path)
+    result["feature_id"] = (data.get("feature") or {}).get("id")
+    result["manifest_hash"] = digest
+
+    if use_cache:
+        entries.pop(key, None)
+        entries[key] = result
+        _save_cache(cache_path, entries)
+
+    result = dict(result)
+    result["cached"] = False
+    return result
+
+
+def find_feature_manifests(tasks_dir: Path) -> List[Path]:
+    """Per-feature manifests under a .tasks directory (root manifest excluded)"""
+    return sorted(p for p in tasks_dir.glob("*/manifest.json") if p.is_file())
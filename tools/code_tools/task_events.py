@@ -0,0 +1,322 @@
+"""
+Append-only task event log with materialized manifest views.
+
+Architecture:
+- Each status transition is appended as one JSON line to
+  {feature_dir}/events.jsonl (a batch is a single append)
+- The feature manifest.json is a materialized view: it records the byte
+  offset of the last applied event under "eventLog" and readers catch up
+  by applying only the events appended since (load_manifest_view)
+- Status updates only append. manifest.json is rewritten once
+  MATERIALIZE_EVENTS events or MATERIALIZE_BYTES bytes are pending, or on
+  an explicit materialize
+- Root manifest counters follow the same scheme: between materializations
+  a writer appends the feature's new counters to .tasks/events.jsonl and
+  load_root_manifest_view applies them on read
+- Writers serialize on a per-feature lock file; manifests are replaced
+  atomically so readers never see a torn file. Root counters are recorded
+  before the feature lock is released (then under the root lock), so they
+  always come from the latest feature state
+- Replaying the whole log onto the manifest is idempotent, so a crash
+  between append and materialize is repaired by the next reader/writer
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+    _HAVE_FCNTL = True
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    _HAVE_FCNTL = False
+
+
+EVENT_LOG_FILENAME = "events.jsonl"
+LOCK_FILENAME = ".manifest.lock"
+VALID_STATUSES = ("NOT_STARTED", "IN_PROGRESS", "COMPLETED", "BLOCKED")
+# Pending events/bytes past which a status update rewrites manifest.json
+MATERIALIZE_EVENTS = 64
+MATERIALIZE_BYTES = 64 * 1024
+# Placeholders older manifests hold for started/completed
+_UNSET_TIMESTAMPS = (None, "", "null")
+
+
+class TaskEventError(ValueError):
+    """Raised for invalid status updates or unreadable manifests"""
+
+
+def now_iso() -> str:
+    """Current UTC timestamp for events and task started/completed fields"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+@contextmanager
+def file_lock(lock_path: Path) -> Iterator[None]:
+    """Exclusive advisory lock held for the duration of the block"""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as handle:
+        if _HAVE_FCNTL:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if _HAVE_FCNTL:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """Write JSON to a temp file and rename it over the target"""
+    tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with tmp.open('w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    tmp.replace(path)
+
+
+def read_events(log_path: Path, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Read complete events appended after byte offset.
+
+    Returns (events, new_offset). A trailing partial line (writer crashed
+    mid-append) is left unconsumed.
+    """
+    if not log_path.exists():
+        return [], offset
+    with log_path.open('rb') as f:
+        f.seek(offset)
+        data = f.read()
+    events = []
+    consumed = 0
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+        consumed += len(line)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            events.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            continue
+    return events, offset + consumed
+
+
+def append_events(log_path: Path, events: List[Dict[str, Any]]) -> None:
+    """Append events with a single O_APPEND write"""
+    payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events).encode('utf-8')
+    fd = os.open(str(log_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, payload)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def apply_event(manifest: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """Apply one status transition to a manifest in place (idempotent)"""
+    for task in manifest.get("tasks", []):
+        if task.get("id") == event.get("task_id"):
+            status = event.get("status")
+            task["status"] = status
+            if status == "IN_PROGRESS" and task.get("started") in _UNSET_TIMESTAMPS:
+                task["started"] = event.get("ts")
+            if status == "COMPLETED" and task.get("completed") in _UNSET_TIMESTAMPS:
+                task["completed"] = event.get("ts")
+            return
+
+
+def _load_manifest(manifest_path: Path) -> Dict[str, Any]:
+    if not manifest_path.exists():
+        raise TaskEventError(f"Task manifest not found: {manifest_path}")
+    try:
+        with manifest_path.open('r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except ValueError as e:  # JSONDecodeError and UnicodeDecodeError
+        raise TaskEventError(f"Invalid JSON: {e}")
+    if not isinstance(manifest, dict):
+        raise TaskEventError(f"Manifest is not a JSON object: {manifest_path}")
+    return manifest
+
+
+def _catch_up(manifest: Dict[str, Any], log_path: Path, replay: bool = False) -> int:
+    """Apply pending log events to manifest in memory; returns number applied"""
+    state = manifest.setdefault("eventLog", {"file": EVENT_LOG_FILENAME, "offset": 0, "count": 0})
+    start = 0 if replay else int(state.get("offset", 0))
+    if replay:
+        state["count"] = 0
+    events, new_offset = read_events(log_path, start)
+    for event in events:
+        apply_event(manifest, event)
+    state["offset"] = new_offset
+    state["count"] = int(state.get("count", 0)) + len(events)
+    return len(events)
+
+
+def load_manifest_view(manifest_path: Path) -> Dict[str, Any]:
+    """Read a feature manifest with any not-yet-materialized events applied"""
+    manifest = _load_manifest(manifest_path)
+    log_path = manifest_path.parent / EVENT_LOG_FILENAME
+    if log_path.exists():
+        _catch_up(manifest, log_path)
+    return manifest
+
+
+def load_root_manifest_view(root_manifest_path: Path) -> Dict[str, Any]:
+    """Read the root manifest with counters recorded since its last sync applied"""
+    root_manifest = _load_manifest(root_manifest_path)
+    log_path = root_manifest_path.parent / EVENT_LOG_FILENAME
+    if log_path.exists():
+        _catch_up_root(root_manifest, log_path)
+    return root_manifest
+
+
+def materialize(feature_dir: Path, replay: bool = False) -> Dict[str, Any]:
+    """Bring manifest.json up to date with the event log and sync the root manifest"""
+    manifest_path = feature_dir / "manifest.json"
+    log_path = feature_dir / EVENT_LOG_FILENAME
+    with file_lock(feature_dir / LOCK_FILENAME):
+        manifest = _load_manifest(manifest_path)
+        applied = _catch_up(manifest, log_path, replay=replay)
+        if applied or replay:
+            write_json_atomic(manifest_path, manifest)
+        # Still under the feature lock, so a later writer's counters cannot be overwritten by these
+        sync_root_manifest(manifest)
+    return {
+        "feature_dir": str(feature_dir),
+        "events_applied": applied,
+        "offset": manifest["eventLog"]["offset"],
+        "replayed": replay,
+    }
+
+
+def record_status_updates(feature_dir: Path, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Append status transitions for one feature.
+
+    manifest.json is only rewritten once enough events are pending; until
+    then readers see the updates through load_manifest_view.
+
+    updates: [{"task_id": "T01", "status": "COMPLETED"}, ...]
+    Returns one summary per update with old/new status and timestamp.
+    """
+    if not updates:
+        raise TaskEventError("No status updates given")
+    for update in updates:
+        if update.get("status") not in VALID_STATUSES:
+            raise TaskEventError(f"Invalid status: {update.get('status')}")
+        if not update.get("task_id"):
+            raise TaskEventError("Status update missing task_id")
+
+    manifest_path = feature_dir / "manifest.json"
+    log_path = feature_dir / EVENT_LOG_FILENAME
+
+    with file_lock(feature_dir / LOCK_FILENAME):
+        manifest = _load_manifest(manifest_path)
+        written = dict(manifest.get("eventLog") or {})
+        _catch_up(manifest, log_path)
+        counters = _root_counters(manifest)
+
+        statuses = {t.get("id"): t.get("status") for t in manifest.get("tasks", [])}
+        ts = now_iso()
+        events = []
+        for update in updates:
+            task_id = update["task_id"]
+            if task_id not in statuses:
+                raise TaskEventError(f"Task {task_id} not found in manifest")
+            events.append({
+                "ts": ts,
+                "task_id": task_id,
+                "old_status": statuses[task_id],
+                "status": update["status"],
+            })
+            statuses[task_id] = update["status"]
+
+        append_events(log_path, events)
+        _catch_up(manifest, log_path)
+        state = manifest["eventLog"]
+        if (state["count"] - int(written.get("count", 0)) >= MATERIALIZE_EVENTS
+                or state["offset"] - int(written.get("offset", 0)) >= MATERIALIZE_BYTES):
+            write_json_atomic(manifest_path, manifest)
+            sync_root_manifest(manifest)
+        elif _root_counters(manifest) != counters:
+            record_root_counters(manifest)
+
+    return [
+        {
+            "task_id": e["task_id"],
+            "old_status": e["old_status"],
+            "new_status": e["status"],
+            "ts": e["ts"],
+            "updated": True,
+        }
+        for e in events
+    ]
+
+
+def _root_counters(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """This feature's entry for the root manifest counters"""
+    tasks = manifest.get("tasks", [])
+    completed_count = sum(1 for t in tasks if t.get("status") == "COMPLETED")
+    if completed_count == 0:
+        status = "NOT_STARTED"
+    elif completed_count == len(tasks):
+        status = "COMPLETED"
+    else:
+        status = "IN_PROGRESS"
+    return {
+        "feature_id": manifest.get("feature", {}).get("id"),
+        "completedCount": completed_count,
+        "status": status,
+    }
+
+
+def _apply_counters(root_manifest: Dict[str, Any], counters: Dict[str, Any]) -> bool:
+    """Set one feature's counters in the root manifest; returns True if changed"""
+    for feature in root_manifest.get("features", []):
+        if feature.get("id") == counters.get("feature_id"):
+            if (feature.get("completedCount") == counters.get("completedCount")
+                    and feature.get("status") == counters.get("status")):
+                return False
+            feature["completedCount"] = counters.get("completedCount")
+            feature["status"] = counters.get("status")
+            return True
+    return False
+
+
+def _catch_up_root(root_manifest: Dict[str, Any], log_path: Path) -> bool:
+    """Apply counters recorded since the root manifest's offset; returns True if changed"""
+    state = root_manifest.setdefault("eventLog", {"file": EVENT_LOG_FILENAME, "offset": 0})
+    records, new_offset = read_events(log_path, int(state.get("offset", 0)))
+    changed = new_offset != state.get("offset")
+    for counters in records:
+        changed = _apply_counters(root_manifest, counters) or changed
+    state["offset"] = new_offset
+    return changed
+
+
+def record_root_counters(manifest: Dict[str, Any], root_manifest_path: Optional[Path] = None) -> bool:
+    """Append this feature's counters to the root event log; returns True if recorded"""
+    root_manifest_path = root_manifest_path or Path(".tasks/manifest.json")
+    if not root_manifest_path.exists():
+        return False
+    append_events(root_manifest_path.parent / EVENT_LOG_FILENAME, [_root_counters(manifest)])
+    return True
+
+
+def sync_root_manifest(manifest: Dict[str, Any], root_manifest_path: Optional[Path] = None) -> bool:
+    """Write this feature's counters (and any recorded ones) into the root manifest; returns True if written"""
+    root_manifest_path = root_manifest_path or Path(".tasks/manifest.json")
+    if not root_manifest_path.exists():
+        return False
+
+    log_path = root_manifest_path.parent / EVENT_LOG_FILENAME
+    with file_lock(root_manifest_path.parent / LOCK_FILENAME):
+        root_manifest = _load_manifest(root_manifest_path)
+        changed = _catch_up_root(root_manifest, log_path) if log_path.exists() else False
+        changed = _apply_counters(root_manifest, _root_counters(manifest)) or changed
+        if changed:
+            write_json_atomic(root_manifest_path, root_manifest)
+        return changed
@@ -0,0 +1,328 @@
+"""
+SQLite index of task manifests for cross-feature queries.
+
+Architecture:
+- One row per .tasks/**/manifest.json (feature manifests only) and one row
+  per task, stored in {tasks_dir}/.index.db
+- Refresh is incremental: files whose (mtime, size) are unchanged are
+  skipped without reading; changed files are re-parsed only if their
+  content hash differs
+- Pending (not yet materialized) task events are folded in via
+  task_events.load_manifest_view, and the event log size is part of the
+  fingerprint
+- Manifests that cannot be read as a JSON object are indexed with an error
+  and no tasks; if the index file cannot be opened or written (read-only
+  tree, corrupt file) the index is built in memory for this process only
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from code_tools.task_events import load_manifest_view, EVENT_LOG_FILENAME, TaskEventError
+
+
+INDEX_FILENAME = ".index.db"
+STATUSES = ("NOT_STARTED", "IN_PROGRESS", "COMPLETED", "BLOCKED")
+
+
+class TaskIndex:
+    """Incremental SQLite index over all feature manifests"""
+
+    def __init__(self, tasks_dir: Path, db_path: Optional[Path] = None):
+        self.tasks_dir = tasks_dir
+        self.db_path = db_path or tasks_dir / INDEX_FILENAME
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(str(self.db_path))
+            self._init_db()
+        except sqlite3.DatabaseError:  # OperationalError for a read-only tree, or a corrupt index
+            self._use_memory()
+
+    def _use_memory(self) -> None:
+        """Switch to an in-memory index (read-only tasks dir or index file)"""
+        if self._conn:
+            self._conn.close()
+        self.db_path = Path(":memory:")
+        self._conn = sqlite3.connect(":memory:")
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize database schema"""
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifests (
+                path TEXT PRIMARY KEY,
+                feature_id TEXT,
+                feature_name TEXT,
+                content_hash TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                events_size INTEGER NOT NULL,
+                error TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                manifest_path TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                task_id TEXT,
+                status TEXT,
+                name TEXT,
+                dependencies TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (manifest_path, position)
+            )
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_status
+            ON tasks(status)
+        """)
+        self._conn.commit()
+
+    def refresh(self) -> Dict[str, int]:
+        """Sync the index with manifests on disk; returns change counts"""
+        try:
+            return self._refresh()
+        except sqlite3.DatabaseError:
+            if str(self.db_path) == ":memory:":
+                raise
+            self._conn.rollback()
+            self._use_memory()
+            return self._refresh()
+
+    def _refresh(self) -> Dict[str, int]:
+        # Take the write lock before reading state so concurrent refreshes serialise
+        self._conn.execute("BEGIN IMMEDIATE")
+        known = {
+            row[0]: row[1:]
+            for row in self._conn.execute(
+                "SELECT path, mtime_ns, size, events_size, content_hash FROM manifests"
+            )
+        }
+        stats = {"scanned": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+
+        for manifest_path in sorted(self.tasks_dir.rglob("manifest.json")):
+            if manifest_path.parent == self.tasks_dir:
+                continue  # root manifest lists features, not tasks
+            key = str(manifest_path)
+            seen.add(key)
+            stats["scanned"] += 1
+            try:
+                st = manifest_path.stat()
+            except OSError:
+                continue
+            log_path = manifest_path.parent / EVENT_LOG_FILENAME
+            events_size = log_path.stat().st_size if log_path.exists() else 0
+
+            previous = known.get(key)
+            if previous and previous[:3] == (st.st_mtime_ns, st.st_size, events_size):
+                stats["unchanged"] += 1
+                continue
+
+            try:
+                raw = manifest_path.read_bytes()
+            except OSError:
+                continue
+            content_hash = hashlib.sha256(raw).hexdigest()
+            if previous and previous[3] == content_hash and previous[2] == events_size:
+                # Touched but not modified: only refresh the stat fingerprint
+                self._conn.execute(
+                    "UPDATE manifests SET mtime_ns = ?, size = ? WHERE path = ?",
+                    (st.st_mtime_ns, st.st_size, key)
+                )
+                stats["unchanged"] += 1
+                continue
+
+            self._index_manifest(manifest_path, content_hash, st, events_size)
+            stats["updated"] += 1
+
+        for key in set(known) - seen:
+            self._conn.execute("DELETE FROM manifests WHERE path = ?", (key,))
+            self._conn.execute("DELETE FROM tasks WHERE manifest_path = ?", (key,))
+            stats["removed"] += 1
+
+        self._conn.commit()
+        return stats
+
+    def _index_manifest(self, manifest_path: Path, content_hash: str, st: Any, events_size: int) -> None:
+        key = str(manifest_path)
+        self._conn.execute("DELETE FROM tasks WHERE manifest_path = ?", (key,))
+        try:
+            manifest = load_manifest_view(manifest_path)
+            error = None
+        except TaskEventError as e:
+            manifest = {}
+            error = str(e)
+        tasks = manifest.get("tasks", [])
+        if not isinstance(tasks, list):
+            tasks = []
+            error = f"Manifest has no task list: {manifest_path}"
+
+        feature = manifest.get("feature")
+        if not isinstance(feature, dict):
+            feature = {}
+        self._conn.execute("""
+            INSERT OR REPLACE INTO manifests
+            (path, feature_id, feature_name, content_hash, mtime_ns, size, events_size, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            key,
+            feature.get("id"),
+            feature.get("name"),
+            content_hash,
+            st.st_mtime_ns,
+            st.st_size,
+            events_size,
+            error
+        ))
+
+        rows = [
+            (
+                key,
+                position,
+                task.get("id"),
+                task.get("status"),
+                task.get("name") or task.get("title"),
+                json.dumps(task.get("dependencies", []) or []),
+                json.dumps(task, ensure_ascii=False),
+            )
+            for position, task in enumerate(tasks)
+            if isinstance(task, dict)
+        ]
+        self._conn.executemany("""
+            INSERT INTO tasks
+            (manifest_path, position, task_id, status, name, dependencies, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def query_tasks(
+        self,
+        status: Optional[str] = None,
+        feature_id: Optional[str] = None,
+        task_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Tasks across all features, in manifest order"""
+        where = []
+        params: List[Any] = []
+        if status:
+            where.append("t.status = ?")
+            params.append(status)
+        if feature_id:
+            where.append("m.feature_id = ?")
+            params.append(feature_id)
+        if task_id:
+            where.append("t.task_id = ?")
+            params.append(task_id)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT ?"
+            params.append(limit)
+
+        cursor = self._conn.execute(f"""
+            SELECT m.feature_id, m.path, t.data
+            FROM tasks t
+            JOIN manifests m ON m.path = t.manifest_path
+            {where_sql}
+            ORDER BY m.path, t.position
+            {limit_sql}
+        """, params)
+        return [
+            {"feature_id": row[0], "manifest": row[1], "task": json.loads(row[2])}
+            for row in cursor.fetchall()
+        ]
+
+    def feature_stats(self) -> List[Dict[str, Any]]:
+        """Per-feature status counts computed in one aggregate query"""
+        cursor = self._conn.execute("""
+            SELECT
+                m.path, m.feature_id, m.feature_name, m.error,
+                COUNT(t.position),
+                COALESCE(SUM(t.status = 'COMPLETED'), 0),
+                COALESCE(SUM(t.status = 'IN_PROGRESS'), 0),
+                COALESCE(SUM(t.status = 'BLOCKED'), 0)
+            FROM manifests m
+            LEFT JOIN tasks t ON t.manifest_path = m.path
+            GROUP BY m.path
+            ORDER BY m.path
+        """)
+        return [
+            {
+                "manifest": row[0],
+                "feature_id": row[1],
+                "feature_name": row[2],
+                "error": row[3],
+                "total_tasks": row[4],
+                "completed": row[5],
+                "in_progress": row[6],
+                "blocked": row[7],
+            }
+            for row in cursor.fetchall()
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Overall counts by status and completion ratio"""
+        by_status = dict(self._conn.execute(
+            "SELECT COALESCE(status, 'UNKNOWN'), COUNT(*) FROM tasks GROUP BY status"
+        ).fetchall())
+        total = sum(by_status.values())
+        features = self._conn.execute("SELECT COUNT(*) FROM manifests").fetchone()[0]
+        completed = by_status.get("COMPLETED", 0)
+        return {
+            "features": features,
+            "total_tasks": total,
+            "by_status": by_status,
+            "completion": round(completed / total, 4) if total else 0.0,
+        }
+
+    def close(self):
+        """Close the database connection"""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+
+def expected_feature_status(total: int, completed: int, in_progress: int, blocked: int) -> str:
+    """Root manifest status implied by a feature's task counts"""
+    status = "NOT_STARTED"
+    if completed == total and total > 0:
+        status = "COMPLETED"
+    elif completed > 0 or in_progress > 0:
+        status = "IN_PROGRESS"
+    if blocked > 0:
+        status = "BLOCKED"
+    return status
+
+
+def validate_feature(stats: Dict[str, Any], root_features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compare a feature's task counts with its root manifest entry"""
+    issues = []
+    expected_status = expected_feature_status(
+        stats["total_tasks"], stats["completed"], stats["in_progress"], stats["blocked"]
+    )
+    for feature in root_features:
+        if feature.get("id") == stats["feature_id"]:
+            if feature.get("taskCount") != stats["total_tasks"]:
+                issues.append({
+                    "type": "task_count_mismatch",
+                    "expected": stats["total_tasks"],
+                    "found": feature.get("taskCount")
+                })
+            if feature.get("completedCount") != stats["completed"]:
+                issues.append({
+                    "type": "completed_count_mismatch",
+                    "expected": stats["completed"],
+                    "found": feature.get("completedCount")
+                })
+            if feature.get("status") != expected_status:
+                issues.append({
+                    "type": "status_mismatch",
+                    "expected": expected_status,
+                    "found": feature.get("status")
+                })
+            break
+    return issues
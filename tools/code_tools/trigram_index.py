@@ -0,0 +1,350 @@
+"""
+Persistent trigram index for grep_code.
+
+Architecture:
+- SQLite database in the memory dir, one per indexed root
+- files: path (root-relative), mtime/size/hash fingerprint and the file's
+  sorted trigram set (kept so incremental updates can diff postings)
+- postings: trigram -> sorted uint32 array of file ids
+- Sorted id/trigram arrays are stored delta-encoded at the narrowest
+  integer width that fits (per-file sets, only read on update, are also
+  zlib-compressed)
+- Trigrams are 3-byte windows that do not contain a newline (matches
+  never span lines), computed with NumPy
+- refresh() walks the tree (gitignore-aware), skips files whose
+  mtime/size are unchanged, re-reads the rest and only rewrites postings
+  if the content hash changed
+- Queries are OR-of-AND groups of literals; each literal contributes all
+  its trigrams. Patterns without a usable literal return None so callers
+  fall back to scanning.
+"""
+
+import hashlib
+import os
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from code_tools.literal_search import analyze_pattern
+from code_tools.walker import walk, DEFAULT_EXCLUDE_PATTERNS, BINARY_SNIFF_BYTES
+
+
+# Files above this size are tracked but not trigram-indexed (always candidates)
+MAX_INDEXED_BYTES = 8 * 1024 * 1024
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def trigrams(data: bytes) -> np.ndarray:
+    """Sorted unique trigram codes (b0 << 16 | b1 << 8 | b2) without newlines"""
+    if len(data) < 3:
+        return _EMPTY
+    arr = np.frombuffer(data, dtype=np.uint8)
+    a, b, c = arr[:-2], arr[1:-1], arr[2:]
+    codes = (a.astype(np.uint32) << 16) | (b.astype(np.uint32) << 8) | c.astype(np.uint32)
+    keep = (a != 10) & (b != 10) & (c != 10)
+    return _sorted_unique(codes[keep])
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # Sort-based; cheaper than np.unique's hash path for these sizes
+    if not len(values):
+        return _EMPTY
+    values = np.sort(values)
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+_WIDTHS = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def _pack(values: np.ndarray) -> bytes:
+    """Sorted uint32 array -> width byte + delta encoding"""
+    deltas = values.astype(np.uint32)  # copy
+    deltas[1:] -= values[:-1]
+    top = int(deltas.max()) if len(deltas) else 0
+    width = 1 if top < 1 << 8 else 2 if top < 1 << 16 else 4
+    return bytes([width]) + deltas.astype(_WIDTHS[width]).tobytes()
+
+
+def _unpack(blob: bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(blob, dtype=_WIDTHS[blob[0]], offset=1), dtype=np.uint32)
+
+
+def trigram_query(pattern: Optional[str] = None, patterns: Optional[Sequence[str]] = None) -> Optional[List[List[str]]]:
+    """
+    Literal groups a match requires: any group, all literals within it.
+
+    Returns None when some alternative has no literal of 3+ bytes, i.e.
+    the index cannot narrow the search.
+    """
+    if patterns:
+        groups = [[p] for p in patterns if p]
+    elif pattern is not None:
+        info = analyze_pattern(pattern)
+        groups = [[run for run in info.runs if len(run.encode('utf-8')) >= 3]]
+    else:
+        return None
+    if not groups or any(not any(len(lit.encode('utf-8')) >= 3 for lit in group) for group in groups):
+        return None
+    return groups
+
+
+class TrigramIndex:
+    """Incrementally maintained trigram index over one root directory"""
+
+    def __init__(self, root: Path, index_dir: Path, use_gitignore: bool = True):
+        self.root = root.resolve()
+        self.use_gitignore = use_gitignore
+        index_dir.mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha256(f"{self.root}:{int(use_gitignore)}".encode()).hexdigest()[:12]
+        self.db_path = index_dir / f"trigram-{key}.db"
+        try:
+            # Never index our own database files
+            self._db_prefix = self.db_path.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            self._db_prefix = None
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize database schema"""
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                is_binary INTEGER NOT NULL,
+                trigrams BLOB
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                trigram INTEGER PRIMARY KEY,
+                file_ids BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('root', ?)", (str(self.root),))
+        self._conn.commit()
+
+    def refresh(self, exclude: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS) -> Dict[str, int]:
+        """Bring the index up to date with the tree; returns change counts"""
+        # Take the write lock before reading state so concurrent refreshes serialise
+        self._conn.execute("BEGIN IMMEDIATE")
+        known: Dict[str, Tuple[int, int, int, str]] = {
+            row[0]: (row[1], row[2], row[3], row[4])
+            for row in self._conn.execute("SELECT path, id, mtime_ns, size, content_hash FROM files")
+        }
+        stats = {"scanned": 0, "indexed": 0, "touched": 0, "unchanged": 0, "removed": 0}
+        adds: List[Tuple[np.ndarray, int]] = []
+        removes: List[Tuple[np.ndarray, int]] = []
+        seen = set()
+
+        for entry, rel, _ in walk(self.root, exclude=exclude, use_gitignore=self.use_gitignore):
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            if self._db_prefix and rel.startswith(self._db_prefix):
+                continue
+            seen.add(rel)
+            stats["scanned"] += 1
+            previous = known.get(rel)
+            if previous and previous[1:3] == (st.st_mtime_ns, st.st_size):
+                stats["unchanged"] += 1
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            content_hash = hashlib.sha256(data).hexdigest()
+            if previous and previous[3] == content_hash:
+                self._conn.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                    (st.st_mtime_ns, st.st_size, previous[0])
+                )
+                stats["touched"] += 1
+                continue
+
+            is_binary = b"\0" in data[:BINARY_SNIFF_BYTES]
+            grams = None if is_binary or len(data) > MAX_INDEXED_BYTES else trigrams(data)
+            if previous:
+                file_id = previous[0]
+                old = self._file_trigrams(file_id)
+                new = grams if grams is not None else _EMPTY
+                removes.append((np.setdiff1d(old, new, assume_unique=True), file_id))
+                adds.append((np.setdiff1d(new, old, assume_unique=True), file_id))
+                self._conn.execute("""
+                    UPDATE files SET mtime_ns = ?, size = ?, content_hash = ?, is_binary = ?, trigrams = ?
+                    WHERE id = ?
+                """, (st.st_mtime_ns, st.st_size, content_hash, int(is_binary),
+                      zlib.compress(_pack(grams), 1) if grams is not None else None, file_id))
+            else:
+                cursor = self._conn.execute("""
+                    INSERT INTO files (path, mtime_ns, size, content_hash, is_binary, trigrams)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (rel, st.st_mtime_ns, st.st_size, content_hash, int(is_binary),
+                      zlib.compress(_pack(grams), 1) if grams is not None else None))
+                if grams is not None:
+                    adds.append((grams, cursor.lastrowid))
+            stats["indexed"] += 1
+
+        for rel in set(known) - seen:
+            file_id = known[rel][0]
+            removes.append((self._file_trigrams(file_id), file_id))
+            self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            stats["removed"] += 1
+
+        self._apply_postings(adds, removes)
+        self._conn.commit()
+        return stats
+
+    def _file_trigrams(self, file_id: int) -> np.ndarray:
+        row = self._conn.execute("SELECT trigrams FROM files WHERE id = ?", (file_id,)).fetchone()
+        if not row or row[0] is None:
+            return _EMPTY
+        return _unpack(zlib.decompress(row[0]))
+
+    @staticmethod
+    def _group(pairs: List[Tuple[np.ndarray, int]]) -> Dict[int, np.ndarray]:
+        """(trigrams, file_id) pairs -> trigram -> sorted file ids"""
+        pairs = [(g, fid) for g, fid in pairs if len(g)]
+        if not pairs:
+            return {}
+        grams = np.concatenate([g for g, _ in pairs]).astype(np.uint64)
+        ids = np.concatenate([np.full(len(g), fid, dtype=np.uint64) for g, fid in pairs])
+        keyed = np.sort((grams << np.uint64(32)) | ids)
+        grams = (keyed >> np.uint64(32)).astype(np.uint32)
+        ids = (keyed & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        starts = np.flatnonzero(np.diff(grams, prepend=np.uint32(0)) != 0) if len(grams) else _EMPTY
+        if not len(starts) or starts[0] != 0:
+            starts = np.concatenate(([0], starts))
+        keys = grams[starts]
+        return dict(zip(keys.tolist(), np.split(ids, starts[1:])))
+
+    def _apply_postings(self, adds: List[Tuple[np.ndarray, int]], removes: List[Tuple[np.ndarray, int]]) -> None:
+        added = self._group(adds)
+        removed = self._group(removes)
+        touched = set(added) | set(removed)
+        if not touched:
+            return
+        existing = self._postings(sorted(touched))
+        writes = []
+        deletes = []
+        for gram in touched:
+            ids = existing.get(gram)
+            if ids is None:
+                ids = added[gram]  # new trigram: nothing to merge
+            else:
+                if gram in removed:
+                    ids = np.setdiff1d(ids, removed[gram], assume_unique=True)
+                if gram in added:
+                    ids = np.union1d(ids, added[gram])
+            if len(ids):
+                writes.append((gram, _pack(ids.astype(np.uint32))))
+            else:
+                deletes.append((gram,))
+        self._conn.executemany("INSERT OR REPLACE INTO postings (trigram, file_ids) VALUES (?, ?)", writes)
+        self._conn.executemany("DELETE FROM postings WHERE trigram = ?", deletes)
+
+    def _postings(self, grams: Sequence[int]) -> Dict[int, np.ndarray]:
+        result: Dict[int, np.ndarray] = {}
+        grams = list(grams)
+        for i in range(0, len(grams), 900):
+            batch = grams[i:i + 900]
+            placeholders = ','.join('?' * len(batch))
+            for gram, blob in self._conn.execute(
+                f"SELECT trigram, file_ids FROM postings WHERE trigram IN ({placeholders})", batch
+            ):
+                result[gram] = _unpack(blob)
+        return result
+
+    def _match_group(self, literals: Sequence[str]) -> np.ndarray:
+        """File ids containing every trigram of every literal in the group"""
+        grams = np.unique(np.concatenate([trigrams(lit.encode('utf-8')) for lit in literals]))
+        postings = self._postings(grams.tolist())
+        if len(postings) < len(grams):
+            return _EMPTY  # some trigram occurs nowhere
+        ids = None
+        for posting in sorted(postings.values(), key=len):
+            ids = posting if ids is None else np.intersect1d(ids, posting, assume_unique=True)
+            if not len(ids):
+                break
+        return ids if ids is not None else _EMPTY
+
+    def candidates(self, groups: List[List[str]]) -> List[str]:
+        """Root-relative paths that may match, in walk order; unindexed text files included"""
+        ids = _EMPTY
+        for group in groups:
+            usable = [lit for lit in group if len(lit.encode('utf-8')) >= 3]
+            ids = np.union1d(ids, self._match_group(usable))
+        id_list = ids.tolist()
+        paths = []
+        for i in range(0, len(id_list), 900):
+            batch = id_list[i:i + 900]
+            placeholders = ','.join('?' * len(batch))
+            paths.extend(row[0] for row in self._conn.execute(
+                f"SELECT path FROM files WHERE id IN ({placeholders})", batch
+            ))
+        paths.extend(row[0] for row in self._conn.execute(
+            "SELECT path FROM files WHERE trigrams IS NULL AND is_binary = 0"
+        ))
+        return sorted(set(paths), key=lambda p: p.split('/'))
+
+    def candidate_files(self, roots: Sequence[Path], groups: List[List[str]]) -> Optional[List[str]]:
+        """
+        Candidate paths under roots, spelled as iter_files would spell them.
+
+        Returns None if any root lies outside the indexed root.
+        """
+        prefixes = []
+        for root in roots:
+            try:
+                rel = root.resolve().relative_to(self.root).as_posix()
+            except ValueError:
+                return None
+            prefixes.append('' if rel == '.' else rel)
+        candidates = self.candidates(groups)
+        files = []
+        for root, prefix in zip(roots, prefixes):
+            for rel in candidates:
+                if rel == prefix:
+                    files.append(str(root))
+                elif not prefix:
+                    files.append(os.path.join(str(root), rel))
+                elif rel.startswith(prefix + '/'):
+                    files.append(os.path.join(str(root), rel[len(prefix) + 1:]))
+        return files
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index statistics"""
+        files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        grams = self._conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+        return {
+            'root': str(self.root),
+            'files': files,
+            'trigrams': grams,
+            'db_path': str(self.db_path),
+            'db_size_mb': round(os.path.getsize(self.db_path) / 1024 / 1024, 2)
+        }
+
+    def close(self):
+        """Close the database connection"""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
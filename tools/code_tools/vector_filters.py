@@ -0,0 +1,116 @@
+"""
+Row sets for filtered vector search, built from the chunk metadata.
+
+Architecture:
+- One pass over vector_rows JOIN code_chunks (ordered by file path) gives:
+  - a path index: the distinct file paths, sorted, and for each the range
+    of its rows in a path-ordered row array, so a directory prefix is a few
+    bisections and a substring filter is evaluated once per file, not per
+    chunk
+  - one bitmap (boolean array over rows) per chunk type and per language
+- mask() combines them into the candidate bitmap for a query; the store
+  then plans the search from the number of candidates
+- Built lazily and rebuilt by the store after writes; tombstoned rows have
+  no chunk_id and are never part of any set
+"""
+
+import bisect
+import sqlite3
+from typing import List, Dict, Any, Optional
+
+# Sorts after any character that can follow a prefix
+_PREFIX_END = "\U0010ffff"
+
+
+def normalise_prefix(prefix: str) -> str:
+    """Directory prefix as stored paths spell it: no leading ./, forward slashes, no trailing /"""
+    prefix = prefix.replace("\\", "/")
+    while prefix.startswith("./"):
+        prefix = prefix[2:]
+    return prefix.rstrip("/")
+
+
+class FilterIndex:
+    """Path-prefix index and chunk type / language bitmaps over vector rows"""
+
+    def __init__(self, conn: sqlite3.Connection, count: int):
+        import numpy as np
+
+        self.count = count
+        records = conn.execute("""
+            SELECT v.row, c.file_path, c.chunk_type, c.language
+            FROM vector_rows v JOIN code_chunks c ON c.id = v.chunk_id
+            ORDER BY c.file_path, v.row
+        """).fetchall()
+        self.order = np.fromiter((r[0] for r in records), dtype=np.int64, count=len(records))
+        self.paths: List[str] = []
+        starts: List[int] = []
+        for i, record in enumerate(records):
+            if not self.paths or record[1] != self.paths[-1]:
+                self.paths.append(record[1])
+                starts.append(i)
+        starts.append(len(records))
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self._lowered = [p.lower() for p in self.paths]
+        self.by_type = self._bitmaps(records, 2)
+        self.by_language = self._bitmaps(records, 3)
+
+    def _bitmaps(self, records: List[Any], column: int) -> Dict[str, Any]:
+        import numpy as np
+
+        rows: Dict[str, List[int]] = {}
+        for record in records:
+            rows.setdefault(record[column], []).append(record[0])
+        maps = {}
+        for value, members in rows.items():
+            bitmap = np.zeros(self.count, dtype=bool)
+            bitmap[members] = True
+            maps[value] = bitmap
+        return maps
+
+    def _path_mask(self, path_prefix: Optional[str], file_filter: Optional[str]):
+        import numpy as np
+
+        # Path groups as contiguous [lo, hi) ranges: everything, or the files
+        # under the directory plus a file named exactly like it
+        spans = [(0, len(self.paths))]
+        directory = normalise_prefix(path_prefix) if path_prefix else ""
+        if directory:
+            lo = bisect.bisect_left(self.paths, directory + "/")
+            spans = [(lo, bisect.bisect_left(self.paths, directory + "/" + _PREFIX_END, lo))]
+            exact = bisect.bisect_left(self.paths, directory)
+            if exact < len(self.paths) and self.paths[exact] == directory:
+                spans.append((exact, exact + 1))
+        mask = np.zeros(self.count, dtype=bool)
+        for lo, hi in spans:
+            if file_filter:
+                # Same semantics as the SQL LIKE '%x%' it replaces: substring, ASCII case-insensitive
+                needle = file_filter.lower()
+                for g in range(lo, hi):
+                    if needle in self._lowered[g]:
+                        mask[self.order[self.starts[g]:self.starts[g + 1]]] = True
+            elif hi > lo:
+                mask[self.order[self.starts[lo]:self.starts[hi]]] = True
+        return mask
+
+    def mask(
+        self,
+        path_prefix: Optional[str] = None,
+        file_filter: Optional[str] = None,
+        chunk_type: Optional[str] = None,
+        language: Optional[str] = None
+    ):
+        """Bitmap of the rows matching every given filter, or None when no filter is given"""
+        import numpy as np
+
+        mask = None
+        if path_prefix or file_filter:
+            mask = self._path_mask(path_prefix, file_filter)
+        for maps, value in ((self.by_type, chunk_type), (self.by_language, language)):
+            if value is None:
+                continue
+            bitmap = maps.get(value)
+            if bitmap is None:
+                return np.zeros(self.count, dtype=bool)
+            mask = bitmap.copy() if mask is None else mask & bitmap
+        return mask
@@ -0,0 +1,335 @@
+"""
+Pure-NumPy vector index for VectorStore, used when sqlite-vss is unavailable.
+
+Architecture:
+- Embeddings live in one contiguous float32 matrix in a memory-mapped file
+  (<db>.vectors), grown by doubling; row r is the r-th vector ever appended
+- The row <-> chunk id mapping lives in the store's SQLite database
+  (vector_rows); a deleted chunk's row keeps its slot with chunk_id NULL
+  (a tombstone) until compact() writes the live rows to a new matrix, which
+  the store swaps in once the renumbered rows are committed
+- Updating a chunk that already has a row overwrites the row in place
+- Search scans the matrix in blocks of roughly BLOCK_BYTES: one matrix-vector
+  product per block gives squared L2 distances (the metric vss reports),
+  argpartition keeps each block's k best and the survivors are merged, so
+  memory stays bounded and only the final k are sorted; a selective filter
+  mask switches the scan to gathering just the candidate rows
+- search_many() scores a batch of queries in the same single scan, with one
+  matrix-matrix product per block
+- Vectors are written and flushed before their rows are committed, so a crash
+  leaves at most unreferenced rows past the end of the matrix
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Sequence, Set, Iterable, Callable
+
+
+BLOCK_BYTES = 8 * 1024 * 1024
+# Below this fraction of candidate rows, search gathers them instead of scanning every block
+SUBSET_FRACTION = 0.25
+MIN_CAPACITY = 1024
+# SQLite's default limit on host parameters is 999 in older builds
+_PARAMS = 900
+
+
+def _chunks(items: Sequence[Any], size: int = _PARAMS):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _top_k(query, k: int, blocks: Iterable[Tuple[Any, Any, Any]],
+           distance: Optional[Callable[[Any], Any]] = None) -> List[Tuple[int, float]]:
+    """
+    Merge per-block top-k over (rows, vectors, keep-mask or None) blocks.
+
+    One matrix-vector product per block gives squared L2 distances (or
+    distance(block) gives them, for blocks that are not float32 vectors);
+    argpartition keeps each block's k best and the survivors are merged.
+    """
+    import numpy as np
+
+    qq = float(query @ query)
+    best_rows = np.empty(0, dtype=np.int64)
+    best_dist = np.empty(0, dtype=np.float32)
+    for rows, part, keep in blocks:
+        if keep is not None and not keep.any():
+            continue
+        if distance is None:
+            dist = np.einsum("ij,ij->i", part, part) - 2 * (part @ query) + qq
+        else:
+            dist = distance(part)
+        if keep is not None:
+            dist[~keep] = np.inf
+        top = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+        best_rows = np.concatenate([best_rows, rows[top]])
+        best_dist = np.concatenate([best_dist, dist[top]])
+        if len(best_dist) > k:
+            top = np.argpartition(best_dist, k - 1)[:k]
+            best_rows, best_dist = best_rows[top], best_dist[top]
+    order = np.argsort(best_dist, kind="stable")
+    return [(int(best_rows[i]), max(float(best_dist[i]), 0.0)) for i in order if np.isfinite(best_dist[i])]
+
+
+def _top_k_many(queries, k: int, blocks: Iterable[Tuple[Any, Any, Any]]) -> List[List[Tuple[int, float]]]:
+    """
+    _top_k for every row of a (queries, dimension) matrix, one result list per query.
+
+    Each block is scored against all queries with one matrix-matrix product
+    (a single BLAS call instead of one matrix-vector product per query);
+    every query keeps its own k best across blocks.
+    """
+    import numpy as np
+
+    qq = np.einsum("ij,ij->i", queries, queries)[:, None]
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_dist = np.empty((len(queries), 0), dtype=np.float32)
+    for rows, part, keep in blocks:
+        if keep is not None and not keep.any():
+            continue
+        dist = np.einsum("ij,ij->i", part, part)[None, :] - 2 * (queries @ part.T) + qq
+        if keep is not None:
+            dist[:, ~keep] = np.inf
+        best_rows = np.concatenate([best_rows, np.broadcast_to(rows, dist.shape)], axis=1)
+        best_dist = np.concatenate([best_dist, dist], axis=1)
+        if best_dist.shape[1] > k:
+            top = np.argpartition(best_dist, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(best_rows, top, axis=1)
+            best_dist = np.take_along_axis(best_dist, top, axis=1)
+    order = np.argsort(best_dist, axis=1, kind="stable")
+    return [
+        [(int(rows[i]), max(float(dist[i]), 0.0)) for i in ranked if np.isfinite(dist[i])]
+        for rows, dist, ranked in zip(best_rows, best_dist, order)
+    ]
+
+
+def _blocks(source, mask, block: int) -> Iterable[Tuple[Any, Any, Any]]:
+    """
+    (rows, source rows, keep-mask or None) blocks over the rows mask selects.
+
+    When the mask leaves fewer than SUBSET_FRACTION of the rows, only those
+    rows are gathered; otherwise every block is read and masked.
+    """
+    import numpy as np
+
+    count = len(mask)
+    if mask.sum() < count * SUBSET_FRACTION:
+        rows = np.flatnonzero(mask)
+        return ((rows[i:i + block], source[rows[i:i + block]], None) for i in range(0, len(rows), block))
+    return (
+        (np.arange(start, stop), source[start:stop], mask[start:stop])
+        for start, stop in ((i, min(i + block, count)) for i in range(0, count, block))
+    )
+
+
+class FlatIndex:
+    """Exact nearest-neighbour search over a memory-mapped float32 matrix"""
+
+    def __init__(self, conn: sqlite3.Connection, path: Path, dimension: Optional[int] = None):
+        self.conn = conn
+        self.path = path
+        self.dimension = dimension
+        self._matrix = None  # np.memmap of shape (capacity, dimension)
+        self._init_db()
+        row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vector_rows").fetchone()
+        self.count = row[0]
+        self._dead = {r for (r,) in conn.execute("SELECT row FROM vector_rows WHERE chunk_id IS NULL")}
+
+    def _init_db(self):
+        """Initialize the row mapping table"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS vector_rows (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE
+            )
+        """)
+        self.conn.commit()
+
+    def _open(self, rows: int):
+        """Map the matrix with room for at least rows vectors"""
+        import numpy as np
+
+        itemsize = self.dimension * 4
+        size = self.path.stat().st_size if self.path.exists() else 0
+        capacity = size // itemsize
+        if capacity < rows:
+            capacity = max(MIN_CAPACITY, capacity * 2, rows)
+            with open(self.path, "ab") as f:
+                f.truncate(capacity * itemsize)
+            self._matrix = None
+        if self._matrix is None and capacity:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        return self._matrix
+
+    def _check(self, vectors) -> None:
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"embedding dimension {vectors.shape[1]} does not match the index ({self.dimension})")
+
+    def rows_for(self, chunk_ids: Sequence[str]) -> Dict[str, int]:
+        """Current row of each chunk id that has one"""
+        found: Dict[str, int] = {}
+        for part in _chunks(list(chunk_ids)):
+            placeholders = ",".join("?" * len(part))
+            found.update(self.conn.execute(
+                f"SELECT chunk_id, row FROM vector_rows WHERE chunk_id IN ({placeholders})", part
+            ).fetchall())
+        return found
+
+    def ids_for(self, rows: Sequence[int]) -> Dict[int, str]:
+        found: Dict[int, str] = {}
+        for part in _chunks([int(r) for r in rows]):
+            placeholders = ",".join("?" * len(part))
+            found.update(self.conn.execute(
+                f"SELECT row, chunk_id FROM vector_rows WHERE row IN ({placeholders}) AND chunk_id IS NOT NULL", part
+            ).fetchall())
+        return found
+
+    def add(self, chunk_ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> Tuple[List[int], List[int]]:
+        """Insert or overwrite vectors; returns (appended rows, overwritten rows); the caller commits"""
+        import numpy as np
+
+        if not chunk_ids:
+            return [], []
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(chunk_ids):
+            raise ValueError("expected one vector per chunk id")
+        self._check(matrix)
+        # The last vector for a repeated id wins, as with INSERT OR REPLACE
+        last = {cid: i for i, cid in enumerate(chunk_ids)}
+        existing = self.rows_for(list(last))
+        new_ids = [cid for cid in last if cid not in existing]
+        target = self._open(self.count + len(new_ids))
+        for cid, row in existing.items():
+            target[row] = matrix[last[cid]]
+        if new_ids:
+            rows = range(self.count, self.count + len(new_ids))
+            target[rows.start:rows.stop] = matrix[[last[cid] for cid in new_ids]]
+        target.flush()
+        if new_ids:
+            self.conn.executemany("INSERT INTO vector_rows (row, chunk_id) VALUES (?, ?)", zip(rows, new_ids))
+            self.count += len(new_ids)
+            return list(rows), list(existing.values())
+        return [], list(existing.values())
+
+    def delete(self, chunk_ids: Sequence[str]) -> int:
+        """Tombstone the rows of chunk_ids; the caller commits"""
+        rows = list(self.rows_for(chunk_ids).values())
+        for part in _chunks(rows):
+            placeholders = ",".join("?" * len(part))
+            self.conn.execute(f"UPDATE vector_rows SET chunk_id = NULL WHERE row IN ({placeholders})", part)
+        self._dead.update(rows)
+        return len(rows)
+
+    @property
+    def live(self) -> int:
+        return self.count - len(self._dead)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._dead)
+
+    @property
+    def dead(self) -> Set[int]:
+        """Tombstoned rows (do not modify)"""
+        return self._dead
+
+    def matrix(self):
+        """The live region of the matrix as a plain ndarray view (rows 0..count-1)"""
+        import numpy as np
+
+        if self.count == 0:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.asarray(self._open(self.count))[:self.count]
+
+    def live_mask(self):
+        import numpy as np
+
+        mask = np.ones(self.count, dtype=bool)
+        if self._dead:
+            mask[np.fromiter(self._dead, dtype=np.int64)] = False
+        return mask
+
+    def search(self, query: Sequence[float], k: int, allowed=None) -> List[Tuple[int, float]]:
+        """
+        (row, squared L2 distance) of the k nearest live vectors, nearest first.
+
+        allowed: optional boolean mask over rows restricting the candidates.
+        When it leaves fewer than SUBSET_FRACTION of the rows, only those rows
+        are gathered and scored instead of scanning the whole matrix.
+        """
+        import numpy as np
+
+        q = np.asarray(query, dtype=np.float32)
+        if self.dimension is not None and q.shape != (self.dimension,):
+            raise ValueError(f"query dimension {q.size} does not match the index ({self.dimension})")
+        return self.search_many(q[None, :], k, allowed)[0]
+
+    def search_many(self, queries, k: int, allowed=None) -> List[List[Tuple[int, float]]]:
+        """
+        search() for each row of a (queries, dimension) matrix in one pass over the index.
+
+        Each block is read once and scored against every query with one
+        matrix-matrix product, so n queries cost one scan rather than n.
+        """
+        import numpy as np
+
+        q = np.asarray(queries, dtype=np.float32)
+        if k <= 0 or self.count == 0 or self.dimension is None:
+            return [[] for _ in range(len(q))]
+        if q.ndim != 2 or q.shape[1] != self.dimension:
+            raise ValueError(f"query dimension {q.shape[-1]} does not match the index ({self.dimension})")
+        mask = self.live_mask()
+        if allowed is not None:
+            mask &= allowed[:self.count]
+        if not mask.any():
+            return [[] for _ in range(len(q))]
+        block = max(1, BLOCK_BYTES // (self.dimension * 4))
+        return _top_k_many(q, k, _blocks(self._open(self.count), mask, block))
+
+    def compact(self, pending: Path) -> int:
+        """
+        Write the live rows to pending and renumber vector_rows to match; returns the rows reclaimed.
+
+        The current matrix is left untouched: the caller commits the new
+        rows, then swaps pending in, so a crash before the commit keeps the
+        old mapping and matrix and one after it finds pending ready to swap.
+        """
+        import numpy as np
+
+        if not self._dead:
+            return 0
+        reclaimed = len(self._dead)
+        kept = np.flatnonzero(self.live_mask())
+        if len(kept):
+            matrix = self._open(self.count)
+            compacted = np.memmap(pending, dtype=np.float32, mode="w+", shape=(len(kept), self.dimension))
+            block = max(1, BLOCK_BYTES // (self.dimension * 4))
+            for start in range(0, len(kept), block):
+                compacted[start:start + block] = matrix[kept[start:start + block]]
+            compacted.flush()
+            del compacted
+        else:
+            pending.write_bytes(b"")
+        pairs = self.conn.execute("SELECT row, chunk_id FROM vector_rows WHERE chunk_id IS NOT NULL ORDER BY row").fetchall()
+        self.conn.execute("DELETE FROM vector_rows")
+        self.conn.executemany("INSERT INTO vector_rows (row, chunk_id) VALUES (?, ?)",
+                              ((new, cid) for new, (_, cid) in enumerate(pairs)))
+        self.count = len(pairs)
+        self._dead = set()
+        return reclaimed
+
+    def stats(self) -> Dict[str, Any]:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        return {
+            "vectors": self.live,
+            "tombstones": self.tombstones,
+            "dimension": self.dimension,
+            "vectors_mb": round(size / 1024 / 1024, 2),
+        }
+
+    def close(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
@@ -1,27 +1,83 @@
 """
-Vector store for semantic code search using SQLite + VSS.
+Vector store for semantic code search using SQLite + VSS, or NumPy.
 
 Architecture:
-- SQLite database with VSS extension for vector similarity search
+- SQLite database holding chunk metadata, with one of two vector backends:
+  - vss: the sqlite-vss extension (vss0 virtual table)
+  - numpy: a memory-mapped float32 matrix searched by blocked matrix
+    products (code_tools.vector_index), for when sqlite-vss cannot load
+- The backend is chosen when the database is created (auto: vss if the
+  extension loads, else numpy), recorded in store_meta and reused on open
+- The numpy backend searches exactly (index "flat") or through an HNSW graph
+  over the same matrix (index "hnsw", code_tools.hnsw); the index type and
+  its parameters are recorded too, and changing them rebuilds only the graph
+- Filters are planned, not applied after the limit: the numpy backend turns
+  them into a candidate bitmap (code_tools.vector_filters) and picks exact
+  search over the candidates or a graph search with a wider beam; vss
+  over-fetches and widens until enough rows pass the filters
+- The numpy backend can also keep compressed codes of every vector
+  (quantization int8 or pq, code_tools.quantization): exact scans then run
+  over the codes and only a shortlist of rerank * limit rows is re-ranked
+  from the float32 matrix
+- The embedding dimension is recorded with the backend and checked on
+  open (vss needs it up front: 1536 unless given). reproject() reduces a
+  numpy index in place by PCA or truncation (code_tools.projection);
+  embeddings at the original dimension are projected on the way in
+- search_many() answers several queries together: filters resolve once and,
+  on the numpy backend, exact scans read the matrix once for the whole batch
 - Code chunks stored with embeddings
 - Embedding cache to minimize API calls
 - Support for incremental updates
+- numpy and sqlite_vss are imported on first use, so importing this module
+  (e.g. for CodeChunk via the chunker) stays cheap
 """
 
 import json
+import math
+import os
 import sqlite3
 import hashlib
+from importlib.util import find_spec
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
-try:
+from code_tools.vector_index import BLOCK_BYTES, SUBSET_FRACTION
+
+VSS_AVAILABLE = find_spec("sqlite_vss") is not None and find_spec("numpy") is not None
+BACKENDS = ("auto", "vss", "numpy")
+INDEX_TYPES = ("flat", "hnsw")
+# vss tables are created with a fixed width; indexes built before dimensions were recorded used this
+DEFAULT_DIMENSION = 1536
+# Filtered searches with at most this many candidates are exact even with the hnsw index
+EXACT_CANDIDATES = 10000
+# vss: initial over-fetch for filtered searches, and growth factor while too few rows match
+VSS_OVERFETCH = 4
+
+
+def _load_vss(conn: sqlite3.Connection) -> bool:
+    """Load sqlite-vss into conn; False if the package or the extension is unavailable"""
+    if not VSS_AVAILABLE:
+        return False
     import sqlite_vss
+
+    try:
+        conn.enable_load_extension(True)
+        sqlite_vss.load(conn)
+        conn.enable_load_extension(False)
+    except (AttributeError, sqlite3.OperationalError):
+        return False
+    return True
+
+
+def _f32_blob(values: List[float]) -> bytes:
+    """Pack an embedding as float32 bytes, the layout vss expects"""
     import numpy as np
-    VSS_AVAILABLE = True
-except ImportError:
-    VSS_AVAILABLE = False
+    return np.asarray(values, dtype=np.float32).tobytes()
+
+
+COMPACT_MIN_TOMBSTONES = 1024
 
 
 @dataclass
@@ -51,29 +107,343 @@ class CodeChunk:
 
 
 class VectorStore:
-    """SQLite + VSS vector store for code chunks"""
+    """SQLite vector store for code chunks (vss or NumPy backend)"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        backend: str = "auto",
+        index: Optional[str] = None,
+        hnsw_m: Optional[int] = None,
+        ef_construction: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        quantization: Optional[str] = None,
+        pq_m: Optional[int] = None,
+        rerank: Optional[int] = None,
+        dimension: Optional[int] = None
+    ):
+        """
+        Open or create the store at db_path.
 
-    def __init__(self, db_path: Path):
+        index, hnsw_m, ef_construction, ef_search, quantization, pq_m and
+        rerank default to the values recorded in the database (flat, no
+        quantization for a new one); values given here are recorded for
+        later opens. dimension is the embedding size: recorded for a new
+        store, and for an existing one it must match the index (or its
+        input dimension, if it was re-projected).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._conn = None  # Reusable connection
+        self._index = None  # FlatIndex for the numpy backend
+        self._graph = None  # HNSWGraph for index "hnsw"
+        self._codes = None  # CodeIndex when quantization is on
+        self._projection = None  # ProjectionStage list, loaded on first use
+        self._filters = None  # FilterIndex, valid while _filters_version == _writes
+        self._filters_version = -1
+        self._writes = 0
+        self.last_plan: Dict[str, Any] = {}
+        self.backend = None
+        self.backend = self._resolve_backend(backend)
+        self._resolve_dimension(dimension)
         self._init_db()
+        if self.backend == "numpy":
+            self._swap_vectors()
+        self.index_type = self._resolve_index(index, hnsw_m, ef_construction, ef_search)
+        self._resolve_quantization(quantization, pq_m, rerank)
 
     def _get_connection(self) -> sqlite3.Connection:
-        """Get or create a connection with VSS loaded (reusable)"""
+        """Get or create a connection, with VSS loaded for the vss backend (reusable)"""
         if self._conn is None:
-            if not VSS_AVAILABLE:
+            # Shared across threads by `code-tools batch` (callers serialise access)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            if self.backend == "vss" and not _load_vss(self._conn):
+                self._conn.close()
+                self._conn = None
                 raise RuntimeError(
-                    "sqlite-vss not installed. Run: pip install sqlite-vss"
+                    "sqlite-vss not installed or not loadable. Run: pip install sqlite-vss, "
+                    "or rebuild the index with --backend numpy"
                 )
-            self._conn = sqlite3.connect(str(self.db_path))
-            self._conn.enable_load_extension(True)
-            sqlite_vss.load(self._conn)
-            self._conn.enable_load_extension(False)
         return self._conn
 
+    def _resolve_backend(self, requested: str) -> str:
+        """Backend recorded in the database, else the requested one (auto: vss if it loads)"""
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        row = conn.execute("SELECT value FROM store_meta WHERE key = 'backend'").fetchone()
+        recorded = row[0] if row else None
+        if recorded is None and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'code_embeddings'"
+        ).fetchone():
+            recorded = "vss"  # Built before backends were recorded
+        if recorded is not None:
+            if requested not in ("auto", recorded):
+                raise ValueError(
+                    f"{self.db_path} was built with the {recorded} backend; "
+                    f"delete it to rebuild with {requested}"
+                )
+            backend = recorded
+        elif requested == "auto":
+            backend = "vss" if _load_vss(conn) else "numpy"
+        else:
+            backend = requested
+        if backend == "vss":
+            # Reconnect so the extension is loaded (or its absence reported)
+            conn.close()
+            self._conn = None
+            self.backend = backend
+            conn = self._get_connection()
+        conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('backend', ?)", (backend,))
+        conn.commit()
+        return backend
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._get_connection().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _resolve_dimension(self, requested: Optional[int]) -> None:
+        """Record the embedding dimension for a new store, or check the requested one against the index"""
+        if requested is not None and requested < 1:
+            raise ValueError("dimension must be >= 1")
+        conn = self._get_connection()
+        recorded = self._meta("dimension")
+        if recorded is None and self.backend == "vss":
+            legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'code_embeddings'").fetchone()
+            recorded = str(DEFAULT_DIMENSION if legacy else requested or DEFAULT_DIMENSION)
+            conn.execute("INSERT INTO store_meta (key, value) VALUES ('dimension', ?)", (recorded,))
+            conn.commit()
+        if recorded is None:
+            if requested is not None:
+                conn.execute("INSERT INTO store_meta (key, value) VALUES ('dimension', ?)", (str(requested),))
+                conn.commit()
+        elif requested is not None and requested not in self._accepted_dimensions():
+            if requested == int(recorded):
+                raise ValueError(
+                    f"{self.db_path} was reduced to {recorded} dimensions by PCA, so embeddings must be "
+                    f"{self.input_dimension}-dimensional and projected; drop --dimensions"
+                )
+            raise ValueError(
+                f"{self.db_path} holds {recorded}-dimensional embeddings, not {requested}; "
+                "re-project it (reproject_code_index) or delete it to rebuild"
+            )
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Dimension of the stored vectors (None for an empty numpy store)"""
+        recorded = self._meta("dimension")
+        return int(recorded) if recorded else None
+
+    @property
+    def input_dimension(self) -> Optional[int]:
+        """Dimension of the embeddings the index was built from: what the provider should produce"""
+        stages = self._get_projection()
+        return stages[0].source if stages else self.dimension
+
+    def _accepted_dimensions(self) -> List[int]:
+        """
+        Embedding sizes the index takes: the input dimension, and the index
+        dimension itself unless a PCA stage maps into a space of its own
+        (truncated vectors are what a provider's shortened embeddings are).
+        """
+        stages = self._get_projection()
+        accepted = [self.input_dimension] if stages else []
+        if all(stage.method == "truncate" for stage in stages):
+            accepted.append(self.dimension)
+        return accepted
+
+    def _get_projection(self):
+        """Recorded projection stages (empty unless the index was re-projected)"""
+        if self._projection is None:
+            from code_tools.projection import init_db, load_stages
+
+            conn = self._get_connection()
+            init_db(conn)
+            self._projection = load_stages(conn)
+        return self._projection
+
+    def _prepare(self, embeddings: List[List[float]]):
+        """Embeddings as stored: projected when they are at the input dimension of a re-projected index"""
+        import numpy as np
+        from code_tools.projection import project
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("expected one embedding per chunk, all of the same dimension")
+        if self.dimension is None:
+            return vectors
+        accepted = self._accepted_dimensions()
+        if vectors.shape[1] not in accepted:
+            expected = " or ".join(str(d) for d in accepted)
+            raise ValueError(f"embedding dimension {vectors.shape[1]} does not match the index ({expected})")
+        stages = self._get_projection()
+        if stages and vectors.shape[1] == stages[0].source:
+            vectors = project(stages, vectors)
+        return vectors
+
+    def _resolve_index(
+        self,
+        requested: Optional[str],
+        hnsw_m: Optional[int],
+        ef_construction: Optional[int],
+        ef_search: Optional[int]
+    ) -> str:
+        """Index type recorded in the database, updated with any explicitly requested settings"""
+        if requested is not None and requested not in INDEX_TYPES:
+            raise ValueError(f"Unknown index: {requested} (expected one of {', '.join(INDEX_TYPES)})")
+        index_type = requested or self._meta("index") or "flat"
+        if index_type == "hnsw" and self.backend != "numpy":
+            raise ValueError("The hnsw index needs the numpy backend")
+        settings = {"index": index_type, "hnsw_m": hnsw_m, "ef_construction": ef_construction, "ef_search": ef_search}
+        for value in (hnsw_m, ef_construction, ef_search):
+            if value is not None and value < 2:
+                raise ValueError("hnsw_m, ef_construction and ef_search must be >= 2")
+        changed = [(key, str(value)) for key, value in settings.items()
+                   if value is not None and self._meta(key) != str(value)]
+        if changed:
+            conn = self._get_connection()
+            conn.executemany("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", changed)
+            conn.commit()
+        if index_type == "flat":
+            from code_tools.hnsw import graph_files
+
+            # A graph left from an earlier hnsw index would go stale as the matrix changes
+            for path in graph_files(self.db_path.with_suffix(".hnsw")):
+                path.unlink(missing_ok=True)
+        return index_type
+
+    def _resolve_quantization(self, requested: Optional[str], pq_m: Optional[int], rerank: Optional[int]) -> None:
+        """Record explicitly requested quantization settings; codes are dropped when it is turned off"""
+        from code_tools.quantization import CODECS, code_files
+
+        if requested is not None and requested not in CODECS:
+            raise ValueError(f"Unknown quantization: {requested} (expected one of {', '.join(CODECS)})")
+        if requested not in (None, "none") and self.backend != "numpy":
+            raise ValueError("Quantization needs the numpy backend")
+        for value in (pq_m, rerank):
+            if value is not None and value < 1:
+                raise ValueError("pq_m and rerank must be >= 1")
+        self._check_pq_m(self.dimension, requested, pq_m)
+        settings = {"quantization": requested, "pq_m": pq_m, "rerank": rerank}
+        changed = [(key, str(value)) for key, value in settings.items()
+                   if value is not None and self._meta(key) != str(value)]
+        if changed:
+            conn = self._get_connection()
+            conn.executemany("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", changed)
+            conn.commit()
+        if self.quantization == "none":
+            for path in code_files(self.db_path.with_suffix(".codes")):
+                path.unlink(missing_ok=True)
+
+    def _check_pq_m(self, dimension: Optional[int], quantization: Optional[str] = None,
+                    pq_m: Optional[int] = None) -> None:
+        """Raise if pq codes with pq_m (default: the recorded settings) cannot split dimension"""
+        from code_tools.quantization import check_pq_m
+
+        pq_m = pq_m or self._meta("pq_m")
+        if dimension and pq_m and (quantization or self.quantization) == "pq":
+            check_pq_m(dimension, int(pq_m))
+
+    @property
+    def quantization(self) -> str:
+        return self._meta("quantization") or "none"
+
+    @property
+    def rerank(self) -> int:
+        from code_tools.quantization import DEFAULT_RERANK
+
+        return int(self._meta("rerank") or DEFAULT_RERANK)
+
+    def _get_codes(self):
+        """CodeIndex over the numpy matrix, rebuilt if its parameters changed and caught up with the matrix"""
+        if self._codes is None:
+            from code_tools.quantization import CodeIndex
+
+            pq_m = self._meta("pq_m")
+            self._codes = CodeIndex(self.db_path.with_suffix(".codes"), self.quantization,
+                                    self._get_index().dimension, int(pq_m) if pq_m else None)
+            self._sync_codes()
+        return self._codes
+
+    def _sync_codes(self) -> None:
+        """Encode matrix rows the codes do not cover yet; retrain and re-encode all once the index has outgrown the codebook"""
+        codes, index = self._codes, self._get_index()
+        if codes.count > index.count or codes.needs_training(index.count):
+            codes.reset()
+        if codes.count < index.count:
+            codes.add(index.matrix(), range(codes.count, index.count))
+            codes.save()
+
+    def _get_graph(self):
+        """HNSWGraph over the numpy matrix, rebuilt if its parameters changed and caught up with the matrix"""
+        if self._graph is None:
+            from code_tools.hnsw import HNSWGraph, DEFAULT_M, DEFAULT_EF_CONSTRUCTION
+
+            m = int(self._meta("hnsw_m") or DEFAULT_M)
+            ef_construction = int(self._meta("ef_construction") or DEFAULT_EF_CONSTRUCTION)
+            graph = HNSWGraph(self.db_path.with_suffix(".hnsw"), m=m, ef_construction=ef_construction)
+            if (graph.m, graph.ef_construction) != (m, ef_construction):
+                graph.reset(m=m, ef_construction=ef_construction)
+            self._graph = graph
+            self._sync_graph()
+        return self._graph
+
+    def _sync_graph(self) -> None:
+        """Insert matrix rows the graph does not cover yet (all of them after a compaction)"""
+        graph, index = self._graph, self._get_index()
+        if graph.count > index.count:
+            graph.reset()
+        if graph.count < index.count:
+            graph.add(index.matrix(), range(graph.count, index.count))
+            graph.save()
+
+    @property
+    def ef_search(self) -> int:
+        from code_tools.hnsw import DEFAULT_EF_SEARCH
+
+        return int(self._meta("ef_search") or DEFAULT_EF_SEARCH)
+
+    def _get_index(self):
+        """FlatIndex over <db>.vectors (numpy backend)"""
+        if self._index is None:
+            from code_tools.vector_index import FlatIndex
+
+            dimension = self._meta("dimension")
+            self._index = FlatIndex(self._get_connection(), self.db_path.with_suffix(".vectors"),
+                                    int(dimension) if dimension else None)
+        return self._index
+
+    def _add_vectors(self, chunks: List[CodeChunk], vectors) -> None:
+        """Store prepared embeddings in the numpy backend, recording the dimension on first use"""
+        if self.dimension is None:
+            self._check_pq_m(vectors.shape[1])
+        index = self._get_index()
+        self._writes += 1
+        _, overwritten = index.add([c.id for c in chunks], vectors)
+        self._get_connection().execute(
+            "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('dimension', ?)", (str(index.dimension),)
+        )
+        if self.index_type == "hnsw":
+            graph = self._get_graph()
+            self._sync_graph()
+            if overwritten:
+                graph.relink(index.matrix(), overwritten)
+                graph.save()
+        if self.quantization != "none":
+            codes = self._get_codes()
+            self._sync_codes()
+            if overwritten:
+                codes.add(index.matrix(), overwritten)
+                codes.save()
+
     def _init_db(self):
-        """Initialize database schema with VSS extension"""
+        """Initialize database schema (VSS table for the vss backend)"""
         conn = self._get_connection()
 
         # Create code chunks table
@@ -93,11 +463,12 @@ class VectorStore:
         """)
 
         # Create VSS virtual table for embeddings
-        conn.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS code_embeddings USING vss0(
-                embedding(1536)
-            )
-        """)
+        if self.backend == "vss":
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS code_embeddings USING vss0(
+                    embedding({self.dimension})
+                )
+            """)
 
         # Create file hash tracking table for incremental updates
         conn.execute("""
@@ -126,6 +497,7 @@ class VectorStore:
         """Insert or update a code chunk with its embedding"""
         if not chunk.embedding:
             raise ValueError("Chunk must have embedding")
+        vectors = self._prepare([chunk.embedding])
 
         conn = self._get_connection()
 
@@ -149,11 +521,18 @@ class VectorStore:
         ))
 
         # Upsert embedding
-        embedding_blob = np.array(chunk.embedding, dtype=np.float32).tobytes()
-        conn.execute("""
-            INSERT OR REPLACE INTO code_embeddings(rowid, embedding)
-            VALUES (?, ?)
-        """, (chunk.id, embedding_blob))
+        if self.backend == "numpy":
+            try:
+                self._add_vectors([chunk], vectors)
+            except ValueError:
+                conn.rollback()
+                raise
+        else:
+            embedding_blob = _f32_blob(vectors[0])
+            conn.execute("""
+                INSERT OR REPLACE INTO code_embeddings(rowid, embedding)
+                VALUES (?, ?)
+            """, (chunk.id, embedding_blob))
 
         conn.commit()
 
@@ -161,6 +540,8 @@ class VectorStore:
         """Batch insert/update chunks for efficiency"""
         if not chunks:
             return
+        embedded = [c for c in chunks if c.embedding]
+        vectors = self._prepare([c.embedding for c in embedded]) if embedded else None
 
         conn = self._get_connection()
 
@@ -180,9 +561,19 @@ class VectorStore:
         """, metadata)
 
         # Batch insert embeddings
+        if self.backend == "numpy":
+            try:
+                if embedded:
+                    self._add_vectors(embedded, vectors)
+            except ValueError:
+                conn.rollback()
+                raise
+            conn.commit()
+            return
+
         embeddings = [
-            (c.id, np.array(c.embedding, dtype=np.float32).tobytes())
-            for c in chunks if c.embedding
+            (c.id, _f32_blob(vector))
+            for c, vector in zip(embedded, vectors if embedded else [])
         ]
 
         conn.executemany("""
@@ -197,7 +588,10 @@ class VectorStore:
         query_embedding: List[float],
         limit: int = 10,
         file_filter: Optional[str] = None,
-        chunk_type_filter: Optional[str] = None
+        chunk_type_filter: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        language_filter: Optional[str] = None,
+        ef_search: Optional[int] = None
     ) -> List[Tuple[CodeChunk, float]]:
         """
         Search for similar code chunks using vector similarity.
@@ -205,53 +599,133 @@ class VectorStore:
         Returns list of (chunk, similarity) tuples, sorted by similarity.
         Similarity is in range [0, 1] where 1 = identical, 0 = unrelated.
         Computed as: similarity = 1 / (1 + L2_distance)
+        file_filter is a case-insensitive substring of the path, path_prefix a
+        leading directory; filters are applied before the limit, so up to limit
+        matching chunks are returned whenever that many exist.
+        ef_search overrides the recorded HNSW beam width for this query.
+        How the search ran is left in last_plan.
         """
+        queries = self._prepare([query_embedding])
+        filters = {
+            "file_filter": file_filter,
+            "chunk_type_filter": chunk_type_filter,
+            "path_prefix": path_prefix,
+            "language_filter": language_filter,
+        }
+        if self.backend == "numpy":
+            return self._search_numpy(queries, limit, ef_search, **filters)[0]
+        return self._search_vss(queries[0], limit, **filters)
+
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 10,
+        file_filter: Optional[str] = None,
+        chunk_type_filter: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        language_filter: Optional[str] = None,
+        ef_search: Optional[int] = None
+    ) -> List[List[Tuple[CodeChunk, float]]]:
+        """
+        search() for several queries at once: one result list per query, in order.
+
+        On the numpy backend the filters resolve to one candidate bitmap for
+        the batch, exact plans score every query in a single blocked pass
+        over the matrix, and the chunks of all results are fetched together.
+        Graph and quantized searches, and the vss backend, still run query by
+        query. last_plan is the batch's plan (the last query's for the
+        graph) with the number of queries.
+        """
+        if not query_embeddings:
+            return []
+        queries = self._prepare(query_embeddings)
+        filters = {
+            "file_filter": file_filter,
+            "chunk_type_filter": chunk_type_filter,
+            "path_prefix": path_prefix,
+            "language_filter": language_filter,
+        }
+        if self.backend == "numpy":
+            results = self._search_numpy(queries, limit, ef_search, **filters)
+        else:
+            results = [self._search_vss(query, limit, **filters) for query in queries]
+        self.last_plan = {**self.last_plan, "queries": len(queries)}
+        return results
+
+    def _search_vss(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        file_filter: Optional[str],
+        chunk_type_filter: Optional[str],
+        path_prefix: Optional[str],
+        language_filter: Optional[str]
+    ) -> List[Tuple[CodeChunk, float]]:
+        """
+        search() for the vss backend.
+
+        vss returns its k nearest before the join can filter them, so with
+        filters k starts at VSS_OVERFETCH * limit and grows until limit
+        matches are found or every vector has been considered.
+        """
+        from code_tools.vector_filters import normalise_prefix
+
         conn = self._get_connection()
 
-        query_blob = np.array(query_embedding, dtype=np.float32).tobytes()
+        query_blob = _f32_blob(query_embedding)
 
         # Build query with optional filters
         where_clauses = []
-        params = [query_blob, limit]
+        filter_params: List[Any] = []
 
         if file_filter:
             where_clauses.append("c.file_path LIKE ?")
-            params.insert(-1, f"%{file_filter}%")
+            filter_params.append(f"%{file_filter}%")
 
         if chunk_type_filter:
             where_clauses.append("c.chunk_type = ?")
-            params.insert(-1, chunk_type_filter)
+            filter_params.append(chunk_type_filter)
 
-        where_sql = f"AND {' AND '.join(where_clauses)}" if where_clauses else ""
+        directory = normalise_prefix(path_prefix) if path_prefix else ""
+        if directory:
+            # Files under the directory, not siblings that merely share the prefix (src/api_legacy)
+            where_clauses.append("(c.file_path = ? OR substr(c.file_path, 1, ?) = ?)")
+            filter_params.extend([directory, len(directory) + 1, directory + "/"])
+
+        if language_filter:
+            where_clauses.append("c.language = ?")
+            filter_params.append(language_filter)
+
+        where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
         query = f"""
             SELECT
                 c.id, c.file_path, c.start_line, c.end_line, c.chunk_type,
                 c.name, c.content, c.language, c.created_at,
                 e.distance
-            FROM code_embeddings e
+            FROM (
+                SELECT rowid, distance FROM code_embeddings
+                WHERE vss_search(embedding, vss_search_params(?, ?))
+            ) e
             JOIN code_chunks c ON e.rowid = c.id
-            WHERE vss_search(e.embedding, ?)
             {where_sql}
             ORDER BY e.distance ASC
             LIMIT ?
         """
 
-        cursor = conn.execute(query, params)
+        total = conn.execute("SELECT COUNT(*) FROM code_chunks").fetchone()[0]
+        fetch = limit * VSS_OVERFETCH if where_clauses else limit
+        while True:
+            rows = conn.execute(query, [query_blob, min(fetch, max(total, 1)), *filter_params, limit]).fetchall()
+            if len(rows) >= limit or fetch >= total:
+                break
+            fetch *= VSS_OVERFETCH
+        self.last_plan = {"strategy": "vss", "fetched": min(fetch, total)}
+
         results = []
 
-        for row in cursor.fetchall():
-            chunk = CodeChunk(
-                id=row[0],
-                file_path=row[1],
-                start_line=row[2],
-                end_line=row[3],
-                chunk_type=row[4],
-                name=row[5],
-                content=row[6],
-                language=row[7],
-                created_at=row[8]
-            )
+        for row in rows:
+            chunk = _row_to_chunk(row)
             distance = row[9]
             # Convert L2 distance to similarity score [0, 1]
             similarity = 1.0 / (1.0 + distance)
@@ -259,6 +733,271 @@ class VectorStore:
 
         return results
 
+    def _search_numpy(
+        self,
+        queries,
+        limit: int,
+        ef_search: Optional[int],
+        file_filter: Optional[str],
+        chunk_type_filter: Optional[str],
+        path_prefix: Optional[str],
+        language_filter: Optional[str]
+    ) -> List[List[Tuple[CodeChunk, float]]]:
+        """
+        search_many() for the numpy backend, planned from the number of candidates.
+
+        Filters resolve to a bitmap of candidate rows (FilterIndex). Few
+        candidates are scored exactly (gathered rows, or a masked scan when
+        the index is flat); with the hnsw index, many candidates go through
+        the graph with efSearch raised by the inverse selectivity.
+        """
+        index = self._get_index()
+
+        allowed = None
+        candidates = None
+        if file_filter or chunk_type_filter or path_prefix or language_filter:
+            allowed = self._get_filters().mask(path_prefix=path_prefix, file_filter=file_filter,
+                                               chunk_type=chunk_type_filter, language=language_filter)
+            candidates = int(allowed.sum())
+
+        if candidates == 0:
+            hits: List[List[Tuple[int, float]]] = [[] for _ in queries]
+            self.last_plan = {"strategy": "empty", "candidates": 0}
+        elif self.index_type == "hnsw" and (candidates is None or candidates > EXACT_CANDIDATES):
+            hits = [self._search_graph(query, limit, allowed, candidates, ef_search or self.ef_search)
+                    for query in queries]
+        else:
+            hits, plan = self._search_exact(queries, limit, allowed, candidates)
+            self.last_plan = {**plan, "candidates": index.live if candidates is None else candidates}
+
+        ids = index.ids_for(sorted({row for found in hits for row, _ in found}))
+        chunks = self._get_chunks(list(ids.values()))
+        return [
+            [(chunks[ids[row]], 1.0 / (1.0 + distance)) for row, distance in found if ids.get(row) in chunks]
+            for found in hits
+        ]
+
+    def _search_graph(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        allowed,
+        candidates: Optional[int],
+        ef: int
+    ) -> List[Tuple[int, float]]:
+        """
+        (row, squared L2 distance) from the HNSW graph, skipping tombstoned and filtered-out rows.
+
+        efSearch starts at ef scaled by the inverse selectivity of the filter
+        and doubles while fewer than limit results come back; past
+        SUBSET_FRACTION of the index an exact search is cheaper and certain.
+        """
+        import numpy as np
+
+        index = self._get_index()
+        graph = self._get_graph()
+        if index.dimension is None:
+            self.last_plan = {"strategy": "empty", "candidates": 0}
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape != (index.dimension,):
+            raise ValueError(f"query dimension {query.size} does not match the index ({index.dimension})")
+        dead = index.dead
+        accept = None
+        if dead or allowed is not None:
+            def accept(row: int) -> bool:
+                return row not in dead and (allowed is None or bool(allowed[row]))
+
+        available = index.live if candidates is None else candidates
+        wanted = min(limit, available)
+        ef = max(ef, limit)
+        if candidates is not None:
+            ef = int(math.ceil(ef * index.live / candidates))
+        while True:
+            if ef > index.count * SUBSET_FRACTION and ef > limit * 2:
+                hits, plan = self._search_exact(query[None, :], limit, allowed, candidates)
+                self.last_plan = {**plan, "candidates": available, "ef": ef}
+                return hits[0]
+            found = graph.search(index.matrix(), query, limit, ef, accept)
+            if len(found) >= wanted:
+                break
+            ef *= 2
+        self.last_plan = {"strategy": "hnsw", "candidates": available, "ef": ef}
+        return [(row, max(distance, 0.0)) for distance, row in found]
+
+    def _search_exact(
+        self,
+        queries,
+        limit: int,
+        allowed,
+        candidates: Optional[int]
+    ) -> Tuple[List[List[Tuple[int, float]]], Dict[str, Any]]:
+        """
+        Exact (row, squared L2 distance) hits for each query and the plan that produced them.
+
+        With quantization on and more candidates than the shortlist, the
+        codes are scanned for rerank * limit rows per query and only those
+        are scored from the float32 matrix.
+        """
+        import numpy as np
+
+        index = self._get_index()
+        shortlist = limit * self.rerank
+        selected = index.live if candidates is None else candidates
+        if self.quantization == "none" or index.dimension is None or selected <= shortlist:
+            subset = candidates is not None and candidates < index.count * SUBSET_FRACTION
+            return index.search_many(queries, limit, allowed), {"strategy": "exact-subset" if subset else "exact-scan"}
+        codes = self._get_codes()
+        mask = index.live_mask()
+        if allowed is not None:
+            mask &= allowed[:index.count]
+        hits = []
+        for query in queries:
+            found = codes.search(query, shortlist, mask)
+            keep = np.zeros(index.count, dtype=bool)
+            keep[[row for row, _ in found]] = True
+            hits.append(index.search(query, limit, keep))
+        return hits, {"strategy": "quantized", "codec": codes.kind, "shortlist": len(found)}
+
+    def _get_filters(self):
+        """FilterIndex over the current rows, rebuilt after writes"""
+        if self._filters is None or self._filters_version != self._writes:
+            from code_tools.vector_filters import FilterIndex
+
+            self._filters = FilterIndex(self._get_connection(), self._get_index().count)
+            self._filters_version = self._writes
+        return self._filters
+
+    def _get_chunks(self, chunk_ids: List[str]) -> Dict[str, CodeChunk]:
+        """Chunks by id (without embeddings)"""
+        conn = self._get_connection()
+        found: Dict[str, CodeChunk] = {}
+        for i in range(0, len(chunk_ids), 900):
+            part = chunk_ids[i:i + 900]
+            placeholders = ','.join('?' * len(part))
+            for row in conn.execute(f"""
+                SELECT id, file_path, start_line, end_line, chunk_type,
+                       name, content, language, created_at
+                FROM code_chunks WHERE id IN ({placeholders})
+            """, part):
+                found[row[0]] = _row_to_chunk(row)
+        return found
+
+    def compact(self) -> int:
+        """Reclaim the space of deleted vectors (numpy backend); returns the rows reclaimed"""
+        if self.backend != "numpy":
+            return 0
+        reclaimed = self._compact_index()
+        self._get_connection().commit()
+        return reclaimed
+
+    def _compact_index(self) -> int:
+        """
+        Compact the matrix and commit; row numbers change, so the HNSW graph and codes are rebuilt.
+
+        The live rows go to <db>.vectors.new and the renumbered mapping
+        commits with pending_vectors set, then the file is swapped in as
+        after reproject(), so an interrupted compaction never leaves the
+        mapping pointing at moved vectors.
+        """
+        index = self._get_index()
+        pending = index.path.with_name(index.path.name + ".new")
+        reclaimed = index.compact(pending)
+        if not reclaimed:
+            return 0
+        conn = self._get_connection()
+        conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('pending_vectors', ?)", (pending.name,))
+        conn.commit()
+        self._swap_vectors()
+        if self.index_type == "hnsw":
+            self._get_graph()
+        if self.quantization != "none":
+            self._get_codes()
+        return reclaimed
+
+    def reproject(self, dimension: int, method: str = "pca") -> Dict[str, Any]:
+        """
+        Reduce every stored vector to dimension without re-embedding (numpy backend).
+
+        The stage is fitted on the stored vectors (PCA) or is a plain
+        truncation, and is recorded so later queries and chunks embedded at
+        the input dimension are projected the same way. The reduced matrix is
+        written beside the current one and swapped in once its rows are
+        committed; the HNSW graph and quantized codes are rebuilt from it.
+        A recorded pq_m that does not divide the new dimension is replaced
+        by the default for it in the same commit.
+        """
+        import numpy as np
+        from code_tools.projection import PCA_SAMPLE, add_stage, fit, describe
+        from code_tools.quantization import default_pq_m
+
+        if self.backend != "numpy":
+            raise ValueError("Re-projection needs the numpy backend; rebuild a vss index with the new dimension")
+        index = self._get_index()
+        if index.dimension is None or not index.live:
+            raise ValueError("The index has no vectors to re-project")
+        conn = self._get_connection()
+        pairs = conn.execute("SELECT row, chunk_id FROM vector_rows WHERE chunk_id IS NOT NULL ORDER BY row").fetchall()
+        rows = np.fromiter((row for row, _ in pairs), dtype=np.int64, count=len(pairs))
+        matrix = index.matrix()
+        sample = rows if len(rows) <= PCA_SAMPLE else np.sort(
+            np.random.default_rng(0).choice(rows, PCA_SAMPLE, replace=False))
+        stage = fit(method, matrix[sample], dimension)
+
+        pending = index.path.with_name(index.path.name + ".new")
+        reduced = np.memmap(pending, dtype=np.float32, mode="w+", shape=(len(rows), dimension))
+        block = max(1, BLOCK_BYTES // (index.dimension * 4))
+        for start in range(0, len(rows), block):
+            reduced[start:start + block] = stage.apply(matrix[rows[start:start + block]])
+        reduced.flush()
+        del reduced
+
+        conn.execute("DELETE FROM vector_rows")
+        conn.executemany("INSERT INTO vector_rows (row, chunk_id) VALUES (?, ?)",
+                         ((new, chunk_id) for new, (_, chunk_id) in enumerate(pairs)))
+        meta = [("dimension", str(dimension)), ("pending_vectors", pending.name)]
+        pq_m = self._meta("pq_m")
+        if pq_m and dimension % int(pq_m):
+            meta.append(("pq_m", str(default_pq_m(dimension))))
+        conn.executemany("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", meta)
+        self._get_projection()
+        add_stage(conn, stage)
+        conn.commit()
+        previous = index.dimension
+        self._swap_vectors()
+        if self.index_type == "hnsw":
+            self._get_graph()
+        if self.quantization != "none":
+            self._get_codes()
+        return {"vectors": len(rows), "from": previous, "to": dimension, "method": method,
+                "projection": describe(self._get_projection())}
+
+    def _swap_vectors(self) -> None:
+        """Swap in a re-projected or compacted matrix whose rows are committed (also after a crash in between)"""
+        from code_tools.hnsw import graph_files
+        from code_tools.quantization import code_files
+
+        path = self.db_path.with_suffix(".vectors")
+        pending = self._meta("pending_vectors")
+        if pending is None:
+            # Written but never committed: the old matrix is still the live one
+            path.with_name(path.name + ".new").unlink(missing_ok=True)
+            return
+        for attr in ("_graph", "_codes", "_index"):
+            if getattr(self, attr) is not None:
+                getattr(self, attr).close()
+                setattr(self, attr, None)
+        if (path.parent / pending).exists():
+            os.replace(path.parent / pending, path)
+        # The graph and codes describe the old vectors
+        for stale in graph_files(self.db_path.with_suffix(".hnsw")) + code_files(self.db_path.with_suffix(".codes")):
+            stale.unlink(missing_ok=True)
+        conn = self._get_connection()
+        conn.execute("DELETE FROM store_meta WHERE key = 'pending_vectors'")
+        conn.commit()
+        self._projection = None
+        self._writes += 1
+
     def delete_by_file(self, file_path: str) -> int:
         """Delete all chunks for a file (for incremental updates)"""
         conn = self._get_connection()
@@ -276,7 +1015,14 @@ class VectorStore:
             (file_path,)
         )
 
-        if chunk_ids:
+        if chunk_ids and self.backend == "numpy":
+            index = self._get_index()
+            index.delete(chunk_ids)
+            self._writes += 1
+            # Rewrite the matrix once deleted rows outnumber live ones
+            if index.tombstones > max(COMPACT_MIN_TOMBSTONES, index.live):
+                self._compact_index()
+        elif chunk_ids:
             placeholders = ','.join('?' * len(chunk_ids))
             conn.execute(
                 f"DELETE FROM code_embeddings WHERE rowid IN ({placeholders})",
@@ -313,14 +1059,28 @@ class VectorStore:
         """)
         total_files = cursor.fetchone()[0]
 
-        return {
+        stats = {
             'total_chunks': total_chunks,
             'total_files': total_files,
             'by_type': by_type,
             'by_language': by_language,
+            'backend': self.backend,
+            'dimension': self.dimension,
             'db_path': str(self.db_path),
             'db_size_mb': round(self.db_path.stat().st_size / 1024 / 1024, 2)
         }
+        if self.backend == "numpy":
+            stats.update(self._get_index().stats())
+            stats['index'] = self.index_type
+            if self.index_type == "hnsw":
+                stats['hnsw'] = {**self._get_graph().stats(), 'ef_search': self.ef_search}
+            if self.quantization != "none" and self._get_index().dimension is not None:
+                stats['quantization'] = {**self._get_codes().stats(), 'rerank': self.rerank}
+        if self._get_projection():
+            from code_tools.projection import describe
+
+            stats['projection'] = describe(self._get_projection())
+        return stats
 
     def list_files(self) -> List[str]:
         """List all indexed files"""
@@ -363,6 +1123,30 @@ class VectorStore:
 
     def close(self):
         """Close the database connection"""
+        if self._graph is not None:
+            self._graph.close()
+            self._graph = None
+        if self._codes is not None:
+            self._codes.close()
+            self._codes = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
         if self._conn:
             self._conn.close()
             self._conn = None
+
+
+def _row_to_chunk(row: Tuple[Any, ...]) -> CodeChunk:
+    """CodeChunk from (id, file_path, start_line, end_line, chunk_type, name, content, language, created_at, ...)"""
+    return CodeChunk(
+        id=row[0],
+        file_path=row[1],
+        start_line=row[2],
+        end_line=row[3],
+        chunk_type=row[4],
+        name=row[5],
+        content=row[6],
+        language=row[7],
+        created_at=row[8]
+    )
@@ -0,0 +1,408 @@
+"""
+Filesystem walking with .gitignore and exclude-pattern support.
+
+Walks with os.scandir (reusing DirEntry type information instead of extra
+stat calls), prunes excluded and ignored directories before descending,
+and yields entries in deterministic (name-sorted, depth-first) order.
+
+- DirCache: optional listing cache validated by each directory's mtime
+  (one stat per directory instead of a readdir); can be persisted as JSON
+- GlobMatcher: several globs compiled into one regex, plus the walk depth
+  they can possibly need
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator, Tuple, Sequence, Any
+
+from code_tools.result_cache import note
+
+
+# Directory names never worth descending into (shared with the code chunker)
+DEFAULT_EXCLUDE_PATTERNS = [
+    '__pycache__', 'node_modules', '.git', 'venv', 'env',
+    '.pytest_cache', 'dist', 'build', '.next', '.vscode'
+]
+
+BINARY_SNIFF_BYTES = 8192
+
+
+def is_binary_file(path: str) -> bool:
+    """Heuristic: a NUL byte in the first block means binary"""
+    try:
+        with open(path, 'rb') as f:
+            return b"\0" in f.read(BINARY_SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a gitignore-style glob to a regex body ('/'-separated paths)"""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 3] == '**/':
+                out.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i + 2] == '**':
+                out.append('.*')
+                i += 2
+                continue
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = pattern.find(']', i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+class IgnoreRule:
+    """One parsed .gitignore line"""
+
+    __slots__ = ("regex", "negate", "dir_only")
+
+    def __init__(self, line: str):
+        self.negate = line.startswith('!')
+        if self.negate:
+            line = line[1:]
+        elif line.startswith('\\'):
+            line = line[1:]
+        self.dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        line = line.lstrip('/')
+        prefix = '' if anchored else '(?:.*/)?'
+        self.regex = re.compile(f'^{prefix}{_translate_glob(line)}$')
+
+
+def parse_gitignore(text: str) -> List[IgnoreRule]:
+    """Parse .gitignore content into rules (blank lines and comments skipped)"""
+    rules = []
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        rules.append(IgnoreRule(line))
+    return rules
+
+
+class IgnoreStack:
+    """Active .gitignore rule sets, each relative to the directory that defined it"""
+
+    def __init__(self, layers: Optional[List[Tuple[str, str, List[IgnoreRule]]]] = None):
+        self.layers = layers or []
+
+    def push(self, base: str, rules: List[IgnoreRule], prefix: str = '') -> "IgnoreStack":
+        """
+        Add rules defined in directory base (walk-relative).
+
+        prefix re-bases paths for rules defined above the walk root.
+        """
+        if not rules:
+            return self
+        return IgnoreStack(self.layers + [(base, prefix, rules)])
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """Last matching rule wins; negations re-include"""
+        result = False
+        for base, prefix, rules in self.layers:
+            if base:
+                if not path.startswith(base + '/'):
+                    continue
+                rel = path[len(base) + 1:]
+            else:
+                rel = path
+            if prefix:
+                rel = f"{prefix}/{rel}"
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(rel):
+                    result = not rule.negate
+        return result
+
+
+def _read_gitignore(directory: str) -> List[IgnoreRule]:
+    path = os.path.join(directory, '.gitignore')
+    note(path)
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return parse_gitignore(f.read())
+    except OSError:
+        return []
+
+
+def ancestor_ignores(root: Path) -> IgnoreStack:
+    """Collect .gitignore rules defined above root inside its git work tree"""
+    root = root.resolve()
+    chain = []
+    current = root
+    while True:
+        chain.append(current)
+        if (current / '.git').exists() or current.parent == current:
+            break
+        current = current.parent
+    if not (chain[-1] / '.git').exists():
+        return IgnoreStack()
+
+    stack = IgnoreStack()
+    for ancestor in reversed(chain[1:]):
+        stack = stack.push('', _read_gitignore(str(ancestor)), prefix=root.relative_to(ancestor).as_posix())
+    return stack
+
+
+class CachedEntry:
+    """os.DirEntry stand-in rebuilt from a cached listing; stat() is lazy and memoised"""
+
+    __slots__ = ("name", "path", "_symlink", "_dir", "_file", "_stat")
+
+    def __init__(self, directory: str, name: str, flags: int):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._symlink = bool(flags & 1)
+        self._dir = bool(flags & 2)
+        self._file = bool(flags & 4)
+        self._stat: Optional[os.stat_result] = None
+
+    def is_symlink(self) -> bool:
+        return self._symlink
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._dir and (follow_symlinks or not self._symlink)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return self._file and (follow_symlinks or not self._symlink)
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if not follow_symlinks and self._symlink:
+            return os.lstat(self.path)
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _entry_flags(entry: os.DirEntry) -> int:
+    try:
+        return (int(entry.is_symlink()) | (2 if entry.is_dir() else 0)
+                | (4 if entry.is_file() else 0))
+    except OSError:
+        return 0
+
+
+class DirCache:
+    """
+    Directory listings keyed by absolute path, valid while the directory's
+    mtime is unchanged.
+
+    Listings younger than RACY_NS are not cached: a change within the same
+    mtime tick would otherwise go unnoticed. Entry stat data is not cached
+    (directory mtime does not track file content), so it is re-read lazily.
+    """
+
+    RACY_NS = 1_000_000_000
+
+    def __init__(self, path: Optional[Path] = None, max_dirs: int = 50000):
+        self.path = path
+        self.max_dirs = max_dirs
+        self.hits = 0
+        self.misses = 0
+        self._dirs: Dict[str, Tuple[int, List[Tuple[str, int]]]] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                data = json.loads(path.read_text())
+                if data.get("version") == 1:
+                    self._dirs = {k: (v[0], [tuple(e) for e in v[1]]) for k, v in data["dirs"].items()}
+            except (OSError, ValueError, KeyError, TypeError, IndexError):
+                self._dirs = {}
+
+    def scandir(self, directory: str) -> List[Any]:
+        """Name-sorted entries of directory ([] if unreadable)"""
+        key = os.path.abspath(directory)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._dirs.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            self.hits += 1
+            return [CachedEntry(directory, name, flags) for name, flags in cached[1]]
+
+        self.misses += 1
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return []
+        self._dirs.pop(key, None)
+        if time.time_ns() - mtime_ns > self.RACY_NS:
+            self._dirs[key] = (mtime_ns, [(e.name, _entry_flags(e)) for e in entries])
+            while len(self._dirs) > self.max_dirs:
+                del self._dirs[next(iter(self._dirs))]
+        self._dirty = True
+        return entries
+
+    def invalidate(self, path: str) -> None:
+        """Forget the listing of path and of its parent directory"""
+        key = os.path.abspath(path)
+        for k in (key, os.path.dirname(key)):
+            if self._dirs.pop(k, None) is not None:
+                self._dirty = True
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "dirs": len(self._dirs)}
+
+    def save(self) -> None:
+        """Persist to self.path (atomic replace); no-op when unchanged or in-memory"""
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"version": 1, "dirs": {k: [v[0], v[1]] for k, v in self._dirs.items()}}))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def walk(
+    root: Path,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS,
+    use_gitignore: bool = True,
+    include_hidden: bool = True,
+    max_depth: Optional[int] = None,
+    follow_symlinks: bool = False,
+    cache: Optional[DirCache] = None,
+) -> Iterator[Tuple[os.DirEntry, str, int]]:
+    """
+    Depth-first walk yielding (entry, relative_posix_path, depth) for files and dirs.
+
+    Depth of root's direct children is 0. Excluded/ignored directories are
+    pruned before descent and never yielded; max_depth stops descent
+    below that level. With a cache, unchanged directories are listed
+    from it and entries are CachedEntry objects.
+    """
+    exclude_set = set(exclude or ())
+    base_ignores = ancestor_ignores(root) if use_gitignore else IgnoreStack()
+
+    def scan(directory: str) -> List[os.DirEntry]:
+        note(directory)
+        if cache is not None:
+            return cache.scandir(directory)
+        try:
+            with os.scandir(directory) as it:
+                return sorted(it, key=lambda e: e.name)
+        except OSError:
+            return []
+
+    def ignores_for(directory: str, rel: str, entries: List[os.DirEntry], parent: IgnoreStack) -> IgnoreStack:
+        # Only open .gitignore where the listing shows one
+        if not use_gitignore or not any(e.name == '.gitignore' for e in entries):
+            return parent
+        return parent.push(rel, _read_gitignore(directory))
+
+    root_str = str(root)
+    root_entries = scan(root_str)
+    stack: List[Tuple[Iterator[os.DirEntry], str, int, IgnoreStack]] = [
+        (iter(root_entries), '', 0, ignores_for(root_str, '', root_entries, base_ignores))
+    ]
+    while stack:
+        entries, rel_dir, depth, ignores = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        name = entry.name
+        if not include_hidden and name.startswith('.'):
+            continue
+        try:
+            is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+        except OSError:
+            continue
+        if is_dir and name in exclude_set:
+            continue
+        rel = f"{rel_dir}/{name}" if rel_dir else name
+        if use_gitignore and ignores.ignored(rel, is_dir):
+            continue
+        note(entry.path)
+        yield entry, rel, depth
+        if is_dir and (max_depth is None or depth < max_depth):
+            children = scan(entry.path)
+            stack.append((iter(children), rel, depth + 1, ignores_for(entry.path, rel, children, ignores)))
+
+
+def iter_files(
+    roots: Sequence[Path],
+    exclude: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS,
+    use_gitignore: bool = True,
+) -> Iterator[str]:
+    """Yield file paths under roots (a root may itself be a file)"""
+    for root in roots:
+        if root.is_file():
+            note(root)
+            yield str(root)
+            continue
+        for entry, _, _ in walk(root, exclude=exclude, use_gitignore=use_gitignore):
+            try:
+                if entry.is_file():
+                    yield entry.path
+            except OSError:
+                continue
+
+
+class GlobMatcher:
+    """Several root-relative globs ('*', '?', '[...]', '**/') compiled into one regex"""
+
+    def __init__(self, globs: Sequence[str]):
+        cleaned = []
+        for glob in globs:
+            glob = glob.strip()
+            while glob.startswith('./'):
+                glob = glob[2:]
+            glob = glob.strip('/')
+            if glob:
+                cleaned.append(glob)
+        self.globs = cleaned
+        self.regex = re.compile('|'.join(f'(?:{_translate_glob(g)})' for g in cleaned) or '(?!)')
+        # Deepest walk level any glob can reach (None: unbounded)
+        self.max_depth: Optional[int] = max((g.count('/') for g in cleaned), default=0)
+        if any('**' in g for g in cleaned):
+            self.max_depth = None
+
+    def match(self, rel: str) -> bool:
+        return self.regex.fullmatch(rel) is not None
+
+
+def find(
+    root: Path,
+    globs: Sequence[str],
+    exclude: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS,
+    use_gitignore: bool = True,
+    include_hidden: bool = False,
+    cache: Optional[DirCache] = None,
+) -> Iterator[Tuple[os.DirEntry, str]]:
+    """Yield (entry, relative_posix_path) for files and dirs matching any glob"""
+    matcher = GlobMatcher(globs)
+    for entry, rel, _ in walk(root, exclude=exclude, use_gitignore=use_gitignore,
+                              include_hidden=include_hidden, max_depth=matcher.max_depth, cache=cache):
+        if matcher.match(rel):
+            yield entry, rel
@@ -0,0 +1,242 @@
+"""
+Concurrent, cached URL fetching and text extraction for fetch_content.
+
+Architecture:
+- One requests.Session per fetcher with a connection pool sized to the
+  worker count; worker threads share it, so URLs on the same host reuse
+  kept-alive connections
+- HTTPCache keeps one JSON entry per URL (named by the URL's sha256)
+  under <cache-dir>/http_cache: extracted text, status, ETag and
+  Last-Modified. Entries younger than the TTL are served without a
+  request; older ones are revalidated with If-None-Match /
+  If-Modified-Since and reused on 304. Only 200 responses without
+  Cache-Control: no-store are stored
+- Bodies are decoded incrementally and fed chunk by chunk to an
+  HTMLParser that drops script/style content and collapses whitespace as
+  it goes: one pass, and the page is never held whole
+- Repeated URLs in one call are fetched once
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+
+DEFAULT_TTL = 3600
+DEFAULT_TIMEOUT = 15.0
+DEFAULT_WORKERS = 8
+MAX_CHARS = 20000
+CHUNK_SIZE = 64 * 1024
+CACHE_VERSION = 1
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML to text: tags become spaces, whitespace runs collapse"""
+
+    SKIP = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip = 0
+        self._gap = False
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in self.SKIP:
+            self._skip += 1
+        self._gap = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+        self._gap = True
+
+    def handle_startendtag(self, tag: str, attrs: Any) -> None:
+        self._gap = True
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip:
+            self.add_text(data)
+
+    def add_text(self, data: str) -> None:
+        """Append text, collapsing whitespace across calls"""
+        if not data:
+            return
+        words = data.split()
+        if data[0].isspace():
+            self._gap = True
+        for word in words:
+            if self._gap and self._parts:
+                self._parts.append(" ")
+            self._parts.append(word)
+            self._gap = True
+        self._gap = data[-1].isspace() if words else self._gap
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def _is_html(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return not content_type or "html" in content_type or "xml" in content_type
+
+
+def _charset(content_type: str) -> str:
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset" and value.strip():
+            charset = value.strip().strip("\"'")
+            try:
+                codecs.lookup(charset)
+                return charset
+            except LookupError:
+                break
+    return "utf-8"
+
+
+def extract_text(chunks: Iterator[bytes], content_type: str = "") -> str:
+    """Decode and extract text from body chunks in a single pass"""
+    decoder = codecs.getincrementaldecoder(_charset(content_type))(errors="replace")
+    extractor = TextExtractor()
+    html = _is_html(content_type)
+    feed = extractor.feed if html else extractor.add_text
+    for chunk in chunks:
+        if chunk:
+            feed(decoder.decode(chunk))
+    feed(decoder.decode(b"", final=True))
+    if html:
+        extractor.close()
+    return extractor.text()
+
+
+class HTTPCache:
+    """Extracted responses on disk, one JSON file per URL"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads(self._path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION or entry.get("url") != url:
+            return None
+        return entry
+
+    def put(self, url: str, entry: Dict[str, Any]) -> None:
+        path = self._path(url)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({**entry, "version": CACHE_VERSION, "url": url}, ensure_ascii=False),
+                           encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+
+def make_session(pool_size: int = DEFAULT_WORKERS) -> Any:
+    """requests.Session whose per-host connection pool holds pool_size connections"""
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "code-tools fetch_content"
+    return session
+
+
+def _no_store(cache_control: str) -> bool:
+    return any(d.strip().lower() == "no-store" for d in cache_control.split(","))
+
+
+class Fetcher:
+    """Fetch URLs over a shared session, through the cache when one is given"""
+
+    def __init__(self, session: Any, cache: Optional[HTTPCache] = None, ttl: float = DEFAULT_TTL,
+                 timeout: float = DEFAULT_TIMEOUT, max_chars: int = MAX_CHARS):
+        self.session = session
+        self.cache = cache
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_chars = max_chars
+
+    def _result(self, url: str, entry: Dict[str, Any], cache: str, start: float) -> Dict[str, Any]:
+        content = entry["content"]
+        return {
+            "url": url,
+            "status": entry["status"],
+            "content": content[:self.max_chars],
+            "truncated": len(content) > self.max_chars,
+            "cache": cache,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch one URL; network errors propagate"""
+        start = time.perf_counter()
+        entry = self.cache.get(url) if self.cache else None
+        now = time.time()
+        if entry is not None and now - entry.get("fetched_at", 0) < self.ttl:
+            return self._result(url, entry, "hit", start)
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            if resp.status_code == 304 and entry is not None:
+                entry["fetched_at"] = now
+                self.cache.put(url, entry)
+                return self._result(url, entry, "revalidated", start)
+            content_type = resp.headers.get("Content-Type", "")
+            fresh = {
+                "status": resp.status_code,
+                "content": extract_text(resp.iter_content(CHUNK_SIZE), content_type),
+                "content_type": content_type,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "fetched_at": now,
+            }
+            cacheable = resp.status_code == 200 and not _no_store(resp.headers.get("Cache-Control", ""))
+        if self.cache is None:
+            return self._result(url, fresh, "off", start)
+        if cacheable:
+            self.cache.put(url, fresh)
+        return self._result(url, fresh, "miss", start)
+
+    def fetch_many(self, urls: List[str], workers: int = DEFAULT_WORKERS) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(index, result) in completion order; a failed URL's result carries "error" """
+        positions: Dict[str, List[int]] = {}
+        for i, url in enumerate(urls):
+            positions.setdefault(url, []).append(i)
+        if not positions:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(positions)))) as pool:
+            futures = {pool.submit(self.fetch, url): url for url in positions}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"url": url, "error": str(e)}
+                for i in positions[url]:
+                    yield i, result
@@ -1,42 +1,604 @@
+"""
+Run many commands in parallel and merge their JSON envelopes.
+
+Architecture:
+- code-tools commands run in-process by default: each is parsed by one
+  shared code_tools.cli parser and executed with code_tools.batch.execute,
+  which captures its envelope per task, so imports, parsers and session
+  resources (stores, providers) are loaded once instead of per command
+- I/O-bound code-tools commands run on a thread pool in this process;
+  CPU-bound ones (CPU_BOUND_COMMANDS) go to a process pool whose workers
+  keep their imports and session across tasks. Worker processes are
+  started before any thread, so forking never races a running thread
+- Other programs, `code-tools batch`, every command under --mode
+  subprocess and every command with a timeout (only a child process can
+  be killed) run as subprocesses
+- Both pools are bounded by --workers (default: one per core)
+- With --fail-fast the first failure cancels queued commands and kills
+  running children; an interrupt does the same before exiting
+- Results are produced in completion order: --stream prints them as
+  NDJSON as they finish, otherwise they are merged with aggregate timing
+  stats
+- A spec is either a flat list of commands or a DAG of named steps
+  ({"steps": [{"name", "cmd", "depends_on", "for_each", "timeout"}]}).
+  Arguments may reference earlier envelopes as ${step.data[0].path}
+  (implicitly depending on that step); for_each fans a step out over a
+  list, with ${item...} naming the element. A step starts as soon as its
+  dependencies succeed; a failure skips only its dependents. The
+  critical path is computed from measured step durations with
+  code_tools.task_analysis
+- "code-tools" subprocesses resolve to the installed script, else to
+  `python -m code_tools` with this interpreter
+"""
+
 import argparse
 import json
+import os
+import re
+import shutil
 import subprocess
-from typing import List, Dict, Any
-
-
-def run_parallel(commands: List[List[str]]) -> Dict[str, Any]:
-    # Prefer absolute path for code-tools if available
-    import shutil
-    code_tools_bin = shutil.which("code-tools") or shutil.which("code-tools", path="/home/dimitri/.pyenv/versions/3.12.11/bin")
-    normalized = []
-    for cmd in commands:
-        if cmd and cmd[0] == "code-tools" and code_tools_bin:
-            cmd = [code_tools_bin] + cmd[1:]
-        normalized.append(cmd)
-    procs = {i: subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for i, cmd in enumerate(normalized)}
-    results: Dict[str, Any] = {}
-    for i, p in procs.items():
-        out, err = p.communicate()
-        if p.returncode != 0:
-            results[i] = {"ok": False, "error": err.strip() or out.strip(), "cmd": commands[i]}
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Set
+
+
+# Spend their time in Python code under the GIL: run in worker processes
+CPU_BOUND_COMMANDS = {"grep_code", "search_memory", "analyze_dependencies", "sync_memory_graph"}
+# Read stdin or manage their own pool: always a subprocess
+SUBPROCESS_COMMANDS = {"batch"}
+
+MODES = ("auto", "subprocess")
+
+STEP_NAME = re.compile(r"^[A-Za-z_][\w-]*$")
+TEMPLATE = re.compile(r"\$\{([^}]*)\}")
+PATH_PART = re.compile(r"\.([A-Za-z_][\w-]*)|\[(-?\d+)\]|\[(-?\d*):(-?\d*)\]")
+ITEM = "item"
+
+_parser = None
+_parser_lock = threading.Lock()
+_process_context = None
+
+
+def _resolve(cmd: List[str]) -> List[str]:
+    if cmd and cmd[0] == "code-tools":
+        binary = shutil.which("code-tools")
+        return ([binary] if binary else [sys.executable, "-m", "code_tools"]) + cmd[1:]
+    return cmd
+
+
+def placement(cmd: List[str], mode: str = "auto", timeout: Optional[float] = None) -> str:
+    """Where a command runs: subprocess, thread or process"""
+    if mode == "subprocess" or timeout is not None or len(cmd) < 2 or cmd[0] != "code-tools":
+        return "subprocess"
+    if cmd[1] in SUBPROCESS_COMMANDS:
+        return "subprocess"
+    return "process" if cmd[1] in CPU_BOUND_COMMANDS else "thread"
+
+
+def _envelope(out: str, err: str, returncode: int, cmd: List[str]) -> Dict[str, Any]:
+    if returncode != 0:
+        return {"ok": False, "error": err.strip() or out.strip(), "cmd": cmd}
+    try:
+        return json.loads(out.strip())
+    except ValueError:
+        return {"ok": False, "error": "Non-JSON output", "stdout": out, "cmd": cmd}
+
+
+def _executed_envelope(result: Dict[str, Any], cmd: List[str]) -> Dict[str, Any]:
+    """The envelope a subprocess would have produced, from a batch.execute() result"""
+    output = result["output"]
+    if result["exit_code"] == 0 and isinstance(output, dict):
+        return output
+    if isinstance(output, str):
+        text = output
+    else:
+        records = output if isinstance(output, list) else [] if output is None else [output]
+        text = "\n".join(json.dumps(r, ensure_ascii=False) for r in records)
+    if result["exit_code"] != 0:
+        return {"ok": False, "error": result.get("error") or text.strip(), "cmd": cmd}
+    return {"ok": False, "error": "Non-JSON output", "stdout": text, "cmd": cmd}
+
+
+def _execute(argv: List[str]) -> Dict[str, Any]:
+    """Run one code-tools command (argv without "code-tools") in this thread"""
+    global _parser
+    from code_tools.batch import command_parser, execute
+
+    with _parser_lock:
+        if _parser is None:
+            _parser = command_parser()
+    return execute(_parser, argv)
+
+
+def _execute_in_worker(argv: List[str]) -> Dict[str, Any]:
+    """Process pool task: one session per worker process, reused by its tasks"""
+    global _process_context
+    if _process_context is None:
+        from code_tools.batch import session_context
+        _process_context = session_context()
+    return _process_context.run(_execute, argv)
+
+
+def _outcome(envelope: Dict[str, Any]) -> str:
+    return "ok" if envelope.get("ok") is not False else "failed"
+
+
+def _cancelled(cmd: List[str]) -> Dict[str, Any]:
+    return {"outcome": "cancelled", "elapsed_ms": 0.0, "result": {"ok": False, "error": "cancelled", "cmd": cmd}}
+
+
+class _Pools:
+    """
+    The thread pool, optional process pool and live subprocesses of one run.
+
+    submit() returns a future; record() turns it into
+    {outcome, mode, elapsed_ms, result} where outcome is ok, failed,
+    timeout or cancelled.
+    """
+
+    def __init__(self, workers: int, processes: int = 0):
+        self.cancelled = threading.Event()
+        self._live: Set[subprocess.Popen] = set()
+        self._lock = threading.Lock()
+        self._process_futures: Set[Future] = set()
+        self.processes = ProcessPoolExecutor(max_workers=min(workers, processes)) if processes else None
+        if self.processes is not None:
+            # Fork the workers now, before this run starts any thread
+            self.processes.submit(int).result()
+        self.threads = ThreadPoolExecutor(max_workers=workers)
+        from code_tools.batch import session_context
+        self.base = session_context()
+
+    def submit(self, cmd: List[str], where: str, timeout: Optional[float] = None) -> Future:
+        if where == "process":
+            future = self.processes.submit(_execute_in_worker, cmd[1:])
+            self._process_futures.add(future)
+            return future
+        return self.threads.submit(self.base.copy().run, self._timed, cmd, where, timeout)
+
+    def record(self, future: Future, cmd: List[str], where: str) -> Dict[str, Any]:
+        if where != "process":
+            return {**future.result(), "mode": where}
+        self._process_futures.discard(future)
+        if future.cancelled():
+            return {**_cancelled(cmd), "mode": where}
+        try:
+            result = future.result()
+        except Exception as e:
+            return {"outcome": "failed", "mode": where, "elapsed_ms": 0.0,
+                    "result": {"ok": False, "error": f"{type(e).__name__}: {e}", "cmd": cmd}}
+        envelope = _executed_envelope(result, cmd)
+        return {"outcome": _outcome(envelope), "mode": where, "elapsed_ms": result["elapsed_ms"], "result": envelope}
+
+    def _timed(self, cmd: List[str], where: str, timeout: Optional[float]) -> Dict[str, Any]:
+        if self.cancelled.is_set():
+            return _cancelled(cmd)
+        start = time.perf_counter()
+        if where == "thread":
+            envelope = _executed_envelope(_execute(cmd[1:]), cmd)
+            outcome = _outcome(envelope)
         else:
+            envelope, outcome = self._run_subprocess(cmd, timeout)
+        return {"outcome": outcome, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3), "result": envelope}
+
+    def _run_subprocess(self, cmd: List[str], timeout: Optional[float]) -> Tuple[Dict[str, Any], str]:
+        with self._lock:
+            if self.cancelled.is_set():
+                return _cancelled(cmd)["result"], "cancelled"
             try:
-                results[i] = json.loads(out.strip())
-            except Exception:
-                results[i] = {"ok": False, "error": "Non-JSON output", "stdout": out, "cmd": commands[i]}
-    return {"ok": True, "results": results}
+                proc = subprocess.Popen(_resolve(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            except OSError as e:
+                return {"ok": False, "error": str(e), "cmd": cmd}, "failed"
+            self._live.add(proc)
+        try:
+            out, err = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return {"ok": False, "error": f"timed out after {timeout}s", "cmd": cmd}, "timeout"
+        finally:
+            with self._lock:
+                self._live.discard(proc)
+        if self.cancelled.is_set() and proc.returncode < 0:
+            return _cancelled(cmd)["result"], "cancelled"
+        envelope = _envelope(out, err, proc.returncode, cmd)
+        return envelope, _outcome(envelope)
+
+    def cancel(self) -> None:
+        """Kill live subprocesses; queued commands report cancelled"""
+        with self._lock:
+            self.cancelled.set()
+            for proc in self._live:
+                proc.kill()
+        for future in list(self._process_futures):
+            future.cancel()
+
+    def close(self) -> None:
+        self.threads.shutdown(wait=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=True)
+
+
+def iter_parallel(commands: List[List[str]], workers: Optional[int] = None, timeout: Optional[float] = None,
+                  fail_fast: bool = False, mode: str = "auto") -> Iterator[Dict[str, Any]]:
+    """
+    {index, outcome, mode, elapsed_ms, result} per command, in completion order.
+    Each pool runs at most `workers` (default: cores) commands at once.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    where = [placement(cmd, mode, timeout) for cmd in commands]
+    pools = _Pools(workers, where.count("process"))
+    futures: Dict[Future, int] = {}
+    try:
+        for index, cmd in enumerate(commands):
+            futures[pools.submit(cmd, where[index], timeout)] = index
+        for future in as_completed(futures):
+            index = futures[future]
+            record = {"index": index, **pools.record(future, commands[index], where[index])}
+            if fail_fast and record["outcome"] in ("failed", "timeout") and not pools.cancelled.is_set():
+                pools.cancel()
+            yield record
+    finally:
+        # Early exit (interrupt, closed generator): do not leave children behind
+        if not pools.cancelled.is_set() and not all(f.done() for f in futures):
+            pools.cancel()
+        pools.close()
+
+
+class SpecError(ValueError):
+    """Invalid DAG spec or template reference"""
+
+
+def _parse_reference(expr: str) -> Tuple[str, List[Any]]:
+    """"grep.data[0].path" -> ("grep", ["data", 0, "path"]); slices become slice objects"""
+    expr = expr.strip()
+    match = re.match(r"[A-Za-z_][\w-]*", expr)
+    if not match:
+        raise SpecError(f"bad reference ${{{expr}}}")
+    parts: List[Any] = []
+    pos = match.end()
+    while pos < len(expr):
+        part = PATH_PART.match(expr, pos)
+        if not part:
+            raise SpecError(f"bad reference ${{{expr}}} at {expr[pos:]!r}")
+        key, index, start, stop = part.groups()
+        if key is not None:
+            parts.append(key)
+        elif index is not None:
+            parts.append(int(index))
+        else:
+            parts.append(slice(int(start) if start else None, int(stop) if stop else None))
+        pos = part.end()
+    return match.group(0), parts
+
+
+def _lookup(value: Any, parts: List[Any], expr: str) -> Any:
+    for part in parts:
+        try:
+            if isinstance(part, str):
+                if not isinstance(value, dict):
+                    raise KeyError(part)
+                value = value[part]
+            elif isinstance(value, list):
+                value = value[part]
+            else:
+                raise KeyError(part)
+        except (KeyError, IndexError, TypeError):
+            raise SpecError(f"${{{expr}}}: nothing at {part!r}")
+    return value
+
+
+def _references(text: str) -> List[str]:
+    return [_parse_reference(expr)[0] for expr in TEMPLATE.findall(text)]
+
+
+def resolve(expr: str, scope: Dict[str, Any]) -> Any:
+    """Value of one reference such as "grep.data[0].path" in scope (step name -> envelope)"""
+    name, parts = _parse_reference(expr)
+    if name not in scope:
+        raise SpecError(f"${{{expr}}}: unknown step {name!r}")
+    return _lookup(scope[name], parts, expr.strip())
+
+
+def render(arg: str, scope: Dict[str, Any]) -> str:
+    """Substitute ${name.path} references; non-string values are JSON-encoded"""
+    def text_of(value: Any) -> str:
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+    whole = TEMPLATE.fullmatch(arg)
+    if whole:
+        return text_of(resolve(whole.group(1), scope))
+    return TEMPLATE.sub(lambda m: text_of(resolve(m.group(1), scope)), arg)
+
+
+def load_steps(spec: Any) -> List[Dict[str, Any]]:
+    """
+    Validate a DAG spec ({"steps": [...]} or a list of step objects) into
+    steps with explicit and template-implied depends_on. Raises SpecError.
+    """
+    steps = spec.get("steps") if isinstance(spec, dict) else spec
+    if not isinstance(steps, list) or not steps:
+        raise SpecError("spec must be a non-empty list of steps")
+    names: Dict[str, int] = {}
+    parsed = []
+    for number, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise SpecError(f"step {number}: expected an object")
+        name = step.get("name")
+        if not isinstance(name, str) or not STEP_NAME.match(name) or name == ITEM:
+            raise SpecError(f"step {number}: name must be an identifier other than {ITEM!r}")
+        if name in names:
+            raise SpecError(f"duplicate step name {name!r}")
+        cmd = step.get("cmd")
+        if not isinstance(cmd, list) or not cmd or not all(isinstance(a, str) for a in cmd):
+            raise SpecError(f"{name}: cmd must be a non-empty list of strings")
+        depends_on = step.get("depends_on", [])
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        if not isinstance(depends_on, list) or not all(isinstance(d, str) for d in depends_on):
+            raise SpecError(f"{name}: depends_on must be a list of step names")
+        for_each = step.get("for_each")
+        if for_each is not None and (not isinstance(for_each, str) or not TEMPLATE.fullmatch(for_each)):
+            raise SpecError(f"{name}: for_each must be a single ${{step.path}} reference")
+        timeout = step.get("timeout")
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+            raise SpecError(f"{name}: timeout must be a positive number")
+        implied = [ref for text in cmd + ([for_each] if for_each else []) for ref in _references(text)]
+        if (ITEM in implied and for_each is None) or (for_each and ITEM in _references(for_each)):
+            raise SpecError(f"{name}: ${{{ITEM}}} is only defined in the cmd of a for_each step")
+        names[name] = number
+        parsed.append({"name": name, "cmd": cmd, "for_each": for_each, "timeout": timeout,
+                       "depends_on": list(dict.fromkeys(depends_on + [r for r in implied if r != ITEM]))})
+    for step in parsed:
+        for dep in step["depends_on"]:
+            if dep not in names:
+                raise SpecError(f"{step['name']}: unknown dependency {dep!r}")
+
+    from code_tools.task_analysis import find_cycles
+
+    cycles = find_cycles([[names[d] for d in step["depends_on"]] for step in parsed])
+    if cycles:
+        raise SpecError("dependency cycle: " + ", ".join(" <-> ".join(parsed[v]["name"] for v in c) for c in cycles))
+    return parsed
+
+
+def iter_dag(steps: List[Dict[str, Any]], workers: Optional[int] = None, timeout: Optional[float] = None,
+             fail_fast: bool = False, mode: str = "auto") -> Iterator[Dict[str, Any]]:
+    """
+    {step, outcome, mode, started_ms, elapsed_ms, result} per step, in
+    completion order. Steps are submitted as soon as all their dependencies
+    succeeded; dependents of a failed step are reported as skipped.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    by_name = {step["name"]: step for step in steps}
+    dependents: Dict[str, List[str]] = {name: [] for name in by_name}
+    waiting = {}
+    for step in steps:
+        waiting[step["name"]] = len(step["depends_on"])
+        for dep in step["depends_on"]:
+            dependents[dep].append(step["name"])
+    where = {step["name"]: placement(step["cmd"], mode, step["timeout"] or timeout) for step in steps}
+    in_workers = [step for step in steps if where[step["name"]] == "process"]
+    pools = _Pools(workers, workers if any(s["for_each"] for s in in_workers) else len(in_workers))
+    outputs: Dict[str, Any] = {}
+    running: Dict[Future, Tuple[str, int, List[str]]] = {}
+    parts: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+    started: Dict[str, float] = {}
+    start = time.perf_counter()
+    ready = [step["name"] for step in steps if not step["depends_on"]]
+    done: Set[str] = set()
+
+    def now_ms() -> float:
+        return round((time.perf_counter() - start) * 1000, 3)
+
+    def finish(name: str, outcome: str, envelope: Dict[str, Any], step_mode: str) -> Dict[str, Any]:
+        done.add(name)
+        outputs[name] = envelope
+        return {"step": name, "outcome": outcome, "mode": step_mode, "started_ms": started.get(name, now_ms()),
+                "elapsed_ms": round(now_ms() - started.get(name, now_ms()), 3), "result": envelope}
+
+    def skip(name: str, reason: str) -> Iterator[Dict[str, Any]]:
+        """Report every not-yet-finished transitive dependent of name as skipped"""
+        stack = [(d, name) for d in dependents[name]]
+        while stack:
+            dependent, cause = stack.pop()
+            if dependent in done:
+                continue
+            yield finish(dependent, "skipped", {"ok": False, "error": f"skipped: {cause} {reason}"},
+                         where[dependent])
+            stack.extend((d, dependent) for d in dependents[dependent])
+
+    def launch(name: str) -> Iterator[Dict[str, Any]]:
+        step = by_name[name]
+        started[name] = now_ms()
+        scope = {dep: outputs[dep] for dep in step["depends_on"]}
+        try:
+            if step["for_each"] is None:
+                commands = [[render(arg, scope) for arg in step["cmd"]]]
+            else:
+                values = resolve(TEMPLATE.fullmatch(step["for_each"]).group(1), scope)
+                if not isinstance(values, list):
+                    raise SpecError(f"{name}: for_each must resolve to a list")
+                commands = [[render(arg, {**scope, ITEM: value}) for arg in step["cmd"]] for value in values]
+        except SpecError as e:
+            yield finish(name, "failed", {"ok": False, "error": str(e), "cmd": step["cmd"]}, where[name])
+            if fail_fast and not pools.cancelled.is_set():
+                pools.cancel()
+            yield from skip(name, "failed")
+            return
+        if pools.cancelled.is_set():
+            yield finish(name, "cancelled", _cancelled(step["cmd"])["result"], where[name])
+            return
+        parts[name] = [None] * len(commands)
+        if not commands:
+            yield finish(name, "ok", {"ok": True, "tool": "for_each", "data": []}, where[name])
+            yield from release(name)
+        for i, cmd in enumerate(commands):
+            running[pools.submit(cmd, where[name], step["timeout"] or timeout)] = (name, i, cmd)
+
+    def release(name: str) -> Iterator[Dict[str, Any]]:
+        for dependent in dependents[name]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                yield from launch(dependent)
+
+    try:
+        for name in ready:
+            yield from launch(name)
+        while running:
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, i, cmd = running.pop(future)
+                parts[name][i] = pools.record(future, cmd, where[name])
+                if any(p is None for p in parts[name]):
+                    continue
+                records = parts[name]
+                outcomes = [r["outcome"] for r in records]
+                outcome = next((o for o in ("timeout", "failed", "cancelled") if o in outcomes), "ok")
+                if by_name[name]["for_each"] is None:
+                    envelope = records[0]["result"]
+                else:
+                    envelope = {"ok": outcome == "ok", "tool": "for_each", "data": [r["result"] for r in records]}
+                yield finish(name, outcome, envelope, where[name])
+                if outcome == "ok":
+                    yield from release(name)
+                    continue
+                if fail_fast and not pools.cancelled.is_set():
+                    pools.cancel()
+                yield from skip(name, "cancelled" if outcome == "cancelled" else "failed")
+    finally:
+        if running and not pools.cancelled.is_set():
+            pools.cancel()
+        pools.close()
+
+
+def dag_critical_path(steps: List[Dict[str, Any]], records: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Longest chain of measured step durations through the dependency graph"""
+    from code_tools.task_analysis import critical_path, topological_order
+
+    index = {step["name"]: i for i, step in enumerate(steps)}
+    deps = [[index[d] for d in step["depends_on"]] for step in steps]
+    durations = [records[step["name"]]["elapsed_ms"] if step["name"] in records else 0.0 for step in steps]
+    cp = critical_path(deps, topological_order(deps), durations)
+    return {"steps": [steps[v]["name"] for v in cp["path"]], "ms": round(cp["length"], 3)}
+
+
+def _stats(records: List[Dict[str, Any]], workers: int, wall_ms: float) -> Dict[str, Any]:
+    times = [r["elapsed_ms"] for r in records if r["outcome"] not in ("cancelled", "skipped")]
+    total = sum(times)
+    outcomes = [r["outcome"] for r in records]
+    modes = [r["mode"] for r in records]
+    stats = {
+        "count": len(records),
+        "succeeded": outcomes.count("ok"),
+        "failed": outcomes.count("failed"),
+        "timed_out": outcomes.count("timeout"),
+        "cancelled": outcomes.count("cancelled"),
+        "subprocess": modes.count("subprocess"),
+        "in_process": modes.count("thread") + modes.count("process"),
+        "workers": workers,
+        "wall_ms": round(wall_ms, 3),
+        "total_command_ms": round(total, 3),
+        "mean_ms": round(total / len(times), 3) if times else 0.0,
+        "max_ms": max(times) if times else 0.0,
+        "parallelism": round(total / wall_ms, 2) if wall_ms else 0.0,
+    }
+    if "skipped" in outcomes:
+        stats["skipped"] = outcomes.count("skipped")
+    return stats
+
+
+def run_parallel(commands: List[List[str]], workers: Optional[int] = None, timeout: Optional[float] = None,
+                 fail_fast: bool = False, mode: str = "auto") -> Dict[str, Any]:
+    """Merged envelopes keyed by index, with per-command timings and aggregate stats"""
+    workers = max(1, workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    records = sorted(iter_parallel(commands, workers, timeout, fail_fast, mode), key=lambda r: r["index"])
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {
+        "ok": True,
+        "results": {r["index"]: r["result"] for r in records},
+        "timings": {r["index"]: r["elapsed_ms"] for r in records},
+        "stats": _stats(records, workers, wall_ms),
+    }
+
+
+def run_dag(steps: List[Dict[str, Any]], workers: Optional[int] = None, timeout: Optional[float] = None,
+            fail_fast: bool = False, mode: str = "auto") -> Dict[str, Any]:
+    """Step records keyed by name (in spec order), critical path and aggregate stats"""
+    workers = max(1, workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    records = {r["step"]: r for r in iter_dag(steps, workers, timeout, fail_fast, mode)}
+    wall_ms = (time.perf_counter() - start) * 1000
+    ordered = {step["name"]: {k: v for k, v in records[step["name"]].items() if k != "step"} for step in steps}
+    return {
+        "ok": True,
+        "steps": ordered,
+        "critical_path": dag_critical_path(steps, records),
+        "stats": _stats(list(records.values()), workers, wall_ms),
+    }
+
+
+def _print(record: Dict[str, Any]) -> None:
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def _fail(message: str) -> None:
+    print(json.dumps({"ok": False, "error": message}))
+    raise SystemExit(1)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run multiple code-tools commands in parallel")
-    parser.add_argument("--spec", required=True, help="Path to JSON file: array of command arrays")
+    parser.add_argument("--spec", required=True,
+                        help='Path to JSON file: array of command arrays, or {"steps": [...]} for a DAG')
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent commands per pool (default: CPU cores)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Per-command timeout in seconds (runs every command as a subprocess)")
+    parser.add_argument("--fail-fast", action="store_true", help="Cancel remaining commands after the first failure")
+    parser.add_argument("--mode", choices=MODES, default="auto",
+                        help="auto: code-tools commands in-process, others as subprocesses; subprocess: fork every command")
+    parser.add_argument("--stream", action="store_true",
+                        help="NDJSON: one record per command in completion order, then a trailer with stats")
     args = parser.parse_args()
     spec = json.loads(open(args.spec, "r", encoding="utf-8").read())
-    if not isinstance(spec, list) or not all(isinstance(x, list) and x for x in spec):
-        print(json.dumps({"ok": False, "error": "spec must be list of non-empty command arrays"}))
-        raise SystemExit(1)
-    merged = run_parallel(spec)
-    print(json.dumps(merged, ensure_ascii=False))
+    if args.workers is not None and args.workers < 1:
+        _fail("workers must be >= 1")
+    steps = None
+    if isinstance(spec, dict) or (isinstance(spec, list) and spec and all(isinstance(x, dict) for x in spec)):
+        try:
+            steps = load_steps(spec)
+        except SpecError as e:
+            _fail(str(e))
+    elif not isinstance(spec, list) or not all(isinstance(x, list) and x for x in spec):
+        _fail("spec must be list of non-empty command arrays")
+
+    options = dict(workers=args.workers, timeout=args.timeout, fail_fast=args.fail_fast, mode=args.mode)
+    if not args.stream:
+        merged = run_dag(steps, **options) if steps is not None else run_parallel(spec, **options)
+        print(json.dumps(merged, ensure_ascii=False))
+        return
+
+    workers = max(1, args.workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    records = []
+    _print({"type": "header", "ok": True, "tool": "parallel_run", "count": len(steps if steps is not None else spec)})
+    try:
+        produced = iter_dag(steps, **{**options, "workers": workers}) if steps is not None else \
+            iter_parallel(spec, **{**options, "workers": workers})
+        for record in produced:
+            records.append(record)
+            _print({"type": "result", **record})
+    except KeyboardInterrupt:
+        _print({"type": "error", "ok": False, "tool": "parallel_run", "error": "interrupted"})
+        raise SystemExit(130)
+    trailer = {"type": "trailer", "ok": True, "tool": "parallel_run",
+               "stats": _stats(records, workers, (time.perf_counter() - start) * 1000)}
+    if steps is not None:
+        trailer["critical_path"] = dag_critical_path(steps, {r["step"]: r for r in records})
+    _print(trailer)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+"""
+Tests for in-process batch execution (code-tools batch)
+"""
+
+import contextvars
+import json
+import subprocess
+import threading
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools import cli
+from code_tools.batch import command_parser, execute, parse_commands, run_batch
+
+
+def test_parse_commands_json_and_ndjson():
+    assert parse_commands('[["list_dir"], ["code-tools", "read_file", "--path", "x"]]') == [
+        ["list_dir"], ["read_file", "--path", "x"]
+    ]
+    assert parse_commands('["list_dir"]\n\n["grep_code", "--pattern", "a b"]\n') == [
+        ["list_dir"], ["grep_code", "--pattern", "a b"]
+    ]
+    assert parse_commands("  ") == []
+    with pytest.raises(ValueError):
+        parse_commands('["list_dir"]\n{"not": "argv"}')
+    with pytest.raises(ValueError):
+        parse_commands('[["list_dir", 3]]')
+
+
+def test_writes_are_barriers_and_failures_are_per_command(tmp_path):
+    target = tmp_path / "made.txt"
+    commands = [
+        ["read_file", "--path", str(target)],
+        ["create_file", "--file", str(target), "--content", "fresh\n"],
+        ["read_file", "--path", str(target)],
+        ["grep_code", "--pattern", "fresh", "--path", str(tmp_path)],
+        ["read_file", "--start", "2"],
+        ["no_such_command"],
+    ]
+    results = sorted(run_batch(commands, workers=4), key=lambda r: r["index"])
+    assert [r["exit_code"] for r in results] == [1, 0, 0, 0, 1, 2]
+    assert "not found" in results[0]["output"]["error"]
+    assert results[2]["output"]["data"]["content"] == "fresh\n"
+    assert results[3]["output"]["data"][0]["line"] == 1
+    assert results[4]["output"] == {"ok": False, "tool": "read_file", "version": cli.VERSION,
+                                    "error": "Provide --path or --ranges"}
+    assert "invalid choice" in results[5]["error"] and results[5]["output"] is None
+
+
+def test_shared_resources_are_created_once_per_session():
+    made = []
+
+    def factory():
+        made.append(1)
+        return object()
+
+    # Outside a batch every call builds a fresh resource
+    assert cli._shared("thing", "k", factory)[0] is not cli._shared("thing", "k", factory)[0]
+    made.clear()
+
+    ctx = contextvars.copy_context()
+    ctx.run(cli._session.set, {"objects": {}, "lock": threading.Lock()})
+    seen = []
+    threads = [threading.Thread(target=ctx.copy().run, args=(lambda: seen.append(cli._shared("thing", "k", factory)),))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(made) == 1 and len({id(resource) for resource, _ in seen}) == 1
+
+
+def test_needs_env_commands_load_dotenv_in_process(monkeypatch):
+    dotenv = pytest.importorskip("dotenv")
+    calls = []
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda: calls.append(True))
+    monkeypatch.setattr(cli, "_env_loaded", False)
+    parser = command_parser()
+    execute(parser, ["slugify_feature", "--name", "Two Words"])
+    assert calls == []
+    # query_memory reads OPENAI_API_KEY from .env, as it does when run by main()
+    for _ in range(2):
+        execute(parser, ["query_memory", "--dir", "no-such-memory-dir", "--query", "login"])
+    assert calls == [True]
+
+
+def test_batch_cli_reads_stdin_and_streams(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha\nbeta\n")
+    ndjson = '["list_dir", "--path", "."]\n["read_file", "--path", "a.txt", "--start", "2"]\n'
+    data = json.loads(subprocess.check_output(
+        ["code-tools", "batch"], input=ndjson, text=True, cwd=tmp_path
+    ))["data"]
+    assert data["count"] == 2 and data["failed"] == 0
+    assert data["results"][1]["output"]["data"]["content"] == "beta\n"
+
+    lines = subprocess.check_output(
+        ["code-tools", "batch", "--stream", "--commands", ndjson], text=True, cwd=tmp_path
+    ).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["type"] for r in records] == ["header", "result", "result", "trailer"]
+    assert sorted(r["data"]["index"] for r in records[1:3]) == [0, 1]
@@ -60,6 +60,9 @@ def test_read_file_bad_ranges(tmp_path):
     data = run_fail(["code-tools", "read_file", "--path", str(p), "--start", "0", "--end", "1"])  # start < 1
     assert "start must be" in data.get("error", "")
 
+    for ranges in ["[{bad", f"@{tmp_path / 'missing.json'}", json.dumps([{"path": str(p), "start": "1"}])]:
+        data = run_fail(["code-tools", "read_file", "--ranges", ranges])
+        assert "ranges" in data.get("error", "")
 
 def test_search_replace_uniqueness(tmp_path):
     f = tmp_path / "t.txt"
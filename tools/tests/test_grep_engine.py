@@ -0,0 +1,119 @@
+"""
+Tests for the parallel grep engine and gitignore-aware walker
+"""
+
+import json
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.grep_engine import grep
+from code_tools.literal_search import analyze_pattern, AhoCorasick, AHO_CORASICK_MIN_PATTERNS
+from code_tools.walker import iter_files, parse_gitignore, IgnoreStack
+
+
+def _tree(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.log\nout/\n!keep.log\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("import os\n# TODO: first\nx = 1\n# TODO: second\n")
+    (tmp_path / "src" / "b.py").write_text("café = 'TODO: unicode'\n")
+    (tmp_path / "src" / "blob.bin").write_bytes(b"\0\1TODO\2")
+    (tmp_path / "debug.log").write_text("TODO in ignored log\n")
+    (tmp_path / "keep.log").write_text("TODO in negated log\n")
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "gen.py").write_text("TODO generated\n")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "dep.js").write_text("// TODO vendored\n")
+
+
+def test_gitignore_rules():
+    stack = IgnoreStack().push('', parse_gitignore("build/\n/root.txt\n*.tmp\n!keep.tmp\ndocs/**/*.bak\n"))
+    assert stack.ignored("build", True)
+    assert not stack.ignored("build", False)
+    assert stack.ignored("root.txt", False)
+    assert not stack.ignored("sub/root.txt", False)
+    assert stack.ignored("a/b/c.tmp", False)
+    assert not stack.ignored("keep.tmp", False)
+    assert stack.ignored("docs/x/y/z.bak", False)
+
+
+def test_walker_prunes_ignored_and_excluded(tmp_path):
+    _tree(tmp_path)
+    files = [Path(p).relative_to(tmp_path).as_posix() for p in iter_files([tmp_path])]
+    assert files == [".gitignore", "keep.log", "src/a.py", "src/b.py", "src/blob.bin"]
+
+
+def test_grep_order_binary_skip_and_context(tmp_path):
+    _tree(tmp_path)
+    matches = list(grep([tmp_path], r"TODO", limit=10, context=1, workers=4))
+    found = [(Path(m["path"]).name, m["line"]) for m in matches]
+    assert found == [("keep.log", 1), ("a.py", 2), ("a.py", 4), ("b.py", 1)]
+    assert matches[1]["before"] == ["import os"] and matches[1]["after"] == ["x = 1"]
+    assert matches[2]["after"] == []
+
+
+def test_grep_unicode_semantics_and_limit(tmp_path):
+    _tree(tmp_path)
+    matches = list(grep([tmp_path / "src"], r"caf\w\b", limit=5))
+    assert [m["preview"] for m in matches] == ["café = 'TODO: unicode'"]
+    assert len(list(grep([tmp_path], "TODO", limit=2))) == 2
+
+
+def test_grep_matches_do_not_span_lines(tmp_path):
+    (tmp_path / "m.txt").write_text("alpha\r\nbeta\r\n")
+    assert list(grep([tmp_path], r"alpha\s+beta")) == []
+    matches = list(grep([tmp_path], r"beta$"))
+    assert matches[0]["line"] == 2 and matches[0]["preview"] == "beta"
+
+
+def test_grep_code_cli_no_ignore(tmp_path):
+    _tree(tmp_path)
+    out = subprocess.check_output([
+        "code-tools", "grep_code", "--pattern", "TODO", "--paths", str(tmp_path), "--no-ignore", "--limit", "50"
+    ], text=True)
+    res = json.loads(out)
+    names = {Path(m["path"]).name for m in res["data"]}
+    assert "debug.log" in names and "gen.py" in names
+    assert "dep.js" not in names
+
+
+def test_pattern_analysis():
+    assert analyze_pattern("handle_request").literal == "handle_request"
+    assert analyze_pattern(r"foo\.bar").literal == "foo.bar"
+    info = analyze_pattern(r"^def\s+parse_\w+")
+    assert info.literal is None and info.required == "parse_"
+    assert analyze_pattern("foo|bar").required is None
+    assert analyze_pattern("(?i)needle").required is None
+
+
+def test_aho_corasick_matches_bruteforce():
+    words = [f"w{i}x" for i in range(100)] + ["he", "she", "his", "hers"]
+    ac = AhoCorasick([w.encode() for w in words])
+    text = b"ushers w17x w99x w100x his"
+    found = {(start, words[idx]) for start, idx in ac.iter_matches(text)}
+    expected = {
+        (i, w) for w in words for i in range(len(text))
+        if text.startswith(w.encode(), i)
+    }
+    assert found == expected
+
+
+def test_grep_multi_literal_patterns(tmp_path):
+    (tmp_path / "a.py").write_text("alpha = 1\nbeta = alpha\ngamma = 3\n")
+    matches = list(grep([tmp_path], patterns=["beta", "alpha"]))
+    assert [m["line"] for m in matches] == [1, 2]
+    assert matches[1]["matches"] == ["beta", "alpha"]
+
+    many = [f"token_{i}" for i in range(AHO_CORASICK_MIN_PATTERNS)] + ["gamma"]
+    matches = list(grep([tmp_path], patterns=many))
+    assert [(m["line"], m["matches"]) for m in matches] == [(3, ["gamma"])]
+
+
+def test_grep_literal_and_prefilter_paths_agree_with_regex(tmp_path):
+    (tmp_path / "u.txt").write_text("naïve parse_x\r\nplain\r\nparse_y done\r\n", newline="")
+    assert [m["line"] for m in grep([tmp_path], "parse_")] == [1, 3]
+    matches = list(grep([tmp_path], r"parse_\w+ done$"))
+    assert [(m["line"], m["preview"]) for m in matches] == [(3, "parse_y done")]
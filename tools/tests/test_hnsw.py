@@ -0,0 +1,154 @@
+"""
+Tests for the HNSW index: recall against exact search, persistence, tombstones, relinking and rebuilds
+"""
+
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools.hnsw import HNSWGraph, graph_files  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 16
+
+
+def _chunks(vectors, start=0):
+    return [
+        CodeChunk(id=f"c{start + i}", file_path=f"src/m{(start + i) % 10}.py", start_line=1, end_line=2,
+                  chunk_type="function", name="f", content="pass", language="python", embedding=v.tolist())
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _recall(store, vectors, queries, k=10, keep=None, **kwargs):
+    total = 0.0
+    for q in queries:
+        dist = ((vectors - q) ** 2).sum(axis=1)
+        if keep is not None:
+            dist[~keep] = np.inf
+        truth = {f"c{i}" for i in np.argsort(dist)[:k]}
+        found = {c.id for c, _ in store.search(q.tolist(), limit=k, **kwargs)}
+        total += len(found & truth) / k
+    return total / len(queries)
+
+
+def test_graph_recall_and_persistence(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((800, DIM)).astype(np.float32)
+    graph = HNSWGraph(tmp_path / "g.hnsw", m=8, ef_construction=64)
+    graph.add(vectors, range(400))
+    graph.add(vectors, range(400, 800))
+    graph.save()
+    assert graph.count == 800 and graph.max_level >= 1
+    # Layer 0 keeps at most 2*M links per node, upper layers M
+    assert graph._links0.shape[1] == 16 and all(len(links) == 8 for layer in graph.upper for links in layer.values())
+    graph.close()
+
+    loaded = HNSWGraph(tmp_path / "g.hnsw", m=32)
+    assert (loaded.m, loaded.ef_construction, loaded.count) == (8, 64, 800)
+    queries = rng.standard_normal((30, DIM)).astype(np.float32)
+    hits = 0
+    for q in queries:
+        truth = set(np.argsort(((vectors - q) ** 2).sum(axis=1))[:10].tolist())
+        found = loaded.search(vectors, q, 10, ef=100)
+        assert [d for d, _ in found] == sorted(d for d, _ in found)
+        hits += len(truth & {r for _, r in found})
+    assert hits / (10 * len(queries)) >= 0.95
+    assert {r for _, r in loaded.search(vectors, queries[0], 10, ef=100, accept=lambda r: r % 2 == 0)} <= set(range(0, 800, 2))
+    loaded.close()
+
+
+def _sequential_heuristic(vectors, candidates, width):
+    # The heuristic as written in the paper: one candidate at a time
+    selected, pruned = [], []
+    for d, row in candidates:
+        if len(selected) >= width:
+            break
+        if all(((vectors[row] - vectors[s]) ** 2).sum() > d for s in selected):
+            selected.append(row)
+        else:
+            pruned.append(row)
+    return selected + pruned[:width - len(selected)]
+
+
+def test_batched_heuristic_matches_sequential_selection(tmp_path):
+    rng = np.random.default_rng(3)
+    # Small integers keep every distance exact, so ties break the same way in both
+    vectors = rng.integers(-4, 5, (500, DIM)).astype(np.float32)
+    pools, dists, expected = [], [], []
+    for _ in range(20):
+        query, rows = vectors[rng.integers(500)], rng.choice(500, 33, replace=False)
+        dist = ((vectors[rows] - query) ** 2).sum(axis=1)
+        order = np.argsort(dist)
+        pools.append(rows[order])
+        dists.append(dist[order])
+        expected.append(_sequential_heuristic(vectors, list(zip(dist[order], rows[order])), 16))
+    # One call for every pool, as _link_back does for all full neighbours
+    assert HNSWGraph._heuristic(vectors, np.array(pools), np.array(dists), 16).tolist() == expected
+
+    # A single large pool, as _select gets from the construction search
+    dist = ((vectors - vectors[0]) ** 2).sum(axis=1)
+    candidates = sorted(zip(dist.tolist(), range(500)))[1:200]
+    graph = HNSWGraph(tmp_path / "g.hnsw")
+    assert graph._select(vectors, candidates, 16) == _sequential_heuristic(vectors, candidates, 16)
+
+
+def test_store_with_hnsw_index(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((600, DIM)).astype(np.float32)
+    queries = rng.standard_normal((20, DIM)).astype(np.float32)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index="hnsw", hnsw_m=8, ef_construction=64)
+    for start in range(0, 600, 50):
+        store.batch_upsert(_chunks(vectors[start:start + 50], start))
+    assert _recall(store, vectors, queries, ef_search=100) >= 0.95
+
+    # Tombstoned and filtered-out rows are never returned
+    store.delete_by_file("src/m3.py")
+    keep = np.array([i % 10 != 3 for i in range(600)])
+    assert _recall(store, vectors, queries, keep=keep, ef_search=100) >= 0.95
+    hits = store.search(queries[0].tolist(), limit=5, file_filter="m4")
+    assert len(hits) == 5 and all(c.file_path == "src/m4.py" for c, _ in hits)
+
+    # An overwritten vector is found at its new position
+    moved = rng.standard_normal(DIM).astype(np.float32) * 3
+    store.upsert_chunk(_chunks([moved], start=7)[0])
+    vectors[7] = moved
+    assert store.search(moved.tolist(), limit=1)[0][0].id == "c7"
+    store.close()
+
+    # Settings are recorded; changing M rebuilds the graph from the stored vectors
+    reopened = VectorStore(tmp_path / "codebase.db", hnsw_m=12)
+    assert reopened.index_type == "hnsw"
+    assert reopened.get_stats()["hnsw"]["m"] == 12 and reopened.get_stats()["hnsw"]["nodes"] == 600
+    assert _recall(reopened, vectors, queries, keep=keep) >= 0.9
+    assert reopened.compact() == 60
+    assert reopened.get_stats()["hnsw"]["nodes"] == 540
+    assert reopened.search(moved.tolist(), limit=1)[0][0].id == "c7"
+    reopened.close()
+
+    # Switching back to flat drops the graph files
+    VectorStore(tmp_path / "codebase.db", index="flat").close()
+    assert not any(p.exists() for p in graph_files(tmp_path / "codebase.hnsw"))
+
+
+def test_graph_catches_up_with_the_matrix(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.standard_normal((300, DIM)).astype(np.float32)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index="hnsw", hnsw_m=8, ef_construction=32)
+    store.batch_upsert(_chunks(vectors[:200]))
+    saved = {p: p.read_bytes() for p in graph_files(tmp_path / "codebase.hnsw")}
+    store.batch_upsert(_chunks(vectors[200:], 200))
+    store.close()
+    # As if the process died after committing the rows but before saving the graph
+    for path, content in saved.items():
+        path.write_bytes(content)
+    store = VectorStore(tmp_path / "codebase.db")
+    assert store.get_stats()["hnsw"]["nodes"] == 300
+    assert store.search(vectors[250].tolist(), limit=1)[0][0].id == "c250"
+    store.close()
@@ -0,0 +1,111 @@
+"""
+Tests for the line-offset index and ranged reads behind read_file
+"""
+
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools import line_index
+from code_tools.line_index import read_ranges
+
+
+def _expected(path: Path, start, end) -> str:
+    with path.open('r', encoding='utf-8', errors='ignore') as f:
+        lines = f.readlines()
+    return ''.join(lines[(start or 1) - 1:end])
+
+
+def test_ranges_match_text_mode_for_all_newline_styles(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_index, "CHECKPOINT_EVERY", 4)
+    monkeypatch.setattr(line_index, "BLOCK_BYTES", 7)  # force checkpoints across blocks
+    bodies = {
+        "lf.txt": "".join(f"línea {i}\n" for i in range(1, 40)),
+        "crlf.txt": "".join(f"line {i}\r\n" for i in range(1, 40)) + "tail",
+        "mixed.txt": "a\rb\r\nc\nd\r\re\n" * 6 + "\r",
+    }
+    windows = [(None, None), (1, 3), (5, 5), (9, 17), (30, None), (38, 45), (50, 60), (7, 3)]
+    for name, body in bodies.items():
+        path = tmp_path / name
+        path.write_bytes(body.encode('utf-8'))
+        got = read_ranges(str(path), windows)
+        for (start, end), window in zip(windows, got):
+            expected = _expected(path, start, end) if end is None or end >= (start or 1) else ""
+            assert window["content"] == expected, (name, start, end)
+            assert window["line_count"] == len(expected.splitlines())
+
+
+def test_index_is_cached_and_invalidated(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_index, "CHECKPOINT_EVERY", 8)
+    monkeypatch.setattr(line_index, "PERSIST_MIN_BYTES", 1)
+    path = tmp_path / "big.log"
+    path.write_text("".join(f"entry {i}\n" for i in range(1, 101)))
+    index_dir = tmp_path / "memory"
+
+    assert read_ranges(str(path), [(90, 91)], index_dir)[0]["content"] == "entry 90\nentry 91\n"
+    saved = list((index_dir / "line-index").glob("*.npy"))
+    assert len(saved) == 1
+    line_index._cache.clear()
+    loaded = line_index.LineIndex.load(saved[0])
+    assert loaded.lines == 100 and len(loaded.checkpoints) == 13
+
+    path.write_text("".join(f"changed {i}\n" for i in range(1, 51)))
+    os.utime(path, ns=(1, 1))
+    assert read_ranges(str(path), [(49, None)], index_dir)[0]["content"] == "changed 49\nchanged 50\n"
+
+
+def test_cache_hit_is_safe_against_concurrent_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_index, "CHECKPOINT_EVERY", 4)
+    monkeypatch.setattr(line_index, "MAX_CACHED_INDEXES", 1)
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    for path in (first, second):
+        path.write_text("".join(f"{path.stem} {n}\n" for n in range(1, 41)))
+    evictions = []
+
+    class RacingCache(line_index.OrderedDict):
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            if value is not None and not evictions:
+                # Another batch thread caches a second file (evicting this one) mid-lookup
+                evictions.append(threading.Thread(target=read_ranges, args=(str(second), [(30, 30)])))
+                evictions[0].start()
+                evictions[0].join(timeout=0.2)
+            return value
+
+    monkeypatch.setattr(line_index, "_cache", RacingCache())
+    assert read_ranges(str(first), [(30, 30)])[0]["content"] == "first 30\n"
+    # The cache hit: the evicting thread waits for it instead of removing the entry under it
+    assert read_ranges(str(first), [(31, 31)])[0]["content"] == "first 31\n"
+    evictions[0].join()
+    assert list(line_index._cache) == [str(second)]
+
+
+def test_read_file_cli_multi_range(tmp_path):
+    a = tmp_path / "a.txt"
+    a.write_text("".join(f"a{i}\n" for i in range(1, 3001)))
+    b = tmp_path / "b.txt"
+    b.write_text("one\ntwo\n")
+    ranges = [
+        {"path": str(a), "start": 2500, "end": 2501},
+        {"path": str(b), "start": 2},
+        {"path": str(a), "start": 1, "end": 1},
+        {"path": str(tmp_path / "missing.txt"), "start": 1, "end": 2},
+    ]
+    out = subprocess.check_output(
+        ["code-tools", "read_file", "--ranges", json.dumps(ranges)], text=True, cwd=tmp_path
+    )
+    data = json.loads(out)["data"]
+    assert data["count"] == 4
+    assert [w.get("content") for w in data["ranges"][:3]] == ["a2500\na2501\n", "two\n", "a1\n"]
+    assert "not found" in data["ranges"][3]["error"]
+
+    single = json.loads(subprocess.check_output(
+        ["code-tools", "read_file", "--path", str(a), "--start", "2999"], text=True, cwd=tmp_path
+    ))["data"]
+    assert single == {"path": str(a), "start": 2999, "end": None, "content": "a2999\na3000\n", "line_count": 2}
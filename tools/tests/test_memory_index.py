@@ -0,0 +1,89 @@
+"""
+Tests for the section-level BM25 index behind search_memory
+"""
+
+import json
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.memory_index import MemoryIndex, split_sections, snippet, MAX_SECTION_CHARS
+
+
+AUTH_DOC = """# Architecture
+
+Overview of the services and how they talk to each other.
+
+## Auth flow
+
+Login posts credentials, the auth service issues a session token
+and the gateway validates the token on every request.
+
+```python
+# Not a heading: inside a code fence
+login(user)
+```
+
+## Database
+
+Postgres with a read replica; config lives in settings.toml.
+"""
+
+
+def test_split_sections_headings_fences_and_long_text():
+    sections = split_sections(AUTH_DOC)
+    assert [(s.heading, s.start_line, s.end_line) for s in sections] == [
+        ("Architecture", 1, 4), ("Auth flow", 5, 14), ("Database", 15, 17)
+    ]
+    assert "# Not a heading" in sections[1].text
+
+    paragraphs = "\n\n".join(f"paragraph {i} " + "word " * 60 for i in range(40))
+    long_sections = split_sections(paragraphs)
+    assert len(long_sections) > 1
+    assert all(len(s.text) <= MAX_SECTION_CHARS + 400 for s in long_sections)
+    assert long_sections[1].text.startswith("paragraph")
+
+
+def test_snippet_windows_on_first_hit():
+    text = "\n".join(["filler line"] * 100 + ["the needle is here"] + ["tail"] * 10)
+    assert snippet(text, {"needle"}, 100).startswith("filler line\nfiller line\nthe needle")
+    text += "\n" + "tail\n" * 100
+    assert snippet(text, {"needle"}, 100).startswith("the needle is here")
+    assert snippet("short", {"x"}) == "short"
+
+
+def test_bm25_ranks_best_section_and_refreshes_incrementally(tmp_path):
+    (tmp_path / "design.md").write_text(AUTH_DOC)
+    (tmp_path / "notes.txt").write_text("auth is mentioned once among many other unrelated words here\n")
+    (tmp_path / "ignored.json").write_text('{"auth": "flow"}')
+    index = MemoryIndex(tmp_path)
+    assert index.refresh() == {"scanned": 2, "updated": 2, "unchanged": 0, "removed": 0}
+
+    results = index.search("auth flow token", topk=5)
+    assert [Path(r["path"]).name for r in results] == ["design.md", "notes.txt"]
+    assert results[0]["heading"] == "Auth flow" and results[0]["lines"] == [5, 14]
+    assert "session token" in results[0]["snippet"] and "Postgres" not in results[0]["snippet"]
+    assert index.search("postgres replica")[0]["heading"] == "Database"
+    assert index.search("nonexistentterm") == []
+
+    assert index.refresh()["unchanged"] == 2
+    (tmp_path / "notes.txt").unlink()
+    (tmp_path / "design.md").write_text("# Auth flow\n\nReplaced with OAuth device codes.\n")
+    assert index.refresh() == {"scanned": 1, "updated": 1, "unchanged": 0, "removed": 1}
+    results = index.search("postgres")
+    assert results == []
+    index.close()
+
+
+def test_search_memory_cli_returns_sections(tmp_path):
+    mem = tmp_path / "memory"
+    mem.mkdir()
+    (mem / "design.md").write_text(AUTH_DOC)
+    cmd = ["code-tools", "search_memory", "--dir", str(mem), "--query", "database config", "--topk", "3"]
+    data = json.loads(subprocess.check_output(cmd, text=True))["data"]
+    assert data[0]["heading"] == "Database" and data[0]["snippet"].startswith("## Database")
+    assert (mem / ".search-index.db").exists()
+    assert json.loads(subprocess.check_output(cmd, text=True))["data"] == data
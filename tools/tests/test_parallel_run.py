@@ -0,0 +1,155 @@
+"""
+Tests for parallel_run: bounded pool, completion order, timeouts, cancellation, in-process execution and DAG specs
+"""
+
+import json
+import subprocess
+import time
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from parallel_run import SpecError, iter_parallel, load_steps, placement, run_dag, run_parallel
+
+
+def _sleeper(seconds: float, exit_code: int = 0) -> list:
+    code = ("import json, sys, time; start = time.time(); time.sleep(%r); "
+            "print(json.dumps({'ok': True, 'data': [start, time.time()]})); sys.exit(%d)" % (seconds, exit_code))
+    return [sys.executable, "-c", code]
+
+
+def test_pool_is_bounded_and_results_arrive_in_completion_order():
+    commands = [_sleeper(0.6)] + [_sleeper(0.2) for _ in range(5)]
+    records = list(iter_parallel(commands, workers=2))
+    assert records[0]["index"] != 0 and records[-1]["index"] != 0
+    spans = [r["result"]["data"] for r in records]
+    for start, _ in spans:
+        running = sum(1 for s, e in spans if s <= start < e)
+        assert running <= 2
+
+    merged = run_parallel(commands, workers=3)
+    assert list(merged["results"]) == list(range(6)) and all(r["ok"] for r in merged["results"].values())
+    stats = merged["stats"]
+    assert stats["count"] == 6 and stats["succeeded"] == 6 and stats["workers"] == 3
+    assert stats["max_ms"] >= 600 and stats["parallelism"] > 1.5
+
+
+def test_timeout_and_fail_fast_cancellation():
+    start = time.perf_counter()
+    merged = run_parallel([_sleeper(30), _sleeper(0.05)], workers=2, timeout=0.5)
+    assert time.perf_counter() - start < 10
+    assert "timed out" in merged["results"][0]["error"] and merged["results"][1]["ok"]
+    assert merged["stats"]["timed_out"] == 1
+
+    start = time.perf_counter()
+    merged = run_parallel([_sleeper(30), _sleeper(0.1, exit_code=1)] + [_sleeper(30)] * 3, workers=2, fail_fast=True)
+    assert time.perf_counter() - start < 10
+    assert merged["results"][1]["ok"] is False
+    assert [merged["results"][i]["error"] for i in (0, 2, 3, 4)] == ["cancelled"] * 4
+    assert merged["stats"]["failed"] == 1 and merged["stats"]["cancelled"] == 4
+
+
+def test_stream_cli(tmp_path):
+    (tmp_path / "a.txt").write_text("A\nB\n")
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps([
+        _sleeper(0.5),
+        ["code-tools", "read_file", "--path", str(tmp_path / "a.txt"), "--start", "1", "--end", "1"],
+    ]))
+    out = subprocess.check_output(["code-tools-parallel", "--spec", str(spec), "--stream", "--workers", "2"], text=True)
+    records = [json.loads(line) for line in out.splitlines()]
+    assert [r["type"] for r in records] == ["header", "result", "result", "trailer"]
+    assert [r["index"] for r in records[1:3]] == [1, 0]
+    assert records[1]["result"]["ok"] and records[-1]["stats"]["succeeded"] == 2
+
+
+def test_in_process_matches_subprocess(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("alpha\nbeta\n")
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "auth.md").write_text("# Auth\n\nlogin flow\n")
+    spec = [
+        ["code-tools", "read_file", "--path", "a.txt", "--start", "2", "--end", "2"],
+        ["code-tools", "grep_code", "--pattern", "beta", "--paths", "."],
+        ["code-tools", "search_memory", "--dir", "memory", "--query", "login"],
+        ["code-tools", "read_file", "--path", "missing.txt"],
+        ["code-tools", "slugify_feature", "--name", "Two Words"],
+        [sys.executable, "-c", "print('{}')"],
+    ]
+    assert [placement(cmd) for cmd in spec] == ["thread", "process", "process", "thread", "thread", "subprocess"]
+    assert placement(spec[0], mode="subprocess") == placement(spec[0], timeout=5) == "subprocess"
+
+    records = {r["index"]: r for r in iter_parallel(spec, workers=2)}
+    assert [records[i]["mode"] for i in range(6)] == ["thread", "process", "process", "thread", "thread", "subprocess"]
+    in_process = {i: r["result"] for i, r in records.items()}
+    forked = run_parallel(spec, workers=2, mode="subprocess")
+    assert in_process == forked["results"]
+    assert in_process[1]["data"][0]["line"] == 2 and in_process[3]["ok"] is False
+    assert forked["stats"]["subprocess"] == 6
+
+    start = time.perf_counter()
+    merged = run_parallel([spec[4]] * 20, workers=2)
+    assert merged["stats"]["in_process"] == 20 and time.perf_counter() - start < 2
+
+
+def test_dag_templates_fan_out_and_subgraph_failure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("x = 1\n# TODO: one\n")
+    (tmp_path / "b.py").write_text("# TODO: two\ny = 2\n")
+    steps = load_steps({"steps": [
+        {"name": "grep", "cmd": ["code-tools", "grep_code", "--pattern", "TODO", "--paths", "."]},
+        {"name": "read", "for_each": "${grep.data}",
+         "cmd": ["code-tools", "read_file", "--path", "${item.path}", "--start", "${item.line}", "--end", "${item.line}"]},
+        {"name": "first", "cmd": ["code-tools", "slugify_feature", "--name", "hit in ${read.data[0].data.path}"]},
+        {"name": "slow", "cmd": _sleeper(0.4)},
+        {"name": "broken", "cmd": ["code-tools", "read_file", "--path", "missing.txt"]},
+        {"name": "after_broken", "cmd": ["code-tools", "slugify_feature", "--name", "x"], "depends_on": ["broken"]},
+        {"name": "last", "cmd": ["code-tools", "slugify_feature", "--name", "${grep.tool}"], "depends_on": "after_broken"},
+    ]})
+    assert steps[2]["depends_on"] == ["read"] and steps[1]["depends_on"] == ["grep"]
+
+    merged = run_dag(steps, workers=4)
+    out = merged["steps"]
+    assert [r["data"]["content"] for r in out["read"]["result"]["data"]] == ["# TODO: one\n", "# TODO: two\n"]
+    assert out["first"]["result"]["data"]["original"] == "hit in a.py"
+    assert out["broken"]["outcome"] == "failed"
+    assert [out[s]["outcome"] for s in ("after_broken", "last")] == ["skipped", "skipped"]
+    assert out["slow"]["outcome"] == "ok" and merged["stats"]["skipped"] == 2
+    # Independent work overlaps: the chain did not wait for the slow step
+    assert out["first"]["started_ms"] < out["slow"]["started_ms"] + out["slow"]["elapsed_ms"]
+    assert merged["critical_path"]["steps"] in (["slow"], ["grep", "read", "first"])
+    assert merged["critical_path"]["ms"] == max(out["slow"]["elapsed_ms"],
+                                                sum(out[s]["elapsed_ms"] for s in ("grep", "read", "first")))
+
+
+def test_dag_spec_errors(tmp_path):
+    def error(spec):
+        with pytest.raises(SpecError) as info:
+            load_steps(spec)
+        return str(info.value)
+
+    assert "cycle" in error([{"name": "a", "cmd": ["x", "${b.data}"]}, {"name": "b", "cmd": ["x"], "depends_on": ["a"]}])
+    assert "unknown dependency 'c'" in error([{"name": "a", "cmd": ["x"], "depends_on": ["c"]}])
+    assert "for_each" in error([{"name": "a", "cmd": ["x", "${item}"]}])
+    assert "duplicate" in error([{"name": "a", "cmd": ["x"]}, {"name": "a", "cmd": ["y"]}])
+
+    merged = run_dag(load_steps([
+        {"name": "a", "cmd": ["code-tools", "slugify_feature", "--name", "x"]},
+        {"name": "b", "cmd": ["code-tools", "slugify_feature", "--name", "${a.data.nope}"]},
+    ]))
+    assert merged["steps"]["b"]["outcome"] == "failed" and "nothing at 'nope'" in merged["steps"]["b"]["result"]["error"]
+
+    spec = tmp_path / "dag.json"
+    spec.write_text(json.dumps({"steps": [
+        {"name": "a", "cmd": ["code-tools", "slugify_feature", "--name", "One Two"]},
+        {"name": "b", "cmd": ["code-tools", "slugify_feature", "--name", "${a.data.slug}"]},
+    ]}))
+    out = subprocess.check_output(["code-tools-parallel", "--spec", str(spec), "--stream"], text=True)
+    records = [json.loads(line) for line in out.splitlines()]
+    assert [r.get("step") for r in records[1:3]] == ["a", "b"]
+    assert records[2]["result"]["data"]["original"] == "one-two"
+    assert records[-1]["critical_path"]["steps"] == ["a", "b"]
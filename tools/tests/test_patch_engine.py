@@ -0,0 +1,151 @@
+"""
+Tests for unified-diff application behind edit_file
+"""
+
+import difflib
+import json
+import random
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools.patch_engine import PatchError, apply_patches, parse_patch
+
+
+def _diff(old: str, new: str, name: str = "f.txt", context: int = 3) -> str:
+    lines = []
+    for line in difflib.unified_diff(old.splitlines(True), new.splitlines(True), f"a/{name}", f"b/{name}", n=context):
+        lines.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+    return "".join(lines)
+
+
+def test_difflib_patches_round_trip(tmp_path):
+    rng = random.Random(11)
+    for trial in range(60):
+        old = [f"line {rng.randint(0, 9)}\n" for _ in range(rng.randint(0, 40))]
+        new = list(old)
+        for _ in range(rng.randint(1, 4)):
+            k = rng.randint(0, len(new))
+            if rng.random() < 0.5 or not new:
+                new.insert(k, f"added {trial}\n")
+            else:
+                del new[min(k, len(new) - 1)]
+        if rng.random() < 0.3 and new:
+            new[-1] = new[-1].rstrip("\n")
+        if old == new:
+            continue
+        target = tmp_path / "f.txt"
+        target.write_text("".join(old))
+        apply_patches(parse_patch(_diff("".join(old), "".join(new), context=rng.choice([0, 1, 3])).encode()),
+                      root=tmp_path)
+        assert target.read_text() == "".join(new), trial
+
+
+def test_fuzzy_location_and_per_hunk_results(tmp_path):
+    body = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(200))
+    target = tmp_path / "mod.py"
+    target.write_text("# header\n" * 7 + body)
+    patch = """--- a/mod.py
++++ b/mod.py
+@@ -31,3 +31,3 @@
+ def f10():
+-    return 10
++    return 'ten'
+
+@@ -301,4 +301,4 @@
+ # drifted context line
+ def f100():
+-    return 100
++    return 'hundred'
+@@ -400,2 +400,3 @@
+ def   f150():
++    # indented differently in the file
+     return 150
+"""
+    results = apply_patches(parse_patch(patch.encode()), root=tmp_path)
+    hunks = results[0]["hunks"]
+    assert [(h["status"], h["line"], h["offset"]) for h in hunks] == [
+        ("applied", 38, 7), ("applied", 308, 6), ("applied", 458, 58)
+    ]
+    assert [h["fuzz"] for h in hunks] == [0, 1, 0] and [h["whitespace"] for h in hunks] == [False, False, True]
+    text = target.read_text()
+    assert "return 'ten'" in text and "return 'hundred'" in text
+    assert "def f150():\n    # indented differently in the file\n    return 150\n" in text
+
+
+def test_line_endings_and_missing_final_newline(tmp_path):
+    target = tmp_path / "win.txt"
+    target.write_bytes(b"one\r\ntwo\r\nthree")
+    patch = "@@ -2,2 +2,3 @@\n two\n-three\n\\ No newline at end of file\n+three\n+four\n"
+    apply_patches(parse_patch(patch.encode()), target=target)
+    assert target.read_bytes() == b"one\r\ntwo\r\nthree\r\nfour\r\n"
+
+
+def test_multi_file_patch_is_all_or_nothing(tmp_path):
+    (tmp_path / "keep.txt").write_text("a\nb\nc\n")
+    (tmp_path / "gone.txt").write_text("bye\n")
+    patch = (_diff("a\nb\nc\n", "a\nB\nc\n", "keep.txt")
+             + "--- /dev/null\n+++ b/src/new.txt\n@@ -0,0 +1,2 @@\n+hello\n+world\n"
+             + "--- a/gone.txt\n+++ /dev/null\n@@ -1 +0,0 @@\n-bye\n")
+    bad = patch + _diff("x\n", "y\n", "keep.txt").replace("--- a/keep.txt\n+++ b/keep.txt\n", "--- a/gone.txt\n+++ b/gone.txt\n")
+    with pytest.raises(PatchError, match="1 of 4 hunks failed"):
+        apply_patches(parse_patch(bad.encode()), root=tmp_path)
+    assert (tmp_path / "keep.txt").read_text() == "a\nb\nc\n" and not (tmp_path / "src").exists()
+
+    results = apply_patches(parse_patch(patch.encode()), root=tmp_path)
+    assert [r["action"] for r in results] == ["modified", "created", "deleted"]
+    assert (tmp_path / "keep.txt").read_text() == "a\nB\nc\n"
+    assert (tmp_path / "src" / "new.txt").read_text() == "hello\nworld\n"
+    assert not (tmp_path / "gone.txt").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["keep.txt", "src"]
+
+
+def test_header_paths_must_stay_under_root(tmp_path):
+    root = tmp_path / "pt" / "sub"
+    root.mkdir(parents=True)
+    (tmp_path / "pt" / "victim.txt").write_text("a\n")
+    for header in ["../victim.txt", "x/../../victim.txt", str(tmp_path / "pt" / "victim.txt")]:
+        patch = f"--- {header}\n+++ {header}\n@@ -1 +1 @@\n-a\n+pwned\n"
+        with pytest.raises(PatchError, match="Refusing to patch"):
+            apply_patches(parse_patch(patch.encode()), root=root)
+    created = "--- /dev/null\n+++ ../../escaped.txt\n@@ -0,0 +1 @@\n+x\n"
+    with pytest.raises(PatchError, match="Refusing to patch"):
+        apply_patches(parse_patch(created.encode()), root=root)
+    assert (tmp_path / "pt" / "victim.txt").read_text() == "a\n" and not (tmp_path / "escaped.txt").exists()
+
+    # A symlinked directory pointing outside the root is refused as well
+    (root / "link").symlink_to(tmp_path / "pt")
+    patch = "--- link/victim.txt\n+++ link/victim.txt\n@@ -1 +1 @@\n-a\n+pwned\n"
+    with pytest.raises(PatchError, match="resolves outside"):
+        apply_patches(parse_patch(patch.encode()), root=root)
+
+
+def test_edit_file_cli_diff_mode(tmp_path):
+    target = tmp_path / "app.cfg"
+    target.write_text("debug = false\nport = 80\n")
+    spec = tmp_path / "change.diff"
+    spec.write_text(_diff(target.read_text(), "debug = true\nport = 80\n", "app.cfg"))
+    cmd = ["code-tools", "edit_file", "--patch", f"@{spec}", "--root", str(tmp_path)]
+
+    dry = json.loads(subprocess.check_output(cmd + ["--dry-run"], text=True))["data"]
+    assert dry["files"][0]["hunks"][0]["status"] == "applied" and "false" in target.read_text()
+    data = json.loads(subprocess.check_output(cmd, text=True))["data"]
+    assert data["count"] == 1 and data["hunks_applied"] == 1
+    assert target.read_text() == "debug = true\nport = 80\n"
+
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    assert proc.returncode == 1 and "context not found" in json.loads(proc.stdout)["error"]
+
+
+def test_edit_file_content_mode_keeps_permissions(tmp_path):
+    script = tmp_path / "run.sh"
+    script.write_text("echo old\n")
+    script.chmod(0o755)
+    subprocess.check_output(["code-tools", "edit_file", "--mode", "content", "--file", str(script),
+                             "--patch", "echo new\n"], text=True)
+    assert script.read_text() == "echo new\n" and script.stat().st_mode & 0o777 == 0o755
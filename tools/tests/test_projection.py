@@ -0,0 +1,194 @@
+"""
+Tests for embedding dimensions: recorded and checked on open, PCA/truncation re-projection, and provider cache namespaces
+"""
+
+import io
+import json
+from contextlib import redirect_stdout
+from dataclasses import replace
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools import cli, vector_store  # noqa: E402
+from code_tools.embeddings import CachedEmbeddingProvider, EmbeddingProvider  # noqa: E402
+from code_tools.hnsw import graph_files  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 64
+
+
+def _low_rank(n, seed=0):
+    """Unit vectors varying mostly along 12 directions within the leading 48 dimensions (Matryoshka-like)"""
+    rng = np.random.default_rng(seed)
+    basis = np.zeros((12, DIM))
+    basis[:, :48] = np.linalg.qr(np.random.default_rng(42).standard_normal((48, 12)))[0].T
+    vectors = rng.standard_normal((n, 12)) @ basis + 0.02 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _chunks(vectors, start=0):
+    return [
+        CodeChunk(id=f"c{start + i}", file_path=f"src/m{(start + i) % 10}.py", start_line=1, end_line=2,
+                  chunk_type="function", name="f", content="pass", language="python", embedding=v.tolist())
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _recall(store, vectors, queries, k=10):
+    total = 0.0
+    for q in queries:
+        truth = {f"c{i}" for i in np.argsort(((vectors - q) ** 2).sum(axis=1))[:k]}
+        total += len(truth & {c.id for c, _ in store.search(q.tolist(), limit=k)}) / k
+    return total / len(queries)
+
+
+def test_dimension_is_recorded_and_checked(tmp_path):
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", dimension=DIM)
+    assert store.dimension == DIM and store.get_stats()["dimension"] == DIM
+    with pytest.raises(ValueError, match="does not match the index"):
+        store.batch_upsert(_chunks(_low_rank(3)[:, :32]))
+    assert store.get_stats()["total_chunks"] == 0
+    store.close()
+    with pytest.raises(ValueError, match="64-dimensional"):
+        VectorStore(tmp_path / "codebase.db", dimension=32)
+    VectorStore(tmp_path / "codebase.db", dimension=DIM).close()
+
+
+@pytest.mark.parametrize("method", ["pca", "truncate"])
+def test_reproject_without_reembedding(tmp_path, method):
+    vectors, queries = _low_rank(1000), _low_rank(20, seed=1)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index="hnsw", hnsw_m=8, ef_construction=32,
+                        quantization="int8")
+    store.batch_upsert(_chunks(vectors))
+    store.delete_by_file("src/m0.py")
+    result = store.reproject(16 if method == "pca" else 48, method=method)
+    assert (result["vectors"], result["from"]) == (900, DIM)
+    stats = store.get_stats()
+    assert (stats["dimension"], stats["vectors"], stats["tombstones"]) == (result["to"], 900, 0)
+    assert stats["hnsw"]["nodes"] == 900 and stats["quantization"]["trained_on"] > 0
+    if method == "pca":
+        assert stats["projection"][0]["retained"] > 0.95
+    else:
+        # Matryoshka: the leading dimensions, re-normalised, as a provider's dimensions option returns them
+        expected = vectors[1, :48] / np.linalg.norm(vectors[1, :48])
+        assert np.allclose(store._get_index().matrix()[0], expected, atol=1e-6)
+    store.close()
+
+    # Queries and new chunks at the input dimension are projected; reduced ones are stored as they are
+    store = VectorStore(tmp_path / "codebase.db", dimension=DIM)
+    assert (store.dimension, store.input_dimension) == (result["to"], DIM)
+    keep = np.array([i % 10 != 0 for i in range(1000)])
+    truth_vectors = np.where(keep[:, None], vectors, 100.0)
+    assert _recall(store, truth_vectors, queries) >= 0.9
+    store.batch_upsert(_chunks(vectors[:1]))
+    assert store.search(vectors[0].tolist(), limit=1)[0][0].id == "c0"
+    reduced = CodeChunk(id="reduced", file_path="src/r.py", start_line=1, end_line=2, chunk_type="function",
+                        name="r", content="pass", language="python",
+                        embedding=store._prepare([vectors[5]])[0].tolist())
+    if method == "pca":
+        # PCA output is not an embedding space a provider can produce, so only input-dimension vectors are taken
+        with pytest.raises(ValueError, match="does not match the index"):
+            store.upsert_chunk(reduced)
+        with pytest.raises(ValueError, match="reduced to 16 dimensions by PCA"):
+            VectorStore(tmp_path / "codebase.db", dimension=16)
+        store.upsert_chunk(replace(reduced, embedding=vectors[5].tolist()))
+    else:
+        store.upsert_chunk(reduced)
+        VectorStore(tmp_path / "codebase.db", dimension=48).close()
+    assert {c.id for c, _ in store.search(vectors[5].tolist(), limit=2)} == {"c5", "reduced"}
+    with pytest.raises(ValueError):
+        store.search([0.0] * 40, limit=1)
+
+    # A second reduction stacks on the first
+    store.reproject(8, method="truncate")
+    assert (store.dimension, store.input_dimension) == (8, DIM)
+    assert [s["to"] for s in store.get_stats()["projection"]] == [result["to"], 8]
+    assert store.search(vectors[5].tolist(), limit=1)[0][0].id in ("c5", "reduced")
+    store.close()
+
+
+def test_reproject_with_product_quantization(tmp_path):
+    vectors = _low_rank(600)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", quantization="pq", pq_m=16, rerank=2)
+    store.batch_upsert(_chunks(vectors))
+    # 16 subvectors cannot split 40 dimensions: the default for 40 replaces them
+    store.reproject(40, method="truncate")
+    assert store.get_stats()["quantization"]["code_bytes"] == 5
+    store.close()
+    reopened = VectorStore(tmp_path / "codebase.db")
+    assert reopened.search(vectors[9].tolist(), limit=1)[0][0].id == "c9"
+    assert reopened.last_plan["strategy"] == "quantized"
+    reopened.close()
+
+
+def test_interrupted_swap_is_finished_on_open(tmp_path, monkeypatch):
+    vectors = _low_rank(300)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert(_chunks(vectors))
+
+    def crash(*args):
+        raise OSError("killed")
+
+    # The reduced rows are committed but the matrix is not swapped in yet
+    with monkeypatch.context() as patched:
+        patched.setattr(vector_store.os, "replace", crash)
+        with pytest.raises(OSError):
+            store.reproject(16)
+    store._conn.close()
+    store._conn = store._index = None
+
+    reopened = VectorStore(tmp_path / "codebase.db")
+    assert reopened.dimension == 16 and reopened.get_stats()["vectors"] == 300
+    assert not (tmp_path / "codebase.vectors.new").exists()
+    assert reopened.search(vectors[7].tolist(), limit=1)[0][0].id == "c7"
+    reopened.close()
+
+
+def test_reproject_command(tmp_path):
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index="hnsw", hnsw_m=8, ef_construction=32)
+    store.batch_upsert(_chunks(_low_rank(200)))
+    store.close()
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        cli.main(["reproject_code_index", "--dir", str(tmp_path), "--dimensions", "24", "--method", "truncate"])
+    data = json.loads(buf.getvalue())["data"]
+    assert (data["from"], data["to"], data["db_stats"]["hnsw"]["nodes"]) == (DIM, 24, 200)
+    assert all(p.exists() for p in graph_files(tmp_path / "codebase.hnsw"))
+    buf = io.StringIO()
+    with redirect_stdout(buf), pytest.raises(SystemExit):
+        cli.main(["reproject_code_index", "--dir", str(tmp_path), "--dimensions", "24"])
+    assert "between 1 and 23" in json.loads(buf.getvalue())["error"]
+
+
+class _Provider(EmbeddingProvider):
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def embed(self, text):
+        return [1.0]
+
+    def embed_batch(self, texts):
+        return [[1.0] for _ in texts]
+
+    @property
+    def dimension(self):
+        return 1
+
+    @property
+    def cache_namespace(self):
+        return self.namespace
+
+
+def test_cache_keys_depend_on_provider_configuration(tmp_path):
+    default = CachedEmbeddingProvider(_Provider(""), tmp_path / "cache.db")
+    shortened = CachedEmbeddingProvider(_Provider("text-embedding-3-small:256"), tmp_path / "cache.db")
+    # The default configuration keeps the key earlier versions used
+    assert default._hash_text("x") == "2d711642b726b04401627ca9fbac32f5c8530fb1903cc4db02258717921a4881"
+    assert shortened._hash_text("x") != default._hash_text("x")
@@ -0,0 +1,192 @@
+"""
+Tests for quantized vector search: codec accuracy, re-ranked recall, codes following writes, and the packed embedding cache
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools.embeddings import CachedEmbeddingProvider, EmbeddingProvider, pack_embedding  # noqa: E402
+from code_tools.quantization import CodeIndex, ProductCodec, ScalarCodec, code_files  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 32
+
+
+def _clustered(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((20, DIM)).astype(np.float32)
+    return (centres[rng.integers(0, 20, n)] + 0.4 * rng.standard_normal((n, DIM))).astype(np.float32)
+
+
+def _chunks(vectors, start=0):
+    return [
+        CodeChunk(id=f"c{start + i}", file_path=f"src/m{(start + i) % 10}.py", start_line=1, end_line=2,
+                  chunk_type="function", name="f", content="pass", language="python", embedding=v.tolist())
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _recall(store, vectors, queries, k=10, keep=None, **filters):
+    total = 0.0
+    for q in queries:
+        dist = ((vectors - q) ** 2).sum(axis=1)
+        if keep is not None:
+            dist[~keep] = np.inf
+        truth = {f"c{i}" for i in np.argsort(dist)[:k]}
+        total += len(truth & {c.id for c, _ in store.search(q.tolist(), limit=k, **filters)}) / k
+    return total / len(queries)
+
+
+def test_codecs():
+    rng = np.random.default_rng(0)
+    vectors = _clustered(2000)
+    query = vectors[0] + 0.1
+
+    scalar = ScalarCodec(DIM)
+    scalar.train(vectors, rng)
+    codes = scalar.encode(vectors)
+    assert codes.dtype == np.uint8 and codes.shape == (2000, DIM + 4)
+    assert np.abs(scalar.decode(codes) - vectors).max() <= scalar.step.max() / 2 + 1e-5
+
+    pq = ProductCodec(DIM, 4)
+    pq.train(vectors, rng)
+    codes = pq.encode(vectors)
+    assert codes.shape == (2000, 4) and pq.centroids.shape == (4, 256, 8)
+    # Distances are exact for the decoded vectors (asymmetric: the query is not quantized)
+    for codec, block in ((scalar, scalar.encode(vectors[:50])), (pq, codes[:50])):
+        expected = ((codec.decode(block) - query) ** 2).sum(axis=1)
+        assert np.allclose(codec.distance(query)(block), expected, rtol=1e-3, atol=1e-3)
+    with pytest.raises(ValueError):
+        ProductCodec(DIM, 5)
+
+
+def test_code_index_persistence(tmp_path):
+    vectors = _clustered(300)
+    codes = CodeIndex(tmp_path / "c.codes", "pq", DIM, pq_m=8)
+    codes.add(vectors, range(300))
+    codes.save()
+    found = codes.search(vectors[7], 5, np.ones(300, dtype=bool))
+    codes.close()
+
+    loaded = CodeIndex(tmp_path / "c.codes", "pq", DIM, pq_m=8)
+    assert (loaded.count, loaded.trained_on) == (300, 300)
+    assert loaded.search(vectors[7], 5, np.ones(300, dtype=bool)) == found
+    loaded.close()
+    # Codes saved with other parameters are discarded
+    assert CodeIndex(tmp_path / "c.codes", "int8", DIM).count == 0
+
+
+@pytest.mark.parametrize("quantization,code_bytes", [("int8", DIM + 4), ("pq", 8)])
+def test_quantized_store(tmp_path, quantization, code_bytes):
+    vectors = _clustered(3000)
+    queries = _clustered(20, seed=1)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", quantization=quantization, pq_m=code_bytes)
+    for start in range(0, 3000, 300):
+        store.batch_upsert(_chunks(vectors[start:start + 300], start))
+    assert _recall(store, vectors, queries) >= 0.95
+    assert store.last_plan == {"strategy": "quantized", "codec": quantization, "shortlist": 100, "candidates": 3000}
+    stats = store.get_stats()["quantization"]
+    assert stats["codec"] == quantization and stats["rerank"] == 10
+    assert stats["code_bytes"] == code_bytes
+    # Re-ranking is exact: the returned distances are the float32 ones
+    chunk, similarity = store.search(vectors[42].tolist(), limit=1)[0]
+    assert chunk.id == "c42" and similarity == pytest.approx(1.0)
+
+    # Tombstones and filters apply to the codes scan
+    store.delete_by_file("src/m3.py")
+    keep = np.array([i % 10 != 3 for i in range(3000)])
+    assert _recall(store, vectors, queries, keep=keep) >= 0.95
+    hits = store.search(queries[0].tolist(), limit=50, file_filter="m4")
+    assert len(hits) == 50 and all(c.file_path == "src/m4.py" for c, _ in hits)
+
+    # An overwritten vector is re-encoded
+    moved = vectors[5] + 5
+    store.upsert_chunk(_chunks([moved], start=5)[0])
+    assert store.search(moved.tolist(), limit=1)[0][0].id == "c5"
+    assert store.compact() == 300
+    assert store.search(moved.tolist(), limit=1)[0][0].id == "c5"
+    assert store.get_stats()["quantization"]["codes_mb"] > 0
+    store.close()
+
+    # Small or selective searches skip the codes; turning quantization off drops them
+    reopened = VectorStore(tmp_path / "codebase.db", rerank=400)
+    reopened.search(queries[0].tolist(), limit=10)
+    assert reopened.last_plan["strategy"] == "exact-scan"
+    reopened.close()
+    VectorStore(tmp_path / "codebase.db", quantization="none").close()
+    assert not any(p.exists() for p in code_files(tmp_path / "codebase.codes"))
+
+
+def test_codebook_retrained_as_the_index_grows(tmp_path):
+    vectors = _clustered(1200)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", quantization="int8")
+    store.batch_upsert(_chunks(vectors[:100]))
+    assert store.get_stats()["quantization"]["trained_on"] == 100
+    store.batch_upsert(_chunks(vectors[100:300], 100))
+    assert store.get_stats()["quantization"]["trained_on"] == 100
+    store.batch_upsert(_chunks(vectors[300:], 300))
+    assert store.get_stats()["quantization"]["trained_on"] == 1200
+    store.close()
+    with pytest.raises(ValueError):
+        VectorStore(tmp_path / "codebase.db", quantization="pq", pq_m=0)
+
+
+def test_pq_m_must_divide_the_dimension(tmp_path):
+    vectors = _clustered(50)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert(_chunks(vectors))
+    store.close()
+    with pytest.raises(ValueError, match="must divide"):
+        VectorStore(tmp_path / "codebase.db", quantization="pq", pq_m=5)
+    # Nothing was recorded, so the store still opens and searches
+    reopened = VectorStore(tmp_path / "codebase.db")
+    assert reopened.quantization == "none" and reopened.search(vectors[3].tolist(), limit=1)[0][0].id == "c3"
+    reopened.close()
+
+    # With no vectors yet, the first batch is checked before anything is written
+    empty = VectorStore(tmp_path / "empty.db", backend="numpy", quantization="pq", pq_m=5)
+    with pytest.raises(ValueError, match="must divide"):
+        empty.batch_upsert(_chunks(vectors))
+    assert empty.get_stats()["total_chunks"] == 0 and empty.dimension is None
+    empty.close()
+
+
+class _Provider(EmbeddingProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        self.calls += len(texts)
+        return [[float(len(t)), 0.5, -1.25] for t in texts]
+
+    @property
+    def dimension(self):
+        return 3
+
+
+def test_embedding_cache_is_packed_and_reads_json(tmp_path):
+    provider = _Provider()
+    cache = CachedEmbeddingProvider(provider, tmp_path / "embedding_cache.db")
+    assert cache.embed_batch(["ab", "abc"]) == [[2.0, 0.5, -1.25], [3.0, 0.5, -1.25]]
+    conn = sqlite3.connect(str(tmp_path / "embedding_cache.db"))
+    blobs = [row[0] for row in conn.execute("SELECT embedding FROM embedding_cache")]
+    assert sorted(blobs) == [pack_embedding([2.0, 0.5, -1.25]), pack_embedding([3.0, 0.5, -1.25])]
+    assert all(len(blob) == len(b"f32:") + 3 * 4 for blob in blobs)
+    # Entries written as JSON by earlier versions are still served
+    conn.execute("UPDATE embedding_cache SET embedding = ?", (json.dumps([1.0, 2.0, 3.0]).encode(),))
+    conn.commit()
+    conn.close()
+    assert cache.embed("ab") == [1.0, 2.0, 3.0]
+    assert provider.calls == 2
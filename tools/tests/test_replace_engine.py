@@ -0,0 +1,120 @@
+"""
+Tests for the multi-file, single-pass search_replace engine
+"""
+
+import json
+import os
+import random
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools import replace_engine
+from code_tools.literal_search import MultiLiteral, AHO_CORASICK_MIN_PATTERNS
+from code_tools.replace_engine import FilePlan, ReplaceError, apply_plan, load_plan, plan_file
+
+
+def _rep(orig, new, replace_all=False):
+    return {"original_text": orig, "new_text": new, "replace_all": replace_all}
+
+
+def test_occurrences_match_brute_force_for_both_engines():
+    rng = random.Random(5)
+    buf = bytes(rng.choice(b"abc\n") for _ in range(3000))
+    for count in (3, AHO_CORASICK_MIN_PATTERNS + 2):
+        literals = list(dict.fromkeys("".join(rng.choice("abc") for _ in range(rng.randint(1, 4)))
+                                      for _ in range(count * 3)))[:count]
+        matcher = MultiLiteral(literals)
+        expected = sorted(
+            (pos, idx) for idx, lit in enumerate(matcher.encoded)
+            for pos in range(len(buf)) if buf.startswith(lit, pos)
+        )
+        assert sorted(matcher.occurrences(buf)) == expected
+
+
+def test_single_pass_semantics(tmp_path):
+    f = tmp_path / "swap.py"
+    f.write_bytes(b"left = right\r\nright(left)\r\n")
+    # Originals are matched against the file as read: a swap works in one plan
+    edit = plan_file(FilePlan(f, [_rep("left", "right", True), _rep("right", "left", True)]))
+    assert edit.content == b"right = left\r\nleft(right)\r\n"
+    assert [a["count"] for a in edit.applied] == [2, 2]
+
+    with pytest.raises(ValueError, match="overlap at line 1"):
+        plan_file(FilePlan(f, [_rep("left = ", "x"), _rep(" = right", "y")]))
+    with pytest.raises(ValueError, match=r"not unique \(count=2\)"):
+        plan_file(FilePlan(f, [_rep("left", "x")]))
+    with pytest.raises(ValueError, match="not found"):
+        plan_file(FilePlan(f, [_rep("middle", "x")]))
+
+
+def test_plan_is_all_or_nothing(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("alpha beta\n")
+    b.write_text("gamma\n")
+    os.chmod(b, 0o640)
+    plans = load_plan([
+        {"file": str(a), "replacements": [_rep("alpha", "ALPHA")]},
+        {"file": str(b), "replacements": [_rep("delta", "DELTA")]},
+    ])
+    with pytest.raises(ReplaceError) as info:
+        apply_plan(plans)
+    assert info.value.errors == [(str(b), "original_text not found: delta")]
+    assert a.read_text() == "alpha beta\n"
+
+    plans = load_plan({"files": [
+        {"file": str(a), "replacements": [_rep("alpha", "ALPHA")]},
+        {"file": str(b), "replacements": [_rep("gamma", "GAMMA")]},
+        {"file": str(a), "replacements": [_rep("beta", "BETA")]},
+    ]})
+    assert len(plans) == 2
+    apply_plan(plans, workers=2)
+    assert a.read_text() == "ALPHA BETA\n" and b.read_text() == "GAMMA\n"
+    assert (os.stat(b).st_mode & 0o777) == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "b.txt"]
+
+
+def test_failed_swap_restores_committed_files(tmp_path, monkeypatch):
+    files = [tmp_path / f"f{i}.txt" for i in range(3)]
+    for f in files:
+        f.write_text("old\n")
+    plans = [FilePlan(f, [_rep("old", "new")]) for f in files]
+
+    real_replace = os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(dst)
+        if Path(dst) == files[2] and str(src).endswith(".tmp") and len(calls) == 3:
+            raise PermissionError(13, "denied", str(dst))
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(replace_engine.os, "replace", flaky_replace)
+    with pytest.raises(ReplaceError):
+        apply_plan(plans)
+    assert [f.read_text() for f in files] == ["old\n"] * 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["f0.txt", "f1.txt", "f2.txt"]
+
+
+def test_search_replace_cli_plan(tmp_path):
+    for i in range(5):
+        (tmp_path / f"m{i}.py").write_text(f"import old_name\nold_name.run({i})\n")
+    plan = [{"file": str(tmp_path / f"m{i}.py"), "replacements": [_rep("old_name", "new_name", True)]}
+            for i in range(5)]
+    spec = tmp_path / "plan.json"
+    spec.write_text(json.dumps(plan))
+
+    dry = json.loads(subprocess.check_output(
+        ["code-tools", "search_replace", "--plan", f"@{spec}", "--dry-run"], text=True))["data"]
+    assert dry["count"] == 5 and dry["replacements"] == 10 and dry["dry_run"] is True
+    assert "old_name" in (tmp_path / "m0.py").read_text()
+
+    data = json.loads(subprocess.check_output(
+        ["code-tools", "search_replace", "--plan", f"@{spec}"], text=True))["data"]
+    assert [f["applied"][0]["count"] for f in data["files"]] == [2] * 5
+    assert (tmp_path / "m4.py").read_text() == "import new_name\nnew_name.run(4)\n"
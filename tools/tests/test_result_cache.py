@@ -0,0 +1,131 @@
+"""
+Tests for --memo: result reuse keyed by file fingerprints, invalidation, eviction and write bypass
+"""
+
+import io
+import json
+import os
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools import cli
+from code_tools.result_cache import ResultCache, note, recording
+
+
+def _age(*paths: Path) -> None:
+    """Move mtimes out of the racy window so results touching them can be stored"""
+    past = time.time() - 60
+    for path in paths:
+        os.utime(path, (past, past))
+
+
+def _run(*argv: str) -> dict:
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        try:
+            cli.main(list(argv))
+        except SystemExit:
+            pass
+    lines = buf.getvalue().splitlines()
+    return json.loads(lines[0]) if len(lines) == 1 else [json.loads(line) for line in lines]
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("def main():\n    pass\n")
+    (tmp_path / "src" / "b.py").write_text("x = 1\n")
+    memo = tmp_path / "memo"
+    memo.mkdir()
+    _age(tmp_path / "src" / "a.py", tmp_path / "src" / "b.py", tmp_path / "src", tmp_path)
+    return tmp_path
+
+
+def test_hits_until_a_dependency_changes(tree):
+    grep = ("grep_code", "--pattern", "main", "--paths", "src", "--memo", "--memo-dir", "memo")
+    first = _run(*grep)
+    assert first["cached"] is False and first["data"][0]["path"] == "src/a.py"
+    again = _run(*grep)
+    assert again["cached"] is True and again["data"] == first["data"]
+    # Different arguments are a different entry
+    assert _run("grep_code", "--pattern", "x =", "--paths", "src", "--memo", "--memo-dir", "memo")["cached"] is False
+
+    # Editing a file the result depends on, even one without a match, invalidates it
+    (tree / "src" / "b.py").write_text("y = 2\nmain = 1\n")
+    changed = _run(*grep)
+    assert changed["cached"] is False and [m["path"] for m in changed["data"]] == ["src/a.py", "src/b.py"]
+
+    # A new file shows up through the directory's fingerprint
+    _age(tree / "src" / "b.py")
+    read = ("read_file", "--path", "src/c.py", "--memo", "--memo-dir", "memo")
+    assert _run(*read)["ok"] is False
+    (tree / "src" / "c.py").write_text("main()\n")
+    _age(tree / "src" / "c.py", tree / "src")
+    assert _run(*grep)["cached"] is False
+    assert _run(*grep)["cached"] is True
+    assert _run(*read)["data"]["content"] == "main()\n"
+
+    # Streaming replays the same records and reports the hit in the trailer
+    records = _run(*grep, "--stream")
+    assert [r["data"]["path"] for r in records if r["type"] == "result"] == ["src/a.py", "src/b.py", "src/c.py"]
+    assert records[-1]["cached"] is True
+
+
+def test_recently_modified_files_are_not_stored(tree):
+    (tree / "fresh.txt").write_text("new\n")
+    read = ("read_file", "--path", "fresh.txt", "--memo", "--memo-dir", "memo")
+    assert _run(*read)["cached"] is False
+    assert _run(*read)["cached"] is False
+    _age(tree / "fresh.txt")
+    assert _run(*read)["cached"] is False
+    assert _run(*read)["cached"] is True
+    # Without --memo nothing is looked up and the envelope is unchanged
+    assert "cached" not in _run("read_file", "--path", "fresh.txt")
+
+
+def test_lru_eviction_and_own_directory(tmp_path):
+    cache = ResultCache(tmp_path / "memo", max_bytes=600)
+    source = tmp_path / "f.txt"
+    source.write_text("x")
+    _age(source)
+    for key in ("a", "b", "c"):
+        assert cache.put(key, "v" * 150, set())
+    assert cache.get("a") == "v" * 150  # a is now the most recently used
+    assert cache.put("d", "v" * 150, set())
+    assert cache.get("b") is None and cache.get("a") is not None
+    assert cache.stats()["bytes"] <= 600
+    assert not cache.put("huge", "v" * 1000, set())
+
+    # The cache's own files are not dependencies; others are checked on every get
+    assert cache.put("e", 1, {str(source), str(tmp_path / "memo"), str(tmp_path / "memo" / "results.db")})
+    assert cache.get("e") == 1
+    source.write_text("changed")
+    assert cache.get("e") is None
+
+    with recording() as touched:
+        note(source)
+    note(tmp_path / "outside")
+    assert touched == {str(source)}
+    cache.close()
+
+
+def test_batch_commands_share_the_cache_and_writes_bypass_it(tree):
+    from code_tools.batch import run_batch
+
+    assert "memo" not in vars(cli.build_parser().parse_args(["create_file", "--file", "x", "--content", "y"]))
+    commands = [
+        ["read_file", "--path", "src/b.py", "--memo", "--memo-dir", "memo"],
+        ["read_file", "--path", "src/b.py", "--memo", "--memo-dir", "memo"],
+    ]
+    results = sorted(run_batch(commands, workers=1), key=lambda r: r["index"])
+    assert [r["output"]["cached"] for r in results] == [False, True]
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(["create_file", "--file", "x", "--content", "y", "--memo"])
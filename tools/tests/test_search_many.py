@@ -0,0 +1,154 @@
+"""
+Tests for batched multi-query search: VectorStore.search_many and query_memory with several --query values
+"""
+
+import io
+import json
+from contextlib import nullcontext, redirect_stdout
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools import cli, vector_index  # noqa: E402
+from code_tools.embeddings import EmbeddingProvider  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 16
+
+
+def _clustered(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((10, DIM)).astype(np.float32)
+    return (centres[rng.integers(0, 10, n)] + 0.3 * rng.standard_normal((n, DIM))).astype(np.float32)
+
+
+def _chunks(vectors, start=0):
+    return [
+        CodeChunk(id=f"c{start + i}", file_path=f"src/{'api' if (start + i) % 3 == 0 else 'core'}/m{(start + i) % 5}.py",
+                  start_line=start + i, end_line=start + i + 1, chunk_type="function", name=f"n{start + i}",
+                  content="pass", language="python", embedding=v.tolist())
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _nearest(vectors, query, k, keep=None):
+    dist = ((vectors - query) ** 2).sum(axis=1)
+    if keep is not None:
+        dist[~keep] = np.inf
+    return [f"c{i}" for i in np.argsort(dist, kind="stable")[:k] if np.isfinite(dist[i])]
+
+
+def test_exact_batch_matches_single_queries(tmp_path, monkeypatch):
+    # Several blocks per search even at test sizes
+    monkeypatch.setattr(vector_index, "BLOCK_BYTES", 64 * DIM * 4)
+    vectors, queries = _clustered(700), _clustered(6, seed=1)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert(_chunks(vectors))
+    store.delete_by_file("src/core/m1.py")
+    keep = np.array([i % 5 != 1 or i % 3 == 0 for i in range(700)])
+
+    results = store.search_many(queries.tolist(), limit=7)
+    assert store.last_plan == {"strategy": "exact-scan", "candidates": int(keep.sum()), "queries": 6}
+    assert [[c.id for c, _ in found] for found in results] == [_nearest(vectors, q, 7, keep) for q in queries]
+    for q, found in zip(queries, results):
+        single = store.search(q.tolist(), limit=7)
+        assert [c.id for c, _ in single] == [c.id for c, _ in found]
+        assert [s for _, s in single] == pytest.approx([s for _, s in found], rel=1e-5)
+
+    # Filters resolve once for the batch; an empty selection gives empty groups
+    api = np.array([i % 3 == 0 and i % 5 == 2 for i in range(700)])
+    results = store.search_many(queries.tolist(), limit=5, path_prefix="src/api", file_filter="m2")
+    assert store.last_plan["strategy"] == "exact-subset" and store.last_plan["queries"] == 6
+    assert [[c.id for c, _ in found] for found in results] == [_nearest(vectors, q, 5, api) for q in queries]
+    assert store.search_many(queries.tolist(), limit=5, language_filter="rust") == [[]] * 6
+    assert store.search_many([], limit=5) == []
+    with pytest.raises(ValueError):
+        store.search_many([[0.0] * (DIM - 1)] * 2)
+    store.close()
+
+
+@pytest.mark.parametrize("options", [{"index": "hnsw", "hnsw_m": 8, "ef_construction": 32},
+                                     {"quantization": "int8", "rerank": 2}])
+def test_graph_and_quantized_batches_run_per_query(tmp_path, options):
+    vectors, queries = _clustered(1500), _clustered(4, seed=1)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", **options)
+    store.batch_upsert(_chunks(vectors))
+    results = store.search_many(queries.tolist(), limit=5)
+    assert store.last_plan["strategy"] == ("hnsw" if "index" in options else "quantized")
+    assert store.last_plan["queries"] == 4
+    assert [[c.id for c, _ in found] for found in results] == [
+        [c.id for c, _ in store.search(q.tolist(), limit=5)] for q in queries
+    ]
+    store.close()
+
+
+class _Provider(EmbeddingProvider):
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.batches = []
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        return [self.vectors[text] for text in texts]
+
+    @property
+    def dimension(self):
+        return DIM
+
+
+def _query(args):
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        cli.main(["query_memory", *args])
+    return json.loads(buf.getvalue())["data"]
+
+
+def test_query_memory_groups_several_queries(tmp_path, monkeypatch):
+    vectors = _clustered(300)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert(_chunks(vectors))
+    store.close()
+    # Two near-identical questions and one about something else
+    far = int(np.argmax(((vectors - vectors[0]) ** 2).sum(axis=1)))
+    texts = {"login": vectors[0].tolist(), "sign in": (vectors[0] + 0.01).tolist(), "cache": vectors[far].tolist()}
+    provider = _Provider(texts)
+    monkeypatch.setattr(cli, "_embedding_provider", lambda memory_dir, dimensions: (provider, nullcontext()))
+    base = ["--dir", str(tmp_path), "--mode", "semantic", "--limit", "4"]
+
+    data = _query(base + ["--query", "login", "--query", "sign in", "--query", "cache"])
+    assert provider.batches == [["login", "sign in", "cache"]]
+    assert data["queries"] == ["login", "sign in", "cache"] and data["count"] == 12
+    assert data["plan"]["queries"] == 3 and not data["deduplicated"]
+    names = [[r["name"] for r in group["results"]] for group in data["groups"]]
+    assert names[0] == [f"n{i[1:]}" for i in _nearest(vectors, vectors[0], 4)]
+    assert names[0][0] == names[1][0] == "n0"
+
+    # Each chunk under its best query only; the losing query fills up from further down
+    data = _query(base + ["--query", "login", "--query", "sign in", "--query", "cache", "--dedupe"])
+    names = [[r["name"] for r in group["results"]] for group in data["groups"]]
+    assert [len(n) for n in names] == [4, 4, 4]
+    assert len({name for group in names for name in group}) == 12
+    assert names[0][0] == "n0" and names[2][0] == f"n{far}"
+    assert set(names[0] + names[1]) <= {f"n{i[1:]}" for i in _nearest(vectors, vectors[0], 10)}
+    for group in data["groups"]:
+        similarities = [r["similarity"] for r in group["results"]]
+        assert similarities == sorted(similarities, reverse=True)
+
+    # One --query keeps the single-query result shape
+    data = _query(base + ["--query", "cache"])
+    assert data["query"] == "cache" and data["results"][0]["name"] == f"n{far}"
+    assert "queries" not in data["plan"]
+
+    buf = io.StringIO()
+    with redirect_stdout(buf), pytest.raises(SystemExit):
+        cli.main(["query_memory", "--dir", str(tmp_path), "--mode", "direct", "--query", "a", "--query", "b"])
+    assert "--mode semantic" in json.loads(buf.getvalue())["error"]
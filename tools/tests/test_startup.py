@@ -0,0 +1,44 @@
+"""
+Tests that light commands stay light: heavy dependencies load on demand
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).parent.parent
+
+HEAVY = ["numpy", "sqlite_vss", "dotenv"]
+
+PROBE = """
+import contextlib, io, json, sys
+sys.path.insert(0, {tools!r})
+{setup}
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        {call}
+    except SystemExit:
+        pass
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def _loaded(setup: str, call: str, cwd: Path) -> list:
+    code = PROBE.format(tools=str(TOOLS_DIR), setup=setup, call=call, heavy=HEAVY)
+    out = subprocess.check_output([sys.executable, "-c", code], text=True, cwd=cwd)
+    return json.loads(out.splitlines()[-1])
+
+
+def test_light_commands_do_not_import_heavy_dependencies(tmp_path):
+    (tmp_path / "a.txt").write_text("one\ntwo\n")
+    main = "from code_tools.cli import main"
+    assert _loaded(main, "main(['slugify_feature', '--name', 'X'])", tmp_path) == []
+    assert _loaded(main, "main(['read_file', '--path', 'a.txt', '--start', '2', '--end', '2'])", tmp_path) == []
+    assert _loaded(main, "main(['grep_code', '--pattern', 'two'])", tmp_path) == []
+    assert _loaded("import code_tools.chunker", "pass", tmp_path) == []
+
+
+def test_env_loaded_only_for_commands_that_need_it(tmp_path):
+    main = "from code_tools.cli import main"
+    assert "dotenv" in _loaded(main, "main(['search_web', '--query', 'x'])", tmp_path)
@@ -0,0 +1,50 @@
+"""
+Tests for --stream NDJSON output
+"""
+
+import json
+import subprocess
+
+
+def _records(argv, cwd=None):
+    proc = subprocess.run(argv + ["--stream"], capture_output=True, text=True, cwd=cwd)
+    return proc.returncode, [json.loads(line) for line in proc.stdout.splitlines()]
+
+
+def _envelope(argv, cwd=None):
+    return json.loads(subprocess.check_output(argv, text=True, cwd=cwd))
+
+
+def test_stream_matches_envelope_for_list_commands(tmp_path):
+    (tmp_path / "src").mkdir()
+    for i in range(5):
+        (tmp_path / "src" / f"m{i}.py").write_text(f"# TODO {i}\nx = {i}\n")
+    for argv in (
+        ["code-tools", "grep_code", "--pattern", "TODO", "--paths", str(tmp_path)],
+        ["code-tools", "list_dir", "--path", str(tmp_path), "--depth", "2"],
+        ["code-tools", "search_file", "--path", str(tmp_path), "--glob", "**/*.py", "--limit", "3"],
+    ):
+        code, records = _records(argv)
+        assert code == 0
+        assert records[0]["type"] == "header" and records[0]["tool"] == argv[1]
+        assert records[-1]["type"] == "trailer" and records[-1]["count"] == len(records) - 2
+        assert records[-1]["elapsed_ms"] >= records[-1]["first_result_ms"] >= 0
+        assert [r["data"] for r in records[1:-1]] == _envelope(argv)["data"]
+
+
+def test_stream_single_result_multi_range_and_errors(tmp_path):
+    p = tmp_path / "a.txt"
+    p.write_text("one\ntwo\n")
+    code, records = _records(["code-tools", "read_file", "--path", str(p), "--start", "2"])
+    assert [r["type"] for r in records] == ["header", "result", "trailer"]
+    assert records[1]["data"]["content"] == "two\n"
+
+    ranges = json.dumps([{"path": str(p), "start": 1, "end": 1}, {"path": str(p), "start": 2}])
+    code, records = _records(["code-tools", "read_file", "--ranges", ranges])
+    assert [r["data"]["content"] for r in records[1:-1]] == ["one\n", "two\n"]
+    assert records[-1]["meta"] == {"count": 2}
+
+    code, records = _records(["code-tools", "list_dir", "--path", str(tmp_path / "missing")])
+    assert code == 1
+    assert records == [{"type": "error", "ok": False, "tool": "list_dir", "version": "1.0",
+                        "error": f"Path not found: {tmp_path / 'missing'}"}]
@@ -0,0 +1,94 @@
+"""
+Tests for task dependency analytics
+"""
+
+import json
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.task_analysis import analyze_tasks, analyze_manifest, CACHE_FILENAME
+
+
+def _tasks():
+    # T1 -> T2 -> T4, T1 -> T3 -> T4, plus a redundant T1 -> T4 edge
+    return [
+        {"id": "T1", "status": "COMPLETED", "dependencies": [], "duration": 2},
+        {"id": "T2", "status": "NOT_STARTED", "dependencies": ["T1"], "duration": 5},
+        {"id": "T3", "status": "NOT_STARTED", "dependencies": ["T1"], "duration": 1},
+        {"id": "T4", "status": "NOT_STARTED", "dependencies": ["T2", "T3", "T1"], "duration": 1},
+    ]
+
+
+def test_critical_path_and_slack():
+    result = analyze_tasks(_tasks(), agents=2)
+    assert result["has_cycles"] is False
+    assert result["critical_path"]["tasks"] == ["T1", "T2", "T4"]
+    assert result["critical_path"]["length"] == 8
+    assert result["tasks"]["T3"]["slack"] == 4
+    assert result["tasks"]["T2"]["critical"] is True
+    assert result["redundant_dependencies"] == [{"task": "T4", "dependency": "T1"}]
+
+
+def test_makespan_simulation():
+    one = analyze_tasks(_tasks(), agents=1)["simulation"]
+    two = analyze_tasks(_tasks(), agents=2)["simulation"]
+    assert one["makespan"] == 9
+    assert two["makespan"] == 8
+    assert two["schedule"]["T4"]["start"] == 7
+
+
+def test_remaining_only_zeroes_completed_work():
+    result = analyze_tasks(_tasks(), agents=2, remaining_only=True)
+    assert result["critical_path"]["length"] == 6
+
+
+def test_cycle_detection():
+    tasks = [
+        {"id": "A", "dependencies": ["C"]},
+        {"id": "B", "dependencies": ["A"]},
+        {"id": "C", "dependencies": ["B"]},
+        {"id": "D", "dependencies": ["D"]},
+        {"id": "E", "dependencies": ["X"]},
+    ]
+    result = analyze_tasks(tasks)
+    assert result["has_cycles"] is True
+    assert sorted(result["cycles"]) == [["A", "B", "C"], ["D"]]
+    assert result["missing_dependencies"] == [{"task": "E", "dependency": "X"}]
+    assert result["critical_path"] is None
+
+
+def test_analysis_cached_by_manifest_hash(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"feature": {"id": "01"}, "tasks": _tasks()}))
+
+    first = analyze_manifest(manifest, agents=2)
+    second = analyze_manifest(manifest, agents=2)
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert (tmp_path / CACHE_FILENAME).exists()
+
+    # Content change invalidates the cached entry
+    manifest.write_text(json.dumps({"feature": {"id": "01"}, "tasks": _tasks()[:2]}))
+    third = analyze_manifest(manifest, agents=2)
+    assert third["cached"] is False
+    assert third["task_count"] == 2
+
+
+def test_analyze_dependencies_cli_all(tmp_path):
+    for fid, tasks in (("01-a", _tasks()), ("02-b", [{"id": "T1", "dependencies": ["T1"]}])):
+        d = tmp_path / ".tasks" / fid
+        d.mkdir(parents=True)
+        (d / "manifest.json").write_text(json.dumps({"feature": {"id": fid[:2]}, "tasks": tasks}))
+
+    out = subprocess.check_output([
+        "code-tools", "analyze_dependencies", "--all",
+        "--tasks-dir", str(tmp_path / ".tasks"), "--agents", "2"
+    ], text=True)
+    res = json.loads(out)
+    assert res["ok"]
+    assert res["data"]["feature_count"] == 2
+    assert len(res["data"]["features_with_cycles"]) == 1
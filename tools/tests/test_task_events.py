@@ -0,0 +1,178 @@
+"""
+Tests for the append-only task event log
+"""
+
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools import task_events
+from code_tools.task_events import (
+    record_status_updates, materialize, load_manifest_view, load_root_manifest_view,
+    read_events, append_events, EVENT_LOG_FILENAME
+)
+
+
+def _feature(tmp_path, count=3):
+    feature_dir = tmp_path / ".tasks" / "01-test"
+    feature_dir.mkdir(parents=True)
+    (feature_dir / "manifest.json").write_text(json.dumps({
+        "feature": {"id": "01"},
+        "tasks": [{"id": f"T{i:02d}", "status": "NOT_STARTED"} for i in range(1, count + 1)]
+    }))
+    (tmp_path / ".tasks" / "manifest.json").write_text(json.dumps({
+        "features": [{"id": "01", "taskCount": count, "completedCount": 0, "status": "NOT_STARTED"}]
+    }))
+    return feature_dir
+
+
+def test_status_update_appends_event_with_timestamp(tmp_path):
+    feature_dir = _feature(tmp_path)
+    applied = record_status_updates(feature_dir, [{"task_id": "T01", "status": "IN_PROGRESS"}])
+    assert applied[0]["old_status"] == "NOT_STARTED"
+
+    events, _ = read_events(feature_dir / EVENT_LOG_FILENAME)
+    assert len(events) == 1 and events[0]["status"] == "IN_PROGRESS"
+
+    manifest = load_manifest_view(feature_dir / "manifest.json")
+    task = manifest["tasks"][0]
+    assert task["status"] == "IN_PROGRESS"
+    assert task["started"] == events[0]["ts"] and task["started"] != "null"
+
+
+def test_legacy_null_timestamps_are_replaced(tmp_path):
+    feature_dir = _feature(tmp_path)
+    manifest_path = feature_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    # Placeholders written by the old json.dumps(None) code path
+    for task, placeholder in zip(manifest["tasks"], ["null", "", None]):
+        task["started"] = task["completed"] = placeholder
+    manifest_path.write_text(json.dumps(manifest))
+
+    record_status_updates(feature_dir, [
+        {"task_id": "T01", "status": "IN_PROGRESS"},
+        {"task_id": "T02", "status": "COMPLETED"},
+        {"task_id": "T03", "status": "IN_PROGRESS"},
+    ])
+    tasks = load_manifest_view(manifest_path)["tasks"]
+    ts = read_events(feature_dir / EVENT_LOG_FILENAME)[0][0]["ts"]
+    assert [tasks[0]["started"], tasks[1]["completed"], tasks[2]["started"]] == [ts, ts, ts]
+    assert tasks[0]["completed"] == "null" and tasks[1]["started"] == ""
+
+
+def test_pending_events_visible_and_replayable(tmp_path):
+    feature_dir = _feature(tmp_path)
+    # Simulate a writer that crashed after appending but before materializing
+    append_events(feature_dir / EVENT_LOG_FILENAME, [
+        {"ts": "2025-01-01T00:00:00+00:00", "task_id": "T02", "old_status": "NOT_STARTED", "status": "COMPLETED"}
+    ])
+    view = load_manifest_view(feature_dir / "manifest.json")
+    assert view["tasks"][1]["status"] == "COMPLETED"
+
+    result = materialize(feature_dir, replay=True)
+    assert result["events_applied"] == 1
+    manifest = json.loads((feature_dir / "manifest.json").read_text())
+    assert manifest["tasks"][1]["completed"] == "2025-01-01T00:00:00+00:00"
+
+
+def test_concurrent_updates_are_not_lost(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    feature_dir = _feature(tmp_path, count=20)
+    ids = [f"T{i:02d}" for i in range(1, 21)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda tid: record_status_updates(
+            Path(".tasks/01-test"), [{"task_id": tid, "status": "COMPLETED"}]), ids))
+
+    manifest = load_manifest_view(feature_dir / "manifest.json")
+    assert all(t["status"] == "COMPLETED" for t in manifest["tasks"])
+    root = load_root_manifest_view(tmp_path / ".tasks" / "manifest.json")
+    assert root["features"][0]["completedCount"] == 20
+    assert root["features"][0]["status"] == "COMPLETED"
+
+
+def test_root_counters_are_synced_under_the_feature_lock(tmp_path, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    monkeypatch.chdir(tmp_path)
+    feature_dir = _feature(tmp_path)
+    held = []
+    sync = task_events.sync_root_manifest
+
+    def checked_sync(manifest, *args):
+        # Another writer cannot take the feature lock while the counters are written
+        with open(feature_dir / task_events.LOCK_FILENAME, "a") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                held.append(False)
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            except BlockingIOError:
+                held.append(True)
+        return sync(manifest, *args)
+
+    monkeypatch.setattr(task_events, "sync_root_manifest", checked_sync)
+    monkeypatch.setattr(task_events, "MATERIALIZE_EVENTS", 1)
+    record_status_updates(Path(".tasks/01-test"), [{"task_id": "T01", "status": "COMPLETED"}])
+    materialize(Path(".tasks/01-test"), replay=True)
+    assert held == [True, True]
+    root = json.loads((tmp_path / ".tasks" / "manifest.json").read_text())
+    assert root["features"][0]["completedCount"] == 1
+
+
+def test_updates_append_until_materialize_threshold(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    feature_dir = _feature(tmp_path, count=10)
+    writes = []
+    write = task_events.write_json_atomic
+    monkeypatch.setattr(task_events, "write_json_atomic", lambda path, data: (writes.append(path), write(path, data)))
+    monkeypatch.setattr(task_events, "MATERIALIZE_EVENTS", 8)
+
+    for i in range(1, 8):
+        record_status_updates(Path(".tasks/01-test"), [{"task_id": f"T{i:02d}", "status": "COMPLETED"}])
+    assert writes == []
+    assert sum(t["status"] == "COMPLETED" for t in load_manifest_view(feature_dir / "manifest.json")["tasks"]) == 7
+    root_path = tmp_path / ".tasks" / "manifest.json"
+    assert json.loads(root_path.read_text())["features"][0]["completedCount"] == 0
+    assert load_root_manifest_view(root_path)["features"][0]["completedCount"] == 7
+
+    # The eighth pending event rewrites both manifests once
+    record_status_updates(Path(".tasks/01-test"), [{"task_id": "T08", "status": "COMPLETED"}])
+    assert writes == [Path(".tasks/01-test/manifest.json"), Path(".tasks/manifest.json")]
+    assert json.loads(root_path.read_text())["features"][0]["completedCount"] == 8
+    assert load_root_manifest_view(root_path)["features"][0]["completedCount"] == 8
+
+    # A status change that leaves the counters alone records nothing for the root
+    root_log = tmp_path / ".tasks" / EVENT_LOG_FILENAME
+    size = root_log.stat().st_size
+    record_status_updates(Path(".tasks/01-test"), [{"task_id": "T09", "status": "IN_PROGRESS"}])
+    assert root_log.stat().st_size == size and len(writes) == 2
+
+
+def test_batch_update_cli(tmp_path):
+    feature_dir = _feature(tmp_path)
+    updates = json.dumps([
+        {"task_id": "T01", "status": "COMPLETED"},
+        {"task_id": "T02", "status": "BLOCKED"},
+    ])
+    out = subprocess.check_output([
+        "code-tools", "update_task_status", "--feature-dir", ".tasks/01-test", "--updates", updates
+    ], text=True, cwd=tmp_path)
+    res = json.loads(out)
+    assert res["ok"] and res["data"]["count"] == 2
+    root = load_root_manifest_view(tmp_path / ".tasks" / "manifest.json")
+    assert root["features"][0]["completedCount"] == 1
+
+
+def test_update_cli_reports_bad_updates(tmp_path):
+    _feature(tmp_path)
+    for updates in ["{not json", "@missing.json", '["T01"]']:
+        proc = subprocess.run([
+            "code-tools", "update_task_status", "--feature-dir", ".tasks/01-test", "--updates", updates
+        ], capture_output=True, text=True, cwd=tmp_path)
+        assert proc.returncode == 1 and "Traceback" not in proc.stderr
+        assert json.loads(proc.stdout)["ok"] is False
@@ -0,0 +1,112 @@
+"""
+Tests for the cross-feature task index
+"""
+
+import json
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.task_index import TaskIndex
+
+
+def _write_feature(tasks_dir, slug, feature_id, statuses):
+    d = tasks_dir / slug
+    d.mkdir(parents=True, exist_ok=True)
+    (d / "manifest.json").write_text(json.dumps({
+        "feature": {"id": feature_id, "name": slug},
+        "tasks": [{"id": f"T{i:02d}", "status": s} for i, s in enumerate(statuses, start=1)]
+    }))
+
+
+def test_incremental_refresh_and_queries(tmp_path):
+    tasks_dir = tmp_path / ".tasks"
+    _write_feature(tasks_dir, "01-auth", "01", ["COMPLETED", "BLOCKED"])
+    _write_feature(tasks_dir, "02-chat", "02", ["BLOCKED", "NOT_STARTED"])
+
+    index = TaskIndex(tasks_dir)
+    assert index.refresh()["updated"] == 2
+    assert index.refresh()["unchanged"] == 2
+
+    blocked = index.query_tasks(status="BLOCKED")
+    assert [(t["feature_id"], t["task"]["id"]) for t in blocked] == [("01", "T02"), ("02", "T01")]
+    assert index.summary()["completion"] == 0.25
+
+    _write_feature(tasks_dir, "02-chat", "02", ["COMPLETED", "COMPLETED"])
+    (tasks_dir / "01-auth" / "manifest.json").unlink()
+    stats = index.refresh()
+    assert stats["updated"] == 1 and stats["removed"] == 1
+    assert index.summary()["by_status"] == {"COMPLETED": 2}
+    index.close()
+
+
+def test_validate_manifest_all(tmp_path):
+    tasks_dir = tmp_path / ".tasks"
+    _write_feature(tasks_dir, "01-auth", "01", ["COMPLETED", "IN_PROGRESS"])
+    _write_feature(tasks_dir, "02-chat", "02", ["COMPLETED"])
+    (tasks_dir / "manifest.json").write_text(json.dumps({"features": [
+        {"id": "01", "taskCount": 2, "completedCount": 1, "status": "IN_PROGRESS"},
+        {"id": "02", "taskCount": 1, "completedCount": 0, "status": "NOT_STARTED"},
+    ]}))
+
+    out = subprocess.check_output(["code-tools", "validate_manifest", "--all"], text=True, cwd=tmp_path)
+    res = json.loads(out)
+    assert res["ok"]
+    assert res["data"]["valid"] is False
+    assert res["data"]["invalid_count"] == 1
+    bad = [f for f in res["data"]["features"] if not f["valid"]][0]
+    assert bad["feature_id"] == "02"
+    assert {i["type"] for i in bad["issues"]} == {"completed_count_mismatch", "status_mismatch"}
+
+
+def test_query_tasks_cli(tmp_path):
+    tasks_dir = tmp_path / ".tasks"
+    _write_feature(tasks_dir, "01-auth", "01", ["BLOCKED", "COMPLETED"])
+    out = subprocess.check_output([
+        "code-tools", "query_tasks", "--tasks-dir", str(tasks_dir), "--status", "BLOCKED"
+    ], text=True)
+    res = json.loads(out)
+    assert res["ok"] and res["data"]["count"] == 1
+    assert res["data"]["summary"]["total_tasks"] == 2
+
+
+def test_malformed_manifests_are_reported_not_raised(tmp_path):
+    tasks_dir = tmp_path / ".tasks"
+    _write_feature(tasks_dir, "01-auth", "01", ["COMPLETED"])
+    for slug, raw in [("02-list", b"[1, 2]"), ("03-latin1", '{"feature": "caf\xe9"}'.encode("latin-1")),
+                      ("04-shape", b'{"feature": "04", "tasks": 3}')]:
+        (tasks_dir / slug).mkdir()
+        (tasks_dir / slug / "manifest.json").write_bytes(raw)
+
+    index = TaskIndex(tasks_dir)
+    assert index.refresh()["updated"] == 4
+    errors = {Path(f["manifest"]).parent.name: f["error"] for f in index.feature_stats()}
+    assert errors["01-auth"] is None
+    assert "not a JSON object" in errors["02-list"] and "Invalid JSON" in errors["03-latin1"]
+    assert "no task list" in errors["04-shape"]
+    assert [t["task"]["id"] for t in index.query_tasks()] == ["T01"]
+    index.close()
+
+    out = subprocess.check_output(["code-tools", "validate_manifest", "--all"], text=True, cwd=tmp_path)
+    res = json.loads(out)["data"]
+    assert res["feature_count"] == 4 and res["invalid_count"] == 3
+
+
+def test_unwritable_index_falls_back_to_memory(tmp_path):
+    tasks_dir = tmp_path / ".tasks"
+    _write_feature(tasks_dir, "01-auth", "01", ["BLOCKED", "COMPLETED"])
+    # A location sqlite cannot create the index file in, as in a read-only tree
+    index = TaskIndex(tasks_dir, db_path=tmp_path / "missing" / "index.db")
+    assert str(index.db_path) == ":memory:"
+    assert index.refresh()["updated"] == 1
+    assert index.summary()["by_status"] == {"BLOCKED": 1, "COMPLETED": 1}
+    index.close()
+
+    # An index file sqlite cannot use
+    (tasks_dir / ".index.db").write_bytes(b"not a database" * 100)
+    index = TaskIndex(tasks_dir)
+    assert index.refresh()["updated"] == 1 and str(index.db_path) == ":memory:"
+    index.close()
@@ -0,0 +1,86 @@
+"""
+Tests for the persistent trigram index used by grep_code --index
+"""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.grep_engine import grep
+from code_tools.trigram_index import TrigramIndex, trigram_query, trigrams
+
+
+def _tree(root: Path):
+    (root / ".gitignore").write_text("*.log\n")
+    (root / "src").mkdir()
+    (root / "src" / "a.py").write_text("def handle_request(req):\n    return parse_body(req)\n")
+    (root / "src" / "b.py").write_text("def parse_header(h):\n    return h\n")
+    (root / "docs").mkdir()
+    (root / "docs" / "notes.md").write_text("handle_request is the entry point\n")
+    (root / "debug.log").write_text("handle_request in an ignored file\n")
+
+
+def test_trigram_extraction_and_query_planning():
+    grams = trigrams(b"abcd\nxy")
+    assert [int(g) for g in grams] == [0x616263, 0x626364]
+    assert trigram_query("handle_request") == [["handle_request"]]
+    assert trigram_query(r"def\s+parse_\w+") == [["def", "parse_"]]
+    assert trigram_query(patterns=["foo", "barbaz"]) == [["foo"], ["barbaz"]]
+    assert trigram_query(r"\w+id\b") is None
+    assert trigram_query("(?i)needle") is None
+    assert trigram_query(patterns=["ok", "longer"]) is None
+
+
+def test_index_candidates_match_scan(tmp_path):
+    _tree(tmp_path)
+    index = TrigramIndex(tmp_path, tmp_path / ".claude" / "memory")
+    stats = index.refresh()
+    assert stats["indexed"] == 4 and stats["removed"] == 0
+
+    assert index.candidates([["handle_request"]]) == ["docs/notes.md", "src/a.py"]
+    assert index.candidates([["def", "parse_h"]]) == ["src/b.py"]
+    assert index.candidates([["missing_symbol"]]) == []
+
+    for kwargs in ({"pattern": "handle_request"}, {"pattern": r"parse_\w+\("},
+                   {"patterns": ["entry", "return h"]}, {"pattern": r"\w+\(req\)"}):
+        scanned = list(grep([tmp_path], limit=100, **kwargs))
+        indexed = list(grep([tmp_path], limit=100, index=index, **kwargs))
+        assert indexed == scanned
+    sub = list(grep([tmp_path / "src"], "handle_request", index=index))
+    assert [m["path"] for m in sub] == [str(tmp_path / "src" / "a.py")]
+    index.close()
+
+
+def test_incremental_refresh(tmp_path):
+    _tree(tmp_path)
+    index = TrigramIndex(tmp_path, tmp_path / ".claude" / "memory")
+    index.refresh()
+
+    assert index.refresh() == {"scanned": 4, "indexed": 0, "touched": 0, "unchanged": 4, "removed": 0}
+    a = tmp_path / "src" / "a.py"
+    os.utime(a, ns=(a.stat().st_atime_ns, a.stat().st_mtime_ns + 10**9))
+    assert index.refresh()["touched"] == 1
+
+    a.write_text("def renamed_handler(req):\n    return None\n")
+    (tmp_path / "docs" / "notes.md").unlink()
+    (tmp_path / "src" / "c.py").write_text("handle_request()\n")
+    stats = index.refresh()
+    assert stats["indexed"] == 2 and stats["removed"] == 1
+    assert index.candidates([["handle_request"]]) == ["src/c.py"]
+    assert index.candidates([["renamed_handler"]]) == ["src/a.py"]
+    index.close()
+
+
+def test_grep_code_cli_index(tmp_path):
+    _tree(tmp_path)
+    cmd = ["code-tools", "grep_code", "--pattern", "handle_request", "--index", "--limit", "10"]
+    first = json.loads(subprocess.check_output(cmd, text=True, cwd=tmp_path))
+    second = json.loads(subprocess.check_output(cmd, text=True, cwd=tmp_path))
+    assert first == second
+    assert sorted(Path(m["path"]).name for m in first["data"]) == ["a.py", "notes.md"]
+    assert list((tmp_path / ".claude" / "memory").glob("trigram-*.db"))
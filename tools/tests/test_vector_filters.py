@@ -0,0 +1,115 @@
+"""
+Tests for filter-aware vector search: candidate bitmaps, search planning and honouring --limit
+"""
+
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools import vector_store  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 16
+DIRS = ["src/api", "src/core", "src/core/db", "lib/Api", "tests"]
+
+
+def _chunk(i, vector):
+    directory = DIRS[i % len(DIRS)]
+    language = "typescript" if i % 7 == 0 else "python"
+    return CodeChunk(id=f"c{i}", file_path=f"{directory}/m{i % 3}.{'ts' if language == 'typescript' else 'py'}",
+                     start_line=i, end_line=i + 1, chunk_type="class" if i % 4 == 0 else "function",
+                     name=f"n{i}", content="pass", language=language, embedding=vector.tolist())
+
+
+def _expected(chunks, vectors, query, k, predicate):
+    keep = np.array([predicate(c) for c in chunks])
+    dist = ((vectors - query) ** 2).sum(axis=1)
+    dist[~keep] = np.inf
+    return [f"c{i}" for i in np.argsort(dist, kind="stable")[:k] if np.isfinite(dist[i])]
+
+
+@pytest.fixture(params=["flat", "hnsw"])
+def indexed(request, tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, DIM)).astype(np.float32)
+    chunks = [_chunk(i, v) for i, v in enumerate(vectors)]
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index=request.param, hnsw_m=8, ef_construction=48)
+    store.batch_upsert(chunks)
+    yield store, chunks, vectors, rng.standard_normal((5, DIM)).astype(np.float32)
+    store.close()
+
+
+@pytest.mark.parametrize("filters,predicate", [
+    ({"path_prefix": "src/core"}, lambda c: c.file_path.startswith("src/core")),
+    ({"path_prefix": "./src/core/db/"}, lambda c: c.file_path.startswith("src/core/db/")),
+    ({"file_filter": "api/"}, lambda c: "api/" in c.file_path.lower()),
+    ({"language_filter": "typescript", "chunk_type_filter": "class"},
+     lambda c: c.language == "typescript" and c.chunk_type == "class"),
+    ({"path_prefix": "src", "file_filter": "m1", "language_filter": "python"},
+     lambda c: c.file_path.startswith("src") and "m1" in c.file_path and c.language == "python"),
+])
+def test_filtered_results_are_exact_and_fill_the_limit(indexed, filters, predicate):
+    store, chunks, vectors, queries = indexed
+    for query in queries:
+        hits = store.search(query.tolist(), limit=10, **filters)
+        assert [c.id for c, _ in hits] == _expected(chunks, vectors, query, 10, predicate)
+        assert store.last_plan["candidates"] == sum(1 for c in chunks if predicate(c))
+    assert store.search(queries[0].tolist(), limit=5, path_prefix="docs") == []
+    assert store.last_plan["strategy"] == "empty"
+
+
+def test_selective_filters_on_the_graph_widen_the_beam(indexed, monkeypatch):
+    store, chunks, vectors, queries = indexed
+    if store.index_type != "hnsw":
+        pytest.skip("graph planning only applies to the hnsw index")
+    # Force the graph path even for small candidate sets
+    monkeypatch.setattr(vector_store, "EXACT_CANDIDATES", 0)
+    monkeypatch.setattr(vector_store, "SUBSET_FRACTION", 1.0)
+    hits = store.search(queries[0].tolist(), limit=15, chunk_type_filter="class", ef_search=16)
+    assert store.last_plan["strategy"] == "hnsw" and store.last_plan["ef"] >= 16 * 4
+    assert len(hits) == 15 and all(c.chunk_type == "class" for c, _ in hits)
+
+    # A filter matching fewer rows than the limit still returns every match
+    predicate = lambda c: c.language == "typescript" and c.file_path.startswith("tests")  # noqa: E731
+    hits = store.search(queries[1].tolist(), limit=50, path_prefix="tests", language_filter="typescript")
+    assert sorted(c.id for c, _ in hits) == sorted(c.id for c in chunks if predicate(c))
+
+
+def test_path_prefix_is_a_directory(tmp_path):
+    paths = ["src/api/a.py", "src/api/v1/b.py", "src/api_legacy/c.py", "src/api-v2/d.py", "src/api.py", "src/apix.py"]
+    rng = np.random.default_rng(3)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert([
+        CodeChunk(id=f"c{i}", file_path=path, start_line=1, end_line=2, chunk_type="function", name=f"n{i}",
+                  content="pass", language="python", embedding=rng.standard_normal(DIM).tolist())
+        for i, path in enumerate(paths)
+    ])
+    query = rng.standard_normal(DIM).tolist()
+    for prefix in ["src/api", "src/api/", "./src/api"]:
+        assert {c.file_path for c, _ in store.search(query, limit=10, path_prefix=prefix)} == {"src/api/a.py",
+                                                                                              "src/api/v1/b.py"}
+    # A prefix naming a file matches that file, and src/ap is no directory at all
+    assert [c.file_path for c, _ in store.search(query, limit=10, path_prefix="src/api.py")] == ["src/api.py"]
+    assert store.search(query, limit=10, path_prefix="src/ap") == []
+    hits = store.search(query, limit=10, path_prefix="src/api", file_filter="v1")
+    assert [c.file_path for c, _ in hits] == ["src/api/v1/b.py"]
+    store.close()
+
+
+def test_bitmaps_follow_writes(indexed):
+    store, chunks, vectors, queries = indexed
+    assert len(store.search(queries[0].tolist(), limit=500, path_prefix="tests")) == 200
+    assert store.last_plan["strategy"] == "exact-subset"
+    store.delete_by_file("tests/m0.py")
+    store.batch_upsert([CodeChunk(id="extra", file_path="tests/new.py", start_line=1, end_line=2,
+                                  chunk_type="function", name="x", content="pass", language="python",
+                                  embedding=queries[0].tolist())])
+    hits = store.search(queries[0].tolist(), limit=500, path_prefix="tests")
+    assert len(hits) == 200 - sum(1 for c in chunks if c.file_path == "tests/m0.py") + 1
+    assert hits[0][0].id == "extra"
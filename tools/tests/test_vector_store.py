@@ -0,0 +1,154 @@
+"""
+Tests for VectorStore's numpy backend: exact top-k, filters, in-place updates, tombstones and persistence
+"""
+
+import sqlite3
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from code_tools import vector_index, vector_store  # noqa: E402
+from code_tools.vector_store import CodeChunk, VectorStore  # noqa: E402
+
+DIM = 12
+
+
+def _chunks(vectors, start=0):
+    return [
+        CodeChunk(id=f"c{start + i}", file_path=f"src/{'api' if (start + i) % 3 == 0 else 'core'}/m{(start + i) % 5}.py",
+                  start_line=start + i, end_line=start + i + 1,
+                  chunk_type="class" if (start + i) % 2 else "function", name=f"n{start + i}",
+                  content="pass", language="python", embedding=v.tolist())
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _nearest(vectors, query, k, keep=None):
+    dist = ((vectors - query) ** 2).sum(axis=1)
+    if keep is not None:
+        dist[~keep] = np.inf
+    return [f"c{i}" for i in np.argsort(dist, kind="stable")[:k] if np.isfinite(dist[i])]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Several blocks per search even at test sizes
+    monkeypatch.setattr(vector_index, "BLOCK_BYTES", 64 * DIM * 4)
+    s = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    yield s
+    s.close()
+
+
+def test_exact_top_k_and_filters(store):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((700, DIM)).astype(np.float32)
+    store.batch_upsert(_chunks(vectors))
+    for query in rng.standard_normal((5, DIM)).astype(np.float32):
+        hits = store.search(query.tolist(), limit=7)
+        assert [c.id for c, _ in hits] == _nearest(vectors, query, 7)
+        distance = float(((vectors[int(hits[0][0].id[1:])] - query) ** 2).sum())
+        assert hits[0][1] == pytest.approx(1 / (1 + distance), rel=1e-4)
+        assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+    query = vectors[10] + 0.01
+    ids = np.arange(len(vectors))
+    keep = (ids % 3 == 0) & (ids % 2 == 1)
+    hits = store.search(query.tolist(), limit=5, file_filter="api/", chunk_type_filter="class")
+    assert [c.id for c, _ in hits] == _nearest(vectors, query, 5, keep)
+    assert all(c.file_path.startswith("src/api/") and c.chunk_type == "class" for c, _ in hits)
+    assert store.search(query.tolist(), limit=5, file_filter="nowhere/") == []
+    assert len(store.search(query.tolist(), limit=10000)) == 700
+
+
+def test_updates_tombstones_and_persistence(store, tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((300, DIM)).astype(np.float32)
+    store.batch_upsert(_chunks(vectors))
+
+    # Re-upserting a chunk overwrites its row in place
+    moved = rng.standard_normal(DIM).astype(np.float32)
+    chunk = _chunks([moved], start=5)[0]
+    store.upsert_chunk(chunk)
+    vectors[5] = moved
+    assert store.search(moved.tolist(), limit=1)[0][0].id == "c5"
+    assert store.get_stats()["vectors"] == 300 and store.get_stats()["tombstones"] == 0
+
+    deleted = store.delete_by_file("src/api/m0.py")
+    gone = {f"c{i}" for i in range(300) if i % 3 == 0 and i % 5 == 0}
+    assert deleted == len(gone) and store.get_stats()["tombstones"] == len(gone)
+    keep = np.array([f"c{i}" not in gone for i in range(300)])
+    query = vectors[0]
+    assert [c.id for c, _ in store.search(query.tolist(), limit=6)] == _nearest(vectors, query, 6, keep)
+
+    # A new chunk appends a row; everything survives reopening, including tombstones
+    extra = rng.standard_normal((1, DIM)).astype(np.float32)
+    store.batch_upsert(_chunks(extra, start=300))
+    store.close()
+    reopened = VectorStore(tmp_path / "codebase.db")
+    assert reopened.backend == "numpy"
+    vectors = np.vstack([vectors, extra])
+    keep = np.append(keep, True)
+    assert [c.id for c, _ in reopened.search(query.tolist(), limit=6)] == _nearest(vectors, query, 6, keep)
+    stats = reopened.get_stats()
+    assert stats["vectors"] == 301 - len(gone) and stats["tombstones"] == len(gone) and stats["dimension"] == DIM
+
+    assert reopened.compact() == len(gone)
+    assert reopened.get_stats()["tombstones"] == 0
+    assert [c.id for c, _ in reopened.search(query.tolist(), limit=6)] == _nearest(vectors, query, 6, keep)
+    assert reopened.search(extra[0].tolist(), limit=1)[0][0].id == "c300"
+    reopened.close()
+
+
+@pytest.mark.parametrize("crash_at", ["swap", "rebuild"])
+def test_interrupted_compaction_keeps_rows_and_vectors_together(tmp_path, monkeypatch, crash_at):
+    rng = np.random.default_rng(2)
+    vectors = rng.standard_normal((120, DIM)).astype(np.float32)
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy", index="hnsw", hnsw_m=8, ef_construction=32)
+    store.batch_upsert(_chunks(vectors))
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    # Deleting most files compacts automatically; interrupt it after the rows commit
+    monkeypatch.setattr(vector_store, "COMPACT_MIN_TOMBSTONES", 0)
+    with monkeypatch.context() as patched:
+        if crash_at == "swap":
+            patched.setattr(vector_store.os, "replace", crash)
+        else:
+            patched.setattr(VectorStore, "_get_graph", crash)
+        with pytest.raises(KeyboardInterrupt):
+            for m in range(5):
+                store.delete_by_file(f"src/core/m{m}.py")
+    store._conn.close()
+    store._conn = store._index = store._graph = None
+
+    reopened = VectorStore(tmp_path / "codebase.db")
+    assert reopened.get_stats()["tombstones"] == 0
+    live = [i for i in range(120) if i % 3 == 0]
+    for i in live:
+        chunk, similarity = reopened.search(vectors[i].tolist(), limit=1)[0]
+        assert chunk.id == f"c{i}" and similarity == pytest.approx(1.0, rel=1e-4)
+    assert not (tmp_path / "codebase.vectors.new").exists()
+    reopened.close()
+
+
+def test_backend_is_recorded_and_checked(tmp_path):
+    store = VectorStore(tmp_path / "codebase.db", backend="numpy")
+    store.batch_upsert(_chunks(np.ones((2, DIM), dtype=np.float32)))
+    with pytest.raises(ValueError, match="dimension"):
+        store.batch_upsert(_chunks(np.ones((1, DIM + 1), dtype=np.float32), start=2))
+    store.close()
+    with pytest.raises(ValueError, match="built with the numpy backend"):
+        VectorStore(tmp_path / "codebase.db", backend="vss")
+    with pytest.raises(ValueError, match="Unknown backend"):
+        VectorStore(tmp_path / "other.db", backend="faiss")
+    conn = sqlite3.connect(str(tmp_path / "codebase.db"))
+    assert conn.execute("SELECT value FROM store_meta WHERE key = 'dimension'").fetchone() == (str(DIM),)
+    # The rejected batch left no metadata behind
+    assert conn.execute("SELECT COUNT(*) FROM code_chunks").fetchone() == (2,)
@@ -0,0 +1,98 @@
+"""
+Tests for the directory cache, multi-glob matching and the list_dir/search_file commands
+"""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from code_tools.walker import DirCache, GlobMatcher, find, walk
+
+
+def _tree(root: Path):
+    (root / ".gitignore").write_text("build.log\n")
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("x = 1\n")
+    (root / "src" / "pkg" / "util.py").write_text("y = 2\n")
+    (root / "src" / "pkg" / "data.json").write_text("{}\n")
+    (root / "README.md").write_text("# readme\n")
+    (root / "build.log").write_text("ignored\n")
+    (root / ".hidden").mkdir()
+    (root / ".hidden" / "secret.py").write_text("z = 3\n")
+    (root / "node_modules").mkdir()
+    (root / "node_modules" / "dep.py").write_text("\n")
+    # Cached listings must be older than the racy window
+    old = 1_000_000_000
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(old, old))
+
+
+def test_glob_matcher():
+    matcher = GlobMatcher(["*.md", "src/**/*.py", "./docs/?.txt"])
+    assert matcher.match("README.md") and not matcher.match("src/README.md")
+    assert matcher.match("src/main.py") and matcher.match("src/pkg/util.py")
+    assert matcher.match("docs/a.txt") and not matcher.match("docs/ab.txt")
+    assert matcher.max_depth is None
+    assert GlobMatcher(["*.py", "src/*.py"]).max_depth == 1
+
+
+def test_find_multiple_globs_prunes_ignored_and_hidden(tmp_path):
+    _tree(tmp_path)
+    found = [rel for _, rel in find(tmp_path, ["**/*.py", "*.log", "*.md"])]
+    assert found == ["README.md", "src/main.py", "src/pkg/util.py"]
+    found = [rel for _, rel in find(tmp_path, ["**/*.py"], include_hidden=True, use_gitignore=False)]
+    assert found == [".hidden/secret.py", "src/main.py", "src/pkg/util.py"]
+
+
+def test_dir_cache_hits_and_invalidation(tmp_path):
+    _tree(tmp_path)
+    cache = DirCache(tmp_path / "cache.json")
+    first = [rel for _, rel, _ in walk(tmp_path / "src", cache=cache)]
+    assert cache.stats()["misses"] == 2
+    cache.save()
+
+    reloaded = DirCache(tmp_path / "cache.json")
+    entries = list(walk(tmp_path / "src", cache=reloaded))
+    assert [rel for _, rel, _ in entries] == first
+    assert reloaded.stats()["hits"] == 2 and reloaded.stats()["misses"] == 0
+    util = next(e for e, rel, _ in entries if rel == "pkg/util.py")
+    assert util.is_file() and util.stat().st_size == 6
+
+    (tmp_path / "src" / "pkg" / "new.py").write_text("\n")
+    assert "pkg/new.py" in [rel for _, rel, _ in walk(tmp_path / "src", cache=reloaded)]
+    assert reloaded.stats()["misses"] == 1
+
+
+def test_list_dir_and_search_file_cli(tmp_path):
+    _tree(tmp_path)
+    out = subprocess.check_output(
+        ["code-tools", "list_dir", "--path", "src", "--depth", "0", "--cache"], text=True, cwd=tmp_path
+    )
+    assert [(e["path"], e["type"]) for e in json.loads(out)["data"]] == [("src/main.py", "file"), ("src/pkg", "dir")]
+    assert (tmp_path / ".claude" / "memory" / "dircache.json").exists()
+
+    out = subprocess.check_output([
+        "code-tools", "search_file", "--path", str(tmp_path), "--glob", "**/*.py,*.md", "--glob", "**/*.json"
+    ], text=True)
+    names = [Path(m["path"]).name for m in json.loads(out)["data"]]
+    assert names == ["README.md", "main.py", "data.json", "util.py"]
+
+
+def test_no_ignore_lists_default_excluded_directories(tmp_path):
+    _tree(tmp_path)
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.py").write_text("\n")
+    cmd = ["code-tools", "list_dir", "--path", ".", "--depth", "0"]
+    listed = {e["path"] for e in json.loads(subprocess.check_output(cmd, text=True, cwd=tmp_path))["data"]}
+    assert "build" not in listed and "node_modules" not in listed and "build.log" not in listed
+    listed = {e["path"] for e in json.loads(subprocess.check_output(cmd + ["--no-ignore"], text=True, cwd=tmp_path))["data"]}
+    assert {"build", "node_modules", "build.log"} <= listed
+
+    cmd = ["code-tools", "search_file", "--path", ".", "--glob", "**/*.py", "--no-ignore"]
+    found = {m["path"] for m in json.loads(subprocess.check_output(cmd, text=True, cwd=tmp_path))["data"]}
+    assert {"build/out.py", "node_modules/dep.py"} <= found
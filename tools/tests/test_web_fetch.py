@@ -0,0 +1,147 @@
+"""
+Tests for concurrent, cached fetch_content against a local stand-in server
+"""
+
+import json
+import subprocess
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add parent dir to path for imports
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from code_tools.web_fetch import Fetcher, HTTPCache, extract_text, make_session
+
+
+PAGE = ("<html><head><style>body { color: red }</style><script>if (a < b) { x(); }</script></head>"
+        "<body><h1>Title&nbsp;&amp; more</h1>\n\n<p>First   paragraph<br/>second line</p>"
+        "<p>café</p></body></html>")
+
+
+class Site(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    pages = {}
+    log = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.log.append((self.path, self.client_address[1], dict(self.headers)))
+        time.sleep(self.latency)
+        page = self.pages.get(self.path)
+        if page is None:
+            body, status, headers = b"<p>missing</p>", 404, {}
+        else:
+            body, headers = page["body"], page.get("headers", {})
+            status = 200
+            if headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+                status, body = 304, b""
+            elif headers.get("Last-Modified") and self.headers.get("If-Modified-Since") == headers["Last-Modified"]:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", page.get("type", "text/html; charset=utf-8") if page else "text/html")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    pytest.importorskip("requests")
+    Site.latency = 0.0
+    Site.pages = {}
+    Site.log = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Site)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield Site, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_streaming_extraction_matches_whole_document():
+    encoded = PAGE.encode("utf-8")
+    whole = extract_text(iter([encoded]), "text/html; charset=utf-8")
+    assert whole == "Title & more First paragraph second line café"
+    # Chunk boundaries inside tags, entities, scripts and multi-byte characters change nothing
+    for size in (1, 2, 3, 7, 64):
+        chunks = (encoded[i:i + size] for i in range(0, len(encoded), size))
+        assert extract_text(chunks, "text/html; charset=utf-8") == whole
+    assert extract_text(iter([b"a <b>  not a tag\n"]), "text/plain") == "a <b> not a tag"
+    assert extract_text(iter(["été".encode("latin-1")]), "text/html; charset=ISO-8859-1") == "été"
+
+
+def test_concurrent_fetches_share_pooled_connections(site):
+    handler, base = site
+    handler.latency = 0.2
+    for i in range(8):
+        handler.pages[f"/p{i}"] = {"body": f"<p>page {i}</p>".encode()}
+    fetcher = Fetcher(make_session(8))
+    urls = [f"{base}/p{i}" for i in range(8)] + [f"{base}/p0"]
+
+    start = time.perf_counter()
+    results = dict(fetcher.fetch_many(urls, workers=8))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.2 * 8 / 2
+    assert [results[i]["content"] for i in range(9)] == [f"page {i}" for i in range(8)] + ["page 0"]
+    assert len(handler.log) == 8  # the repeated URL is fetched once
+
+    # Sequential fetches reuse one kept-alive connection
+    handler.latency = 0.0
+    handler.log.clear()
+    fetcher = Fetcher(make_session(1))
+    assert all("error" not in r for _, r in fetcher.fetch_many(urls[:5], workers=1))
+    assert len({port for _, port, _ in handler.log}) == 1
+
+
+def test_cache_ttl_and_revalidation(site, tmp_path):
+    handler, base = site
+    handler.pages["/etag"] = {"body": b"<p>tagged</p>", "headers": {"ETag": '"v1"'}}
+    handler.pages["/dated"] = {"body": b"<p>dated</p>", "headers": {"Last-Modified": formatdate(usegmt=True)}}
+    handler.pages["/private"] = {"body": b"<p>secret</p>", "headers": {"Cache-Control": "no-store"}}
+    cache = HTTPCache(tmp_path / "http_cache")
+    session = make_session(2)
+
+    fetcher = Fetcher(session, cache=cache, ttl=3600)
+    assert [fetcher.fetch(f"{base}{p}")["cache"] for p in ("/etag", "/dated", "/private")] == ["miss"] * 3
+    handler.log.clear()
+    assert [fetcher.fetch(f"{base}{p}")["cache"] for p in ("/etag", "/dated", "/private")] == ["hit", "hit", "miss"]
+    assert [path for path, _, _ in handler.log] == ["/private"]
+
+    stale = Fetcher(session, cache=cache, ttl=0)
+    handler.log.clear()
+    results = [stale.fetch(f"{base}{p}") for p in ("/etag", "/dated")]
+    assert [(r["cache"], r["content"]) for r in results] == [("revalidated", "tagged"), ("revalidated", "dated")]
+    assert handler.log[0][2].get("If-None-Match") == '"v1"' and "If-Modified-Since" in handler.log[1][2]
+
+    handler.pages["/etag"] = {"body": b"<p>changed</p>", "headers": {"ETag": '"v2"'}}
+    assert stale.fetch(f"{base}/etag")["content"] == "changed"
+    assert Fetcher(session, cache=cache).fetch(f"{base}/etag")["cache"] == "hit"
+    assert Fetcher(session, cache=cache).fetch(f"{base}/missing")["status"] == 404
+    assert sorted(p.suffix for p in (tmp_path / "http_cache").iterdir()) == [".json"] * 2
+
+
+def test_fetch_content_cli_many_urls(site, tmp_path):
+    handler, base = site
+    handler.pages["/a"] = {"body": b"<p>alpha</p>"}
+    handler.pages["/b"] = {"body": b"plain text", "type": "text/plain"}
+    cmd = ["code-tools", "fetch_content", "--url", f"{base}/a", "--url", f"{base}/b", "--url", "http://127.0.0.1:9/x",
+           "--cache-dir", str(tmp_path), "--timeout", "2"]
+    data = json.loads(subprocess.check_output(cmd, text=True))["data"]
+    assert [r.get("content") for r in data["results"]] == ["alpha", "plain text", None]
+    assert data["count"] == 3 and data["failed"] == 1 and data["cache_hits"] == 0
+
+    single = json.loads(subprocess.check_output(cmd[:4] + cmd[-4:], text=True))["data"]
+    assert single["status"] == 200 and single["content"] == "alpha" and single["cache"] == "hit"